@@ -5,7 +5,8 @@ FastAPI 应用程序
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Header
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
@@ -14,6 +15,7 @@ from .base import ServerConfig, BuildConfig, ServerInfo, TaskInfo, APIResponse
 from .server import ServerAPI
 from .builder import BuilderAPI
 from .monitor import MonitorAPI
+from .artifacts import ArtifactAPI
 from ..server import ServerManager
 from ..builder import BuildManager
 
@@ -43,6 +45,7 @@ build_manager = BuildManager(server_manager)
 server_api = ServerAPI(server_manager)
 builder_api = BuilderAPI(build_manager)
 monitor_api = MonitorAPI(build_manager, server_manager)
+artifact_api = ArtifactAPI(build_manager)
 
 # 请求模型
 class AddServerRequest(BaseModel):
@@ -58,15 +61,18 @@ class CreateTaskRequest(BaseModel):
     workspace: str
     config: Dict[str, Any]
 
+# 服务器操作和管理器调用都会阻塞, 处理函数定义为普通函数, 由 FastAPI 在线程池中执行,
+# 避免阻塞事件循环
+
 # 健康检查
 @app.get("/health")
-async def health_check() -> APIResponse:
+def health_check() -> APIResponse:
     """健康检查"""
     return server_api.health_check()
 
 # 服务器管理 API
 @app.post("/servers")
-async def add_server(request: AddServerRequest) -> APIResponse:
+def add_server(request: AddServerRequest) -> APIResponse:
     """添加服务器"""
     return server_api.add_server(
         request.name,
@@ -75,43 +81,43 @@ async def add_server(request: AddServerRequest) -> APIResponse:
     )
     
 @app.delete("/servers/{name}")
-async def remove_server(name: str) -> APIResponse:
+def remove_server(name: str) -> APIResponse:
     """移除服务器"""
     return server_api.remove_server(name)
     
 @app.get("/servers/{name}")
-async def get_server(name: str) -> APIResponse:
+def get_server(name: str, refresh: bool = False) -> APIResponse:
     """获取服务器信息"""
-    return server_api.get_server(name)
+    return server_api.get_server(name, refresh)
     
 @app.get("/servers")
-async def list_servers() -> APIResponse:
+def list_servers(refresh: bool = False) -> APIResponse:
     """获取服务器列表"""
-    return server_api.list_servers()
+    return server_api.list_servers(refresh)
     
 @app.post("/servers/{name}/connect")
-async def connect_server(name: str) -> APIResponse:
+def connect_server(name: str) -> APIResponse:
     """连接服务器"""
     return server_api.connect_server(name)
     
 @app.post("/servers/{name}/disconnect")
-async def disconnect_server(name: str) -> APIResponse:
+def disconnect_server(name: str) -> APIResponse:
     """断开服务器连接"""
     return server_api.disconnect_server(name)
     
 @app.get("/servers/{name}/health")
-async def check_server_health(name: str) -> APIResponse:
+def check_server_health(name: str) -> APIResponse:
     """检查服务器健康状态"""
     return server_api.check_server_health(name)
     
 @app.get("/servers/stats")
-async def get_server_stats() -> APIResponse:
+def get_server_stats(refresh: bool = False) -> APIResponse:
     """获取服务器统计信息"""
-    return server_api.get_server_stats()
+    return server_api.get_server_stats(refresh)
 
 # 任务管理 API
 @app.post("/tasks")
-async def create_task(request: CreateTaskRequest) -> APIResponse:
+def create_task(request: CreateTaskRequest) -> APIResponse:
     """创建打包任务"""
     return builder_api.create_task(
         request.platform,
@@ -121,12 +127,12 @@ async def create_task(request: CreateTaskRequest) -> APIResponse:
     )
     
 @app.get("/tasks/{task_id}")
-async def get_task(task_id: str) -> APIResponse:
+def get_task(task_id: str) -> APIResponse:
     """获取任务信息"""
     return builder_api.get_task(task_id)
     
 @app.get("/tasks")
-async def list_tasks(
+def list_tasks(
     status: Optional[str] = None,
     platform: Optional[str] = None,
     limit: int = 100
@@ -135,33 +141,72 @@ async def list_tasks(
     return builder_api.list_tasks(status, platform, limit)
     
 @app.post("/tasks/{task_id}/cancel")
-async def cancel_task(task_id: str) -> APIResponse:
+def cancel_task(task_id: str) -> APIResponse:
     """取消任务"""
     return builder_api.cancel_task(task_id)
     
 @app.delete("/tasks/{task_id}")
-async def cleanup_task(task_id: str) -> APIResponse:
+def cleanup_task(task_id: str) -> APIResponse:
     """清理任务"""
     return builder_api.cleanup_task(task_id)
     
+@app.get("/tasks/{task_id}/artifacts")
+def list_artifacts(task_id: str) -> APIResponse:
+    """获取任务产物列表"""
+    return artifact_api.list_artifacts(task_id)
+    
+@app.get("/tasks/{task_id}/delta")
+def download_delta(
+    task_id: str,
+    base: str,
+    range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None)
+) -> Response:
+    """下载客户端已有产物版本 (base) 到任务产物的差异包"""
+    return artifact_api.download_delta(
+        task_id,
+        base,
+        range,
+        if_none_match,
+        if_range
+    )
+    
+@app.get("/tasks/{task_id}/artifacts/{name:path}")
+def download_artifact(
+    task_id: str,
+    name: str,
+    range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None)
+) -> Response:
+    """下载产物文件 (支持 Range), 目录或 * 返回 zip 流"""
+    return artifact_api.download_artifact(
+        task_id,
+        name,
+        range,
+        if_none_match,
+        if_range
+    )
+    
 @app.get("/tasks/queue")
-async def get_queue_status() -> APIResponse:
+def get_queue_status() -> APIResponse:
     """获取队列状态"""
     return builder_api.get_queue_status()
     
 @app.get("/builders")
-async def get_supported_builders() -> APIResponse:
+def get_supported_builders() -> APIResponse:
     """获取支持的打包工具"""
     return builder_api.get_supported_builders()
 
 # 监控 API
 @app.get("/monitor/metrics")
-async def collect_metrics() -> APIResponse:
+def collect_metrics() -> APIResponse:
     """收集当前指标"""
     return monitor_api.collect_metrics()
     
 @app.get("/monitor/metrics/history")
-async def get_metrics(
+def get_metrics(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None
 ) -> APIResponse:
@@ -169,7 +214,7 @@ async def get_metrics(
     return monitor_api.get_metrics(start_time, end_time)
     
 @app.get("/monitor/alerts")
-async def get_alerts(
+def get_alerts(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None
 ) -> APIResponse:
@@ -177,27 +222,27 @@ async def get_alerts(
     return monitor_api.get_alerts(start_time, end_time)
     
 @app.get("/monitor/metrics/system")
-async def get_system_metrics() -> APIResponse:
+def get_system_metrics() -> APIResponse:
     """获取系统指标"""
     return monitor_api.get_system_metrics()
     
 @app.get("/monitor/metrics/tasks")
-async def get_task_metrics() -> APIResponse:
+def get_task_metrics() -> APIResponse:
     """获取任务指标"""
     return monitor_api.get_task_metrics()
     
 @app.get("/monitor/metrics/servers")
-async def get_server_metrics() -> APIResponse:
+def get_server_metrics() -> APIResponse:
     """获取服务器指标"""
     return monitor_api.get_server_metrics()
     
 @app.get("/monitor/alerts/active")
-async def get_active_alerts() -> APIResponse:
+def get_active_alerts() -> APIResponse:
     """获取活动告警"""
     return monitor_api.get_active_alerts()
     
 @app.get("/monitor/metrics/{metric_name}")
-async def get_metrics_by_name(
+def get_metrics_by_name(
     metric_name: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None
@@ -210,7 +255,7 @@ async def get_metrics_by_name(
     )
     
 @app.get("/monitor/alerts/{level}")
-async def get_alerts_by_level(
+def get_alerts_by_level(
     level: str,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None
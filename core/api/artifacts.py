@@ -0,0 +1,337 @@
+"""
+产物下载 API
+流式返回产物文件, 支持 Range 请求与基于内容哈希的 ETag, 目录按需打包为 zip 流;
+延迟下载的任务在首次请求产物时才从打包服务器取回;
+客户端已有旧版本时可以只下载两个版本之间的差异包
+"""
+import os
+import time
+import hashlib
+import zipfile
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Callable, BinaryIO
+from urllib.parse import quote
+from fastapi.responses import Response, StreamingResponse
+from .base import BaseAPI, APIResponse
+from ..builder import BuildManager
+
+# 流式读取的块大小
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# 请求全部文件打包时使用的名称
+ALL_ARTIFACTS = '*'
+
+class _ZipStream:
+    """收集 zipfile 输出的不可寻址流"""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+        
+    def tell(self) -> int:
+        return self.position
+        
+    def flush(self) -> None:
+        pass
+        
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 请求头
+    
+    Args:
+        header: Range 请求头, 如 bytes=0-1023 / bytes=1024- / bytes=-512
+        size: 文件大小
+        
+    Returns:
+        Optional[Tuple[int, int]]: (起始, 结束) 闭区间, 无 Range 或多段时返回 None
+        
+    Raises:
+        ValueError: 范围无法满足
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start_text, _, end_text = header[len('bytes='):].strip().partition('-')
+    if not start_text:
+        # 后缀范围: 最后 N 个字节
+        length = int(end_text)
+        if length <= 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+class ArtifactAPI(BaseAPI):
+    """产物下载API"""
+    
+    def __init__(self, build_manager: BuildManager):
+        super().__init__()
+        self.build_manager = build_manager
+        self.store = build_manager.artifact_store
+        
+    def _artifact_id(self, task_id: str) -> Optional[str]:
+        """获取任务的产物ID"""
+        task = self.build_manager.tasks.get(task_id)
+        return task.artifact_id if task else None
+        
+    def list_artifacts(self, task_id: str) -> APIResponse:
+        """获取任务产物列表, 延迟下载的任务直接使用远程清单"""
+        try:
+            task = self.build_manager.tasks.get(task_id)
+            remote = task.remote_output if task else None
+            if remote is not None and not task.artifact_id and not remote.expired():
+                return self.success_response({
+                    'artifact_id': None,
+                    'remote': True,
+                    'expires_at': remote.expires_at,
+                    'files': [
+                        {
+                            'name': path,
+                            'size': entry.size,
+                            'etag': entry.hash
+                        }
+                        for path, entry in sorted(remote.manifest.items())
+                    ]
+                })
+                
+            artifact_id = self._artifact_id(task_id)
+            if not artifact_id or not self.store.get(artifact_id):
+                return self.error_response(f"No artifacts for task {task_id}")
+                
+            return self.success_response({
+                'artifact_id': artifact_id,
+                'remote': False,
+                'files': [
+                    {
+                        'name': entry['path'],
+                        'size': entry['size'],
+                        'etag': entry['hash']
+                    }
+                    for entry in self.store.list_files(artifact_id)
+                ]
+            })
+            
+        except Exception as e:
+            return self.error_response(
+                "Failed to list artifacts",
+                str(e)
+            )
+            
+    def download_artifact(
+        self,
+        task_id: str,
+        name: str,
+        range_header: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_range: Optional[str] = None
+    ) -> Response:
+        """
+        下载产物
+        
+        name 为文件时流式返回 (支持 Range), 为目录或 * 时返回 zip 流
+        
+        Args:
+            task_id: 任务ID
+            name: 文件或目录的相对路径
+            range_header: Range 请求头
+            if_none_match: If-None-Match 请求头
+            if_range: If-Range 请求头
+            
+        Returns:
+            Response: HTTP 响应
+        """
+        # 延迟下载的输出在此取回 (同步路由, 在线程池中执行)
+        artifact_id = self.build_manager.fetch_artifact(task_id)
+        if not artifact_id or not self.store.get(artifact_id):
+            return Response(status_code=404, content=f"No artifacts for task {task_id}")
+            
+        files = self.store.list_files(artifact_id)
+        name = name.strip('/')
+        if entry := next((f for f in files if f['path'] == name), None):
+            return self._file_response(
+                lambda: self.store.open_file(artifact_id, entry['path']),
+                entry['path'].rsplit('/', 1)[-1],
+                entry['size'],
+                f'"{entry["hash"]}"',
+                range_header,
+                if_none_match,
+                if_range
+            )
+            
+        prefix = '' if name == ALL_ARTIFACTS else name + '/'
+        selected = [f for f in files if f['path'].startswith(prefix)]
+        if not selected:
+            return Response(status_code=404, content=f"Artifact {name} not found")
+        archive_name = 'artifacts' if name == ALL_ARTIFACTS else name.rsplit('/', 1)[-1]
+        return self._zip_response(artifact_id, selected, prefix, archive_name, if_none_match)
+        
+    def download_delta(
+        self,
+        task_id: str,
+        base_id: str,
+        range_header: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        if_range: Optional[str] = None
+    ) -> Response:
+        """
+        下载客户端已有版本到任务产物的差异包
+        
+        差异包按版本对缓存, 只在首次请求时生成, 之后按普通文件返回 (支持 Range 续传)
+        
+        Args:
+            task_id: 任务ID
+            base_id: 客户端已有的产物ID
+            range_header: Range 请求头
+            if_none_match: If-None-Match 请求头
+            if_range: If-Range 请求头
+            
+        Returns:
+            Response: HTTP 响应
+        """
+        artifact_id = self.build_manager.fetch_artifact(task_id)
+        if not artifact_id or not self.store.get(artifact_id):
+            return Response(status_code=404, content=f"No artifacts for task {task_id}")
+        if not self.store.get(base_id):
+            return Response(status_code=404, content=f"Base artifact {base_id} not found")
+            
+        path = self.store.get_delta(base_id, artifact_id)
+        if not path:
+            return Response(status_code=500, content="Failed to build delta")
+            
+        return self._file_response(
+            lambda: open(path, 'rb'),
+            f"{base_id}-{artifact_id}.delta.zip",
+            os.path.getsize(path),
+            f'"delta-{base_id}-{artifact_id}"',
+            range_header,
+            if_none_match,
+            if_range
+        )
+        
+    def _file_response(
+        self,
+        opener: Callable[[], Optional[BinaryIO]],
+        filename: str,
+        size: int,
+        etag: str,
+        range_header: Optional[str],
+        if_none_match: Optional[str],
+        if_range: Optional[str]
+    ) -> Response:
+        """流式返回单个文件"""
+        headers = {
+            'ETag': etag,
+            'Accept-Ranges': 'bytes',
+            'Content-Disposition': self._disposition(filename)
+        }
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+            
+        # If-Range 与当前内容不一致时忽略 Range, 返回完整文件
+        if if_range and if_range.strip() != etag:
+            range_header = None
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status_code=416, headers=headers)
+            
+        start, end = byte_range or (0, size - 1)
+        status_code = 200
+        if byte_range:
+            status_code = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(max(end - start + 1, 0))
+        
+        return StreamingResponse(
+            self._iter_file(opener, start, end - start + 1),
+            status_code=status_code,
+            media_type='application/octet-stream',
+            headers=headers
+        )
+        
+    @staticmethod
+    def _iter_file(opener: Callable[[], Optional[BinaryIO]], start: int, length: int) -> Iterator[bytes]:
+        """分块读取文件区间"""
+        f = opener()
+        if f is None:
+            return
+        try:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+            
+    def _zip_response(
+        self,
+        artifact_id: str,
+        files: List[Dict[str, Any]],
+        prefix: str,
+        archive_name: str,
+        if_none_match: Optional[str]
+    ) -> Response:
+        """边压缩边返回 zip 流"""
+        # 内容和文件名决定 zip 内容, 用于 ETag
+        hasher = hashlib.sha256()
+        for entry in files:
+            hasher.update(f"{entry['path']}\0{entry['hash']}\n".encode('utf-8'))
+        etag = f'"zip-{hasher.hexdigest()}"'
+        headers = {
+            'ETag': etag,
+            'Content-Disposition': self._disposition(f"{archive_name}.zip")
+        }
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+            
+        return StreamingResponse(
+            self._iter_zip(artifact_id, files, prefix),
+            media_type='application/zip',
+            headers=headers
+        )
+        
+    def _iter_zip(self, artifact_id: str, files: List[Dict[str, Any]], prefix: str) -> Iterator[bytes]:
+        """逐文件写入 zip 并输出已生成的数据"""
+        stream = _ZipStream()
+        created = self.store.get(artifact_id)['created']
+        date_time = time.localtime(max(created, 315532800))[:6]  # zip 时间不早于 1980 年
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            for entry in files:
+                info = zipfile.ZipInfo(entry['path'][len(prefix):], date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = (0o100000 | entry['mode']) << 16
+                f = self.store.open_file(artifact_id, entry['path'])
+                if f is None:
+                    continue
+                try:
+                    with archive.open(info, 'w', force_zip64=True) as dest:
+                        while chunk := f.read(STREAM_CHUNK_SIZE):
+                            dest.write(chunk)
+                            if data := stream.drain():
+                                yield data
+                finally:
+                    f.close()
+                if data := stream.drain():
+                    yield data
+        yield stream.drain()
+        
+    @staticmethod
+    def _disposition(filename: str) -> str:
+        """Content-Disposition 响应头"""
+        return f"attachment; filename*=UTF-8''{quote(filename)}"
@@ -24,8 +24,15 @@ class ServerInfo(BaseModel):
     memory_usage: float = Field(0.0, description="内存使用率")
     disk_usage: float = Field(0.0, description="磁盘使用率")
     load: float = Field(0.0, description="负载分数")
+    load_average: List[float] = Field(default_factory=list, description="系统平均负载 (1/5/15 分钟)")
+    cpu_count: int = Field(0, description="CPU核数")
+    temp_free: int = Field(0, description="临时目录剩余空间(字节)")
+    python_version: str = Field("", description="Python版本")
+    python_versions: Dict[str, str] = Field(default_factory=dict, description="其他Python解释器")
+    builder_versions: Dict[str, str] = Field(default_factory=dict, description="打包工具版本")
     error: Optional[str] = Field(None, description="错误信息")
-    last_check: datetime = Field(default_factory=datetime.now, description="最后检查时间")
+    last_check: Optional[datetime] = Field(None, description="最后检查时间")
+    stale: bool = Field(False, description="状态是否已超过有效期")
     
 class BuildConfig(BaseModel):
     """打包配置"""
@@ -47,8 +54,10 @@ class TaskInfo(BaseModel):
     status: str = Field(..., description="任务状态")
     progress: float = Field(0.0, description="进度")
     current_step: str = Field("", description="当前步骤")
+    last_output: str = Field("", description="最近一行打包输出")
     error: Optional[str] = Field(None, description="错误信息")
     output_dir: Optional[str] = Field(None, description="输出目录")
+    artifact_id: Optional[str] = Field(None, description="产物ID")
     start_time: Optional[datetime] = Field(None, description="开始时间")
     end_time: Optional[datetime] = Field(None, description="结束时间")
     server: Optional[str] = Field(None, description="构建服务器")
@@ -2,10 +2,10 @@
 服务器管理 API
 提供服务器管理相关的接口
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from .base import BaseAPI, APIError, APIResponse, ServerConfig, ServerInfo
-from ..server import ServerManager
+from ..server import ServerManager, BaseServer, ServerStatus
 
 class ServerAPI(BaseAPI):
     """服务器管理API"""
@@ -63,31 +63,24 @@ class ServerAPI(BaseAPI):
                 str(e)
             )
             
-    def get_server(self, name: str) -> APIResponse:
-        """获取服务器信息"""
+    def get_server(self, name: str, refresh: bool = False) -> APIResponse:
+        """
+        获取服务器信息
+        
+        Args:
+            name: 服务器名称
+            refresh: 是否立即探测, 默认返回后台刷新的状态快照
+        """
         try:
             server = self.server_manager.get_server(name)
             if not server:
                 return self.error_response(f"Server {name} not found")
                 
             # 获取服务器状态
-            status = None
-            if name in self.server_manager.active_servers:
-                status = server.check_health()
+            status = self.server_manager.get_server_status(name, refresh)
                 
             # 获取服���器信息
-            server_info = {
-                "name": name,
-                "type": server.__class__.__name__.lower().replace("server", ""),
-                "status": "online" if status else "offline",
-                "active": name in self.server_manager.active_servers,
-                "cpu_usage": status.cpu_usage if status else 0.0,
-                "memory_usage": status.memory_usage if status else 0.0,
-                "disk_usage": status.disk_usage if status else 0.0,
-                "load": self.server_manager.load_balancer.server_loads.get(name, 0.0),
-                "error": status.errors[0] if status and status.errors else None,
-                "last_check": datetime.now()
-            }
+            server_info = self._server_info(name, server, status)
             
             return self.success_response(
                 self.format_server_info(server_info).dict()
@@ -99,30 +92,22 @@ class ServerAPI(BaseAPI):
                 str(e)
             )
             
-    def list_servers(self) -> APIResponse:
-        """获取服务器列表"""
+    def list_servers(self, refresh: bool = False) -> APIResponse:
+        """
+        获取服务器列表
+        
+        Args:
+            refresh: 是否立即探测所有活动服务器, 默认返回状态快照
+        """
         try:
             server_list = []
             
-            for name, server in self.server_manager.servers.items():
+            for name, server in list(self.server_manager.servers.items()):
                 # 获取服务器状态
-                status = None
-                if name in self.server_manager.active_servers:
-                    status = server.check_health()
+                status = self.server_manager.get_server_status(name, refresh)
                     
                 # 获取服务器信息
-                server_info = {
-                    "name": name,
-                    "type": server.__class__.__name__.lower().replace("server", ""),
-                    "status": "online" if status else "offline",
-                    "active": name in self.server_manager.active_servers,
-                    "cpu_usage": status.cpu_usage if status else 0.0,
-                    "memory_usage": status.memory_usage if status else 0.0,
-                    "disk_usage": status.disk_usage if status else 0.0,
-                    "load": self.server_manager.load_balancer.server_loads.get(name, 0.0),
-                    "error": status.errors[0] if status and status.errors else None,
-                    "last_check": datetime.now()
-                }
+                server_info = self._server_info(name, server, status)
                 
                 server_list.append(
                     self.format_server_info(server_info).dict()
@@ -182,20 +167,9 @@ class ServerAPI(BaseAPI):
             if name not in self.server_manager.active_servers:
                 return self.error_response(f"Server {name} is not connected")
                 
-            status = server.check_health()
+            status = self.server_manager.get_server_status(name, refresh=True)
             
-            server_info = {
-                "name": name,
-                "type": server.__class__.__name__.lower().replace("server", ""),
-                "status": "online",
-                "active": True,
-                "cpu_usage": status.cpu_usage,
-                "memory_usage": status.memory_usage,
-                "disk_usage": status.disk_usage,
-                "load": self.server_manager.load_balancer.server_loads.get(name, 0.0),
-                "error": status.errors[0] if status.errors else None,
-                "last_check": datetime.now()
-            }
+            server_info = self._server_info(name, server, status)
             
             return self.success_response(
                 self.format_server_info(server_info).dict()
@@ -207,10 +181,43 @@ class ServerAPI(BaseAPI):
                 str(e)
             )
             
-    def get_server_stats(self) -> APIResponse:
+    def _server_info(
+        self,
+        name: str,
+        server: BaseServer,
+        cached: Optional[Tuple[ServerStatus, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """生成服务器信息, cached 为 (状态, 快照时间信息), None 表示未连接或尚未探测"""
+        active = name in self.server_manager.active_servers
+        info = {
+            "name": name,
+            "type": server.__class__.__name__.lower().replace("server", ""),
+            "status": "online" if active else "offline",
+            "active": active,
+            "load": self.server_manager.load_balancer.server_loads.get(name, 0.0)
+        }
+        if cached:
+            status, snapshot = cached
+            info.update({
+                "last_check": datetime.fromtimestamp(snapshot["checked_at"]),
+                "stale": snapshot["stale"],
+                "cpu_usage": status.cpu_usage,
+                "memory_usage": status.memory_usage,
+                "disk_usage": status.disk_usage,
+                "load_average": status.load_average,
+                "cpu_count": status.cpu_count,
+                "temp_free": status.temp_free,
+                "python_version": status.python_version,
+                "python_versions": status.python_versions,
+                "builder_versions": status.builder_versions,
+                "error": status.errors[0] if status.errors else None
+            })
+        return info
+        
+    def get_server_stats(self, refresh: bool = False) -> APIResponse:
         """获取服务器统计信息"""
         try:
-            stats = self.server_manager.get_server_stats()
+            stats = self.server_manager.get_server_stats(refresh)
             return self.success_response(stats)
             
         except Exception as e:
@@ -0,0 +1,14 @@
+"""
+打包模块
+"""
+from .manager import BuildManager, BuildTask, TaskStatus, RemoteOutput
+from .cache import BuildCache, build_fingerprint
+
+__all__ = [
+    'BuildManager',
+    'BuildTask',
+    'TaskStatus',
+    'RemoteOutput',
+    'BuildCache',
+    'build_fingerprint'
+]
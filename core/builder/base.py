@@ -1,17 +1,37 @@
 """
 打包器基类
 """
+import json
 import logging
 from abc import ABC, abstractmethod
-from ..server.manager import BuildTask
+from typing import Dict, List, TYPE_CHECKING
+from ..server import BaseServer
+
+if TYPE_CHECKING:
+    from .manager import BuildTask
 
 logger = logging.getLogger(__name__)
 
+# 远程版本探测脚本: 输出 Python 版本与指定模块的版本
+REMOTE_VERSION_SCRIPT = '''
+import importlib, json, sys
+versions = {"python": sys.version.split()[0]}
+for name in sys.argv[1:]:
+    try:
+        versions[name] = getattr(importlib.import_module(name), "__version__", "")
+    except Exception:
+        versions[name] = ""
+sys.stdout.write(json.dumps(versions))
+'''
+
 class BaseBuilder(ABC):
     """打包器基类"""
     
+    # 打包工具的 Python 模块名, 用于探测工具链版本
+    version_modules: List[str] = []
+    
     @abstractmethod
-    def build(self, task: BuildTask) -> bool:
+    def build(self, task: 'BuildTask') -> bool:
         """
         执行打包
         
@@ -21,4 +41,24 @@ class BaseBuilder(ABC):
         Returns:
             bool: 是否打包成功
         """
-        pass 
\ No newline at end of file
+        pass
+        
+    def get_toolchain(self, server: BaseServer) -> Dict[str, str]:
+        """
+        获取服务器上的工具链版本 (Python 与打包工具)
+        
+        Args:
+            server: 打包服务器
+            
+        Returns:
+            Dict[str, str]: 名称到版本的映射, 获取失败时返回空字典
+        """
+        try:
+            stdout, stderr = server.execute_python(REMOTE_VERSION_SCRIPT, *self.version_modules)
+            if not stdout.strip():
+                logger.warning(f"获取工具链版本失败: {stderr.strip()}")
+                return {}
+            return json.loads(stdout)
+        except Exception as e:
+            logger.warning(f"获取工具链版本失败: {str(e)}")
+            return {}
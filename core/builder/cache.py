@@ -0,0 +1,186 @@
+"""
+构建结果缓存
+以输入指纹 (工作目录树哈希 + 打包配置 + 工具链版本 + 平台) 为键记录产物ID,
+相同输入的任务直接复用产物存储中的结果, 不再占用打包服务器
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'),
+    '.remotebuilder',
+    'build_cache'
+)
+
+def build_fingerprint(
+    tree_hash: str,
+    platform: str,
+    entry_script: str,
+    builder: str,
+    builder_config: Dict[str, Any],
+    toolchain: Dict[str, str]
+) -> str:
+    """
+    计算构建输入指纹
+    
+    Args:
+        tree_hash: 工作目录树哈希
+        platform: 目标平台
+        entry_script: 入口脚本
+        builder: 打包工具
+        builder_config: 打包配置 (如 task.config['pyinstaller'])
+        toolchain: 服务器上的工具链版本
+        
+    Returns:
+        str: 指纹
+    """
+    # 规范化为排序后的紧凑 JSON, 键顺序不同的等价配置得到相同指纹
+    payload = json.dumps(
+        {
+            'tree': tree_hash,
+            'platform': platform,
+            'entry_script': entry_script.replace('\\', '/'),
+            'builder': builder,
+            'config': builder_config,
+            'toolchain': toolchain
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class BuildCache:
+    """构建结果缓存 (指纹到产物ID的本地索引, 按最近使用淘汰)"""
+    
+    def __init__(self, root: Optional[str] = None, max_entries: int = 100):
+        self.root = root or DEFAULT_CACHE_DIR
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        
+    def _entry_path(self, fingerprint: str) -> str:
+        """缓存条目文件"""
+        return os.path.join(self.root, f"{fingerprint}.json")
+        
+    def contains(self, fingerprint: str) -> bool:
+        """是否存在缓存条目"""
+        return os.path.isfile(self._entry_path(fingerprint))
+        
+    def get(
+        self,
+        fingerprint: str,
+        valid: Optional[Callable[[str], bool]] = None
+    ) -> Optional[str]:
+        """
+        查找指纹对应的产物ID
+        
+        Args:
+            fingerprint: 构建指纹
+            valid: 检查产物是否仍然存在, 不存在时删除条目并视为未命中
+            
+        Returns:
+            Optional[str]: 产物ID, 未命中时返回 None
+        """
+        entry_path = self._entry_path(fingerprint)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                artifact_id = json.load(f)['artifact_id']
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+            
+        if valid and not valid(artifact_id):
+            # 产物已被保留策略删除
+            self.discard(fingerprint)
+            self.misses += 1
+            return None
+            
+        try:
+            # 条目的修改时间作为最近使用时间
+            os.utime(entry_path)
+        except OSError:
+            pass
+        self.hits += 1
+        return artifact_id
+        
+    def put(
+        self,
+        fingerprint: str,
+        artifact_id: str,
+        meta: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        记录打包结果的产物ID
+        
+        先写入临时文件再改名, 并发任务不会读到不完整的条目
+        
+        Args:
+            fingerprint: 构建指纹
+            artifact_id: 产物存储中的产物ID
+            meta: 附加元数据
+            
+        Returns:
+            bool: 是否保存成功
+        """
+        entry_path = self._entry_path(fingerprint)
+        tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    {
+                        'fingerprint': fingerprint,
+                        'artifact_id': artifact_id,
+                        'created': time.time(),
+                        **(meta or {})
+                    },
+                    f
+                )
+            os.replace(tmp_path, entry_path)
+            self.evict()
+            return True
+            
+        except Exception as e:
+            logger.warning(f"保存构建缓存失败: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+            
+    def discard(self, fingerprint: str) -> None:
+        """删除缓存条目"""
+        try:
+            os.remove(self._entry_path(fingerprint))
+        except OSError:
+            pass
+            
+    def evict(self) -> int:
+        """
+        淘汰最久未使用的条目
+        
+        Returns:
+            int: 淘汰的条目数
+        """
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith('.json') and os.path.isfile(path):
+                    entries.append((os.path.getmtime(path), path))
+                    
+            removed = 0
+            for _, path in sorted(entries)[:max(len(entries) - self.max_entries, 0)]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
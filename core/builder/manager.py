@@ -6,14 +6,41 @@ import os
 import logging
 import tempfile
 import shutil
-import hashlib
 import threading
 import time
-from typing import Dict, Any, Optional, List, Set
+from typing import Dict, Any, Optional, List, Set, Tuple
 from queue import Queue, Empty
-from ..server import ServerManager, BaseServer
+from ..server import ServerManager, BaseServer, OutputLog, DEFAULT_LOG_DIR
+from ..storage import ArtifactStore
+from ..transfer import (
+    IgnoreMatcher,
+    scan_workspace,
+    hash_manifest,
+    tree_hash,
+    fetch_remote_manifest,
+    fetch_remote_stats,
+    diff_manifests,
+    plan_directories,
+    FileEntry,
+    ParallelUploader,
+    ParallelDownloader,
+    TransferStats,
+    ArchiveUploader,
+    ArchiveDownloader,
+    choose_transfer_mode,
+    FileHashCache,
+    DeltaUploader,
+    RemoteBlobStore,
+    WarmWorkspace,
+    BandwidthManager,
+    BandwidthFlow,
+    TransferCheckpoint,
+    DEFAULT_CHECKPOINT_DIR,
+    hash_file
+)
 from .base import BaseBuilder
 from .pyinstaller import PyInstallerBuilder
+from .cache import BuildCache, build_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +54,34 @@ class TaskStatus:
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+class RemoteOutput:
+    """保留在打包服务器上的输出 (延迟下载)"""
+    
+    def __init__(
+        self,
+        path: str,
+        manifest: Dict[str, FileEntry],
+        ttl: float
+    ):
+        self.path = path
+        self.manifest = manifest
+        self.created = time.time()
+        self.expires_at = self.created + ttl
+        self.lock = threading.Lock()  # 同一任务的并发请求只下载一次
+        
+    def expired(self) -> bool:
+        """远程副本是否已过期"""
+        return time.time() >= self.expires_at
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'path': self.path,
+            'files': len(self.manifest),
+            'size': sum(entry.size for entry in self.manifest.values()),
+            'expires_at': self.expires_at
+        }
+        
 class BuildTask:
     """打包任务"""
     
@@ -52,8 +107,27 @@ class BuildTask:
         self.end_time = None
         self.uploaded_files: Set[str] = set()
         self.total_files = 0
+        self.transfer_rate = 0.0  # 字节/秒
         self.current_step = ""
+        self.bytes_saved = 0  # 增量传输节省的字节数
+        self.bandwidth_flow: Optional[BandwidthFlow] = None
+        self.downloaded_files = 0
+        self.downloaded_bytes = 0
+        self.fingerprint: Optional[str] = None
+        self.cache_hit = False
+        self.checkpoint = TransferCheckpoint()  # 大文件分块续传断点
+        self.artifact_id: Optional[str] = None
+        self.remote_output: Optional[RemoteOutput] = None  # 延迟下载时的远程输出
+        self.last_output = ""  # 打包命令最近一行非空输出
+        self.last_output_time: Optional[float] = None
+        self.log = OutputLog(on_line=self.on_output)  # 打包命令输出, 内存中只保留末尾
         
+    def on_output(self, stream: str, line: str) -> None:
+        """打包命令每行输出的回调, 记录最近的输出和时间供状态查询"""
+        if line.strip():
+            self.last_output = line
+            self.last_output_time = time.time()
+            
 class TaskQueue:
     """任务队列"""
     
@@ -103,7 +177,18 @@ class BuildManager:
         self,
         server_manager: ServerManager,
         max_concurrent_tasks: int = 3,
-        chunk_size: int = 1024 * 1024  # 1MB
+        chunk_size: int = 1024 * 1024,  # 1MB
+        hash_workers: int = 8,
+        upload_channels: int = 4,
+        hash_cache: Optional[FileHashCache] = None,
+        delta_threshold: int = 8 * 1024 * 1024,  # 8MB
+        bandwidth_limit: Optional[float] = None,  # 全局上传上限(字节/秒)
+        build_cache: Optional[BuildCache] = None,
+        resume_threshold: int = 64 * 1024 * 1024,  # 64MB
+        checkpoint_dir: Optional[str] = None,
+        artifact_store: Optional[ArtifactStore] = None,
+        remote_output_ttl: float = 24 * 3600,  # 延迟下载时远程输出的保留时间(秒)
+        log_dir: Optional[str] = None
     ):
         self.server_manager = server_manager
         self.tasks: Dict[str, BuildTask] = {}
@@ -112,6 +197,26 @@ class BuildManager:
         }
         self.task_queue = TaskQueue(max_concurrent_tasks)
         self.chunk_size = chunk_size
+        self.hash_workers = hash_workers
+        self.upload_channels = upload_channels
+        self.hash_cache = hash_cache or FileHashCache()
+        self.delta_threshold = delta_threshold
+        self.blob_gc_interval = 600
+        self._blob_gc_times: Dict[int, float] = {}
+        self.warm_workspaces: Dict[Tuple[str, str], WarmWorkspace] = {}
+        # 各 (服务器, 本地工作目录, 平台) 上一次上传的远程工作目录及其文件, 作为增量传输的旧版本
+        self.delta_bases: Dict[Tuple[str, str, str], Tuple[str, Set[str]]] = {}
+        self.bandwidth = BandwidthManager(bandwidth_limit)
+        self.build_cache = build_cache or BuildCache()
+        self._toolchains: Dict[Tuple[str, ...], Tuple[float, Dict[str, str]]] = {}
+        self.toolchain_ttl = 300.0  # 工具链版本的缓存时间(秒), 过期后重新探测
+        self.resume_threshold = resume_threshold
+        self.checkpoint_dir = checkpoint_dir or DEFAULT_CHECKPOINT_DIR
+        self.link_rates: Dict[str, float] = {}  # 各服务器实测链路带宽(字节/秒)
+        self.artifact_store = artifact_store or ArtifactStore()
+        self.remote_output_ttl = remote_output_ttl
+        self.remote_sweep_interval = 60.0
+        self.log_dir = log_dir or DEFAULT_LOG_DIR
         
         # 启动任务处理线程
         self.worker_thread = threading.Thread(
@@ -120,6 +225,13 @@ class BuildManager:
         )
         self.worker_thread.start()
         
+        # 启动远程输出过期清理线程
+        self.sweeper_thread = threading.Thread(
+            target=self._sweep_remote_outputs,
+            daemon=True
+        )
+        self.sweeper_thread.start()
+        
     def create_task(
         self,
         platform: str,
@@ -152,12 +264,23 @@ class BuildManager:
                 logger.error(f"不支持的平台: {platform}")
                 return None
                 
-            server = self.server_manager.select_server(server_type)
+            # 已注册常驻工作目录的项目固定使用同一台服务器
+            if warm := self.warm_workspaces.get(self._warm_key(workspace, platform)):
+                server = warm.server
+            else:
+                server = self.server_manager.select_server(server_type)
             if not server:
                 logger.error(f"没有可用的 {platform} 打包服务器")
                 return None
                 
             task.server = server
+            task.checkpoint = TransferCheckpoint(
+                os.path.join(self.checkpoint_dir, f"{task_id}.json")
+            )
+            task.log = OutputLog(
+                os.path.join(self.log_dir, f"{task_id}.log"),
+                on_line=task.on_output
+            )
             self.tasks[task_id] = task
             
             # 添加到任务队列
@@ -195,19 +318,43 @@ class BuildManager:
             temp_dir = tempfile.mkdtemp(prefix=f"build_{task.platform}_")
             task.output_dir = temp_dir
             
-            # 上传工作目录
-            task.status = TaskStatus.UPLOADING
-            task.current_step = "正在上传工作目录"
-            if not self._upload_workspace(task):
+            # 选择打包工具
+            builder_name = task.config.get('builder', 'pyinstaller')
+            builder = self.builders.get(builder_name)
+            if not builder:
+                logger.error(f"不支持的打包工具: {builder_name}")
                 task.status = TaskStatus.FAILED
+                task.error = f"不支持的打包工具: {builder_name}"
                 return
                 
-            # 选择打包工具
-            builder = self.builders.get(task.config.get('builder', 'pyinstaller'))
-            if not builder:
-                logger.error(f"不支持的打包工具: {task.config.get('builder')}")
+            # 生成本地清单
+            task.current_step = "正在扫描工作目录"
+            local_manifest = self._scan_workspace(task)
+            
+            # 输入相同的构建直接复用缓存结果, 不占用打包服务器
+            if task.config.get('cache', True):
+                task.fingerprint = self._build_fingerprint(task, builder_name, builder, local_manifest)
+                artifact_id = task.fingerprint and self.build_cache.get(
+                    task.fingerprint,
+                    lambda artifact_id: self.artifact_store.get(artifact_id) is not None
+                )
+                if artifact_id:
+                    # 直接引用产物存储中已有的结果, 不复制文件
+                    logger.info(f"任务 {task.task_id} 命中构建缓存")
+                    task.cache_hit = True
+                    task.artifact_id = artifact_id
+                    self.artifact_store.touch(artifact_id)
+                    shutil.rmtree(task.output_dir, ignore_errors=True)
+                    task.output_dir = None
+                    task.status = TaskStatus.SUCCESS
+                    task.progress = 100.0
+                    return
+                    
+            # 上传工作目录
+            task.status = TaskStatus.UPLOADING
+            task.current_step = "正在上传工作目录"
+            if not self._upload_workspace(task, local_manifest):
                 task.status = TaskStatus.FAILED
-                task.error = f"不支持的打包工具: {task.config.get('builder')}"
                 return
                 
             # 开始打包
@@ -217,6 +364,15 @@ class BuildManager:
                 task.status = TaskStatus.FAILED
                 return
                 
+            # 延迟下载: 输出留在服务器上, 客户端请求产物时再下载
+            if task.config.get('transfer', {}).get('lazy_output', False):
+                if not self._keep_remote_output(task):
+                    task.status = TaskStatus.FAILED
+                    return
+                task.status = TaskStatus.SUCCESS
+                task.progress = 100.0
+                return
+                
             # 下载打包结果
             task.status = TaskStatus.DOWNLOADING
             task.current_step = "正在下载打包结果"
@@ -224,6 +380,17 @@ class BuildManager:
                 task.status = TaskStatus.FAILED
                 return
                 
+            if not self._store_artifact(task):
+                task.status = TaskStatus.FAILED
+                return
+                
+            if task.fingerprint:
+                self.build_cache.put(
+                    task.fingerprint,
+                    task.artifact_id,
+                    {'task_id': task.task_id, 'platform': task.platform}
+                )
+                
             task.status = TaskStatus.SUCCESS
             task.progress = 100.0
             
@@ -234,73 +401,315 @@ class BuildManager:
             
         finally:
             task.end_time = time.time()
+            task.log.close()
+            # 失败任务的临时输出目录不再保留
+            if task.status != TaskStatus.SUCCESS and task.output_dir:
+                shutil.rmtree(task.output_dir, ignore_errors=True)
+                task.output_dir = None
+                
+    def _keep_remote_output(self, task: BuildTask) -> bool:
+        """记录远程输出清单, 任务不下载输出即完成"""
+        task.current_step = "正在检查打包结果"
+        remote_output = f"/tmp/output_{task.task_id}"
+        manifest = fetch_remote_manifest(task.server, remote_output)
+        if not manifest:
+            task.error = "打包输出目录为空"
+            return False
             
+        task.remote_output = RemoteOutput(
+            remote_output,
+            manifest,
+            task.config.get('transfer', {}).get('remote_ttl', self.remote_output_ttl)
+        )
+        shutil.rmtree(task.output_dir, ignore_errors=True)
+        task.output_dir = None
+        logger.info(f"任务 {task.task_id} 的输出保留在服务器上: {len(manifest)} 个文件")
+        return True
+        
+    def fetch_artifact(self, task_id: str) -> Optional[str]:
+        """
+        获取任务产物, 延迟下载的输出在首次请求时下载并存入产物存储
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            Optional[str]: 产物ID, 无产物或远程输出已过期时返回 None
+        """
+        task = self.tasks.get(task_id)
+        if not task:
+            return None
+        remote = task.remote_output
+        if task.artifact_id or remote is None:
+            return task.artifact_id
+            
+        with remote.lock:
+            if task.artifact_id or task.remote_output is None:
+                return task.artifact_id
+            if remote.expired():
+                self._release_remote_output(task)
+                return None
+                
+            # 远程输出可能已被服务器清理 (如重启后 /tmp 被清空)
+            stats = fetch_remote_stats(task.server, [remote.path])
+            if stats is not None and stats.get(remote.path) is None:
+                logger.warning(f"任务 {task_id} 的远程输出已不存在: {remote.path}")
+                self._release_remote_output(task)
+                return None
+                
+            task.output_dir = tempfile.mkdtemp(prefix=f"build_{task.platform}_")
+            task.current_step = "正在下载打包结果"
+            fetched = self._download_output(task) and self._store_artifact(task)
+            if fetched and task.fingerprint:
+                self.build_cache.put(
+                    task.fingerprint,
+                    task.artifact_id,
+                    {'task_id': task.task_id, 'platform': task.platform}
+                )
+            task.progress = 100.0
+            if not fetched:
+                logger.error(f"下载任务 {task_id} 的产物失败: {task.error}")
+                if task.output_dir:
+                    shutil.rmtree(task.output_dir, ignore_errors=True)
+                    task.output_dir = None
+                return None
+                
+            # 已存入本地产物存储, 远程副本不再需要
+            self._release_remote_output(task)
+            return task.artifact_id
+            
+    def _release_remote_output(self, task: BuildTask) -> None:
+        """删除服务器上保留的输出"""
+        remote = task.remote_output
+        task.remote_output = None
+        if remote is None or not task.server:
+            return
+        try:
+            task.server.remove_directory(remote.path)
+        except Exception as e:
+            logger.warning(f"删除远程输出失败: {str(e)}")
+            
+    def _sweep_remote_outputs(self) -> None:
+        """定期删除过期的远程输出"""
+        while True:
+            time.sleep(self.remote_sweep_interval)
+            for task in list(self.tasks.values()):
+                remote = task.remote_output
+                # 正在下载的输出跳过, 下次再检查
+                if remote is None or not remote.expired() or not remote.lock.acquire(blocking=False):
+                    continue
+                try:
+                    logger.info(f"任务 {task.task_id} 的远程输出已过期")
+                    self._release_remote_output(task)
+                except Exception as e:
+                    logger.error(f"清理远程输出失败: {str(e)}")
+                finally:
+                    remote.lock.release()
+                    
+    def _store_artifact(self, task: BuildTask) -> bool:
+        """将输出目录存入产物存储, 任务改为通过产物ID引用结果"""
+        task.current_step = "正在保存打包结果"
+        project = task.config.get('project') or os.path.basename(os.path.abspath(task.workspace))
+        artifact_id = self.artifact_store.put(
+            task.output_dir,
+            project,
+            task_id=task.task_id,
+            platform=task.platform,
+            move=True
+        )
+        if not artifact_id:
+            task.error = "保存打包结果失败"
+            return False
+            
+        task.artifact_id = artifact_id
+        shutil.rmtree(task.output_dir, ignore_errors=True)
+        task.output_dir = None
+        return True
+        
+    def _scan_workspace(self, task: BuildTask) -> Dict[str, FileEntry]:
+        """生成本地清单并在线程池中计算哈希, 忽略的目录整体跳过"""
+        matcher = IgnoreMatcher.for_workspace(
+            task.workspace,
+            task.config.get('ignore', []),
+            task.config.get('ignore_defaults', True)
+        )
+        local_manifest = scan_workspace(task.workspace, matcher)
+        hash_manifest(
+            local_manifest,
+            self._calculate_file_hash,
+            self.hash_workers
+        )
+        return local_manifest
+        
+    def _build_fingerprint(
+        self,
+        task: BuildTask,
+        builder_name: str,
+        builder: BaseBuilder,
+        local_manifest: Dict[str, FileEntry]
+    ) -> Optional[str]:
+        """计算构建指纹, 工具链版本未知时返回 None (不使用缓存)"""
+        toolchain = self._get_toolchain(task.server, builder_name, builder)
+        if not toolchain:
+            return None
+        return build_fingerprint(
+            tree_hash(local_manifest),
+            task.platform,
+            task.entry_script,
+            builder_name,
+            task.config.get(builder_name, {}),
+            toolchain
+        )
+        
+    def _get_toolchain(
+        self,
+        server: BaseServer,
+        builder_name: str,
+        builder: BaseBuilder
+    ) -> Dict[str, str]:
+        """获取服务器工具链版本, 按服务器地址与 Python 配置缓存"""
+        # 工具链可能在服务器上升级, 缓存过期后重新探测
+        key = (
+            server.config.get('host', ''),
+            str(server.config.get('port', 22)),
+            server.config.get('username', ''),
+            server.config.get('python', 'python'),
+            builder_name
+        )
+        cached = self._toolchains.get(key)
+        if cached and time.time() - cached[0] < self.toolchain_ttl:
+            return cached[1]
+            
+        toolchain = builder.get_toolchain(server)
+        # 打包工具尚未安装时版本为空, 安装后重新探测
+        if not toolchain or not all(toolchain.values()):
+            self._toolchains.pop(key, None)
+            return {}
+        self._toolchains[key] = (time.time(), toolchain)
+        return toolchain
+        
     def _calculate_file_hash(self, file_path: str) -> str:
-        """计算文件哈希值"""
-        hasher = hashlib.sha256()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(self.chunk_size):
-                hasher.update(chunk)
-        return hasher.hexdigest()
-        
-    def _upload_workspace(self, task: BuildTask) -> bool:
+        """计算文件哈希值, 未修改的文件直接使用缓存"""
+        return self.hash_cache.hash_file(file_path, self._hash_file_content)
+        
+    def _hash_file_content(self, file_path: str) -> str:
+        """
+        读取文件内容计算哈希值 (大文件通过 mmap)
+        
+        工作目录清单固定使用 sha256: 远程清单, 增量补丁和内容寻址存储都按 sha256 比较,
+        verify_hash 只决定下载输出时的校验算法
+        """
+        return hash_file(file_path)
+        
+    @staticmethod
+    def _verify_hash(transfer_config: Dict[str, Any]) -> Optional[str]:
+        """下载校验算法, 关闭校验时返回 None"""
+        if not transfer_config.get('verify', True):
+            return None
+        return transfer_config.get('verify_hash', 'sha256')
+        
+    def _upload_workspace(
+        self,
+        task: BuildTask,
+        local_manifest: Optional[Dict[str, FileEntry]] = None
+    ) -> bool:
         """上传工作目录"""
+        # 并发任务按权重公平分享上传带宽, 并受任务/服务器/全局上限约束
+        transfer_config = task.config.get('transfer', {})
+        task.bandwidth_flow = self.bandwidth.register(
+            task.task_id,
+            self._server_key(task.server),
+            weight=transfer_config.get('weight', 1.0),
+            rate=transfer_config.get('bandwidth_limit'),
+            server_rate=task.server.config.get('bandwidth_limit')
+        )
         try:
             # 创建远程工作目录
             remote_workspace = f"/tmp/workspace_{task.task_id}"
-            if not task.server.create_directory(remote_workspace):
+            if not task.server.create_directories([remote_workspace]):
                 logger.error("创建远程工作目录失败")
                 task.error = "创建远程工作目录失败"
                 return False
                 
-            # 统计需要上传的文件
-            total_size = 0
-            file_list = []
-            for root, _, files in os.walk(task.workspace):
-                for file in files:
-                    local_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(local_path, task.workspace)
-                    remote_path = os.path.join(remote_workspace, relative_path)
-                    file_size = os.path.getsize(local_path)
-                    total_size += file_size
-                    file_list.append((local_path, remote_path, file_size))
-                    
-            task.total_files = len(file_list)
+            if local_manifest is None:
+                local_manifest = self._scan_workspace(task)
+            
+            # 常驻工作目录只需同步最后的改动
+            warm = self.warm_workspaces.get(self._warm_key(task.workspace, task.platform))
+            if warm and warm.server is task.server:
+                return self._upload_from_warm(task, warm, local_manifest, remote_workspace)
+                
+            # 启用内容寻址存储时只上传服务器缺失的内容
+            if transfer_config.get('blob_store', bool(task.server.config.get('blob_store'))):
+                return self._upload_via_blob_store(task, local_manifest, remote_workspace)
+                
+            # 一次性获取远程清单并比较差异
+            remote_manifest = fetch_remote_manifest(task.server, remote_workspace)
+            changed_files = set(diff_manifests(local_manifest, remote_manifest))
+            
+            task.total_files = len(local_manifest)
+            total_size = sum(entry.size for entry in local_manifest.values())
             uploaded_size = 0
             
-            # 上传文件
-            for local_path, remote_path, file_size in file_list:
-                # 创建父目录
-                parent_dir = os.path.dirname(remote_path)
-                if parent_dir != remote_workspace:
-                    task.server.create_directory(parent_dir)
-                    
-                # 检查文件是否已存在
-                try:
-                    remote_hash = task.server.execute_command(
-                        f"sha256sum {remote_path} | cut -d' ' -f1"
-                    )[0].strip()
-                    local_hash = self._calculate_file_hash(local_path)
-                    
-                    if remote_hash == local_hash:
-                        logger.debug(f"文件已存在且未修改: {remote_path}")
-                        task.uploaded_files.add(relative_path)
-                        uploaded_size += file_size
-                        task.progress = (uploaded_size / total_size) * 100
-                        continue
-                except Exception:
-                    pass
+            # 未修改的文件直接计入进度
+            for relative_path, entry in local_manifest.items():
+                if relative_path not in changed_files:
+                    task.uploaded_files.add(relative_path)
+                    uploaded_size += entry.size
                     
-                # 上传文件
-                if not task.server.upload_file(local_path, remote_path):
-                    logger.error(f"上传文件失败: {local_path}")
-                    task.error = f"上传文件失败: {local_path}"
-                    return False
-                    
-                task.uploaded_files.add(relative_path)
-                uploaded_size += file_size
-                task.progress = (uploaded_size / total_size) * 100
+            logger.debug(
+                f"需要上传 {len(changed_files)}/{len(local_manifest)} 个文件"
+            )
+            
+            changed_entries = [local_manifest[path] for path in sorted(changed_files)]
+            
+            # 远程已有旧版本的大文件走块级增量传输, 失败时回退为整文件上传;
+            # 任务工作目录是新建的, 旧版本通常来自同一工作目录上一次任务的远程副本
+            base_key = (self._server_key(task.server), task.workspace, task.platform)
+            previous = self.delta_bases.get(base_key)
+            delta_threshold = transfer_config.get('delta_threshold', self.delta_threshold)
+            bases = {}
+            for entry in changed_entries:
+                if entry.size < delta_threshold:
+                    continue
+                if entry.path in remote_manifest:
+                    bases[entry.path] = f"{remote_workspace}/{entry.path}"
+                elif previous and entry.path in previous[1]:
+                    bases[entry.path] = f"{previous[0]}/{entry.path}"
+            delta_entries = [entry for entry in changed_entries if entry.path in bases]
+            if delta_entries:
+                failed_entries = self._upload_deltas(task, delta_entries, remote_workspace, bases)
+                for entry in delta_entries:
+                    if entry not in failed_entries:
+                        uploaded_size += entry.size
+                changed_entries = [
+                    entry for entry in changed_entries
+                    if entry not in delta_entries or entry in failed_entries
+                ]
                 
+            # 根据文件数量和大小选择上传方式
+            mode = choose_transfer_mode(changed_entries, transfer_config)
+            if mode == 'archive':
+                uploaded = self._upload_archive(
+                    task,
+                    changed_entries,
+                    remote_workspace,
+                    uploaded_size,
+                    total_size
+                )
+            else:
+                uploaded = self._upload_files(
+                    task,
+                    changed_entries,
+                    remote_workspace,
+                    uploaded_size,
+                    total_size
+                )
+            if not uploaded:
+                return False
+                
+            task.uploaded_files.update(changed_files)
+            self.delta_bases[base_key] = (remote_workspace, set(local_manifest))
             return True
             
         except Exception as e:
@@ -308,16 +717,274 @@ class BuildManager:
             task.error = f"上传工作目录失败: {str(e)}"
             return False
             
+        finally:
+            self.bandwidth.unregister(task.bandwidth_flow)
+            task.bandwidth_flow = None
+            
+    def _upload_from_warm(
+        self,
+        task: BuildTask,
+        warm: WarmWorkspace,
+        local_manifest: Dict[str, FileEntry],
+        remote_workspace: str
+    ) -> bool:
+        """从常驻工作目录生成任务工作目录, 常驻目录中没有的文件 (如任务忽略规则不同) 单独上传"""
+        if not warm.sync(flow=task.bandwidth_flow):
+            task.error = f"同步常驻工作目录失败: {warm.error}"
+            return False
+            
+        remaining = warm.clone_to(remote_workspace, local_manifest)
+        if remaining is None:
+            task.error = f"生成任务工作目录失败: {warm.error}"
+            return False
+            
+        task.total_files = len(local_manifest)
+        total_size = sum(entry.size for entry in local_manifest.values())
+        entries = [local_manifest[path] for path in remaining]
+        if entries and not self._upload_files(
+            task,
+            entries,
+            remote_workspace,
+            total_size - sum(entry.size for entry in entries),
+            total_size
+        ):
+            return False
+            
+        task.uploaded_files.update(local_manifest)
+        task.progress = 100.0
+        return True
+        
+    def _upload_via_blob_store(
+        self,
+        task: BuildTask,
+        local_manifest: Dict[str, FileEntry],
+        remote_workspace: str
+    ) -> bool:
+        """通过服务器内容寻址存储上传并生成工作目录"""
+        store = RemoteBlobStore(task.server)
+        task.total_files = len(local_manifest)
+        total_size = sum(entry.size for entry in local_manifest.values())
+        
+        # 每个哈希只需上传一份
+        unique_entries: Dict[str, FileEntry] = {}
+        for entry in local_manifest.values():
+            unique_entries.setdefault(entry.hash, entry)
+        missing = set(store.missing(list(unique_entries)))
+        missing_entries = [unique_entries[digest] for digest in missing]
+        missing_size = sum(entry.size for entry in missing_entries)
+        logger.debug(
+            f"远程存储缺失 {len(missing_entries)}/{len(unique_entries)} 个文件"
+        )
+        
+        def on_progress(stats: TransferStats) -> None:
+            task.transfer_rate = stats.rate
+            if total_size:
+                task.progress = (total_size - missing_size + stats.done_bytes) / total_size * 100
+                
+        files = {path: (entry.hash, entry.mode) for path, entry in local_manifest.items()}
+        for attempt in range(2):
+            if not store.upload(
+                missing_entries,
+                task.task_id,
+                channels=task.config.get('transfer', {}).get('channels', self.upload_channels),
+                progress_callback=on_progress,
+                flow=task.bandwidth_flow
+            ):
+                task.error = f"上传文件失败: {store.error}"
+                return False
+                
+            if store.materialize(files, remote_workspace, task.task_id):
+                break
+            if attempt or not store.vanished:
+                task.error = store.error
+                return False
+                
+            # 查询后被回收的内容重新上传, 只需再生成这些文件
+            vanished = set(store.vanished)
+            logger.warning(f"{len(vanished)} 个文件在生成工作目录前被回收, 重新上传")
+            missing_entries = [unique_entries[digest] for digest in vanished]
+            files = {path: item for path, item in files.items() if item[0] in vanished}
+            
+        task.uploaded_files.update(local_manifest)
+        task.bytes_saved += total_size - missing_size
+        
+        # 控制回收频率, 避免每个任务都遍历整个存储
+        now = time.time()
+        server_key = id(task.server)
+        if now - self._blob_gc_times.get(server_key, 0) > self.blob_gc_interval:
+            self._blob_gc_times[server_key] = now
+            store.gc()
+            
+        return True
+        
+    def _upload_deltas(
+        self,
+        task: BuildTask,
+        entries: List[FileEntry],
+        remote_workspace: str,
+        bases: Dict[str, str]
+    ) -> List[FileEntry]:
+        """
+        增量上传大文件
+        
+        Args:
+            bases: 相对路径到远程旧版本文件的映射
+            
+        Returns:
+            List[FileEntry]: 需要回退为整文件上传的条目
+        """
+        uploader = DeltaUploader(task.server, flow=task.bandwidth_flow)
+        failed = []
+        for entry in entries:
+            sent = uploader.upload(
+                entry.local_path,
+                f"{remote_workspace}/{entry.path}",
+                entry.hash,
+                bases[entry.path]
+            )
+            if sent is None:
+                failed.append(entry)
+                continue
+                
+            task.bytes_saved += max(entry.size - sent, 0)
+            logger.debug(f"增量上传 {entry.path}: 发送 {sent}/{entry.size} 字节")
+            
+        return failed
+        
+    def _upload_files(
+        self,
+        task: BuildTask,
+        entries: List[FileEntry],
+        remote_workspace: str,
+        base_size: int,
+        total_size: int
+    ) -> bool:
+        """通过多个 SFTP 通道并发上传文件"""
+        # 一次远程调用创建所有父目录
+        directories = plan_directories([entry.path for entry in entries])
+        if directories and not task.server.create_directories(
+            [f"{remote_workspace}/{directory}" for directory in directories]
+        ):
+            task.error = "创建远程目录失败"
+            return False
+            
+        file_list = [
+            (entry.local_path, f"{remote_workspace}/{entry.path}", entry.size)
+            for entry in entries
+        ]
+        
+        def on_progress(stats: TransferStats) -> None:
+            task.transfer_rate = stats.rate
+            if total_size:
+                task.progress = (base_size + stats.done_bytes) / total_size * 100
+                
+        # 默认走流水线 SFTP 写入, 由 SFTP 通道保证完整性; 开启 upload_verify 时改为经命令通道
+        # 写入, 远程边写入边计算哈希并与传输前的本地清单比较, 吞吐低于流水线写入
+        verify_hash = None
+        if entries and task.config.get('transfer', {}).get('upload_verify', False):
+            verify_hash = entries[0].algorithm
+            
+        uploader = ParallelUploader(
+            task.server,
+            channels=task.config.get('transfer', {}).get(
+                'channels',
+                self.upload_channels
+            ),
+            progress_callback=on_progress,
+            flow=task.bandwidth_flow,
+            resume_threshold=task.config.get('transfer', {}).get(
+                'resume_threshold',
+                self.resume_threshold
+            ),
+            checkpoint=task.checkpoint,
+            verify_hash=verify_hash
+        )
+        expected = {
+            remote_path: entry.hash
+            for entry, (_, remote_path, _) in zip(entries, file_list)
+            if entry.hash
+        }
+        if not uploader.upload(file_list, expected):
+            task.error = f"上传文件失败: {uploader.error}"
+            return False
+            
+        task.transfer_rate = uploader.stats.rate
+        self._record_link_rate(task.server, uploader.stats.done_bytes, uploader.stats.elapsed)
+        return True
+        
+    def _upload_archive(
+        self,
+        task: BuildTask,
+        entries: List[FileEntry],
+        remote_workspace: str,
+        base_size: int,
+        total_size: int
+    ) -> bool:
+        """以单个压缩 tar 流上传文件"""
+        transfer_config = task.config.get('transfer', {})
+        start_time = time.time()
+        
+        def on_progress(done_bytes: int) -> None:
+            task.transfer_rate = done_bytes / max(time.time() - start_time, 1e-6)
+            if total_size:
+                task.progress = (base_size + done_bytes) / total_size * 100
+                
+        uploader = ArchiveUploader(
+            task.server,
+            compression=transfer_config.get('compression', 'gzip'),
+            level=transfer_config.get('level'),
+            progress_callback=on_progress,
+            flow=task.bandwidth_flow,
+            verify=transfer_config.get('verify', True)
+        )
+        if not uploader.upload(entries, remote_workspace):
+            task.error = uploader.error
+            return False
+            
+        return True
+        
     def _download_output(self, task: BuildTask) -> bool:
         """下载打包结果"""
         try:
-            # 下载打包结果
             remote_output = f"/tmp/output_{task.task_id}"
-            if not task.server.download_file(remote_output, task.output_dir):
+            transfer_config = task.config.get('transfer', {})
+            task.progress = 0.0
+            
+            # 远程边压缩边回传, 失败时回退为逐文件下载
+            compression = transfer_config.get('output_compression', 'none')
+            if compression != 'none':
+                if self._download_archive(task, remote_output, compression):
+                    return True
+                logger.warning(f"压缩下载失败, 改为逐文件下载: {task.error}")
+                
+            # 一次列出整个输出目录, 多通道并发下载到任务输出目录
+            def on_progress(stats: TransferStats) -> None:
+                task.transfer_rate = stats.rate
+                task.downloaded_files = stats.done_files
+                task.downloaded_bytes = stats.done_bytes
+                if stats.total_bytes:
+                    task.progress = stats.done_bytes / stats.total_bytes * 100
+                    
+            downloader = ParallelDownloader(
+                task.server,
+                channels=transfer_config.get('channels', self.upload_channels),
+                progress_callback=on_progress,
+                resume_threshold=transfer_config.get(
+                    'resume_threshold',
+                    self.resume_threshold
+                ),
+                checkpoint=task.checkpoint,
+                verify_hash=self._verify_hash(transfer_config)
+            )
+            if not downloader.download_tree(remote_output, task.output_dir):
                 logger.error("下载打包结果失败")
-                task.error = "下载打包结果失败"
+                task.error = f"下载打包结果失败: {downloader.error}"
                 return False
                 
+            task.downloaded_files = downloader.stats.done_files
+            task.downloaded_bytes = downloader.stats.done_bytes
+            task.transfer_rate = downloader.stats.rate
+            self._record_link_rate(task.server, downloader.stats.done_bytes, downloader.stats.elapsed)
             return True
             
         except Exception as e:
@@ -325,6 +992,135 @@ class BuildManager:
             task.error = f"下载打包结果失败: {str(e)}"
             return False
             
+    def _download_archive(self, task: BuildTask, remote_output: str, compression: str) -> bool:
+        """以远程压缩的单个 tar 流下载打包结果"""
+        transfer_config = task.config.get('transfer', {})
+        start_time = time.time()
+        
+        def on_progress(received: int, extracted: int) -> None:
+            task.transfer_rate = received / max(time.time() - start_time, 1e-6)
+            task.downloaded_bytes = extracted
+            
+        downloader = ArchiveDownloader(
+            task.server,
+            compression=compression,
+            level=transfer_config.get('output_level', 'auto'),
+            threads=transfer_config.get('output_threads', 0),
+            bandwidth=self.link_rates.get(self._server_key(task.server), 0.0),
+            progress_callback=on_progress,
+            verify_hash=self._verify_hash(transfer_config)
+        )
+        if not downloader.download(remote_output, task.output_dir):
+            task.error = downloader.error
+            return False
+            
+        task.downloaded_files = downloader.files
+        task.downloaded_bytes = downloader.extracted_bytes
+        task.transfer_rate = downloader.received_bytes / downloader.elapsed
+        return True
+        
+    @staticmethod
+    def _server_key(server: BaseServer) -> str:
+        """服务器标识"""
+        return server.config.get('host', str(id(server)))
+        
+    def _record_link_rate(self, server: BaseServer, nbytes: int, elapsed: float) -> None:
+        """
+        记录实测链路带宽 (指数移动平均)
+        
+        数据量太小或与其他任务共享链路时的吞吐不代表链路带宽, 不计入
+        """
+        key = self._server_key(server)
+        if nbytes < 4 * 1024 * 1024 or self.bandwidth.active_flows(key) > 1:
+            return
+        rate = nbytes / max(elapsed, 1e-6)
+        previous = self.link_rates.get(key)
+        self.link_rates[key] = rate if previous is None else previous * 0.7 + rate * 0.3
+        self.bandwidth.set_link_rate(key, self.link_rates[key])
+        
+    @staticmethod
+    def _warm_key(workspace: str, platform: str) -> Tuple[str, str]:
+        """常驻工作目录键"""
+        return (os.path.abspath(workspace), platform)
+        
+    def register_warm_workspace(
+        self,
+        workspace: str,
+        platform: str,
+        config: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        注册常驻工作目录
+        
+        选定一台服务器作为该项目的固定打包服务器, 后台持续同步本地改动
+        
+        Args:
+            workspace: 本地工作目录
+            platform: 目标平台
+            config: 同步配置 (ignore / channels / poll_interval)
+            
+        Returns:
+            Optional[str]: 常驻工作目录名称, 失败返回 None
+        """
+        try:
+            key = self._warm_key(workspace, platform)
+            if key in self.warm_workspaces:
+                return self.warm_workspaces[key].name
+                
+            server_type = {
+                'windows': 'windows',
+                'macos': 'macos',
+                'linux': 'unix'
+            }.get(platform)
+            if not server_type:
+                logger.error(f"不支持的平台: {platform}")
+                return None
+                
+            server = self.server_manager.select_server(server_type)
+            if not server:
+                logger.error(f"没有可用的 {platform} 打包服务器")
+                return None
+                
+            config = config or {}
+            name = f"{platform}_{os.path.basename(key[0])}_{len(self.warm_workspaces)}"
+            warm = WarmWorkspace(
+                name=name,
+                workspace=key[0],
+                server=server,
+                hash_func=self._calculate_file_hash,
+                matcher=IgnoreMatcher.for_workspace(
+                    key[0],
+                    config.get('ignore', []),
+                    config.get('ignore_defaults', True)
+                ),
+                channels=config.get('channels', self.upload_channels),
+                poll_interval=config.get('poll_interval', 5.0)
+            )
+            warm.start()
+            self.warm_workspaces[key] = warm
+            return name
+            
+        except Exception as e:
+            logger.error(f"注册常驻工作目录失败: {str(e)}")
+            return None
+            
+    def unregister_warm_workspace(self, workspace: str, platform: str) -> bool:
+        """注销常驻工作目录"""
+        warm = self.warm_workspaces.pop(self._warm_key(workspace, platform), None)
+        if not warm:
+            return False
+            
+        warm.stop()
+        try:
+            warm.server.remove_directory(warm.remote_root)
+        except Exception as e:
+            logger.error(f"清理常驻工作目录失败: {str(e)}")
+        return True
+        
+    def get_warm_status(self) -> List[Dict[str, Any]]:
+        """获取常驻工作目录同步状态"""
+        return [warm.get_status() for warm in self.warm_workspaces.values()]
+        
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务状态"""
         if task_id not in self.tasks:
@@ -342,7 +1138,18 @@ class BuildManager:
             'start_time': task.start_time,
             'end_time': task.end_time,
             'uploaded_files': len(task.uploaded_files),
-            'total_files': task.total_files
+            'total_files': task.total_files,
+            'transfer_rate': task.transfer_rate,
+            'bytes_saved': task.bytes_saved,
+            'downloaded_files': task.downloaded_files,
+            'downloaded_bytes': task.downloaded_bytes,
+            'cache_hit': task.cache_hit,
+            'artifact_id': task.artifact_id,
+            'remote_output': task.remote_output.to_dict() if task.remote_output else None,
+            'last_output': task.last_output,
+            'last_output_time': task.last_output_time,
+            'log_path': task.log.path,
+            'log_tail': task.log.tail(20)
         }
         
     def get_queue_status(self) -> Dict[str, Any]:
@@ -376,6 +1183,25 @@ class BuildManager:
             except Exception as e:
                 logger.error(f"清理临时目录失败: {str(e)}")
                 
+        # 删除服务器上保留的输出
+        if task.remote_output:
+            self._release_remote_output(task)
+            
+        # 清理传输断点
+        if task.checkpoint.path and os.path.exists(task.checkpoint.path):
+            try:
+                os.remove(task.checkpoint.path)
+            except Exception as e:
+                logger.error(f"清理传输断点失败: {str(e)}")
+                
+        # 清理打包日志
+        task.log.close()
+        if task.log.path and os.path.exists(task.log.path):
+            try:
+                os.remove(task.log.path)
+            except Exception as e:
+                logger.error(f"清理打包日志失败: {str(e)}")
+                
         # 释放服务器
         if task.server:
             server_type = {
@@ -3,16 +3,20 @@ PyInstaller 打包器实现
 """
 import os
 import logging
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 from .base import BaseBuilder
-from ..server.manager import BuildTask
+
+if TYPE_CHECKING:
+    from .manager import BuildTask
 
 logger = logging.getLogger(__name__)
 
 class PyInstallerBuilder(BaseBuilder):
     """PyInstaller 打包器"""
     
-    def build(self, task: BuildTask) -> bool:
+    version_modules = ['PyInstaller']
+    
+    def build(self, task: 'BuildTask') -> bool:
         """
         执行打包
         
@@ -32,13 +36,13 @@ class PyInstallerBuilder(BaseBuilder):
             if not cmd:
                 return False
                 
-            # 执行打包
+            # 执行打包, PyInstaller 的进度信息输出到 stderr, 以退出码判断结果
             logger.info(f"正在执行打包命令: {cmd}")
-            stdout, stderr = task.server.execute_command(cmd)
+            exit_status = task.server.execute_streaming(cmd, log=task.log)
             
-            if stderr:
-                logger.error(f"打包失败: {stderr}")
-                task.error = stderr
+            if exit_status != 0:
+                logger.error(f"打包失败, 退出码 {exit_status}")
+                task.error = task.log.tail(20) or f"打包命令退出码 {exit_status}"
                 return False
                 
             # 检查打包结果
@@ -52,7 +56,7 @@ class PyInstallerBuilder(BaseBuilder):
             task.error = str(e)
             return False
             
-    def _check_pyinstaller(self, task: BuildTask) -> bool:
+    def _check_pyinstaller(self, task: 'BuildTask') -> bool:
         """
         检查 PyInstaller 是否已安装
         
@@ -67,12 +71,13 @@ class PyInstallerBuilder(BaseBuilder):
             if stderr or "Version:" not in stdout:
                 # 安装 PyInstaller
                 logger.info("正在安装 PyInstaller")
-                stdout, stderr = task.server.execute_command(
-                    "pip install pyinstaller"
+                exit_status = task.server.execute_streaming(
+                    "pip install pyinstaller",
+                    log=task.log
                 )
-                if stderr:
-                    logger.error(f"安装 PyInstaller 失败: {stderr}")
-                    task.error = stderr
+                if exit_status != 0:
+                    logger.error(f"安装 PyInstaller 失败, 退出码 {exit_status}")
+                    task.error = task.log.tail(20) or f"安装 PyInstaller 失败, 退出码 {exit_status}"
                     return False
             return True
             
@@ -81,7 +86,7 @@ class PyInstallerBuilder(BaseBuilder):
             task.error = str(e)
             return False
             
-    def _build_command(self, task: BuildTask) -> Optional[str]:
+    def _build_command(self, task: 'BuildTask') -> Optional[str]:
         """
         构建打包命令
         
@@ -163,7 +168,7 @@ class PyInstallerBuilder(BaseBuilder):
             task.error = str(e)
             return None
             
-    def _check_output(self, task: BuildTask) -> bool:
+    def _check_output(self, task: 'BuildTask') -> bool:
         """
         检查打包输出
         
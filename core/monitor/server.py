@@ -45,7 +45,7 @@ class ServerCollector(BaseCollector):
         ))
         
         # 收集每个服务器的指标
-        for name, server in self.server_manager.servers.items():
+        for name in list(self.server_manager.servers):
             # 服务器状态
             is_active = name in self.server_manager.active_servers
             self.add_metric(Metric(
@@ -56,9 +56,22 @@ class ServerCollector(BaseCollector):
             ))
             
             if is_active:
-                # 获取服务器健康状态
-                health = server.check_health()
-                if health:
+                # 读取后台刷新的状态快照, 采集时不探测服务器
+                cached = self.server_manager.get_server_status(name)
+                if cached:
+                    health, snapshot = cached
+                    
+                    # 快照时间
+                    self.add_metric(Metric(
+                        name="server_status_age",
+                        type=MetricType.GAUGE,
+                        value=snapshot['age'],
+                        labels={
+                            "server": name,
+                            "unit": "seconds"
+                        }
+                    ))
+                    
                     # CPU 使用率
                     self.add_metric(Metric(
                         name="server_cpu_usage",
@@ -94,6 +94,18 @@ class TaskCollector(BaseCollector):
                 labels={"unit": "seconds"}
             ))
             
+        # 常驻工作目录同步延迟
+        for warm in self.build_manager.get_warm_status():
+            self.add_metric(Metric(
+                name="warm_workspace_sync_lag",
+                type=MetricType.GAUGE,
+                value=warm['sync_lag'],
+                labels={
+                    "workspace": warm['name'],
+                    "unit": "seconds"
+                }
+            ))
+            
         # 检查告警阈值
         self._check_alerts()
         
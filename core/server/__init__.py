@@ -2,9 +2,14 @@
 服务器模块
 """
 from .base import BaseServer, ServerStatus
-from .windows import WindowsServer
-from .unix import UnixServer
-from .macos import MacOSServer
+from .async_base import AsyncBaseServer
+from .adapter import SyncServerAdapter, EventLoopThread
+from .windows import WindowsServer, AsyncWindowsServer
+from .unix import UnixServer, AsyncUnixServer
+from .macos import MacOSServer, AsyncMacOSServer
+from .agent import RemoteAgent, AgentError
+from .stream import OutputLog, LineDecoder, DEFAULT_LOG_DIR
+from .status_cache import StatusCache, StatusSnapshot
 from .factory import ServerFactory
 from .manager import ServerManager
 
@@ -14,6 +19,19 @@ __all__ = [
     'WindowsServer',
     'UnixServer',
     'MacOSServer',
+    'AsyncBaseServer',
+    'AsyncWindowsServer',
+    'AsyncUnixServer',
+    'AsyncMacOSServer',
+    'SyncServerAdapter',
+    'EventLoopThread',
+    'RemoteAgent',
+    'AgentError',
+    'OutputLog',
+    'LineDecoder',
+    'DEFAULT_LOG_DIR',
+    'StatusCache',
+    'StatusSnapshot',
     'ServerFactory',
     'ServerManager'
 ] 
\ No newline at end of file
@@ -0,0 +1,474 @@
+"""
+异步服务器的同步适配器
+所有适配器共享一个后台事件循环线程, 现有的同步调用方 (构建, 传输, 远程代理) 无需修改即可使用异步实现;
+会话通道和 SFTP 客户端以 paramiko 的同步接口提供, 实际读写在事件循环中进行
+"""
+import time
+import errno
+import queue
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Tuple
+from .base import BaseServer, ServerStatus, CHANNEL_READ_SIZE
+from .async_base import AsyncBaseServer, asyncssh
+
+logger = logging.getLogger(__name__)
+
+# SFTP 状态码 (draft-ietf-secsh-filexfer), 转换为与 paramiko 一致的 IOError
+SFTP_NO_SUCH_FILE = 2
+SFTP_PERMISSION_DENIED = 3
+
+# 流水线写入时最多等待确认的请求数
+MAX_PENDING_WRITES = 64
+
+class EventLoopThread:
+    """在后台线程中运行的事件循环"""
+    
+    _shared: Optional['EventLoopThread'] = None
+    _shared_lock = threading.Lock()
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run,
+            name="server-event-loop",
+            daemon=True
+        )
+        self.thread.start()
+        
+    @classmethod
+    def shared(cls) -> 'EventLoopThread':
+        """获取进程内共享的事件循环线程"""
+        with cls._shared_lock:
+            if cls._shared is None or not cls._shared.thread.is_alive():
+                cls._shared = cls()
+            return cls._shared
+            
+    def _run(self) -> None:
+        """事件循环线程"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """提交协程, 不等待结果"""
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("不能在事件循环线程中同步等待协程")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+        
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        在事件循环中执行协程并等待结果
+        
+        Args:
+            coro: 协程
+            timeout: 超时时间 (秒), None 表示一直等待
+            
+        Returns:
+            Any: 协程的返回值
+        """
+        return self.submit(coro).result(timeout)
+        
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """在事件循环线程中执行回调, 不等待"""
+        self.loop.call_soon_threadsafe(callback, *args)
+        
+    def stop(self) -> None:
+        """停止事件循环"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        
+def _io_error(e: Exception) -> Exception:
+    """将 asyncssh 的 SFTP 错误转换为 IOError, 调用方按 paramiko 的约定处理"""
+    if asyncssh is None or not isinstance(e, asyncssh.SFTPError):
+        return e
+    code = {
+        SFTP_NO_SUCH_FILE: errno.ENOENT,
+        SFTP_PERMISSION_DENIED: errno.EACCES
+    }.get(e.code)
+    return IOError(code, e.reason) if code else IOError(e.reason)
+    
+class ChannelFile:
+    """通道输出流的同步读取接口 (对应 paramiko 的 ChannelFile)"""
+    
+    def __init__(self, stream, loop: EventLoopThread):
+        self.stream = stream
+        self.loop = loop
+        
+    def read(self, size: Optional[int] = None) -> bytes:
+        """读取 size 字节, 只有到达结尾时才少于 size; 不指定时读到结尾"""
+        if size is None or size < 0:
+            return self.loop.run(self.stream.read())
+        return self.loop.run(self._read_exact(size))
+        
+    async def _read_exact(self, size: int) -> bytes:
+        try:
+            return await self.stream.readexactly(size)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+            
+    def readline(self) -> bytes:
+        """读取一行"""
+        return self.loop.run(self.stream.readline())
+        
+    def __iter__(self):
+        """逐行读取直到结尾"""
+        while line := self.readline():
+            yield line
+            
+    def close(self) -> None:
+        pass
+        
+class ChannelStdinFile:
+    """通道输入流的同步写入接口 (对应 paramiko 的 ChannelStdinFile, 关闭时结束写入)"""
+    
+    def __init__(self, channel: 'AsyncChannel'):
+        self.channel = channel
+        
+    def write(self, data: bytes) -> None:
+        self.channel.sendall(data)
+        
+    def flush(self) -> None:
+        pass
+        
+    def close(self) -> None:
+        self.channel.shutdown_write()
+        
+class AsyncChannel:
+    """asyncssh 远程进程的同步通道接口, 用法与 paramiko.Channel 相同"""
+    
+    def __init__(self, process, loop: EventLoopThread):
+        """
+        Args:
+            process: 远程进程 (字节模式的 stdin/stdout/stderr)
+            loop: 进程所在的事件循环线程
+        """
+        self.process = process
+        self.loop = loop
+        self.closed = False
+        self._eof_sent = False
+        
+    def makefile(self, mode: str = 'rb') -> ChannelFile:
+        return ChannelFile(self.process.stdout, self.loop)
+        
+    def makefile_stderr(self, mode: str = 'rb') -> ChannelFile:
+        return ChannelFile(self.process.stderr, self.loop)
+        
+    def makefile_stdin(self, mode: str = 'wb') -> ChannelStdinFile:
+        return ChannelStdinFile(self)
+        
+    def sendall(self, data: bytes) -> None:
+        """写入 stdin, 按远程窗口等待发送"""
+        self.loop.run(self._write(data))
+        
+    async def _write(self, data: bytes) -> None:
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+        
+    def shutdown_write(self) -> None:
+        """结束 stdin (重复调用无影响)"""
+        if not self._eof_sent:
+            self._eof_sent = True
+            self.loop.run(self._write_eof())
+            
+    async def _write_eof(self) -> None:
+        self.process.stdin.write_eof()
+        
+    def recv_exit_status(self) -> int:
+        """等待命令结束并返回退出码, 没有退出码 (如被信号终止) 时为 -1"""
+        return self.loop.run(self._wait())
+        
+    async def _wait(self) -> int:
+        await self.process.wait_closed()
+        status = self.process.exit_status
+        return -1 if status is None else status
+        
+    async def pump(self, on_data: Callable[[str, bytes], None]) -> int:
+        """同时读取 stdout 和 stderr 直到命令结束
+        
+        Returns:
+            int: 命令的退出码
+        """
+        async def drain(stream, name: str) -> None:
+            while chunk := await stream.read(CHANNEL_READ_SIZE):
+                on_data(name, chunk)
+                
+        await asyncio.gather(
+            drain(self.process.stdout, 'stdout'),
+            drain(self.process.stderr, 'stderr')
+        )
+        return await self._wait()
+        
+    def close(self) -> None:
+        """关闭通道, 等待中的读取随之返回"""
+        if not self.closed:
+            self.closed = True
+            self.loop.call_soon(self.process.close)
+            
+class SFTPStat:
+    """SFTP 文件属性, 字段与 paramiko.SFTPAttributes 相同"""
+    
+    def __init__(self, attrs):
+        self.st_mode = attrs.permissions
+        self.st_size = attrs.size
+        self.st_uid = attrs.uid
+        self.st_gid = attrs.gid
+        self.st_atime = attrs.atime
+        self.st_mtime = attrs.mtime
+        
+class AsyncSFTPFile:
+    """远程文件的同步接口, 用法与 paramiko.SFTPFile 相同"""
+    
+    def __init__(self, client: 'AsyncSFTPClient', handle):
+        self.client = client
+        self.handle = handle
+        self.position = 0
+        self.pipelined = False
+        self._pending: Deque[concurrent.futures.Future] = deque()
+        
+    def __enter__(self) -> 'AsyncSFTPFile':
+        return self
+        
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+        
+    def set_pipelined(self, pipelined: bool = True) -> None:
+        """流水线写入: 不等待每次写入的确认, 错误在 flush/close 时抛出"""
+        self.pipelined = pipelined
+        
+    def prefetch(self, file_size: Optional[int] = None) -> None:
+        """asyncssh 在单次读取内并行发出分块请求, 无需预读"""
+        pass
+        
+    def seek(self, offset: int, whence: int = 0) -> None:
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.client._call(self.handle.stat()).size
+        self.position = offset
+        
+    def tell(self) -> int:
+        return self.position
+        
+    def read(self, size: Optional[int] = None) -> bytes:
+        data = self.client._call(self.handle.read(-1 if size is None else size, self.position))
+        self.position += len(data)
+        return data
+        
+    def readv(self, chunks: List[Tuple[int, int]]) -> List[bytes]:
+        """并发读取多个 (偏移, 长度) 区间"""
+        async def read_all() -> List[bytes]:
+            return await asyncio.gather(*[
+                self.handle.read(length, offset) for offset, length in chunks
+            ])
+        return self.client._call(read_all())
+        
+    def write(self, data: bytes) -> None:
+        if self.pipelined:
+            self._pending.append(
+                self.client.loop.submit(self.handle.write(data, self.position))
+            )
+            # 限制等待确认的请求数, 避免占用过多内存
+            while len(self._pending) > MAX_PENDING_WRITES:
+                self.client._result(self._pending.popleft())
+        else:
+            self.client._call(self.handle.write(data, self.position))
+        self.position += len(data)
+        
+    def truncate(self, size: int) -> None:
+        self.flush()
+        self.client._call(self.handle.truncate(size))
+        
+    def flush(self) -> None:
+        """等待所有流水线写入完成"""
+        while self._pending:
+            self.client._result(self._pending.popleft())
+            
+    def close(self) -> None:
+        if self.handle is None:
+            return
+        try:
+            self.flush()
+        finally:
+            handle, self.handle = self.handle, None
+            self.client._call(handle.close())
+            
+class AsyncSFTPClient:
+    """asyncssh SFTP 客户端的同步接口, 用法与 paramiko.SFTPClient 相同"""
+    
+    def __init__(self, sftp, loop: EventLoopThread, server: AsyncBaseServer):
+        """
+        Args:
+            sftp: asyncssh.SFTPClient
+            loop: 客户端所在的事件循环线程
+            server: 所属的异步服务器, 重新连接后旧客户端视为已关闭
+        """
+        self.sftp = sftp
+        self.loop = loop
+        self.server = server
+        self._conn = server.conn
+        self._closed = False
+        
+    @property
+    def closed(self) -> bool:
+        return self._closed or self.server.conn is not self._conn
+        
+    def get_channel(self) -> 'AsyncSFTPClient':
+        """与 paramiko 相同, 通过 get_channel().closed 判断客户端是否失效"""
+        return self
+        
+    def _result(self, future: concurrent.futures.Future) -> Any:
+        try:
+            return future.result()
+        except Exception as e:
+            raise _io_error(e) from e
+            
+    def _call(self, coro: Coroutine) -> Any:
+        return self._result(self.loop.submit(coro))
+        
+    def open(self, path: str, mode: str = 'r') -> AsyncSFTPFile:
+        return AsyncSFTPFile(self, self._call(self.sftp.open(path, mode)))
+        
+    def stat(self, path: str) -> SFTPStat:
+        return SFTPStat(self._call(self.sftp.stat(path)))
+        
+    def mkdir(self, path: str, mode: int = 0o777) -> None:
+        self._call(self.sftp.mkdir(path))
+        
+    def remove(self, path: str) -> None:
+        self._call(self.sftp.remove(path))
+        
+    def rename(self, old_path: str, new_path: str) -> None:
+        self._call(self.sftp.rename(old_path, new_path))
+        
+    def posix_rename(self, old_path: str, new_path: str) -> None:
+        self._call(self.sftp.posix_rename(old_path, new_path))
+        
+    def put(self, local_path: str, remote_path: str) -> None:
+        self._call(self.sftp.put(local_path, remote_path))
+        
+    def get(self, remote_path: str, local_path: str) -> None:
+        self._call(self.sftp.get(remote_path, local_path))
+        
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.loop.call_soon(self.sftp.exit)
+        
+class SyncServerAdapter(BaseServer):
+    """将异步服务器包装为同步接口"""
+    
+    def __init__(self, server: AsyncBaseServer, loop: Optional[EventLoopThread] = None):
+        """
+        Args:
+            server: 异步服务器
+            loop: 事件循环线程, 默认使用共享线程
+        """
+        super().__init__(server.config)
+        self.server = server
+        self.status = server.status
+        self.loop = loop or EventLoopThread.shared()
+        
+    @property
+    def encoding(self) -> str:
+        return self.server.encoding
+        
+    @property
+    def probe_script(self) -> str:
+        return self.server.probe_script
+        
+    def connect(self) -> bool:
+        """连接到服务器, 成功后在会话通道上启动远程代理"""
+        if not self.loop.run(self.server.connect()):
+            return False
+        self.start_agent()
+        return True
+        
+    def disconnect(self) -> None:
+        """断开连接"""
+        self.stop_agent()
+        self.loop.run(self.server.disconnect())
+        
+    def check_health(self) -> ServerStatus:
+        """检查服务器健康状态"""
+        return self.loop.run(self.server.check_health())
+        
+    def execute_command(self, command: str) -> Tuple[str, str]:
+        """执行命令"""
+        if self._agent_ready():
+            stdout, stderr, _ = self.agent.execute(command)
+            return stdout, stderr
+        return self.loop.run(self.server.execute_command(command))
+        
+    def execute_python_input(self, script: str, data: bytes, *args: str) -> Tuple[str, str]:
+        """在远程服务器上执行 Python 脚本, 并通过 stdin 传入数据"""
+        if self._agent_ready():
+            return self.agent.execute_python(script, *args, data=data)
+        return self.loop.run(self.server.execute_python_input(script, data, *args))
+        
+    def upload_file(self, local_path: str, remote_path: str) -> bool:
+        """上传文件"""
+        return self.loop.run(self.server.upload_file(local_path, remote_path))
+        
+    def download_file(self, remote_path: str, local_path: str) -> bool:
+        """下载文件"""
+        return self.loop.run(self.server.download_file(remote_path, local_path))
+        
+    def create_directory(self, path: str) -> bool:
+        """创建目录"""
+        return self.loop.run(self.server.create_directory(path))
+        
+    def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (含父目录)"""
+        if self._agent_ready():
+            return self.agent.create_directories(paths)
+        return self.loop.run(self.server.create_directories(paths))
+        
+    def remove_directory(self, path: str) -> bool:
+        """删除目录"""
+        if self._agent_ready():
+            self.agent.cleanup([path])
+            return True
+        return self.loop.run(self.server.remove_directory(path))
+        
+    def open_sftp(self) -> AsyncSFTPClient:
+        """在现有 SSH 连接上打开新的 SFTP 客户端"""
+        return AsyncSFTPClient(self.loop.run(self.server.start_sftp()), self.loop, self.server)
+        
+    def open_channel(self, command: str) -> AsyncChannel:
+        """打开执行命令的会话通道"""
+        return AsyncChannel(self.loop.run(self.server.open_process(command)), self.loop)
+        
+    def _pump_channel(
+        self,
+        channel: AsyncChannel,
+        on_data: Callable[[str, bytes], None],
+        timeout: Optional[float] = None
+    ) -> int:
+        """读取通道的 stdout/stderr 直到命令结束
+        
+        读取在事件循环中进行, 数据经队列交给调用线程, 回调 (如写日志) 不占用事件循环
+        """
+        events: queue.Queue = queue.Queue()
+        future = self.loop.submit(channel.pump(lambda stream, data: events.put((stream, data))))
+        future.add_done_callback(lambda done: events.put((None, done)))
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                try:
+                    stream, data = events.get(
+                        timeout=max(0.0, deadline - time.monotonic()) if deadline else None
+                    )
+                except queue.Empty:
+                    channel.close()
+                    raise TimeoutError(f"命令执行超时 ({timeout} 秒)")
+                if stream is None:
+                    return data.result()
+                on_data(stream, data)
+        finally:
+            future.cancel()
+            
\ No newline at end of file
@@ -0,0 +1,465 @@
+"""
+远程代理
+连接建立后在服务器上启动一个常驻 Python 进程, 之后的命令执行, Python 脚本, 哈希, 文件属性,
+建目录, 清理等操作都通过同一个会话通道上的请求完成, 不再为每次操作新建 SSH 通道和 shell;
+Python 脚本在代理进程内执行 (独立的全局命名空间, 按线程重定向 stdin/stdout/stderr 和 argv),
+不再启动新的解释器, 脚本导入的模块和编译结果在请求之间复用
+
+协议: 每帧为 8 字节头 (头部长度, 数据长度, 大端) + JSON 头部 + 二进制数据;
+请求头部为 {"id", "op", "args"}, 响应头部为 {"id", "ok", "result", "error"},
+远程在线程池中处理请求, 响应按完成顺序返回, 多个请求可同时在途
+"""
+import json
+import struct
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Tuple, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import BaseServer
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct('>II')
+
+DEFAULT_AGENT_WORKERS = 8
+
+# 请求的默认超时时间 (秒), 远程代理卡死时调用方不会一直等待
+DEFAULT_AGENT_TIMEOUT = 600.0
+
+# 远程代理脚本, 只依赖标准库
+# 协议使用复制出的文件描述符, 原 stdin/stdout 指向空设备和 stderr, 子进程或脚本的意外输出不会破坏帧
+REMOTE_AGENT_SCRIPT = '''
+import builtins, hashlib, io, json, locale, mmap, os, shutil, struct, subprocess, sys, threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor
+FRAME_HEADER = struct.Struct(">II")
+stdin = os.fdopen(os.dup(0), "rb")
+stdout = os.fdopen(os.dup(1), "wb")
+null_fd = os.open(os.devnull, os.O_RDONLY)
+os.dup2(null_fd, 0)
+os.dup2(2, 1)
+write_lock = threading.Lock()
+encoding = locale.getpreferredencoding(False)
+started = time.time()
+counters = {"requests": {}, "errors": 0, "busy": 0}
+counter_lock = threading.Lock()
+local = threading.local()
+class ThreadStream(object):
+    def __init__(self, name, default):
+        self._name = name
+        self._default = default
+    def __getattr__(self, attr):
+        return getattr(getattr(local, self._name, self._default), attr)
+    def __iter__(self):
+        return iter(getattr(local, self._name, self._default))
+class ThreadArgv(list):
+    def _argv(self):
+        return getattr(local, "argv", None) or list(list.__iter__(self))
+    def __getitem__(self, index):
+        return self._argv()[index]
+    def __len__(self):
+        return len(self._argv())
+    def __iter__(self):
+        return iter(self._argv())
+    def __repr__(self):
+        return repr(self._argv())
+sys.stdin = ThreadStream("stdin", sys.stdin)
+sys.stdout = ThreadStream("stdout", sys.stdout)
+sys.stderr = ThreadStream("stderr", sys.stderr)
+sys.argv = ThreadArgv(sys.argv)
+compiled = {}
+def read_exact(size):
+    data = b""
+    while len(data) < size:
+        chunk = stdin.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+def send(header, body=b""):
+    payload = json.dumps(header).encode("utf-8")
+    with write_lock:
+        stdout.write(FRAME_HEADER.pack(len(payload), len(body)) + payload)
+        if body:
+            stdout.write(body)
+        stdout.flush()
+def resolve_algorithm(name):
+    if name == "xxh3":
+        try:
+            import xxhash
+        except ImportError:
+            return "sha256"
+        return name
+    return name if name in ("sha256", "blake2b") else "sha256"
+def new_hasher(name):
+    if name == "xxh3":
+        import xxhash
+        return xxhash.xxh3_128()
+    if name == "blake2b":
+        return hashlib.blake2b()
+    return hashlib.sha256()
+def hash_path(path, name):
+    hasher = new_hasher(name)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= 1048576:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hasher.update(data)
+        else:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+def op_ping(args, body):
+    return {"pid": os.getpid(), "python": sys.version.split()[0], "platform": sys.platform}, b""
+def op_exec(args, body):
+    result = subprocess.run(args["command"], shell=True, input=body, capture_output=True, cwd=args.get("cwd"))
+    output_encoding = args.get("encoding") or encoding
+    return {
+        "exit_status": result.returncode,
+        "stdout": result.stdout.decode(output_encoding, "replace"),
+        "stderr": result.stderr.decode(output_encoding, "replace")
+    }, b""
+def op_python(args, body):
+    script = args["script"]
+    code = compiled.get(script)
+    if code is None:
+        code = compiled[script] = compile(script, "<remote>", "exec")
+    out, err = io.BytesIO(), io.BytesIO()
+    local.stdin = io.TextIOWrapper(io.BytesIO(body), encoding="utf-8")
+    local.stdout = io.TextIOWrapper(out, encoding="utf-8", write_through=True)
+    local.stderr = io.TextIOWrapper(err, encoding="utf-8", write_through=True)
+    local.argv = ["-c"] + args.get("argv", [])
+    exit_status = 0
+    try:
+        exec(code, {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_status = e.code
+        elif e.code is not None:
+            local.stderr.write(str(e.code) + "\\n")
+            exit_status = 1
+    except BaseException:
+        traceback.print_exc(file=local.stderr)
+        exit_status = 1
+    finally:
+        local.stdout.flush()
+        local.stderr.flush()
+        stdout_data, stderr_data = out.getvalue(), err.getvalue()
+        del local.stdin, local.stdout, local.stderr, local.argv
+    return {"exit_status": exit_status, "stdout_size": len(stdout_data)}, stdout_data + stderr_data
+def op_hash(args, body):
+    algorithm = resolve_algorithm(args.get("algorithm", "sha256"))
+    def safe_hash(path):
+        try:
+            return hash_path(path, algorithm)
+        except OSError:
+            return ""
+    paths = args["paths"]
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        hashes = dict(zip(paths, pool.map(safe_hash, paths)))
+    return {"algorithm": algorithm, "hashes": hashes}, b""
+def op_stat(args, body):
+    result = {}
+    for path in args["paths"]:
+        try:
+            st = os.stat(path)
+            result[path] = [st.st_size, st.st_mtime, st.st_mode]
+        except OSError:
+            result[path] = None
+    return result, b""
+def op_mkdir(args, body):
+    for path in args["paths"]:
+        os.makedirs(path, exist_ok=True)
+    return True, b""
+def op_cleanup(args, body):
+    removed = 0
+    for path in args["paths"]:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.lexists(path):
+            os.remove(path)
+        else:
+            continue
+        removed += 1
+    return removed, b""
+def op_metrics(args, body):
+    with counter_lock:
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - started,
+            "workers": workers,
+            "busy": counters["busy"],
+            "errors": counters["errors"],
+            "requests": dict(counters["requests"]),
+            "scripts": len(compiled)
+        }, b""
+OPS = {name[3:]: func for name, func in list(globals().items()) if name.startswith("op_")}
+def handle(header, body):
+    op = header["op"]
+    with counter_lock:
+        counters["busy"] += 1
+        counters["requests"][op] = counters["requests"].get(op, 0) + 1
+    try:
+        result, data = OPS[op](header.get("args") or {}, body)
+        send({"id": header["id"], "ok": True, "result": result}, data)
+    except Exception as e:
+        with counter_lock:
+            counters["errors"] += 1
+        send({"id": header["id"], "ok": False, "error": "%s: %s" % (type(e).__name__, e)})
+    finally:
+        with counter_lock:
+            counters["busy"] -= 1
+workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+executor = ThreadPoolExecutor(max_workers=workers)
+while True:
+    prefix = read_exact(FRAME_HEADER.size)
+    if prefix is None:
+        break
+    header_size, body_size = FRAME_HEADER.unpack(prefix)
+    header = json.loads(read_exact(header_size))
+    body = read_exact(body_size) if body_size else b""
+    executor.submit(handle, header, body)
+executor.shutdown(wait=True)
+'''
+
+class AgentError(Exception):
+    """远程代理请求失败"""
+    pass
+
+class RemoteAgent:
+    """远程代理客户端"""
+    
+    def __init__(
+        self,
+        server: 'BaseServer',
+        max_workers: int = DEFAULT_AGENT_WORKERS,
+        timeout: float = DEFAULT_AGENT_TIMEOUT
+    ):
+        """
+        Args:
+            server: 远程服务器, 代理运行在其 open_channel 打开的会话通道上
+            max_workers: 远程处理请求的线程数
+            timeout: 请求的默认超时时间 (秒)
+        """
+        self.server = server
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.channel = None
+        self.info: Dict[str, Any] = {}
+        self._stdout = None
+        self._next_id = 1
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._closed = True
+        
+    @property
+    def alive(self) -> bool:
+        """代理是否可用"""
+        return not self._closed
+        
+    def start(self, timeout: float = 30) -> bool:
+        """
+        在远程启动代理
+        
+        Args:
+            timeout: 等待代理就绪的超时时间 (秒)
+            
+        Returns:
+            bool: 是否启动成功
+        """
+        try:
+            self.channel = self.server.open_channel(
+                self.server.python_command(REMOTE_AGENT_SCRIPT, str(self.max_workers))
+            )
+            self._stdout = self.channel.makefile('rb')
+            self._closed = False
+            self._reader = threading.Thread(target=self._read_loop, daemon=True)
+            self._reader.start()
+            self.info, _ = self.request('ping', timeout=timeout)
+            logger.info(f"远程代理已启动: pid {self.info['pid']}, Python {self.info['python']}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"启动远程代理失败: {str(e)}")
+            self.close()
+            return False
+            
+    def close(self) -> None:
+        """关闭代理, 远程进程读到 EOF 后处理完在途请求并退出"""
+        self._closed = True
+        try:
+            if self.channel:
+                self.channel.close()
+        except Exception as e:
+            logger.error(f"关闭远程代理失败: {str(e)}")
+        finally:
+            self.channel = None
+            
+    def submit(self, op: str, body: bytes = b'', **args: Any) -> Future:
+        """
+        发送请求, 不等待响应
+        
+        Args:
+            op: 操作名
+            body: 二进制数据
+            args: 操作参数
+            
+        Returns:
+            Future: 结果为 (result, body)
+        """
+        if self._closed:
+            raise AgentError("远程代理未运行")
+            
+        future: Future = Future()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+            
+        payload = json.dumps({'id': request_id, 'op': op, 'args': args}).encode('utf-8')
+        try:
+            with self._write_lock:
+                self.channel.sendall(FRAME_HEADER.pack(len(payload), len(body)) + payload)
+                if body:
+                    self.channel.sendall(body)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._closed = True
+            raise AgentError(f"发送请求失败: {str(e)}")
+        return future
+        
+    def request(
+        self,
+        op: str,
+        body: bytes = b'',
+        timeout: Optional[float] = None,
+        **args: Any
+    ) -> Tuple[Any, bytes]:
+        """
+        发送请求并等待响应
+        
+        Args:
+            timeout: 超时时间 (秒), None 表示使用代理的默认超时
+            
+        Returns:
+            Tuple[Any, bytes]: (结果, 二进制数据)
+            
+        Raises:
+            AgentError: 远程处理失败, 超时或代理已退出
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(op, body, **args)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # 远程仍在处理, 之后到达的响应直接丢弃
+            with self._lock:
+                for request_id, pending in list(self._pending.items()):
+                    if pending is future:
+                        del self._pending[request_id]
+            raise AgentError(f"请求 {op} 超时 ({timeout} 秒)")
+        
+    def _read_exact(self, size: int) -> Optional[bytes]:
+        """从通道读取指定长度"""
+        data = self._stdout.read(size)
+        if len(data) < size:
+            return None
+        return data
+        
+    def _read_loop(self) -> None:
+        """读取响应并交给对应的请求"""
+        try:
+            while prefix := self._read_exact(FRAME_HEADER.size):
+                header_size, body_size = FRAME_HEADER.unpack(prefix)
+                header = json.loads(self._read_exact(header_size))
+                body = self._read_exact(body_size) if body_size else b''
+                with self._lock:
+                    future = self._pending.pop(header['id'], None)
+                if future is None:
+                    continue
+                if header['ok']:
+                    future.set_result((header.get('result'), body))
+                else:
+                    future.set_exception(AgentError(header.get('error', '')))
+        except Exception as e:
+            if not self._closed:
+                logger.error(f"读取远程代理响应失败: {str(e)}")
+        finally:
+            self._closed = True
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(AgentError("远程代理已退出"))
+                
+    def execute(self, command: str, cwd: Optional[str] = None) -> Tuple[str, str, int]:
+        """
+        执行命令, 输出按服务器配置的编码解码 (与命令通道一致)
+        
+        Returns:
+            Tuple[str, str, int]: (stdout, stderr, 退出码)
+        """
+        result, _ = self.request('exec', command=command, cwd=cwd, encoding=self.server.encoding)
+        return result['stdout'], result['stderr'], result['exit_status']
+        
+    def execute_python(self, script: str, *args: str, data: bytes = b'') -> Tuple[str, str]:
+        """
+        以代理所在的解释器执行 Python 脚本
+        
+        Args:
+            script: 脚本源码
+            args: 命令行参数
+            data: 写入 stdin 的数据
+            
+        Returns:
+            Tuple[str, str]: (stdout, stderr)
+        """
+        result, output = self.request('python', data, script=script, argv=list(args))
+        size = result['stdout_size']
+        return (
+            output[:size].decode('utf-8', errors='replace'),
+            output[size:].decode('utf-8', errors='replace')
+        )
+        
+    def hash_files(self, paths: List[str], algorithm: str = 'sha256') -> Tuple[str, Dict[str, str]]:
+        """
+        计算远程文件哈希, 无法读取的文件哈希为空
+        
+        Returns:
+            Tuple[str, Dict[str, str]]: (远程实际使用的算法, 路径到哈希的映射)
+        """
+        result, _ = self.request('hash', paths=paths, algorithm=algorithm)
+        return result['algorithm'], result['hashes']
+        
+    def stat(self, paths: List[str]) -> Dict[str, Optional[List[float]]]:
+        """获取远程文件的 (大小, 修改时间, 权限), 不存在时为 None"""
+        result, _ = self.request('stat', paths=paths)
+        return result
+        
+    def metrics(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """
+        代理的运行指标
+        
+        Returns:
+            Dict[str, Any]: 远程的运行时间, 线程数, 处理中的请求数, 错误数, 各操作的请求数,
+                以及本地等待响应的请求数 (pending)
+        """
+        result, _ = self.request('metrics', timeout=timeout)
+        with self._lock:
+            result['pending'] = len(self._pending)
+        return result
+        
+    def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (含父目录)"""
+        try:
+            self.request('mkdir', paths=paths)
+            return True
+        except AgentError as e:
+            logger.error(f"创建目录失败: {str(e)}")
+            return False
+            
+    def cleanup(self, paths: List[str]) -> int:
+        """删除远程文件或目录, 返回删除的数量"""
+        result, _ = self.request('cleanup', paths=paths)
+        return result
\ No newline at end of file
@@ -0,0 +1,317 @@
+"""
+异步远程服务器基类
+基于 asyncssh, 在同一个 SSH 连接上并发执行命令和传输文件, 不阻塞事件循环;
+一个事件循环即可驱动大量服务器
+"""
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple, List
+from abc import ABC, abstractmethod
+from .base import BaseServer, ServerStatus
+from .retry import async_retry, should_retry_on_connection
+from .probe import UNIX_PROBE_SCRIPT, BUILDER_DISTRIBUTIONS, apply_probe
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+SSH_ERRORS = (asyncssh.Error, OSError) if asyncssh else (OSError,)
+
+# OpenSSH 默认 MaxSessions 为 10, 并发会话数超过后新通道会被拒绝
+DEFAULT_MAX_SESSIONS = 8
+
+class AsyncBaseServer(ABC):
+    """异步服务器基类"""
+    
+    # 远程输出编码
+    encoding = 'utf-8'
+    
+    # 健康探测脚本
+    probe_script = UNIX_PROBE_SCRIPT
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Args:
+            config: 服务器配置, 与同步服务器相同, 另支持 port 和 max_sessions
+        """
+        self.config = config
+        self.status = ServerStatus()
+        self.conn = None
+        self._sftp = None
+        self._sftp_lock: Optional[asyncio.Lock] = None
+        self._sessions: Optional[asyncio.Semaphore] = None
+        
+    @staticmethod
+    @abstractmethod
+    def mkdir_commands(paths: List[str]) -> List[str]:
+        """批量创建目录的命令 (与同步服务器相同)"""
+        pass
+        
+    @staticmethod
+    @abstractmethod
+    def remove_command(path: str) -> str:
+        """删除目录的命令 (与同步服务器相同)"""
+        pass
+        
+    @async_retry(
+        max_attempts=3,
+        delay=1.0,
+        backoff=2.0,
+        exceptions=SSH_ERRORS,
+        should_retry=should_retry_on_connection
+    )
+    async def _open_connection(self):
+        """建立 SSH 连接"""
+        connect_params = {
+            'host': self.config['host'],
+            'port': self.config.get('port', 22),
+            'username': self.config['username'],
+            'known_hosts': None,
+            'connect_timeout': self.config.get('timeout', 30)
+        }
+        
+        # 添加密码或密钥认证
+        if 'password' in self.config:
+            connect_params['password'] = self.config['password']
+        elif 'key_file' in self.config:
+            connect_params['client_keys'] = [os.path.expanduser(self.config['key_file'])]
+            
+        return await asyncssh.connect(**connect_params)
+        
+    async def connect(self) -> bool:
+        """连接到服务器"""
+        try:
+            if asyncssh is None:
+                raise RuntimeError("未安装 asyncssh")
+                
+            self.conn = await self._open_connection()
+            self._reset_session_state()
+            self.status.connected = True
+            return True
+            
+        except Exception as e:
+            logger.error(f"连接失败: {str(e)}")
+            self.status.connected = False
+            return False
+            
+    def _reset_session_state(self) -> None:
+        """新连接建立后重置共享的 SFTP 客户端和会话数限制"""
+        self._sftp = None
+        self._sftp_lock = asyncio.Lock()
+        self._sessions = asyncio.Semaphore(
+            self.config.get('max_sessions', DEFAULT_MAX_SESSIONS)
+        )
+        
+    async def disconnect(self) -> None:
+        """断开连接"""
+        try:
+            if self._sftp:
+                self._sftp.exit()
+                await self._sftp.wait_closed()
+            if self.conn:
+                self.conn.close()
+                await self.conn.wait_closed()
+        except Exception as e:
+            logger.error(f"断开连接失败: {str(e)}")
+        finally:
+            self._sftp = None
+            self.conn = None
+            self.status.connected = False
+            
+    def _require_connection(self) -> None:
+        """检查连接状态"""
+        if not self.conn:
+            raise RuntimeError("未连接到服务器")
+            
+    async def open_process(self, command: str):
+        """
+        打开执行命令的会话通道
+        
+        Args:
+            command: 远程命令
+            
+        Returns:
+            asyncssh.SSHClientProcess: 以字节读写 stdin/stdout/stderr 的远程进程
+        """
+        self._require_connection()
+        return await self.conn.create_process(command, encoding=None)
+        
+    async def start_sftp(self):
+        """在现有连接上打开新的 SFTP 客户端 (调用方负责关闭)"""
+        self._require_connection()
+        return await self.conn.start_sftp_client()
+        
+    async def _run(self, command: str, data: Optional[bytes] = None) -> Tuple[str, str]:
+        """在新会话通道中执行命令, 并发数受 max_sessions 限制"""
+        self._require_connection()
+        async with self._sessions:
+            process = await self.open_process(command)
+            try:
+                if data:
+                    process.stdin.write(data)
+                    await process.stdin.drain()
+                process.stdin.write_eof()
+                # 同时读取两个流, stderr 输出较多时不会阻塞远程进程
+                stdout, stderr = await asyncio.gather(
+                    process.stdout.read(),
+                    process.stderr.read()
+                )
+                await process.wait_closed()
+            finally:
+                process.close()
+        return (
+            stdout.decode(self.encoding, errors='replace'),
+            stderr.decode(self.encoding, errors='replace')
+        )
+        
+    async def _get_sftp(self):
+        """获取共享的 SFTP 客户端, 多个请求在同一通道上流水线执行"""
+        self._require_connection()
+        async with self._sftp_lock:
+            if self._sftp is None:
+                self._sftp = await self.start_sftp()
+        return self._sftp
+        
+    @async_retry(
+        max_attempts=2,
+        delay=0.5,
+        exceptions=SSH_ERRORS,
+        should_retry=should_retry_on_connection
+    )
+    async def execute_command(self, command: str) -> Tuple[str, str]:
+        """执行命令
+        
+        Returns:
+            Tuple[str, str]: (stdout, stderr)
+        """
+        return await self._run(command)
+        
+    async def execute_python(self, script: str, *args: str) -> Tuple[str, str]:
+        """在远程服务器上执行 Python 脚本"""
+        return await self.execute_command(self.python_command(script, *args))
+        
+    async def execute_python_input(self, script: str, data: bytes, *args: str) -> Tuple[str, str]:
+        """在远程服务器上执行 Python 脚本, 并通过 stdin 传入数据"""
+        return await self._run(self.python_command(script, *args), data)
+        
+    # 与同步服务器生成相同的远程命令
+    python_command = BaseServer.python_command
+    
+    async def check_python(self) -> Optional[str]:
+        """检查 Python 环境
+        
+        Returns:
+            Optional[str]: Python 版本，如果检查失败则返回 None
+        """
+        try:
+            stdout, stderr = await self.execute_command("python --version")
+            if stderr:
+                logger.error(f"检查 Python 版本失败: {stderr}")
+                return None
+            return stdout.strip()
+        except Exception as e:
+            logger.error(f"检查 Python 版本失败: {str(e)}")
+            return None
+            
+    async def upload_file(self, local_path: str, remote_path: str) -> bool:
+        """上传文件"""
+        try:
+            sftp = await self._get_sftp()
+            await sftp.put(local_path, remote_path)
+            return True
+        except Exception as e:
+            logger.error(f"上传文件失败: {str(e)}")
+            return False
+            
+    async def download_file(self, remote_path: str, local_path: str) -> bool:
+        """下载文件"""
+        try:
+            sftp = await self._get_sftp()
+            await sftp.get(remote_path, local_path)
+            return True
+        except Exception as e:
+            logger.error(f"下载文件失败: {str(e)}")
+            return False
+            
+    async def upload_files(self, files: List[Tuple[str, str]]) -> bool:
+        """并发上传多个文件
+        
+        Args:
+            files: (本地路径, 远程路径) 列表
+            
+        Returns:
+            bool: 是否全部上传成功
+        """
+        results = await asyncio.gather(*[
+            self.upload_file(local_path, remote_path) for local_path, remote_path in files
+        ])
+        return all(results)
+        
+    async def download_files(self, files: List[Tuple[str, str]]) -> bool:
+        """并发下载多个文件
+        
+        Args:
+            files: (远程路径, 本地路径) 列表
+            
+        Returns:
+            bool: 是否全部下载成功
+        """
+        results = await asyncio.gather(*[
+            self.download_file(remote_path, local_path) for remote_path, local_path in files
+        ])
+        return all(results)
+        
+    async def create_directory(self, path: str) -> bool:
+        """创建目录"""
+        try:
+            sftp = await self._get_sftp()
+            await sftp.mkdir(path)
+            return True
+        except Exception as e:
+            logger.error(f"创建目录失败: {str(e)}")
+            return False
+            
+    async def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (含父目录)"""
+        try:
+            for command in self.mkdir_commands(paths):
+                stdout, stderr = await self.execute_command(command)
+                if stderr:
+                    logger.error(f"创建目录失败: {stderr}")
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"创建目录失败: {str(e)}")
+            return False
+            
+    async def remove_directory(self, path: str) -> bool:
+        """删除目录"""
+        try:
+            stdout, stderr = await self.execute_command(self.remove_command(path))
+            if stderr:
+                logger.error(f"删除目录失败: {stderr}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"删除目录失败: {str(e)}")
+            return False
+            
+    async def check_health(self) -> ServerStatus:
+        """检查服务器健康状态 (单次远程调用)"""
+        self.status.errors = []
+        try:
+            stdout, stderr = await self.execute_python(self.probe_script, *BUILDER_DISTRIBUTIONS)
+            if not stdout.strip():
+                raise RuntimeError(stderr.strip() or "探测脚本无输出")
+            return apply_probe(self.status, json.loads(stdout))
+            
+        except Exception as e:
+            logger.error(f"健康检查失败: {str(e)}")
+            self.status.errors.append(str(e))
+            return self.status
+            
\ No newline at end of file
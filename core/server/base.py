@@ -1,14 +1,25 @@
 """
 远程服务器基类
 """
+import time
+import json
+import base64
+import select
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List, Callable
 from abc import ABC, abstractmethod
 import paramiko
 from .retry import retry, should_retry_on_connection
+from .agent import RemoteAgent, DEFAULT_AGENT_WORKERS, DEFAULT_AGENT_TIMEOUT
+from .stream import LineDecoder, OutputLog
+from .probe import UNIX_PROBE_SCRIPT, BUILDER_DISTRIBUTIONS, apply_probe
 
 logger = logging.getLogger(__name__)
 
+# 通道读取的块大小与等待间隔
+CHANNEL_READ_SIZE = 32 * 1024
+CHANNEL_POLL_INTERVAL = 1.0
+
 class ServerStatus:
     """服务器状态"""
     def __init__(self):
@@ -17,14 +28,26 @@ class ServerStatus:
         self.memory_usage: float = 0.0
         self.disk_usage: float = 0.0
         self.python_version: str = ""
+        self.load_average: List[float] = []
+        self.cpu_count: int = 0
+        self.temp_free: int = 0  # 临时目录剩余空间(字节)
+        self.python_versions: Dict[str, str] = {}  # 其他 Python 解释器 (名称到路径)
+        self.builder_versions: Dict[str, str] = {}  # 打包工具版本
         self.errors: list[str] = []
         
 class BaseServer(ABC):
     """服务器基类"""
     
+    # 远程命令输出编码
+    encoding = 'utf-8'
+    
+    # 健康探测脚本
+    probe_script = UNIX_PROBE_SCRIPT
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.status = ServerStatus()
+        self.agent: Optional[RemoteAgent] = None
         
     @abstractmethod
     @retry(
@@ -43,16 +66,22 @@ class BaseServer(ABC):
         """断开连接"""
         pass
         
-    @abstractmethod
-    @retry(
-        max_attempts=2,
-        delay=0.5,
-        exceptions=(paramiko.SSHException, IOError),
-        should_retry=should_retry_on_connection
-    )
     def check_health(self) -> ServerStatus:
-        """检查服务器健康状态"""
-        pass
+        """检查服务器健康状态
+        
+        单次远程调用执行平台探测脚本, errors 只记录本次检查的错误
+        """
+        self.status.errors = []
+        try:
+            stdout, stderr = self.execute_python(self.probe_script, *BUILDER_DISTRIBUTIONS)
+            if not stdout.strip():
+                raise RuntimeError(stderr.strip() or "探测脚本无输出")
+            return apply_probe(self.status, json.loads(stdout))
+            
+        except Exception as e:
+            logger.error(f"健康检查失败: {str(e)}")
+            self.status.errors.append(str(e))
+            return self.status
         
     @abstractmethod
     @retry(
@@ -104,6 +133,35 @@ class BaseServer(ABC):
         """创建目录"""
         pass
         
+    def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (含父目录)
+        
+        默认逐个创建, 子类应覆盖为单次远程调用
+        
+        Args:
+            paths: 目录列表
+            
+        Returns:
+            bool: 是否全部创建成功
+        """
+        return all([self.create_directory(path) for path in paths])
+        
+    @staticmethod
+    def _batch_arguments(paths: List[str], max_length: int) -> List[List[str]]:
+        """按命令行长度上限对参数分批"""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        length = 0
+        for path in paths:
+            if current and length + len(path) + 3 > max_length:
+                batches.append(current)
+                current, length = [], 0
+            current.append(path)
+            length += len(path) + 3
+        if current:
+            batches.append(current)
+        return batches
+        
     @abstractmethod
     @retry(
         max_attempts=2,
@@ -135,4 +193,222 @@ class BaseServer(ABC):
             return stdout.strip()
         except Exception as e:
             logger.error(f"检查 Python 版本失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+            
+    def start_agent(self) -> bool:
+        """启动远程代理 (配置 agent: false 时不启动)
+        
+        代理运行期间命令, 脚本, 建目录和删除目录都经代理执行,
+        代理不可用时回退为每次打开新的 SSH 通道
+        
+        Returns:
+            bool: 代理是否已启动
+        """
+        if not self.config.get('agent', True):
+            return False
+            
+        self.stop_agent()
+        agent = RemoteAgent(
+            self,
+            self.config.get('agent_workers', DEFAULT_AGENT_WORKERS),
+            self.config.get('agent_timeout', DEFAULT_AGENT_TIMEOUT)
+        )
+        if not agent.start():
+            logger.warning("远程代理启动失败, 使用独立通道执行操作")
+            return False
+        self.agent = agent
+        return True
+        
+    def stop_agent(self) -> None:
+        """停止远程代理"""
+        if self.agent:
+            self.agent.close()
+            self.agent = None
+            
+    def _agent_ready(self) -> bool:
+        """远程代理是否可用"""
+        return self.agent is not None and self.agent.alive
+        
+    def execute_python(self, script: str, *args: str) -> Tuple[str, str]:
+        """在远程服务器上执行 Python 脚本
+        
+        脚本经 base64 编码后通过 python -c 执行, 避免不同平台 shell 的引号差异
+        
+        Args:
+            script: 脚本源码
+            args: 传给脚本的命令行参数 (sys.argv[1:])
+            
+        Returns:
+            Tuple[str, str]: (stdout, stderr)
+        """
+        if self._agent_ready():
+            return self.agent.execute_python(script, *args)
+        return self.execute_command(self.python_command(script, *args))
+        
+    def execute_python_input(self, script: str, data: bytes, *args: str) -> Tuple[str, str]:
+        """在远程服务器上执行 Python 脚本, 并通过 stdin 传入数据
+        
+        适用于参数过大无法放入命令行的情况, 脚本需先读完 stdin 再输出
+        
+        Args:
+            script: 脚本源码
+            data: 写入 stdin 的数据
+            args: 传给脚本的命令行参数
+            
+        Returns:
+            Tuple[str, str]: (stdout, stderr)
+        """
+        if self._agent_ready():
+            return self.agent.execute_python(script, *args, data=data)
+            
+        output: Dict[str, List[bytes]] = {'stdout': [], 'stderr': []}
+        channel = self.open_channel(self.python_command(script, *args))
+        try:
+            channel.sendall(data)
+            channel.shutdown_write()
+            self._pump_channel(channel, lambda stream, chunk: output[stream].append(chunk))
+            return (
+                b''.join(output['stdout']).decode('utf-8', errors='replace'),
+                b''.join(output['stderr']).decode('utf-8', errors='replace')
+            )
+        finally:
+            channel.close()
+            
+    def execute_streaming(
+        self,
+        command: str,
+        log: Optional[OutputLog] = None,
+        timeout: Optional[float] = None
+    ) -> int:
+        """流式执行命令
+        
+        同时读取 stdout 和 stderr, 逐行写入日志 (实时回调由 OutputLog.on_line 分发),
+        不在内存中保留完整输出; 长时间运行的命令使用独立通道, 不经过远程代理
+        
+        Args:
+            command: 远程命令
+            log: 输出日志
+            timeout: 超时时间 (秒), 超时后关闭通道并抛出 TimeoutError
+            
+        Returns:
+            int: 命令的退出码
+        """
+        decoders = {
+            'stdout': LineDecoder(self.encoding),
+            'stderr': LineDecoder(self.encoding)
+        }
+        
+        def emit(stream: str, lines: List[str]) -> None:
+            if log:
+                for line in lines:
+                    log.write(stream, line)
+                    
+        channel = self.open_channel(command)
+        try:
+            exit_status = self._pump_channel(
+                channel,
+                lambda stream, data: emit(stream, decoders[stream].feed(data)),
+                timeout
+            )
+        finally:
+            channel.close()
+        for stream, decoder in decoders.items():
+            emit(stream, decoder.flush())
+        return exit_status
+        
+    def _collect_output(self, command: str) -> Tuple[str, str, int]:
+        """执行命令并收集全部输出
+        
+        两个流同时读取, stderr 输出较多时不会因缓冲区写满而阻塞
+        
+        Returns:
+            Tuple[str, str, int]: (stdout, stderr, 退出码)
+        """
+        output: Dict[str, List[bytes]] = {'stdout': [], 'stderr': []}
+        channel = self.open_channel(command)
+        try:
+            exit_status = self._pump_channel(
+                channel,
+                lambda stream, data: output[stream].append(data)
+            )
+        finally:
+            channel.close()
+        return (
+            b''.join(output['stdout']).decode(self.encoding, errors='replace'),
+            b''.join(output['stderr']).decode(self.encoding, errors='replace'),
+            exit_status
+        )
+        
+    @staticmethod
+    def _pump_channel(
+        channel: paramiko.Channel,
+        on_data: Callable[[str, bytes], None],
+        timeout: Optional[float] = None
+    ) -> int:
+        """读取通道的 stdout/stderr 直到命令结束
+        
+        Args:
+            channel: 已执行命令的通道
+            on_data: 数据回调, 参数为 (流名称 stdout/stderr, 数据)
+            timeout: 超时时间 (秒)
+            
+        Returns:
+            int: 命令的退出码
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            if deadline and time.monotonic() > deadline:
+                channel.close()
+                raise TimeoutError(f"命令执行超时 ({timeout} 秒)")
+                
+            select.select([channel], [], [], CHANNEL_POLL_INTERVAL)
+            while channel.recv_ready():
+                on_data('stdout', channel.recv(CHANNEL_READ_SIZE))
+            while channel.recv_stderr_ready():
+                on_data('stderr', channel.recv_stderr(CHANNEL_READ_SIZE))
+                
+            # 远程在退出码之前发送全部输出, 退出码就绪且缓冲为空时输出已读完
+            if (
+                channel.exit_status_ready()
+                and not channel.recv_ready()
+                and not channel.recv_stderr_ready()
+            ):
+                return channel.recv_exit_status()
+                
+    def python_command(self, script: str, *args: str) -> str:
+        """生成执行 Python 脚本的远程命令"""
+        encoded = base64.b64encode(script.encode('utf-8')).decode('ascii')
+        python = self.config.get('python', 'python')
+        arguments = " ".join(f'"{arg}"' for arg in args)
+        return f'{python} -c "import base64;exec(base64.b64decode(\'{encoded}\'))" {arguments}'
+        
+    def open_sftp(self) -> paramiko.SFTPClient:
+        """在现有 SSH 连接上打开新的 SFTP 通道
+        
+        多个通道共享同一个传输层, 可用于并发传输
+        
+        Returns:
+            paramiko.SFTPClient: 新的 SFTP 客户端
+        """
+        ssh = getattr(self, 'ssh', None)
+        if not ssh or not ssh.get_transport():
+            raise RuntimeError("未连接到服务器")
+        return paramiko.SFTPClient.from_transport(ssh.get_transport())
+        
+    def open_channel(self, command: str) -> paramiko.Channel:
+        """打开执行命令的会话通道
+        
+        调用方可通过通道的 stdin/stdout 流式传输数据
+        
+        Args:
+            command: 远程命令
+            
+        Returns:
+            paramiko.Channel: 已执行命令的通道
+        """
+        ssh = getattr(self, 'ssh', None)
+        if not ssh or not ssh.get_transport():
+            raise RuntimeError("未连接到服务器")
+        channel = ssh.get_transport().open_session()
+        channel.exec_command(command)
+        return channel
@@ -4,9 +4,11 @@
 import logging
 from typing import Dict, Any, Optional, Type
 from .base import BaseServer
-from .windows import WindowsServer
-from .unix import UnixServer
-from .macos import MacOSServer
+from .async_base import AsyncBaseServer
+from .adapter import SyncServerAdapter
+from .windows import WindowsServer, AsyncWindowsServer
+from .unix import UnixServer, AsyncUnixServer
+from .macos import MacOSServer, AsyncMacOSServer
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,12 @@ class ServerFactory:
         'macos': MacOSServer
     }
     
+    _async_server_types = {
+        'windows': AsyncWindowsServer,
+        'unix': AsyncUnixServer,
+        'macos': AsyncMacOSServer
+    }
+    
     @classmethod
     def get_server_class(cls, server_type: str) -> Optional[Type[BaseServer]]:
         """
@@ -31,12 +39,35 @@ class ServerFactory:
             Type[BaseServer]: 服务器类
         """
         return cls._server_types.get(server_type.lower())
-    
+        
+    @classmethod
+    def get_server_type(cls, server: BaseServer) -> Optional[str]:
+        """
+        获取服务器实例的类型, 适配的异步服务器按其异步实现判断
+        
+        Args:
+            server: 服务器实例
+            
+        Returns:
+            Optional[str]: 服务器类型 (windows/unix/macos)
+        """
+        if isinstance(server, SyncServerAdapter):
+            server, server_types = server.server, cls._async_server_types
+        else:
+            server_types = cls._server_types
+        for server_type, server_class in server_types.items():
+            if isinstance(server, server_class):
+                return server_type
+        return None
+        
     @classmethod
     def create_server(cls, server_type: str, config: Dict[str, Any]) -> Optional[BaseServer]:
         """
         创建服务器实例
         
+        配置 backend: asyncssh 时创建异步服务器, 并包装为同步接口;
+        所有异步服务器共享一个事件循环线程
+        
         Args:
             server_type: 服务器类型 (windows/unix/macos)
             config: 服务器配置
@@ -45,6 +76,11 @@ class ServerFactory:
             BaseServer: 服务器实例
         """
         try:
+            if config.get('backend', 'paramiko') == 'asyncssh':
+                if server := cls.create_async_server(server_type, config):
+                    return SyncServerAdapter(server)
+                return None
+                
             if server_class := cls.get_server_class(server_type):
                 return server_class(config)
             else:
@@ -53,4 +89,27 @@ class ServerFactory:
                 
         except Exception as e:
             logger.error(f"创建服务器实例失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+            
+    @classmethod
+    def create_async_server(cls, server_type: str, config: Dict[str, Any]) -> Optional[AsyncBaseServer]:
+        """
+        创建异步服务器实例
+        
+        Args:
+            server_type: 服务器类型 (windows/unix/macos)
+            config: 服务器配置
+            
+        Returns:
+            AsyncBaseServer: 异步服务器实例
+        """
+        try:
+            if server_class := cls._async_server_types.get(server_type.lower()):
+                return server_class(config)
+            else:
+                logger.error(f"不支持的服务器类型: {server_type}")
+                return None
+                
+        except Exception as e:
+            logger.error(f"创建服务器实例失败: {str(e)}")
+            return None
\ No newline at end of file
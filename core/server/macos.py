@@ -2,21 +2,39 @@
 macOS 远程服务器实现
 """
 import os
+import shlex
 import logging
 import paramiko
-from typing import Dict, Any, Tuple
-from .base import BaseServer, ServerStatus
+from typing import Dict, Any, Tuple, List
+from .base import BaseServer
+from .async_base import AsyncBaseServer
+from .probe import MACOS_PROBE_SCRIPT
 
 logger = logging.getLogger(__name__)
 
 class MacOSServer(BaseServer):
     """macOS 服务器"""
     
+    probe_script = MACOS_PROBE_SCRIPT
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.ssh: paramiko.SSHClient = None
         self.sftp: paramiko.SFTPClient = None
         
+    @staticmethod
+    def mkdir_commands(paths: List[str]) -> List[str]:
+        """批量创建目录的命令 (按命令行长度分批)"""
+        return [
+            "mkdir -p " + " ".join(shlex.quote(path) for path in batch)
+            for batch in BaseServer._batch_arguments(paths, 32000)
+        ]
+        
+    @staticmethod
+    def remove_command(path: str) -> str:
+        """删除目录的命令"""
+        return f'rm -rf "{path}"'
+        
     def connect(self) -> bool:
         """连接到服务器"""
         try:
@@ -39,6 +57,7 @@ class MacOSServer(BaseServer):
             self.ssh.connect(**connect_params)
             self.sftp = self.ssh.open_sftp()
             self.status.connected = True
+            self.start_agent()
             return True
             
         except Exception as e:
@@ -49,6 +68,7 @@ class MacOSServer(BaseServer):
     def disconnect(self) -> None:
         """断开连接"""
         try:
+            self.stop_agent()
             if self.sftp:
                 self.sftp.close()
             if self.ssh:
@@ -58,48 +78,17 @@ class MacOSServer(BaseServer):
         finally:
             self.status.connected = False
             
-    def check_health(self) -> ServerStatus:
-        """检查服务器健康状态"""
-        try:
-            # 检查 CPU 使用率
-            stdout, _ = self.execute_command(
-                "top -l 1 | grep 'CPU usage' | awk '{print $3}' | cut -d'%' -f1"
-            )
-            self.status.cpu_usage = float(stdout.strip())
-            
-            # 检查内存使用率
-            stdout, _ = self.execute_command(
-                "vm_stat | perl -ne '/page size of (\\d+)/ and $size=$1; /Pages free: (\\d+)/ and print (1-$1*$size/$(sysctl -n hw.memsize))*100'"
-            )
-            self.status.memory_usage = float(stdout.strip())
-            
-            # 检查磁盘使用率
-            stdout, _ = self.execute_command(
-                "df -h / | tail -1 | awk '{print $5}' | sed 's/%//'"
-            )
-            self.status.disk_usage = float(stdout.strip())
-            
-            # 检查 Python 版本
-            if python_version := self.check_python():
-                self.status.python_version = python_version
-                
-            return self.status
-            
-        except Exception as e:
-            logger.error(f"健康检查失败: {str(e)}")
-            self.status.errors.append(str(e))
-            return self.status
-            
     def execute_command(self, command: str) -> Tuple[str, str]:
         """执行命令"""
         if not self.ssh:
             raise RuntimeError("未连接到服务器")
             
-        stdin, stdout, stderr = self.ssh.exec_command(command)
-        return (
-            stdout.read().decode('utf-8'),
-            stderr.read().decode('utf-8')
-        )
+        if self._agent_ready():
+            stdout, stderr, _ = self.agent.execute(command)
+            return stdout, stderr
+            
+        stdout, stderr, _ = self._collect_output(command)
+        return stdout, stderr
         
     def upload_file(self, local_path: str, remote_path: str) -> bool:
         """上传文件"""
@@ -137,14 +126,41 @@ class MacOSServer(BaseServer):
             logger.error(f"创建目录失败: {str(e)}")
             return False
             
+    def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (mkdir -p)"""
+        try:
+            if self._agent_ready():
+                return self.agent.create_directories(paths)
+                
+            for command in self.mkdir_commands(paths):
+                stdout, stderr = self.execute_command(command)
+                if stderr:
+                    logger.error(f"创建目录失败: {stderr}")
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"创建目录失败: {str(e)}")
+            return False
+            
     def remove_directory(self, path: str) -> bool:
         """删除目录"""
         try:
-            stdout, stderr = self.execute_command(f'rm -rf "{path}"')
+            if self._agent_ready():
+                self.agent.cleanup([path])
+                return True
+                
+            stdout, stderr = self.execute_command(self.remove_command(path))
             if stderr:
                 logger.error(f"删除目录失败: {stderr}")
                 return False
             return True
         except Exception as e:
             logger.error(f"删除目录失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+            
+class AsyncMacOSServer(AsyncBaseServer):
+    """macOS 服务器 (异步)"""
+    
+    probe_script = MACOS_PROBE_SCRIPT
+    mkdir_commands = staticmethod(MacOSServer.mkdir_commands)
+    remove_command = staticmethod(MacOSServer.remove_command)
\ No newline at end of file
@@ -5,10 +5,11 @@
 import logging
 import time
 import random
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Any
 from .base import BaseServer, ServerStatus
 from .factory import ServerFactory
 from .pool import ConnectionPool
+from .status_cache import StatusCache, DEFAULT_STATUS_TTL
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +56,11 @@ class LoadBalancer:
 class ServerManager:
     """服务器管理器"""
     
-    def __init__(self):
+    def __init__(self, status_ttl: float = DEFAULT_STATUS_TTL):
+        """
+        Args:
+            status_ttl: 服务器状态快照的默认有效期 (秒), 后台按此间隔刷新
+        """
         self.servers: Dict[str, BaseServer] = {}
         self.active_servers: Dict[str, BaseServer] = {}
         self.reconnect_attempts: Dict[str, int] = {}
@@ -63,6 +68,11 @@ class ServerManager:
         self.reconnect_delay = 5
         self.connection_pool = ConnectionPool()
         self.load_balancer = LoadBalancer()
+        self.status_cache = StatusCache(
+            lambda: dict(self.active_servers),
+            ttl=status_ttl,
+            on_update=self.load_balancer.update_load
+        )
         
     def add_server(self, name: str, server_type: str, config: dict) -> bool:
         """添加服务器"""
@@ -101,15 +111,10 @@ class ServerManager:
             if name in self.active_servers:
                 server.disconnect()
                 del self.active_servers[name]
+            self.status_cache.remove(name)
                 
             # 从连接池移除
-            server_type = None
-            for t, cls in ServerFactory._server_types.items():
-                if isinstance(server, cls):
-                    server_type = t
-                    break
-                    
-            if server_type:
+            if server_type := ServerFactory.get_server_type(server):
                 self.connection_pool.remove_server(server_type, server)
                 
             del self.servers[name]
@@ -132,10 +137,8 @@ class ServerManager:
                 self.active_servers[name] = server
                 self.reconnect_attempts[name] = 0
                 
-                # 更新负载信息
-                if status := server.check_health():
-                    self.load_balancer.update_load(name, status)
-                    
+                # 更新状态快照和负载信息
+                self.status_cache.refresh(name)
                 return True
                 
             # 连接失败,尝试重连
@@ -163,10 +166,8 @@ class ServerManager:
                     self.active_servers[name] = server
                     self.reconnect_attempts[name] = 0
                     
-                    # 更新负载信息
-                    if status := server.check_health():
-                        self.load_balancer.update_load(name, status)
-                        
+                    # 更新状态快照和负载信息
+                    self.status_cache.refresh(name)
                     logger.info(f"服务器 {name} 重连成功")
                     return True
                     
@@ -190,6 +191,7 @@ class ServerManager:
             server = self.active_servers[name]
             server.disconnect()
             del self.active_servers[name]
+            self.status_cache.remove(name)
             return True
             
         except Exception as e:
@@ -205,24 +207,26 @@ class ServerManager:
         return list(self.active_servers.keys())
         
     def check_servers_health(self) -> Dict[str, ServerStatus]:
-        """检查所有活动服务器的健康状态"""
+        """检查所有活动服务器的健康状态 (立即探测, 同时更新状态快照)"""
         results = {}
-        for name, server in list(self.active_servers.items()):
+        # 所有服务器同时探测, 异步后端的服务器在同一个事件循环中完成
+        snapshots = self.status_cache.refresh_many(list(self.active_servers))
+        for name in list(self.active_servers):
             try:
-                status = server.check_health()
-                if status.errors:
+                snapshot = snapshots.get(name)
+                if snapshot and snapshot.status.errors:
                     # 健康检查失败,尝试重连
                     logger.warning(f"服务器 {name} 健康检查失败,尝试重连")
                     if not self.reconnect_server(name):
                         # 重连失败,从活动服务器列表中移除
                         del self.active_servers[name]
+                        self.status_cache.remove(name)
                         continue
-                    # 重连成功,重新检查健康状态
-                    status = server.check_health()
+                    # 重连成功时已重新探测
+                    snapshot = self.status_cache.get(name)
                     
-                # 更新负载信息
-                self.load_balancer.update_load(name, status)
-                results[name] = status
+                if snapshot:
+                    results[name] = snapshot.status
                 
             except Exception as e:
                 logger.error(f"检查服务器 {name} 状态失败: {str(e)}")
@@ -235,7 +239,7 @@ class ServerManager:
             # 获取指定类型的活动服务器
             available_servers = [
                 name for name, server in self.active_servers.items()
-                if isinstance(server, ServerFactory._server_types[server_type])
+                if ServerFactory.get_server_type(server) == server_type
             ]
             
             # 使用负载均衡器选择服务器
@@ -249,28 +253,67 @@ class ServerManager:
             logger.error(f"选择服务器失败: {str(e)}")
             return None
             
-    def get_server_stats(self) -> Dict[str, Dict]:
-        """获取服务器统计信息"""
+    def get_server_status(self, name: str, refresh: bool = False) -> Optional[Tuple[ServerStatus, Dict[str, Any]]]:
+        """
+        获取服务器状态快照
+        
+        Args:
+            name: 服务器名称
+            refresh: 是否立即探测, 默认读取后台刷新的快照
+            
+        Returns:
+            Optional[Tuple[ServerStatus, Dict[str, Any]]]: (状态, 快照时间信息), 未连接或尚未探测时为 None
+        """
+        if name not in self.active_servers:
+            return None
+        snapshot = self.status_cache.get(name, refresh)
+        if not snapshot:
+            return None
+        return snapshot.status, snapshot.to_dict()
+        
+    def get_server_stats(self, refresh: bool = False) -> Dict[str, Dict]:
+        """
+        获取服务器统计信息
+        
+        Args:
+            refresh: 是否立即探测所有活动服务器, 默认读取状态快照
+        """
         stats = {
             'servers': {},
             'pool_status': self.connection_pool.get_pool_status()
         }
         
-        for name, server in self.servers.items():
+        for name in self.servers:
+            cached = self.get_server_status(name, refresh)
             server_info = {
                 'active': name in self.active_servers,
                 'reconnect_attempts': self.reconnect_attempts[name],
                 'load': self.load_balancer.server_loads.get(name, 0)
             }
             
-            if name in self.active_servers:
-                if status := server.check_health():
-                    server_info.update({
-                        'cpu_usage': status.cpu_usage,
-                        'memory_usage': status.memory_usage,
-                        'disk_usage': status.disk_usage,
-                        'errors': status.errors
-                    })
+            if cached:
+                status, snapshot = cached
+                server_info.update({
+                    'cpu_usage': status.cpu_usage,
+                    'memory_usage': status.memory_usage,
+                    'disk_usage': status.disk_usage,
+                    'load_average': status.load_average,
+                    'cpu_count': status.cpu_count,
+                    'temp_free': status.temp_free,
+                    'python_version': status.python_version,
+                    'builder_versions': status.builder_versions,
+                    'errors': status.errors,
+                    'checked_at': snapshot['checked_at'],
+                    'stale': snapshot['stale']
+                })
+                
+            # 常驻代理的运行指标
+            agent = getattr(self.servers[name], 'agent', None)
+            if agent is not None and agent.alive:
+                try:
+                    server_info['agent'] = agent.metrics()
+                except Exception as e:
+                    logger.warning(f"获取代理指标失败: {str(e)}")
                     
             stats['servers'][name] = server_info
             
@@ -280,4 +323,5 @@ class ServerManager:
         """清理所有连接"""
         for name in list(self.active_servers.keys()):
             self.disconnect_server(name)
+        self.status_cache.stop()
         self.connection_pool.cleanup() 
\ No newline at end of file
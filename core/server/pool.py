@@ -4,7 +4,7 @@
 import logging
 import threading
 import time
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple
 from queue import Queue, Empty
 from .base import BaseServer
 
@@ -0,0 +1,156 @@
+"""
+服务器健康探测
+每个平台一个只依赖标准库的探测脚本, 单次远程调用以 JSON 返回 CPU, 内存, 磁盘, 负载,
+核数, 临时目录剩余空间, Python 与打包工具版本; CPU 使用率由两次采样计算, 不调用 top
+"""
+from typing import Dict, Any, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import ServerStatus
+
+# 探测版本的打包工具 (发行包名), 通过包元数据读取版本, 不导入模块
+BUILDER_DISTRIBUTIONS: List[str] = ['pyinstaller', 'cx_Freeze', 'py2app', 'py2exe', 'nuitka']
+
+_PROBE_HEAD = '''
+import json, os, shutil, subprocess, sys, tempfile, time
+SAMPLE_INTERVAL = 0.2
+'''
+
+_PROBE_TAIL = '''
+def builder_versions(names):
+    try:
+        from importlib import metadata
+    except ImportError:
+        return {}
+    versions = {}
+    for name in names:
+        try:
+            versions[name] = metadata.version(name)
+        except Exception:
+            pass
+    return versions
+def python_versions():
+    found = {}
+    for minor in range(6, 16):
+        name = "python3.%d" % minor
+        path = shutil.which(name)
+        if path:
+            found[name] = path
+    return found
+def percent(usage):
+    return (usage.total - usage.free) / usage.total * 100 if usage.total else 0.0
+result = {
+    "cpu_usage": cpu_usage(),
+    "memory_usage": memory_usage(),
+    "disk_usage": percent(shutil.disk_usage(DISK_ROOT)),
+    "load_average": list(os.getloadavg()) if hasattr(os, "getloadavg") else [],
+    "cpu_count": os.cpu_count() or 1,
+    "temp_free": shutil.disk_usage(tempfile.gettempdir()).free,
+    "python_version": sys.version.split()[0],
+    "python_executable": sys.executable,
+    "python_versions": python_versions(),
+    "builder_versions": builder_versions(sys.argv[1:])
+}
+sys.stdout.write(json.dumps(result))
+'''
+
+_UNIX_PROBE = '''
+DISK_ROOT = "/"
+def cpu_times():
+    with open("/proc/stat") as f:
+        values = [int(value) for value in f.readline().split()[1:9]]
+    return values[3] + values[4], sum(values)
+def cpu_usage():
+    idle1, total1 = cpu_times()
+    time.sleep(SAMPLE_INTERVAL)
+    idle2, total2 = cpu_times()
+    return (1 - (idle2 - idle1) / (total2 - total1)) * 100 if total2 > total1 else 0.0
+def memory_usage():
+    meminfo = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) > 1:
+                meminfo[parts[0].rstrip(":")] = int(parts[1])
+    available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+    return (1 - available / meminfo["MemTotal"]) * 100
+'''
+
+_MACOS_PROBE = '''
+DISK_ROOT = "/"
+def cpu_usage():
+    output = subprocess.run(["ps", "-A", "-o", "%cpu="], capture_output=True, text=True).stdout
+    total = sum(float(value) for value in output.split())
+    return min(100.0, total / (os.cpu_count() or 1))
+def memory_usage():
+    total = int(subprocess.run(["sysctl", "-n", "hw.memsize"], capture_output=True, text=True).stdout)
+    output = subprocess.run(["vm_stat"], capture_output=True, text=True).stdout
+    lines = output.splitlines()
+    page_size = int(lines[0].split("page size of")[1].split()[0])
+    pages = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            pages[name.strip()] = int(value.strip().rstrip("."))
+    available = sum(pages.get(name, 0) for name in ("Pages free", "Pages inactive", "Pages speculative"))
+    return (1 - available * page_size / total) * 100
+'''
+
+_WINDOWS_PROBE = '''
+import ctypes
+from ctypes import wintypes
+DISK_ROOT = os.environ.get("SystemDrive", "C:") + "\\\\"
+def cpu_times():
+    idle, kernel, user = wintypes.FILETIME(), wintypes.FILETIME(), wintypes.FILETIME()
+    ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user))
+    value = lambda t: (t.dwHighDateTime << 32) | t.dwLowDateTime
+    return value(idle), value(kernel) + value(user)
+def cpu_usage():
+    idle1, total1 = cpu_times()
+    time.sleep(SAMPLE_INTERVAL)
+    idle2, total2 = cpu_times()
+    return (1 - (idle2 - idle1) / (total2 - total1)) * 100 if total2 > total1 else 0.0
+class MEMORYSTATUSEX(ctypes.Structure):
+    _fields_ = [
+        ("dwLength", ctypes.c_ulong),
+        ("dwMemoryLoad", ctypes.c_ulong),
+        ("ullTotalPhys", ctypes.c_ulonglong),
+        ("ullAvailPhys", ctypes.c_ulonglong),
+        ("ullTotalPageFile", ctypes.c_ulonglong),
+        ("ullAvailPageFile", ctypes.c_ulonglong),
+        ("ullTotalVirtual", ctypes.c_ulonglong),
+        ("ullAvailVirtual", ctypes.c_ulonglong),
+        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)
+    ]
+def memory_usage():
+    status = MEMORYSTATUSEX()
+    status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+    ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+    return (1 - status.ullAvailPhys / status.ullTotalPhys) * 100
+'''
+
+UNIX_PROBE_SCRIPT = _PROBE_HEAD + _UNIX_PROBE + _PROBE_TAIL
+MACOS_PROBE_SCRIPT = _PROBE_HEAD + _MACOS_PROBE + _PROBE_TAIL
+WINDOWS_PROBE_SCRIPT = _PROBE_HEAD + _WINDOWS_PROBE + _PROBE_TAIL
+
+def apply_probe(status: 'ServerStatus', result: Dict[str, Any]) -> 'ServerStatus':
+    """
+    将探测结果写入服务器状态
+    
+    Args:
+        status: 服务器状态
+        result: 探测脚本输出的 JSON
+        
+    Returns:
+        ServerStatus: 更新后的状态
+    """
+    status.cpu_usage = float(result['cpu_usage'])
+    status.memory_usage = float(result['memory_usage'])
+    status.disk_usage = float(result['disk_usage'])
+    status.load_average = [float(value) for value in result.get('load_average', [])]
+    status.cpu_count = int(result.get('cpu_count', 0))
+    status.temp_free = int(result.get('temp_free', 0))
+    status.python_version = f"Python {result['python_version']}"
+    status.python_versions = dict(result.get('python_versions', {}))
+    status.builder_versions = dict(result.get('builder_versions', {}))
+    return status
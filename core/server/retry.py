@@ -3,6 +3,7 @@
 """
 import logging
 import time
+import asyncio
 import functools
 from typing import Type, Tuple, Optional, Callable, Any
 
@@ -61,6 +62,44 @@ def retry(
         return wrapper
     return decorator
     
+def async_retry(
+    max_attempts: int = 3,
+    delay: float = 1.0,
+    backoff: float = 2.0,
+    exceptions: Tuple[Type[Exception], ...] = (Exception,),
+    should_retry: Optional[Callable[[Exception], bool]] = None
+) -> Callable:
+    """
+    协程的错误重试装饰器, 等待期间不阻塞事件循环
+    
+    参数与 retry 相同
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            attempt = 0
+            current_delay = delay
+            
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as e:
+                    attempt += 1
+                    if should_retry and not should_retry(e):
+                        raise
+                    if attempt >= max_attempts:
+                        raise
+                        
+                    logger.warning(
+                        f"执行 {func.__name__} 失败 ({str(e)}), "
+                        f"将在 {current_delay:.1f} 秒后进行第 {attempt + 1} 次重试"
+                    )
+                    await asyncio.sleep(current_delay)
+                    current_delay *= backoff
+                    
+        return wrapper
+    return decorator
+    
 def should_retry_on_connection(e: Exception) -> bool:
     """
     判断连接相关错误是否需要重试
@@ -0,0 +1,285 @@
+"""
+服务器状态缓存
+后台线程按 TTL 并发刷新各服务器的健康状态, API 和监控读取快照, 不在请求中同步探测;
+异步后端的服务器在共享事件循环中一次并发探测, 不占用线程池
+"""
+import copy
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Set, List, Tuple, Iterable
+from .base import BaseServer, ServerStatus
+from .adapter import SyncServerAdapter, EventLoopThread
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS_TTL = 30.0
+
+class StatusSnapshot:
+    """服务器状态快照"""
+    
+    def __init__(self, status: ServerStatus, ttl: float, duration: float = 0.0):
+        """
+        Args:
+            status: 探测得到的状态 (保存副本, 之后的探测不会修改快照)
+            ttl: 有效期 (秒)
+            duration: 探测耗时 (秒)
+        """
+        self.status = copy.deepcopy(status)
+        self.ttl = ttl
+        self.duration = duration
+        self.checked_at = time.time()
+        
+    @property
+    def age(self) -> float:
+        """距上次探测的秒数"""
+        return time.time() - self.checked_at
+        
+    @property
+    def stale(self) -> bool:
+        """是否已超过有效期"""
+        return self.age > self.ttl
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'checked_at': self.checked_at,
+            'age': self.age,
+            'stale': self.stale,
+            'duration': self.duration
+        }
+        
+class StatusCache:
+    """服务器状态缓存"""
+    
+    def __init__(
+        self,
+        get_servers: Callable[[], Dict[str, BaseServer]],
+        ttl: float = DEFAULT_STATUS_TTL,
+        refresh_interval: float = 5.0,
+        max_workers: int = 8,
+        on_update: Optional[Callable[[str, ServerStatus], None]] = None
+    ):
+        """
+        Args:
+            get_servers: 返回需要刷新的服务器 (名称到实例)
+            ttl: 默认有效期 (秒), 服务器配置中的 status_ttl 优先
+            refresh_interval: 后台检查过期快照的间隔 (秒)
+            max_workers: 并发探测的服务器数
+            on_update: 快照更新后的回调 (如更新负载均衡信息)
+        """
+        self.get_servers = get_servers
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.on_update = on_update
+        self.snapshots: Dict[str, StatusSnapshot] = {}
+        self._probing: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._stop = threading.Event()
+        
+        # 启动后台刷新线程
+        self.refresh_thread = threading.Thread(
+            target=self._refresh_loop,
+            daemon=True
+        )
+        self.refresh_thread.start()
+        
+    def ttl_for(self, server: BaseServer) -> float:
+        """服务器的快照有效期"""
+        return float(server.config.get('status_ttl', self.ttl))
+        
+    def get(self, name: str, refresh: bool = False) -> Optional[StatusSnapshot]:
+        """
+        获取服务器状态快照
+        
+        Args:
+            name: 服务器名称
+            refresh: 是否立即探测 (同步)
+            
+        Returns:
+            Optional[StatusSnapshot]: 快照, 尚未探测过时为 None
+        """
+        if refresh:
+            return self.refresh(name)
+        with self._lock:
+            return self.snapshots.get(name)
+            
+    def refresh(self, name: str) -> Optional[StatusSnapshot]:
+        """
+        立即探测服务器并更新快照
+        
+        Returns:
+            Optional[StatusSnapshot]: 新快照, 服务器不存在时为 None
+        """
+        server = self.get_servers().get(name)
+        if not server:
+            return None
+        return self._probe(name, server)
+        
+    def refresh_many(self, names: Iterable[str]) -> Dict[str, StatusSnapshot]:
+        """
+        立即并发探测多个服务器并更新快照
+        
+        Returns:
+            Dict[str, StatusSnapshot]: 探测成功的服务器的新快照
+        """
+        servers = self.get_servers()
+        groups, others = self._split_backends(
+            [(name, servers[name]) for name in names if name in servers]
+        )
+        futures = {
+            name: self._executor.submit(self._probe, name, server)
+            for name, server in others
+        }
+        snapshots: Dict[str, StatusSnapshot] = {}
+        for loop, group in groups.items():
+            snapshots.update(self._probe_gathered(loop, group))
+        for name, future in futures.items():
+            try:
+                snapshots[name] = future.result()
+            except Exception as e:
+                logger.error(f"探测服务器 {name} 失败: {str(e)}")
+        return snapshots
+        
+    @staticmethod
+    def _split_backends(
+        pending: List[Tuple[str, BaseServer]]
+    ) -> Tuple[Dict[EventLoopThread, List[Tuple[str, SyncServerAdapter]]], List[Tuple[str, BaseServer]]]:
+        """
+        将异步后端的服务器按事件循环分组
+        
+        Returns:
+            Tuple: (事件循环到服务器组, 其余同步服务器)
+        """
+        groups: Dict[EventLoopThread, List[Tuple[str, SyncServerAdapter]]] = {}
+        others: List[Tuple[str, BaseServer]] = []
+        for name, server in pending:
+            if isinstance(server, SyncServerAdapter):
+                groups.setdefault(server.loop, []).append((name, server))
+            else:
+                others.append((name, server))
+        return groups, others
+        
+    def _probe_gathered(
+        self,
+        loop: EventLoopThread,
+        group: List[Tuple[str, SyncServerAdapter]]
+    ) -> Dict[str, StatusSnapshot]:
+        """在事件循环中同时探测一组异步服务器"""
+        async def probe(server: SyncServerAdapter) -> Tuple[ServerStatus, float]:
+            start = time.time()
+            status = await server.server.check_health()
+            return status, time.time() - start
+            
+        async def probe_all() -> List[Any]:
+            return await asyncio.gather(
+                *[probe(server) for _, server in group],
+                return_exceptions=True
+            )
+            
+        snapshots: Dict[str, StatusSnapshot] = {}
+        for (name, _), result in zip(group, loop.run(probe_all())):
+            if isinstance(result, BaseException):
+                logger.error(f"探测服务器 {name} 失败: {str(result)}")
+                continue
+            snapshots[name] = self.update(name, *result)
+        return snapshots
+        
+    def update(self, name: str, status: ServerStatus, duration: float = 0.0) -> StatusSnapshot:
+        """
+        记录其他途径得到的探测结果 (如连接时的健康检查)
+        
+        Returns:
+            StatusSnapshot: 新快照
+        """
+        server = self.get_servers().get(name)
+        snapshot = StatusSnapshot(status, self.ttl_for(server) if server else self.ttl, duration)
+        with self._lock:
+            self.snapshots[name] = snapshot
+        if self.on_update:
+            try:
+                self.on_update(name, snapshot.status)
+            except Exception as e:
+                logger.error(f"更新服务器状态失败: {str(e)}")
+        return snapshot
+        
+    def remove(self, name: str) -> None:
+        """删除服务器的快照"""
+        with self._lock:
+            self.snapshots.pop(name, None)
+            
+    def stop(self) -> None:
+        """停止后台刷新"""
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        
+    def _probe(self, name: str, server: BaseServer) -> StatusSnapshot:
+        """探测服务器"""
+        start = time.time()
+        status = server.check_health()
+        return self.update(name, status, time.time() - start)
+        
+    def _probe_async(self, name: str, server: BaseServer) -> None:
+        """后台探测, 同一服务器同时只有一个探测"""
+        try:
+            self._probe(name, server)
+        except Exception as e:
+            logger.error(f"探测服务器 {name} 失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._probing.discard(name)
+                
+    def _probe_gathered_async(
+        self,
+        loop: EventLoopThread,
+        group: List[Tuple[str, SyncServerAdapter]]
+    ) -> None:
+        """后台探测一组异步服务器"""
+        try:
+            self._probe_gathered(loop, group)
+        except Exception as e:
+            logger.error(f"探测服务器失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._probing.difference_update(name for name, _ in group)
+                
+    def _refresh_loop(self) -> None:
+        """定期刷新过期的快照"""
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh_expired()
+            except Exception as e:
+                logger.error(f"刷新服务器状态失败: {str(e)}")
+                
+    def refresh_expired(self) -> int:
+        """
+        提交过期快照的后台探测
+        
+        Returns:
+            int: 提交的探测数
+        """
+        servers = self.get_servers()
+        submitted = 0
+        with self._lock:
+            # 已移除的服务器不再保留快照
+            for name in set(self.snapshots) - set(servers):
+                del self.snapshots[name]
+            pending = [
+                (name, server) for name, server in servers.items()
+                if name not in self._probing
+                and (name not in self.snapshots or self.snapshots[name].age >= self.ttl_for(server))
+            ]
+            self._probing.update(name for name, _ in pending)
+        groups, others = self._split_backends(pending)
+        for name, server in others:
+            self._executor.submit(self._probe_async, name, server)
+            submitted += 1
+        # 同一事件循环上的异步服务器合并为一次并发探测
+        for loop, group in groups.items():
+            self._executor.submit(self._probe_gathered_async, loop, group)
+            submitted += len(group)
+        return submitted
+        
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+命令输出流
+按行解码远程命令的输出, 环形缓冲保留最近的输出, 完整日志写入磁盘,
+长时间运行的命令 (如 PyInstaller) 不必把全部输出保留在内存中
+"""
+import os
+import codecs
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_DIR = os.path.join(
+    os.path.expanduser('~'),
+    '.remotebuilder',
+    'logs'
+)
+
+DEFAULT_TAIL_LINES = 200
+
+class LineDecoder:
+    """增量解码字节流并按行切分, 多字节字符和不完整的行留到下一块"""
+    
+    def __init__(self, encoding: str = 'utf-8'):
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.pending = ''
+        
+    def feed(self, data: bytes) -> List[str]:
+        """
+        送入一块数据
+        
+        Returns:
+            List[str]: 已完整的行 (不含换行符)
+        """
+        lines = (self.pending + self.decoder.decode(data)).split('\n')
+        self.pending = lines.pop()
+        return [line.rstrip('\r') for line in lines]
+        
+    def flush(self) -> List[str]:
+        """结束时返回剩余的不完整行"""
+        rest = self.pending + self.decoder.decode(b'', final=True)
+        self.pending = ''
+        return [rest.rstrip('\r')] if rest else []
+
+class OutputLog:
+    """命令输出日志"""
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        on_line: Optional[Callable[[str, str], None]] = None
+    ):
+        """
+        Args:
+            path: 完整日志的路径, None 表示只保留末尾
+            tail_lines: 内存中保留的行数
+            on_line: 每行输出的回调, 参数为 (流名称 stdout/stderr, 行)
+        """
+        self.path = path
+        self.on_line = on_line
+        self.lines = 0
+        self._tail: deque = deque(maxlen=tail_lines)
+        self._file = None
+        self._lock = threading.Lock()
+        
+    def write(self, stream: str, line: str) -> None:
+        """记录一行输出"""
+        with self._lock:
+            self._tail.append(line)
+            self.lines += 1
+            if self.path:
+                try:
+                    if self._file is None:
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                        self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+                    self._file.write(line + '\n')
+                except OSError as e:
+                    logger.warning(f"写入输出日志失败: {str(e)}")
+                    self.path = None
+        if self.on_line:
+            self.on_line(stream, line)
+            
+    def tail(self, lines: Optional[int] = None) -> str:
+        """
+        获取最近的输出
+        
+        Args:
+            lines: 行数, None 表示环形缓冲中的全部行
+        """
+        with self._lock:
+            recent = list(self._tail)
+        if lines is not None:
+            recent = recent[-lines:] if lines > 0 else []
+        return '\n'.join(recent)
+        
+    def close(self) -> None:
+        """关闭日志文件, 之后的输出会重新打开文件追加"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -4,19 +4,44 @@ Windows 远程服务器实现
 import os
 import logging
 import paramiko
-from typing import Dict, Any, Tuple
-from .base import BaseServer, ServerStatus
+from typing import Dict, Any, Tuple, List
+from .base import BaseServer
+from .async_base import AsyncBaseServer
+from .probe import WINDOWS_PROBE_SCRIPT
 
 logger = logging.getLogger(__name__)
 
 class WindowsServer(BaseServer):
     """Windows 服务器"""
     
+    encoding = 'gbk'
+    probe_script = WINDOWS_PROBE_SCRIPT
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.ssh: paramiko.SSHClient = None
         self.sftp: paramiko.SFTPClient = None
         
+    @staticmethod
+    def mkdir_commands(paths: List[str]) -> List[str]:
+        """批量创建目录的命令 (按命令行长度分批)"""
+        commands = []
+        # cmd.exe 命令行长度上限为 8191
+        for batch in BaseServer._batch_arguments(paths, 6000):
+            arguments = ",".join(
+                "'" + path.replace("'", "''") + "'" for path in batch
+            )
+            commands.append(
+                'powershell -NoProfile -NonInteractive -Command '
+                f'"$ProgressPreference=\'SilentlyContinue\'; New-Item -ItemType Directory -Force -Path {arguments} | Out-Null"'
+            )
+        return commands
+        
+    @staticmethod
+    def remove_command(path: str) -> str:
+        """删除目录的命令"""
+        return f'rmdir /S /Q "{path}"'
+        
     def connect(self) -> bool:
         """连接到服务器"""
         try:
@@ -39,6 +64,7 @@ class WindowsServer(BaseServer):
             self.ssh.connect(**connect_params)
             self.sftp = self.ssh.open_sftp()
             self.status.connected = True
+            self.start_agent()
             return True
             
         except Exception as e:
@@ -49,6 +75,7 @@ class WindowsServer(BaseServer):
     def disconnect(self) -> None:
         """断开连接"""
         try:
+            self.stop_agent()
             if self.sftp:
                 self.sftp.close()
             if self.ssh:
@@ -58,54 +85,17 @@ class WindowsServer(BaseServer):
         finally:
             self.status.connected = False
             
-    def check_health(self) -> ServerStatus:
-        """检查服务器健康状态"""
-        try:
-            # 检查 CPU 使用率
-            stdout, _ = self.execute_command(
-                'wmic cpu get loadpercentage | findstr /r "[0-9]"'
-            )
-            self.status.cpu_usage = float(stdout.strip())
-            
-            # 检查内存使用率
-            stdout, _ = self.execute_command(
-                'wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value'
-            )
-            memory_info = dict(line.split('=', 1) for line in stdout.strip().split('\n'))
-            total = float(memory_info['TotalVisibleMemorySize'])
-            free = float(memory_info['FreePhysicalMemory'])
-            self.status.memory_usage = (total - free) / total * 100
-            
-            # 检查磁盘使用率
-            stdout, _ = self.execute_command(
-                f'wmic logicaldisk where "DeviceID=\'C:\'" get Size,FreeSpace /Value'
-            )
-            disk_info = dict(line.split('=', 1) for line in stdout.strip().split('\n'))
-            total = float(disk_info['Size'])
-            free = float(disk_info['FreeSpace'])
-            self.status.disk_usage = (total - free) / total * 100
-            
-            # 检查 Python 版本
-            if python_version := self.check_python():
-                self.status.python_version = python_version
-                
-            return self.status
-            
-        except Exception as e:
-            logger.error(f"健康检查失败: {str(e)}")
-            self.status.errors.append(str(e))
-            return self.status
-            
     def execute_command(self, command: str) -> Tuple[str, str]:
         """执行命令"""
         if not self.ssh:
             raise RuntimeError("未连接到服务器")
             
-        stdin, stdout, stderr = self.ssh.exec_command(command)
-        return (
-            stdout.read().decode('gbk', errors='replace'),
-            stderr.read().decode('gbk', errors='replace')
-        )
+        if self._agent_ready():
+            stdout, stderr, _ = self.agent.execute(command)
+            return stdout, stderr
+            
+        stdout, stderr, _ = self._collect_output(command)
+        return stdout, stderr
         
     def upload_file(self, local_path: str, remote_path: str) -> bool:
         """上传文件"""
@@ -143,14 +133,42 @@ class WindowsServer(BaseServer):
             logger.error(f"创建���录失败: {str(e)}")
             return False
             
+    def create_directories(self, paths: List[str]) -> bool:
+        """批量创建目录 (PowerShell New-Item -Force)"""
+        try:
+            if self._agent_ready():
+                return self.agent.create_directories(paths)
+                
+            for command in self.mkdir_commands(paths):
+                stdout, stderr = self.execute_command(command)
+                if stderr:
+                    logger.error(f"创建目录失败: {stderr}")
+                    return False
+            return True
+        except Exception as e:
+            logger.error(f"创建目录失败: {str(e)}")
+            return False
+            
     def remove_directory(self, path: str) -> bool:
         """删除目录"""
         try:
-            stdout, stderr = self.execute_command(f'rmdir /S /Q "{path}"')
+            if self._agent_ready():
+                self.agent.cleanup([path])
+                return True
+                
+            stdout, stderr = self.execute_command(self.remove_command(path))
             if stderr:
                 logger.error(f"删除目录失败: {stderr}")
                 return False
             return True
         except Exception as e:
             logger.error(f"删除目录失败: {str(e)}")
-            return False 
\ No newline at end of file
+            return False
+            
+class AsyncWindowsServer(AsyncBaseServer):
+    """Windows 服务器 (异步)"""
+    
+    encoding = 'gbk'
+    probe_script = WINDOWS_PROBE_SCRIPT
+    mkdir_commands = staticmethod(WindowsServer.mkdir_commands)
+    remove_command = staticmethod(WindowsServer.remove_command)
\ No newline at end of file
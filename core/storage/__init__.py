@@ -0,0 +1,15 @@
+"""
+存储模块
+"""
+from .artifacts import ArtifactStore, ChunkedFile, DEFAULT_STORE_ROOT
+from .chunking import iter_chunks
+from .delta import build_delta, apply_delta
+
+__all__ = [
+    'ArtifactStore',
+    'ChunkedFile',
+    'DEFAULT_STORE_ROOT',
+    'iter_chunks',
+    'build_delta',
+    'apply_delta'
+]
@@ -0,0 +1,631 @@
+"""
+构建产物存储
+文件按内容定义分块后按分块哈希保存, 相同分块在不同构建、不同平台之间只存一份,
+读取时按需从分块还原; 以 SQLite 索引记录产物、文件与分块的对应关系,
+支持按项目的数量/时间保留策略与全局容量 LRU 淘汰, 分块在后台线程中删除
+"""
+import io
+import os
+import time
+import uuid
+import bisect
+import sqlite3
+import hashlib
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from .chunking import iter_chunks
+from .delta import build_delta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_ROOT = os.path.join(
+    os.path.expanduser('~'),
+    '.remotebuilder',
+    'artifacts'
+)
+
+class ChunkedFile(io.RawIOBase):
+    """按需从分块还原的只读文件, 只读取请求区间涉及的分块"""
+    
+    def __init__(self, store: 'ArtifactStore', chunks: List[Tuple[str, int]]):
+        super().__init__()
+        self.store = store
+        self.hashes = [digest for digest, _ in chunks]
+        # 每个分块在文件中的起始偏移
+        self.offsets: List[int] = []
+        self.size = 0
+        for _, size in chunks:
+            self.offsets.append(self.size)
+            self.size += size
+        self.position = 0
+        self._cached_index = -1
+        self._cached_data = b''
+        
+    def readable(self) -> bool:
+        return True
+        
+    def seekable(self) -> bool:
+        return True
+        
+    def tell(self) -> int:
+        return self.position
+        
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self.position = offset
+        return self.position
+        
+    def _chunk(self, index: int) -> bytes:
+        """读取分块 (缓存最近一个)"""
+        if index != self._cached_index:
+            self._cached_data = self.store.read_chunk(self.hashes[index])
+            self._cached_index = index
+        return self._cached_data
+        
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(view) and self.position < self.size:
+            index = bisect.bisect_right(self.offsets, self.position) - 1
+            data = self._chunk(index)
+            start = self.position - self.offsets[index]
+            part = data[start:start + len(view) - written]
+            if not part:
+                raise IOError(f"分块 {self.hashes[index]} 不完整")
+            view[written:written + len(part)] = part
+            written += len(part)
+            self.position += len(part)
+        return written
+        
+class ArtifactStore:
+    """构建产物存储"""
+    
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: int = 50 * 1024 * 1024 * 1024,  # 50GB
+        max_count: int = 20,
+        max_age: Optional[float] = 30 * 24 * 3600,  # 30天
+        retention: Optional[Dict[str, Dict[str, Any]]] = None,
+        retention_interval: float = 3600.0
+    ):
+        """
+        Args:
+            root: 存储目录
+            max_bytes: 全局容量上限, 超出时按最近使用时间淘汰
+            max_count: 每个项目默认保留的产物数量
+            max_age: 每个项目默认保留的时间(秒), None 表示不限
+            retention: 按项目覆盖的保留策略 {项目: {'max_count': .., 'max_age': ..}}
+            retention_interval: 后台定期执行保留策略的间隔(秒)
+        """
+        self.root = root or DEFAULT_STORE_ROOT
+        self.chunks_dir = os.path.join(self.root, 'chunks')
+        self.deltas_dir = os.path.join(self.root, 'deltas')
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_age = max_age
+        self.retention = retention or {}
+        self.retention_interval = retention_interval
+        self.lock = threading.Lock()
+        # 正在写入的产物已保存但尚未写入索引的分块, 后台删除时跳过
+        self._pinned: Dict[str, int] = {}
+        # 每个版本对的差异包只生成一次
+        self._delta_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.deltas_dir, exist_ok=True)
+        
+        self.conn = sqlite3.connect(
+            os.path.join(self.root, 'index.db'),
+            timeout=30,
+            check_same_thread=False
+        )
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    id TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    task_id TEXT,
+                    platform TEXT,
+                    status TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    file_count INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_artifacts_project ON artifacts (project, created);
+                CREATE TABLE IF NOT EXISTS artifact_files (
+                    artifact_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mode INTEGER NOT NULL,
+                    PRIMARY KEY (artifact_id, path)
+                );
+                CREATE INDEX IF NOT EXISTS idx_artifact_files_hash ON artifact_files (hash);
+                CREATE TABLE IF NOT EXISTS file_chunks (
+                    file_hash TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    PRIMARY KEY (file_hash, seq)
+                );
+                CREATE INDEX IF NOT EXISTS idx_file_chunks_chunk ON file_chunks (chunk_hash);
+                CREATE TABLE IF NOT EXISTS chunks (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL
+                );
+                """
+            )
+            self.conn.commit()
+            
+        # 后台删除线程: 产物记录删除后, 不再被引用的文件内容与分块在此删除
+        self._deletions: Queue = Queue()
+        self._deleter = threading.Thread(target=self._delete_worker, daemon=True)
+        self._deleter.start()
+        
+    def _chunk_path(self, digest: str) -> str:
+        """分块文件路径"""
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+        
+    def _pin(self, digests: Iterable[str]) -> None:
+        with self.lock:
+            for digest in digests:
+                self._pinned[digest] = self._pinned.get(digest, 0) + 1
+                
+    def _unpin(self, digests: Iterable[str]) -> None:
+        with self.lock:
+            for digest in digests:
+                count = self._pinned.get(digest, 0) - 1
+                if count > 0:
+                    self._pinned[digest] = count
+                else:
+                    self._pinned.pop(digest, None)
+                    
+    def _store_file(self, path: str, pinned: List[str]) -> Tuple[str, List[Tuple[str, int]]]:
+        """
+        分块保存文件
+        
+        Args:
+            path: 文件路径
+            pinned: 记录本次固定的分块哈希
+            
+        Returns:
+            Tuple[str, List[Tuple[str, int]]]: (文件 sha256, [(分块哈希, 大小)])
+        """
+        file_hasher = hashlib.sha256()
+        chunks = []
+        with open(path, 'rb') as f:
+            for data in iter_chunks(f):
+                file_hasher.update(data)
+                digest = hashlib.blake2b(data, digest_size=32).hexdigest()
+                # 先固定再检查是否存在, 避免刚确认存在的分块被后台删除
+                self._pin([digest])
+                pinned.append(digest)
+                chunk_path = self._chunk_path(digest)
+                if not os.path.exists(chunk_path):
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    tmp_path = f"{chunk_path}.{uuid.uuid4().hex}.tmp"
+                    with open(tmp_path, 'wb') as out:
+                        out.write(data)
+                    os.replace(tmp_path, chunk_path)
+                chunks.append((digest, len(data)))
+        return file_hasher.hexdigest(), chunks
+        
+    def put(
+        self,
+        source_dir: str,
+        project: str,
+        task_id: Optional[str] = None,
+        platform: Optional[str] = None,
+        move: bool = False
+    ) -> Optional[str]:
+        """
+        保存目录中的全部文件为一个产物
+        
+        Args:
+            source_dir: 产物目录
+            project: 所属项目
+            task_id: 任务ID
+            platform: 目标平台
+            move: 保存后删除源文件 (源目录为临时目录时尽早释放空间)
+            
+        Returns:
+            Optional[str]: 产物ID, 失败时返回 None
+        """
+        artifact_id = uuid.uuid4().hex
+        pinned: List[str] = []
+        try:
+            files = []
+            for dirpath, _, filenames in os.walk(source_dir):
+                for name in filenames:
+                    local_path = os.path.join(dirpath, name)
+                    if os.path.islink(local_path):
+                        continue
+                    st = os.stat(local_path)
+                    relative_path = os.path.relpath(local_path, source_dir).replace(os.sep, '/')
+                    digest, chunks = self._store_file(local_path, pinned)
+                    files.append((relative_path, digest, chunks, st))
+                    if move:
+                        os.remove(local_path)
+                        
+            now = time.time()
+            with self.lock:
+                self.conn.execute(
+                    "INSERT INTO artifacts VALUES (?, ?, ?, ?, 'ready', ?, ?, ?, ?)",
+                    (
+                        artifact_id, project, task_id, platform,
+                        sum(st.st_size for _, _, _, st in files), len(files), now, now
+                    )
+                )
+                self.conn.executemany(
+                    "INSERT INTO artifact_files VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (artifact_id, relative_path, digest, st.st_size, st.st_mode & 0o777)
+                        for relative_path, digest, _, st in files
+                    ]
+                )
+                for _, digest, chunks, _ in files:
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO file_chunks VALUES (?, ?, ?)",
+                        [(digest, seq, chunk) for seq, (chunk, _) in enumerate(chunks)]
+                    )
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO chunks VALUES (?, ?)",
+                        chunks
+                    )
+                self.conn.commit()
+            self._unpin(pinned)
+            
+            logger.info(f"保存产物 {artifact_id}: {len(files)} 个文件")
+            self.apply_retention(project)
+            return artifact_id
+            
+        except Exception as e:
+            logger.error(f"保存产物失败: {str(e)}")
+            with self.lock:
+                self.conn.rollback()
+            self._unpin(pinned)
+            # 本次写入但未被引用的分块
+            with self.lock:
+                self._release_chunks(set(pinned))
+                self.conn.commit()
+            return None
+            
+    def get(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取产物信息
+        
+        Args:
+            artifact_id: 产物ID
+            
+        Returns:
+            Optional[Dict[str, Any]]: 产物信息, 不存在时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, project, task_id, platform, size, file_count, created, last_used "
+                "FROM artifacts WHERE id = ? AND status = 'ready'",
+                (artifact_id,)
+            ).fetchone()
+        if not row:
+            return None
+        keys = ['artifact_id', 'project', 'task_id', 'platform', 'size', 'file_count', 'created', 'last_used']
+        return dict(zip(keys, row))
+        
+    def list_files(self, artifact_id: str) -> List[Dict[str, Any]]:
+        """
+        列出产物中的文件
+        
+        Returns:
+            List[Dict[str, Any]]: 文件列表 (path / hash / size / mode)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, hash, size, mode FROM artifact_files WHERE artifact_id = ? ORDER BY path",
+                (artifact_id,)
+            ).fetchall()
+        return [dict(zip(['path', 'hash', 'size', 'mode'], row)) for row in rows]
+        
+    def list_artifacts(self, project: Optional[str] = None) -> List[Dict[str, Any]]:
+        """列出产物, 按创建时间倒序"""
+        with self.lock:
+            if project is None:
+                rows = self.conn.execute(
+                    "SELECT id FROM artifacts WHERE status = 'ready' ORDER BY created DESC"
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT id FROM artifacts WHERE status = 'ready' AND project = ? "
+                    "ORDER BY created DESC",
+                    (project,)
+                ).fetchall()
+        return [info for (artifact_id,) in rows if (info := self.get(artifact_id))]
+        
+    def open_file(self, artifact_id: str, path: str) -> Optional[ChunkedFile]:
+        """
+        打开产物中的文件
+        
+        Args:
+            artifact_id: 产物ID
+            path: 文件相对路径
+            
+        Returns:
+            Optional[ChunkedFile]: 可寻址的只读文件对象, 不存在时返回 None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT hash FROM artifact_files WHERE artifact_id = ? AND path = ?",
+                (artifact_id, path)
+            ).fetchone()
+        if not row:
+            return None
+        self.touch(artifact_id)
+        return ChunkedFile(self, self.file_chunks(row[0]))
+        
+    def file_chunks(self, file_hash: str) -> List[Tuple[str, int]]:
+        """
+        获取文件内容的分块列表
+        
+        Args:
+            file_hash: 文件 sha256
+            
+        Returns:
+            List[Tuple[str, int]]: 按顺序排列的 (分块哈希, 大小)
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT f.chunk_hash, c.size FROM file_chunks f JOIN chunks c ON c.hash = f.chunk_hash "
+                "WHERE f.file_hash = ? ORDER BY f.seq",
+                (file_hash,)
+            ).fetchall()
+            
+    def read_chunk(self, digest: str) -> bytes:
+        """读取分块数据"""
+        with open(self._chunk_path(digest), 'rb') as f:
+            return f.read()
+        
+    def export(self, artifact_id: str, dest_dir: str) -> bool:
+        """
+        将产物复制到目录
+        
+        Args:
+            artifact_id: 产物ID
+            dest_dir: 目标目录
+            
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            for entry in self.list_files(artifact_id):
+                dest = os.path.join(dest_dir, *entry['path'].split('/'))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with self.open_file(artifact_id, entry['path']) as src, open(dest, 'wb') as f:
+                    while data := src.read(1024 * 1024):
+                        f.write(data)
+                os.chmod(dest, entry['mode'])
+            self.touch(artifact_id)
+            return True
+        except Exception as e:
+            logger.error(f"导出产物失败: {str(e)}")
+            return False
+            
+    def get_delta(self, base_id: str, target_id: str) -> Optional[str]:
+        """
+        获取两个产物版本之间的差异包, 每个版本对只生成一次
+        
+        Args:
+            base_id: 客户端已有的产物ID
+            target_id: 目标产物ID
+            
+        Returns:
+            Optional[str]: 差异包路径, 产物不存在或生成失败时返回 None
+        """
+        if not self.get(base_id) or not self.get(target_id):
+            return None
+        path = os.path.join(self.deltas_dir, f"{base_id}-{target_id}.zip")
+        with self.lock:
+            pair_lock = self._delta_locks.setdefault((base_id, target_id), threading.Lock())
+        with pair_lock:
+            # 等待锁期间产物可能已被删除
+            if not self.get(base_id) or not self.get(target_id):
+                return None
+            if os.path.exists(path):
+                return path
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                build_delta(self, base_id, target_id, tmp_path)
+                os.replace(tmp_path, path)
+                logger.info(
+                    f"生成差异包 {base_id} -> {target_id}: {os.path.getsize(path)} 字节"
+                )
+                return path
+            except Exception as e:
+                logger.error(f"生成差异包失败: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return None
+                
+    def touch(self, artifact_id: str) -> None:
+        """更新最近使用时间"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE artifacts SET last_used = ? WHERE id = ?",
+                (time.time(), artifact_id)
+            )
+            self.conn.commit()
+            
+    def delete(self, artifact_id: str) -> None:
+        """删除产物记录, 分块由后台线程删除"""
+        with self.lock:
+            hashes = [
+                digest for (digest,) in self.conn.execute(
+                    "SELECT DISTINCT hash FROM artifact_files WHERE artifact_id = ?",
+                    (artifact_id,)
+                )
+            ]
+            self.conn.execute("DELETE FROM artifact_files WHERE artifact_id = ?", (artifact_id,))
+            self.conn.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+            self.conn.commit()
+        for digest in hashes:
+            self._deletions.put(digest)
+            
+        # 涉及该产物的差异包, 持有版本对的锁, 不删除正在生成的差异包的临时文件
+        pairs = set()
+        for name in os.listdir(self.deltas_dir):
+            pair = tuple(name.split('.', 1)[0].split('-'))
+            if len(pair) == 2 and artifact_id in pair:
+                pairs.add(pair)
+        with self.lock:
+            pairs.update(pair for pair in self._delta_locks if artifact_id in pair)
+            pair_locks = {
+                pair: self._delta_locks.setdefault(pair, threading.Lock())
+                for pair in pairs
+            }
+        for pair, pair_lock in pair_locks.items():
+            with pair_lock:
+                path = os.path.join(self.deltas_dir, f"{pair[0]}-{pair[1]}.zip")
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"删除差异包失败: {str(e)}")
+                with self.lock:
+                    self._delta_locks.pop(pair, None)
+            
+    def total_size(self) -> int:
+        """存储占用 (仍被产物引用的分块总大小, 不计待后台删除的分块)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM chunks WHERE hash IN ("
+                "SELECT f.chunk_hash FROM file_chunks f JOIN artifact_files a ON a.hash = f.file_hash)"
+            ).fetchone()
+        return row[0]
+        
+    def logical_size(self) -> int:
+        """去重前的产物总大小"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE status = 'ready'"
+            ).fetchone()
+        return row[0]
+        
+    def apply_retention(self, project: Optional[str] = None) -> List[str]:
+        """
+        执行保留策略: 项目内按数量与时间淘汰, 全局超出容量时按最近使用时间淘汰
+        
+        Args:
+            project: 只检查指定项目的数量/时间策略, None 表示全部项目
+            
+        Returns:
+            List[str]: 删除的产物ID
+        """
+        expired: List[str] = []
+        now = time.time()
+        with self.lock:
+            if project is None:
+                projects = [p for (p,) in self.conn.execute("SELECT DISTINCT project FROM artifacts")]
+            else:
+                projects = [project]
+            for name in projects:
+                policy = self.retention.get(name, {})
+                max_count = policy.get('max_count', self.max_count)
+                max_age = policy.get('max_age', self.max_age)
+                rows = self.conn.execute(
+                    "SELECT id, created FROM artifacts WHERE project = ? AND status = 'ready' "
+                    "ORDER BY created DESC",
+                    (name,)
+                ).fetchall()
+                for index, (artifact_id, created) in enumerate(rows):
+                    if (max_count and index >= max_count) or (max_age and now - created > max_age):
+                        expired.append(artifact_id)
+                        
+        for artifact_id in expired:
+            self.delete(artifact_id)
+            
+        # 全局容量
+        total = self.total_size()
+        if total > self.max_bytes:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id FROM artifacts WHERE status = 'ready' ORDER BY last_used"
+                ).fetchall()
+            for (artifact_id,) in rows:
+                if total <= self.max_bytes:
+                    break
+                self.delete(artifact_id)
+                expired.append(artifact_id)
+                total = self.total_size()
+                
+        if expired:
+            logger.info(f"产物保留策略删除 {len(expired)} 个产物")
+        return expired
+        
+    def _delete_worker(self) -> None:
+        """后台删除不再被引用的文件内容与分块, 空闲时定期执行保留策略 (按时间过期)"""
+        last_retention = time.time()
+        while True:
+            try:
+                digest = self._deletions.get(timeout=60)
+            except Empty:
+                if time.time() - last_retention >= self.retention_interval:
+                    last_retention = time.time()
+                    try:
+                        self.apply_retention()
+                    except Exception as e:
+                        logger.warning(f"执行保留策略失败: {str(e)}")
+                continue
+            try:
+                # 检查引用与删除在同一把锁内, 与 put 写索引互斥
+                with self.lock:
+                    referenced = self.conn.execute(
+                        "SELECT 1 FROM artifact_files WHERE hash = ? LIMIT 1",
+                        (digest,)
+                    ).fetchone()
+                    if not referenced:
+                        chunks = {
+                            chunk for (chunk,) in self.conn.execute(
+                                "SELECT chunk_hash FROM file_chunks WHERE file_hash = ?",
+                                (digest,)
+                            )
+                        }
+                        self.conn.execute("DELETE FROM file_chunks WHERE file_hash = ?", (digest,))
+                        self._release_chunks(chunks)
+                        self.conn.commit()
+            except Exception as e:
+                logger.warning(f"删除产物文件失败: {str(e)}")
+            finally:
+                self._deletions.task_done()
+                
+    def _release_chunks(self, chunks: Iterable[str]) -> None:
+        """删除不再被引用且未固定的分块 (调用方持有锁)"""
+        for chunk in chunks:
+            if chunk in self._pinned:
+                continue
+            if self.conn.execute(
+                "SELECT 1 FROM file_chunks WHERE chunk_hash = ? LIMIT 1",
+                (chunk,)
+            ).fetchone():
+                continue
+            self.conn.execute("DELETE FROM chunks WHERE hash = ?", (chunk,))
+            path = self._chunk_path(chunk)
+            if os.path.exists(path):
+                os.remove(path)
+                
+    def wait_deletions(self) -> None:
+        """等待后台删除完成"""
+        self._deletions.join()
+        
+    def close(self) -> None:
+        """关闭索引"""
+        self.wait_deletions()
+        with self.lock:
+            self.conn.close()
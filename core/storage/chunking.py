@@ -0,0 +1,91 @@
+"""
+内容定义分块
+以 Gear 滚动哈希确定分块边界, 文件中间插入或修改数据只影响附近的分块,
+相同内容在不同构建、不同文件之间得到相同的分块
+"""
+import hashlib
+from typing import List, Iterator, BinaryIO
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 分块大小: 最小 4KB, 平均约 20KB, 最大 64KB
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+# 高 14 位全为 0 时切分 (高位依赖更多的字节)
+BOUNDARY_MASK = 0xFFFC0000
+
+READ_SIZE = 4 * 1024 * 1024
+
+# Gear 表: 由固定种子生成, 修改后已有分块将无法复用
+GEAR = [
+    int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=4).digest(), 'little')
+    for i in range(256)
+]
+
+def _candidates(buffer: bytes) -> List[int]:
+    """
+    计算缓冲区内满足边界条件的位置 (分块结束位置, 不含)
+    
+    哈希从缓冲区起点开始计算, 缓冲区总是从分块边界开始,
+    而边界之后 MIN_CHUNK_SIZE 字节内不会切分, 因此结果与读取方式无关
+    """
+    if np is not None:
+        gear = np.array(GEAR, dtype=np.uint32)
+        h = gear[np.frombuffer(buffer, dtype=np.uint8)]
+        # h[i] = sum(G[b[i-k]] << k), 通过倍增在 log2(32) 次向量运算内得到
+        step = 1
+        while step < 32:
+            shifted = h.copy()
+            shifted[step:] = (h[:-step] << np.uint32(step)) + h[step:]
+            h = shifted
+            step *= 2
+        return (np.flatnonzero((h & np.uint32(BOUNDARY_MASK)) == 0) + 1).tolist()
+        
+    positions = []
+    h = 0
+    for i, byte in enumerate(buffer):
+        h = ((h << 1) + GEAR[byte]) & 0xFFFFFFFF
+        if not h & BOUNDARY_MASK:
+            positions.append(i + 1)
+    return positions
+
+def iter_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    """
+    将输入流切分为内容定义的分块
+    
+    Args:
+        stream: 二进制输入流
+        
+    Yields:
+        bytes: 分块数据
+    """
+    buffer = b''
+    eof = False
+    while not eof:
+        data = stream.read(READ_SIZE)
+        eof = not data
+        buffer += data
+        if not buffer:
+            return
+            
+        candidates = _candidates(buffer)
+        index = 0
+        start = 0
+        while True:
+            # 在 [start + MIN, start + MAX] 内取第一个候选位置
+            while index < len(candidates) and candidates[index] < start + MIN_CHUNK_SIZE:
+                index += 1
+            if index < len(candidates) and candidates[index] <= start + MAX_CHUNK_SIZE:
+                end = candidates[index]
+            elif len(buffer) - start >= MAX_CHUNK_SIZE:
+                end = start + MAX_CHUNK_SIZE
+            elif eof and start < len(buffer):
+                end = len(buffer)
+            else:
+                break
+            yield buffer[start:end]
+            start = end
+        buffer = buffer[start:]
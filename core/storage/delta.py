@@ -0,0 +1,225 @@
+"""
+产物差异包
+基于分块存储生成两个产物版本之间的差异: 内容未变的文件只记录引用, 变化的文件
+以复制 (引用旧版本中的区间) / 插入 (新数据) 指令描述, 客户端以已有版本还原新版本
+
+差异包为 zip 文件:
+    delta.json      清单 (每个文件的操作, 内容哈希与权限)
+    files/<路径>    新文件的完整内容
+    patches/<路径>  变化文件的指令流
+"""
+import os
+import json
+import struct
+import hashlib
+import logging
+import zipfile
+from typing import Dict, Any, List, Tuple, BinaryIO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .artifacts import ArtifactStore
+
+logger = logging.getLogger(__name__)
+
+DELTA_FORMAT = 1
+PATCH_MAGIC = b'RBD1'
+
+# 指令: C + 旧文件偏移(8) + 长度(8) 复制旧版本区间; D + 长度(8) + 数据 插入新数据
+OP_COPY = b'C'
+OP_DATA = b'D'
+
+# 新数据超过文件大小的该比例时直接发送完整文件
+PATCH_MAX_RATIO = 0.8
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def plan_patch(
+    base_chunks: List[Tuple[str, int]],
+    target_chunks: List[Tuple[str, int]]
+) -> List[Tuple[bytes, Any, int]]:
+    """
+    以分块为单位计算差异指令
+    
+    Args:
+        base_chunks: 旧版本文件的 (分块哈希, 大小)
+        target_chunks: 新版本文件的 (分块哈希, 大小)
+        
+    Returns:
+        List[Tuple[bytes, Any, int]]: 指令列表, 复制为 (OP_COPY, 旧偏移, 长度),
+        插入为 (OP_DATA, [分块哈希], 长度); 相邻的同类指令已合并
+    """
+    base_offsets: Dict[str, int] = {}
+    offset = 0
+    for digest, size in base_chunks:
+        base_offsets.setdefault(digest, offset)
+        offset += size
+        
+    ops: List[Tuple[bytes, Any, int]] = []
+    for digest, size in target_chunks:
+        if digest in base_offsets:
+            base_offset = base_offsets[digest]
+            if ops and ops[-1][0] == OP_COPY and ops[-1][1] + ops[-1][2] == base_offset:
+                ops[-1] = (OP_COPY, ops[-1][1], ops[-1][2] + size)
+            else:
+                ops.append((OP_COPY, base_offset, size))
+        elif ops and ops[-1][0] == OP_DATA:
+            ops[-1][1].append(digest)
+            ops[-1] = (OP_DATA, ops[-1][1], ops[-1][2] + size)
+        else:
+            ops.append((OP_DATA, [digest], size))
+    return ops
+
+def build_delta(store: 'ArtifactStore', base_id: str, target_id: str, dest_path: str) -> Dict[str, Any]:
+    """
+    生成差异包
+    
+    Args:
+        store: 产物存储
+        base_id: 客户端已有的产物ID
+        target_id: 目标产物ID
+        dest_path: 差异包路径
+        
+    Returns:
+        Dict[str, Any]: 差异包清单
+    """
+    base_files = {entry['path']: entry for entry in store.list_files(base_id)}
+    base_by_hash = {entry['hash']: entry['path'] for entry in base_files.values()}
+    target_files = store.list_files(target_id)
+    manifest: Dict[str, Any] = {
+        'format': DELTA_FORMAT,
+        'base': base_id,
+        'target': target_id,
+        'files': [],
+        'deleted': sorted(set(base_files) - {entry['path'] for entry in target_files})
+    }
+    
+    with zipfile.ZipFile(dest_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for entry in target_files:
+            item = {
+                'path': entry['path'],
+                'hash': entry['hash'],
+                'size': entry['size'],
+                'mode': entry['mode']
+            }
+            manifest['files'].append(item)
+            
+            # 内容相同 (包括改名) 的文件直接引用旧版本
+            if entry['hash'] in base_by_hash:
+                item['op'] = 'keep'
+                item['base_path'] = base_by_hash[entry['hash']]
+                continue
+                
+            target_chunks = store.file_chunks(entry['hash'])
+            base_entry = base_files.get(entry['path'])
+            if base_entry:
+                ops = plan_patch(store.file_chunks(base_entry['hash']), target_chunks)
+                new_bytes = sum(length for op, _, length in ops if op == OP_DATA)
+                if new_bytes <= entry['size'] * PATCH_MAX_RATIO:
+                    item['op'] = 'patch'
+                    item['base_path'] = base_entry['path']
+                    with archive.open(f"patches/{entry['path']}", 'w', force_zip64=True) as dest:
+                        _write_patch(store, ops, dest)
+                    continue
+                    
+            item['op'] = 'new'
+            with archive.open(f"files/{entry['path']}", 'w', force_zip64=True) as dest:
+                for digest, _ in target_chunks:
+                    dest.write(store.read_chunk(digest))
+                    
+        archive.writestr('delta.json', json.dumps(manifest))
+    return manifest
+
+def _write_patch(store: 'ArtifactStore', ops: List[Tuple[bytes, Any, int]], dest: BinaryIO) -> None:
+    """写出指令流"""
+    dest.write(PATCH_MAGIC)
+    for op, arg, length in ops:
+        if op == OP_COPY:
+            dest.write(OP_COPY + struct.pack('>QQ', arg, length))
+        else:
+            dest.write(OP_DATA + struct.pack('>Q', length))
+            for digest in arg:
+                dest.write(store.read_chunk(digest))
+
+def _copy_exact(source: BinaryIO, dest: BinaryIO, length: int, hasher) -> None:
+    """从输入流复制指定长度"""
+    while length > 0:
+        data = source.read(min(COPY_BUFFER_SIZE, length))
+        if not data:
+            raise ValueError("差异数据不完整")
+        dest.write(data)
+        hasher.update(data)
+        length -= len(data)
+
+def apply_delta(package_path: str, base_dir: str, dest_dir: str) -> Dict[str, Any]:
+    """
+    以已有版本和差异包还原新版本 (客户端使用)
+    
+    Args:
+        package_path: 差异包路径
+        base_dir: 已有版本的目录
+        dest_dir: 新版本输出目录, 不能与 base_dir 相同
+        
+    Returns:
+        Dict[str, Any]: 差异包清单
+        
+    Raises:
+        ValueError: 差异包格式错误或还原结果与期望哈希不一致
+    """
+    if os.path.abspath(base_dir) == os.path.abspath(dest_dir):
+        raise ValueError("输出目录不能与已有版本目录相同")
+        
+    with zipfile.ZipFile(package_path) as archive:
+        manifest = json.loads(archive.read('delta.json'))
+        if manifest.get('format') != DELTA_FORMAT:
+            raise ValueError(f"不支持的差异包格式: {manifest.get('format')}")
+            
+        for item in manifest['files']:
+            dest = _safe_join(dest_dir, item['path'])
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            hasher = hashlib.sha256()
+            with open(dest, 'wb') as out:
+                if item['op'] == 'keep':
+                    with open(_safe_join(base_dir, item['base_path']), 'rb') as source:
+                        _copy_exact(source, out, item['size'], hasher)
+                elif item['op'] == 'new':
+                    with archive.open(f"files/{item['path']}") as source:
+                        _copy_exact(source, out, item['size'], hasher)
+                else:
+                    base_path = _safe_join(base_dir, item['base_path'])
+                    with archive.open(f"patches/{item['path']}") as patch, open(base_path, 'rb') as base:
+                        _apply_patch(patch, base, out, hasher)
+            if hasher.hexdigest() != item['hash']:
+                raise ValueError(f"还原结果校验失败: {item['path']}")
+            os.chmod(dest, item['mode'] & 0o777)
+    return manifest
+
+def _safe_join(root: str, path: str) -> str:
+    """
+    拼接差异包中的相对路径, 拒绝绝对路径和越出目录的路径
+    
+    Raises:
+        ValueError: 路径不合法
+    """
+    parts = path.split('/')
+    if not path or path.startswith('/') or '\\' in path or any(part in ('', '.', '..') for part in parts):
+        raise ValueError(f"非法路径: {path}")
+    target = os.path.realpath(os.path.join(root, *parts))
+    base = os.path.realpath(root)
+    if not target.startswith(base + os.sep):
+        raise ValueError(f"非法路径: {path}")
+    return target
+
+def _apply_patch(patch: BinaryIO, base: BinaryIO, out: BinaryIO, hasher) -> None:
+    """执行指令流"""
+    if patch.read(len(PATCH_MAGIC)) != PATCH_MAGIC:
+        raise ValueError("差异数据格式错误")
+    while op := patch.read(1):
+        if op == OP_COPY:
+            offset, length = struct.unpack('>QQ', patch.read(16))
+            base.seek(offset)
+            _copy_exact(base, out, length, hasher)
+        elif op == OP_DATA:
+            (length,) = struct.unpack('>Q', patch.read(8))
+            _copy_exact(patch, out, length, hasher)
+        else:
+            raise ValueError("差异数据格式错误")
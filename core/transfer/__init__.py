@@ -0,0 +1,59 @@
+"""
+传输模块
+"""
+from .ignore import IgnoreMatcher, DEFAULT_IGNORE_PATTERNS
+from .manifest import (
+    FileEntry,
+    scan_workspace,
+    hash_manifest,
+    tree_hash,
+    fetch_remote_manifest,
+    fetch_remote_stats,
+    diff_manifests,
+    plan_directories
+)
+from .verify import hash_file, hash_files, verify_files, fetch_remote_hashes
+from .bandwidth import TokenBucket, BandwidthFlow, BandwidthManager
+from .receive import RemoteReceiver
+from .resume import ResumableTransfer, TransferCheckpoint, DEFAULT_CHECKPOINT_DIR
+from .upload import TransferStats, ParallelUploader
+from .download import ParallelDownloader
+from .archive import ArchiveUploader, ArchiveDownloader, choose_transfer_mode
+from .hashcache import FileHashCache
+from .delta import DeltaUploader
+from .blobstore import RemoteBlobStore
+from .sync import WarmWorkspace
+
+__all__ = [
+    'IgnoreMatcher',
+    'DEFAULT_IGNORE_PATTERNS',
+    'FileEntry',
+    'scan_workspace',
+    'hash_manifest',
+    'tree_hash',
+    'fetch_remote_manifest',
+    'fetch_remote_stats',
+    'diff_manifests',
+    'plan_directories',
+    'hash_file',
+    'hash_files',
+    'verify_files',
+    'fetch_remote_hashes',
+    'TokenBucket',
+    'BandwidthFlow',
+    'BandwidthManager',
+    'RemoteReceiver',
+    'ResumableTransfer',
+    'TransferCheckpoint',
+    'DEFAULT_CHECKPOINT_DIR',
+    'TransferStats',
+    'ParallelUploader',
+    'ParallelDownloader',
+    'ArchiveUploader',
+    'ArchiveDownloader',
+    'choose_transfer_mode',
+    'FileHashCache',
+    'DeltaUploader',
+    'RemoteBlobStore',
+    'WarmWorkspace'
+]
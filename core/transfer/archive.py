@@ -0,0 +1,473 @@
+"""
+压缩归档传输
+上传: 将工作目录打包为 tar 流, 压缩后经单个命令通道的 stdin 发送, 远程边接收边解包
+下载: 远程边打包边压缩输出目录, 本地边接收边解压写入磁盘
+"""
+import os
+import re
+import gzip
+import json
+import time
+import logging
+import tarfile
+from typing import Dict, Any, List, Optional, Callable
+from ..server import BaseServer
+from .manifest import FileEntry, fetch_remote_manifest
+from .bandwidth import BandwidthFlow, ThrottledWriter
+from .verify import REMOTE_HASH_HELPERS, resolve_algorithm, new_hasher
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 远程解包脚本: 从 stdin 读取压缩 tar 流并解包到目标目录
+# 指定校验算法时边写文件边计算哈希, 完成后输出 {"algorithm", "files": {路径: 哈希}}, 不需要再次读取文件
+# 成员路径及链接目标必须位于目标目录内, 否则中止解包
+REMOTE_EXTRACT_SCRIPT = REMOTE_HASH_HELPERS + '''
+import json, sys, tarfile
+root, compression = sys.argv[1], sys.argv[2]
+algorithm = resolve_algorithm(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3] else ""
+verify = bool(algorithm)
+os.makedirs(root, exist_ok=True)
+root = os.path.realpath(root)
+def inside(path):
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root + os.sep)
+def check(member):
+    path = os.path.join(root, member.name)
+    if os.path.isabs(member.name) or not inside(path):
+        raise ValueError("invalid member: " + member.name)
+    if member.issym() and not inside(os.path.join(os.path.dirname(path), member.linkname)):
+        raise ValueError("invalid link: " + member.name)
+    if member.islnk() and not inside(os.path.join(root, member.linkname)):
+        raise ValueError("invalid link: " + member.name)
+    return path
+stream = sys.stdin.buffer
+if compression == "zstd":
+    try:
+        import zstandard
+        stream = zstandard.ZstdDecompressor().stream_reader(stream)
+    except ImportError:
+        import subprocess
+        proc = subprocess.Popen(["zstd", "-dc"], stdin=stream, stdout=subprocess.PIPE)
+        stream = proc.stdout
+    mode = "r|"
+else:
+    mode = "r|gz"
+hashes = {}
+with tarfile.open(fileobj=stream, mode=mode) as archive:
+    if hasattr(tarfile, "data_filter"):
+        archive.extraction_filter = tarfile.data_filter
+    for member in archive:
+        path = check(member)
+        if not (verify and member.isfile()):
+            archive.extract(member, root)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        hasher = new_hasher(algorithm)
+        source = archive.extractfile(member)
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: source.read(1048576), b""):
+                hasher.update(chunk)
+                f.write(chunk)
+        os.chmod(path, member.mode & 0o777)
+        os.utime(path, (member.mtime, member.mtime))
+        hashes[member.name] = hasher.hexdigest()
+sys.stdout.write(json.dumps({"algorithm": algorithm, "files": hashes}))
+'''
+
+# 远程打包脚本: 将目录打包为 tar 流并压缩输出到 stdout
+# 首字节标记实际使用的压缩方式 (Z: zstd, G: gzip), 远程无 zstd 时回退为 gzip
+# 级别为 auto 时按链路带宽与本机空闲 CPU 选择: 压缩速度刚好不低于链路速度的最高级别
+REMOTE_PACK_SCRIPT = '''
+import os, shutil, subprocess, sys, tarfile
+root, compression, level, threads, bandwidth = sys.argv[1:6]
+out = sys.stdout.buffer
+threads = int(threads) or os.cpu_count() or 1
+if level == "auto":
+    # 各级别单线程压缩速度(字节/秒)的保守估计
+    speeds = [(19, 2e6), (15, 1e7), (9, 4e7), (6, 8e7), (3, 2e8), (1, 3.5e8)]
+    try:
+        idle = max(threads - os.getloadavg()[0], 1.0)
+    except (AttributeError, OSError):
+        idle = threads
+    bandwidth = float(bandwidth)
+    level = 3
+    if bandwidth > 0:
+        level = next((lv for lv, speed in speeds if speed * idle >= bandwidth), 1)
+level = int(level)
+proc = None
+if compression == "zstd":
+    try:
+        import zstandard
+        out.write(b"Z")
+        stream = zstandard.ZstdCompressor(level=level, threads=threads).stream_writer(out)
+    except ImportError:
+        if shutil.which("zstd"):
+            out.write(b"Z")
+            out.flush()
+            proc = subprocess.Popen(["zstd", "-q", "-c", "-T%d" % threads, "-%d" % level], stdin=subprocess.PIPE, stdout=out)
+            stream = proc.stdin
+        else:
+            compression = "gzip"
+if compression != "zstd":
+    import gzip
+    out.write(b"G")
+    stream = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=min(max(level, 1), 9))
+with tarfile.open(fileobj=stream, mode="w|") as archive:
+    for name in sorted(os.listdir(root)):
+        archive.add(os.path.join(root, name), arcname=name)
+stream.close()
+if proc is not None and proc.wait() != 0:
+    sys.exit(1)
+sys.stderr.write("level=%d" % level)
+'''
+
+# 自动模式下切换为归档上传的阈值
+ARCHIVE_MIN_FILES = 200
+ARCHIVE_MAX_AVG_SIZE = 128 * 1024
+
+def choose_transfer_mode(
+    entries: List[FileEntry],
+    config: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    选择上传方式
+    
+    Args:
+        entries: 待上传文件
+        config: 传输配置 (task.config['transfer'])
+        
+    Returns:
+        str: 'archive' 或 'sftp'
+    """
+    mode = (config or {}).get('mode', 'auto')
+    if mode != 'auto':
+        return mode
+        
+    # 大量小文件时 SFTP 逐个打开/关闭的开销占主导
+    if len(entries) < ARCHIVE_MIN_FILES:
+        return 'sftp'
+    average_size = sum(entry.size for entry in entries) / len(entries)
+    return 'archive' if average_size <= ARCHIVE_MAX_AVG_SIZE else 'sftp'
+
+class ArchiveUploader:
+    """归档上传器"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        compression: str = 'gzip',
+        level: Optional[int] = None,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        flow: Optional[BandwidthFlow] = None,
+        verify: bool = True
+    ):
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("未安装 zstandard, 使用 gzip 压缩")
+            compression = 'gzip'
+        self.server = server
+        self.compression = compression
+        self.level = level if level is not None else (3 if compression == 'zstd' else 6)
+        self.progress_callback = progress_callback
+        self.flow = flow
+        self.verify = verify
+        self.error: Optional[str] = None
+        self.sent_bytes = 0
+        
+    def upload(self, entries: List[FileEntry], remote_root: str) -> bool:
+        """
+        以单个压缩流上传文件
+        
+        Args:
+            entries: 待上传文件
+            remote_root: 远程目录
+            
+        Returns:
+            bool: 是否上传成功
+        """
+        try:
+            channel = self.server.open_channel(
+                self.server.python_command(
+                    REMOTE_EXTRACT_SCRIPT,
+                    remote_root,
+                    self.compression,
+                    self._algorithm(entries) if self.verify else ""
+                )
+            )
+        except Exception as e:
+            self.error = f"打开传输通道失败: {str(e)}"
+            logger.error(self.error)
+            return False
+            
+        try:
+            stdin = channel.makefile_stdin('wb')
+            # 限速作用于压缩后的数据, 即实际占用的带宽
+            compressor = self._open_compressor(ThrottledWriter(stdin, self.flow))
+            done_bytes = 0
+            with tarfile.open(fileobj=compressor, mode='w|') as archive:
+                for entry in entries:
+                    archive.add(entry.local_path, arcname=entry.path, recursive=False)
+                    done_bytes += entry.size
+                    if self.progress_callback:
+                        self.progress_callback(done_bytes)
+            compressor.close()
+            stdin.close()
+            channel.shutdown_write()
+            
+            # 先读完输出 (校验清单) 再等待退出, 避免远程阻塞在写 stdout 上
+            stdout = channel.makefile('rb').read()
+            exit_status = channel.recv_exit_status()
+            if exit_status != 0:
+                stderr = channel.makefile_stderr('rb').read().decode('utf-8', errors='replace')
+                self.error = f"远程解包失败: {stderr.strip()}"
+                logger.error(self.error)
+                return False
+                
+            if self.verify:
+                # 与本地清单中已有的哈希比较, 本地文件不需要再次读取
+                result = json.loads(stdout or b'{}')
+                remote_hashes = result.get('files', {})
+                mismatched = [
+                    entry.path for entry in entries
+                    if entry.hash and entry.algorithm == result.get('algorithm')
+                    and remote_hashes.get(entry.path) != entry.hash
+                ]
+                if mismatched:
+                    self.error = f"上传校验失败: {', '.join(mismatched[:5])}"
+                    logger.error(self.error)
+                    return False
+                    
+            self.sent_bytes = done_bytes
+            return True
+            
+        except Exception as e:
+            self.error = f"归档上传失败: {str(e)}"
+            logger.error(self.error)
+            return False
+            
+        finally:
+            channel.close()
+            
+    @staticmethod
+    def _algorithm(entries: List[FileEntry]) -> str:
+        """本地清单使用的哈希算法"""
+        return next((entry.algorithm for entry in entries if entry.hash), 'sha256')
+        
+    def _open_compressor(self, stream):
+        """在输出流上包装压缩器"""
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).stream_writer(
+                stream,
+                closefd=False
+            )
+        return gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=self.level)
+
+class _CountingReader:
+    """统计已读取字节数的输入流包装"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+        
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+        
+class ArchiveDownloader:
+    """归档下载器"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        compression: str = 'zstd',
+        level: Any = 'auto',
+        threads: int = 0,
+        bandwidth: float = 0.0,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        verify_hash: Optional[str] = 'sha256'
+    ):
+        """
+        Args:
+            server: 远程服务器
+            compression: 压缩方式 (zstd / gzip)
+            level: 压缩级别, auto 表示由远程按链路带宽与 CPU 选择
+            threads: 远程压缩线程数, 0 表示使用全部核心
+            bandwidth: 测得的链路带宽(字节/秒), 0 表示未知
+            progress_callback: 进度回调, 参数为 (已接收压缩字节数, 已解出字节数)
+            verify_hash: 校验算法 (sha256 / blake2b / xxh3), None 表示不校验;
+                下载前列出远程文件哈希, 解包时边写入边计算哈希并比较
+        """
+        # 本地无法解压 zstd 时要求远程使用 gzip
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("未安装 zstandard, 使用 gzip 压缩")
+            compression = 'gzip'
+        self.server = server
+        self.compression = compression
+        self.level = level
+        self.threads = threads
+        self.bandwidth = bandwidth
+        self.progress_callback = progress_callback
+        self.verify_hash = resolve_algorithm(verify_hash) if verify_hash else None
+        self.error: Optional[str] = None
+        self.received_bytes = 0
+        self.extracted_bytes = 0
+        self.files = 0
+        self.used_level: Optional[int] = None
+        self.elapsed = 0.0
+        
+    def download(self, remote_root: str, local_root: str) -> bool:
+        """
+        以单个压缩流下载远程目录, 边接收边解压到本地
+        
+        Args:
+            remote_root: 远程目录
+            local_root: 本地目录
+            
+        Returns:
+            bool: 是否下载成功
+        """
+        start_time = time.time()
+        expected: Dict[str, str] = {}
+        algorithm = 'sha256'
+        if self.verify_hash:
+            # 期望哈希来自传输前的远程清单, 不依赖发送方在传输过程中生成的数据
+            manifest = fetch_remote_manifest(self.server, remote_root, algorithm=self.verify_hash)
+            if not manifest:
+                self.error = f"远程目录为空或不存在: {remote_root}"
+                logger.error(self.error)
+                return False
+            expected = {path: entry.hash for path, entry in manifest.items()}
+            algorithm = next(iter(manifest.values())).algorithm
+            
+        try:
+            channel = self.server.open_channel(
+                self.server.python_command(
+                    REMOTE_PACK_SCRIPT,
+                    remote_root,
+                    self.compression,
+                    str(self.level),
+                    str(self.threads),
+                    str(int(self.bandwidth))
+                )
+            )
+        except Exception as e:
+            self.error = f"打开传输通道失败: {str(e)}"
+            logger.error(self.error)
+            return False
+            
+        try:
+            raw = _CountingReader(channel.makefile('rb'))
+            marker = raw.read(1)
+            if marker == b'Z':
+                stream = zstandard.ZstdDecompressor().stream_reader(raw)
+            elif marker == b'G':
+                stream = gzip.GzipFile(fileobj=raw, mode='rb')
+            else:
+                stderr = channel.makefile_stderr('rb').read().decode('utf-8', errors='replace')
+                self.error = f"远程打包失败: {stderr.strip()}"
+                logger.error(self.error)
+                return False
+                
+            os.makedirs(local_root, exist_ok=True)
+            actual: Dict[str, str] = {}
+            with tarfile.open(fileobj=stream, mode='r|') as archive:
+                for member in archive:
+                    if expected and member.isfile():
+                        actual[member.name] = self._extract_file(archive, member, local_root, algorithm)
+                    else:
+                        self._extract(archive, member, local_root)
+                    if member.isfile():
+                        self.files += 1
+                        self.extracted_bytes += member.size
+                    if self.progress_callback:
+                        self.progress_callback(raw.count, self.extracted_bytes)
+                        
+            exit_status = channel.recv_exit_status()
+            stderr = channel.makefile_stderr('rb').read().decode('utf-8', errors='replace')
+            if exit_status != 0:
+                self.error = f"远程打包失败: {stderr.strip()}"
+                logger.error(self.error)
+                return False
+                
+            mismatched = sorted(path for path, digest in expected.items() if actual.get(path) != digest)
+            if mismatched:
+                self.error = f"下载校验失败: {', '.join(mismatched[:5])}"
+                logger.error(self.error)
+                return False
+                
+            if match := re.search(r'level=(\d+)', stderr):
+                self.used_level = int(match.group(1))
+            self.received_bytes = raw.count
+            self.elapsed = max(time.time() - start_time, 1e-6)
+            logger.info(
+                f"压缩下载完成: {self.files} 个文件, {self.extracted_bytes} 字节, "
+                f"传输 {self.received_bytes} 字节 ({'zstd' if marker == b'Z' else 'gzip'}"
+                f" 级别 {self.used_level})"
+            )
+            return True
+            
+        except Exception as e:
+            self.error = f"归档下载失败: {str(e)}"
+            logger.error(self.error)
+            return False
+            
+        finally:
+            channel.close()
+            
+    @staticmethod
+    def _extract_file(
+        archive: tarfile.TarFile,
+        member: tarfile.TarInfo,
+        local_root: str,
+        algorithm: str
+    ) -> str:
+        """
+        解出普通文件, 写入时计算哈希, 拒绝越出目标目录的路径
+        
+        Returns:
+            str: 文件哈希
+        """
+        if hasattr(tarfile, 'data_filter'):
+            member = tarfile.data_filter(member, local_root)
+            target = os.path.join(local_root, member.name)
+        else:
+            root = os.path.realpath(local_root) + os.sep
+            target = os.path.realpath(os.path.join(local_root, member.name))
+            if not target.startswith(root):
+                raise ValueError(f"非法路径: {member.name}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 不跟随已有的同名链接写入
+        if os.path.islink(target):
+            os.remove(target)
+            
+        hasher = new_hasher(algorithm)
+        source = archive.extractfile(member)
+        with open(target, 'wb') as f:
+            while chunk := source.read(1024 * 1024):
+                hasher.update(chunk)
+                f.write(chunk)
+        os.chmod(target, member.mode & 0o777)
+        os.utime(target, (member.mtime, member.mtime))
+        return hasher.hexdigest()
+        
+    @staticmethod
+    def _extract(archive: tarfile.TarFile, member: tarfile.TarInfo, local_root: str) -> None:
+        """解出单个成员, 拒绝越出目标目录的路径"""
+        if hasattr(tarfile, 'data_filter'):
+            archive.extract(member, local_root, filter='data')
+            return
+        root = os.path.realpath(local_root) + os.sep
+        target = os.path.realpath(os.path.join(local_root, member.name))
+        if not target.startswith(root):
+            raise ValueError(f"非法路径: {member.name}")
+        # 链接 (如 macOS 的 framework) 只能指向目标目录内部
+        if member.issym() or member.islnk():
+            base = os.path.dirname(target) if member.issym() else os.path.realpath(local_root)
+            if not os.path.realpath(os.path.join(base, member.linkname)).startswith(root):
+                raise ValueError(f"非法链接: {member.name}")
+        archive.extract(member, local_root)
@@ -0,0 +1,254 @@
+"""
+上传带宽调度
+按任务/服务器令牌桶限速, 并在全局上限内对所有进行中的传输做加权公平分配
+"""
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """令牌桶 (允许透支, 透支部分通过等待偿还)"""
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1024 * 1024)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        
+    def consume(self, nbytes: int) -> None:
+        """
+        消耗令牌, 不足时阻塞等待
+        
+        Args:
+            nbytes: 字节数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+class BandwidthFlow:
+    """单个任务的传输流"""
+    
+    def __init__(
+        self,
+        manager: 'BandwidthManager',
+        flow_id: str,
+        server_key: str,
+        weight: float = 1.0,
+        rate: Optional[float] = None
+    ):
+        self.manager = manager
+        self.flow_id = flow_id
+        self.server_key = server_key
+        self.weight = max(weight, 0.01)
+        self.bucket = TokenBucket(rate) if rate else None
+        self.virtual_time = 0.0
+        self.transferred = 0
+        
+    def consume(self, nbytes: int) -> None:
+        """传输 nbytes 前调用, 按限速与公平份额阻塞"""
+        self.manager.consume(self, nbytes)
+
+# 按实测链路带宽整形时预留的余量, 避免把链路限制在实测值以下
+LINK_HEADROOM = 1.2
+
+class _FairGate:
+    """共享同一令牌桶的传输按虚拟时间依次放行"""
+    
+    def __init__(self):
+        self.waiting: Dict[int, Tuple[float, int]] = {}
+        self.granting = False
+        
+    def first(self) -> Optional[Tuple[float, int]]:
+        """排在最前的等待者, 无等待者时为 None"""
+        return min(self.waiting.values(), default=None)
+
+class BandwidthManager:
+    """带宽管理器"""
+    
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        server_rates: Optional[Dict[str, float]] = None
+    ):
+        """
+        Args:
+            global_rate: 全局上限(字节/秒), None 表示不限
+            server_rates: 各服务器上限(字节/秒)
+        """
+        self.global_bucket = TokenBucket(global_rate) if global_rate else None
+        self.server_buckets: Dict[str, TokenBucket] = {
+            key: TokenBucket(rate) for key, rate in (server_rates or {}).items()
+        }
+        self.link_buckets: Dict[str, TokenBucket] = {}
+        self.flows: Dict[str, BandwidthFlow] = {}
+        self.cond = threading.Condition()
+        self._gates: Dict[str, _FairGate] = {}
+        self._flow_waiters: Dict[str, int] = {}
+        self._next_ticket = 0
+        
+    def register(
+        self,
+        flow_id: str,
+        server_key: str,
+        weight: float = 1.0,
+        rate: Optional[float] = None,
+        server_rate: Optional[float] = None
+    ) -> BandwidthFlow:
+        """
+        登记一个传输流
+        
+        Args:
+            flow_id: 流标识 (任务ID)
+            server_key: 目标服务器
+            weight: 公平分配权重
+            rate: 该流自身上限(字节/秒)
+            server_rate: 服务器上限(字节/秒), 仅在首次登记该服务器时生效
+            
+        Returns:
+            BandwidthFlow: 传输流
+        """
+        flow = BandwidthFlow(self, flow_id, server_key, weight, rate)
+        with self.cond:
+            if server_rate and server_key not in self.server_buckets:
+                self.server_buckets[server_key] = TokenBucket(server_rate)
+            # 新流从当前最小虚拟时间开始, 既不透支也不积攒历史份额
+            if self.flows:
+                flow.virtual_time = min(f.virtual_time for f in self.flows.values())
+            self.flows[flow_id] = flow
+        return flow
+        
+    def unregister(self, flow: BandwidthFlow) -> None:
+        """注销传输流, 仍在等待的线程各自移除自己的排队项"""
+        with self.cond:
+            self.flows.pop(flow.flow_id, None)
+            self.cond.notify_all()
+            
+    def set_link_rate(self, server_key: str, rate: float) -> None:
+        """
+        更新服务器的实测链路带宽
+        
+        未配置服务器上限时, 同一服务器上有多个流就按此带宽 (加余量) 公平分配,
+        小任务不会排在大任务之后
+        """
+        rate *= LINK_HEADROOM
+        with self.cond:
+            if bucket := self.link_buckets.get(server_key):
+                with bucket.lock:
+                    bucket.rate = rate
+                    bucket.burst = max(rate, 1024 * 1024)
+            else:
+                self.link_buckets[server_key] = TokenBucket(rate)
+                
+    def active_flows(self, server_key: str) -> int:
+        """服务器上登记的传输流数"""
+        with self.cond:
+            return sum(1 for f in self.flows.values() if f.server_key == server_key)
+            
+    def _shared_buckets(self, flow: BandwidthFlow) -> List[Tuple[str, TokenBucket]]:
+        """流需要公平竞争的共享令牌桶 (服务器/链路, 全局)"""
+        buckets = []
+        if server_bucket := self.server_buckets.get(flow.server_key):
+            buckets.append((flow.server_key, server_bucket))
+        elif (link_bucket := self.link_buckets.get(flow.server_key)) and sum(
+            1 for f in self.flows.values() if f.server_key == flow.server_key
+        ) > 1:
+            buckets.append((flow.server_key, link_bucket))
+        if self.global_bucket:
+            buckets.append(('*', self.global_bucket))
+        return buckets
+        
+    def consume(self, flow: BandwidthFlow, nbytes: int) -> None:
+        """
+        按任务限速、服务器限速和全局加权公平份额申请带宽
+        
+        每次申请在进入时按流的虚拟时间 (已申请字节 / 权重) 排队, 同一流的多个线程
+        依次占用后续的虚拟时间; 每个共享令牌桶只放行排在最前的申请,
+        大任务无法挤占小任务的份额, 空闲份额由其他流使用
+        """
+        if flow.bucket:
+            flow.bucket.consume(nbytes)
+            
+        with self.cond:
+            self._next_ticket += 1
+            ticket = self._next_ticket
+            order = (flow.virtual_time, ticket)
+            flow.virtual_time += nbytes / flow.weight
+            buckets = self._shared_buckets(flow)
+            
+        for key, bucket in buckets:
+            self._acquire(key, bucket, flow, ticket, order, nbytes)
+            
+        with self.cond:
+            flow.transferred += nbytes
+            
+    def _acquire(
+        self,
+        key: str,
+        bucket: TokenBucket,
+        flow: BandwidthFlow,
+        ticket: int,
+        order: Tuple[float, int],
+        nbytes: int
+    ) -> None:
+        """在共享令牌桶前排队, 轮到时消耗令牌"""
+        with self.cond:
+            gate = self._gates.setdefault(key, _FairGate())
+            gate.waiting[ticket] = order
+            self._flow_waiters[flow.flow_id] = self._flow_waiters.get(flow.flow_id, 0) + 1
+            try:
+                while gate.granting or (gate.first() or order) < order:
+                    self.cond.wait(0.1)
+                gate.granting = True
+            finally:
+                del gate.waiting[ticket]
+                self._flow_waiters[flow.flow_id] -= 1
+                if not self._flow_waiters[flow.flow_id]:
+                    del self._flow_waiters[flow.flow_id]
+        try:
+            bucket.consume(nbytes)
+        finally:
+            with self.cond:
+                gate.granting = False
+                self.cond.notify_all()
+                
+    def get_status(self) -> Dict[str, Dict[str, float]]:
+        """获取各传输流状态"""
+        with self.cond:
+            return {
+                flow_id: {
+                    'server': flow.server_key,
+                    'weight': flow.weight,
+                    'transferred': flow.transferred,
+                    'waiting': self._flow_waiters.get(flow_id, 0)
+                }
+                for flow_id, flow in self.flows.items()
+            }
+
+class ThrottledWriter:
+    """按带宽流限速的写入包装"""
+    
+    def __init__(self, stream: BinaryIO, flow: Optional[BandwidthFlow]):
+        self.stream = stream
+        self.flow = flow
+        
+    def write(self, data: bytes) -> int:
+        if self.flow:
+            self.flow.consume(len(data))
+        self.stream.write(data)
+        return len(data)
+        
+    def flush(self) -> None:
+        self.stream.flush()
+        
+    def close(self) -> None:
+        self.stream.close()
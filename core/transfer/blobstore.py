@@ -0,0 +1,344 @@
+"""
+远程内容寻址存储
+每台打包服务器按文件哈希保存一份内容, 跨任务/项目/分支共享,
+任务工作目录优先通过 reflink 生成独立副本, 不支持时使用硬链接 (存储中的内容只读), 再不支持时复制;
+可执行文件硬链接到同一内容带执行权限的只读副本, 与普通文件分开
+"""
+import json
+import logging
+from typing import Dict, List, Tuple, Optional, Callable
+from ..server import BaseServer
+from .manifest import FileEntry
+from .upload import ParallelUploader, TransferStats
+from .bandwidth import BandwidthFlow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOB_ROOT = '/tmp/remotebuilder_blobs'
+DEFAULT_BLOB_MAX_BYTES = 20 * 1024 * 1024 * 1024  # 20GB
+
+# 查询缺失的内容: stdin 为哈希列表, 输出缺失的哈希
+REMOTE_MISSING_SCRIPT = '''
+import json, os, sys
+root = sys.argv[1]
+hashes = json.loads(sys.stdin.buffer.read())
+missing = [h for h in hashes if not os.path.isfile(os.path.join(root, h[:2], h))]
+sys.stdout.write(json.dumps(missing))
+'''
+
+# 存储锁: 生成工作目录时持有共享锁, 回收时持有排他锁 (不支持 fcntl 的平台不加锁,
+# 由生成脚本报告已被回收的内容); 最近使用记录写入 usage 目录, 不修改内容文件的时间
+REMOTE_STORE_HELPERS = '''
+import json, os, sys
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+def lock_store(root, exclusive):
+    os.makedirs(root, exist_ok=True)
+    handle = open(os.path.join(root, ".lock"), "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+        except OSError:
+            handle.close()
+            return None
+    return handle
+'''
+
+# 入库并生成工作目录: 校验 incoming 中的新内容后以只读方式移入存储, 再按清单生成工作目录文件
+# reflink 和复制得到的是独立副本, 设置为清单中的权限; 硬链接与存储共享 inode (只读, 打包过程
+# 不能原地修改), 可执行文件链接到 <哈希>.x 副本以保留执行权限
+# 输出中的 vanished 为已被回收的内容哈希, 需重新上传
+REMOTE_MATERIALIZE_SCRIPT = REMOTE_STORE_HELPERS + '''
+import hashlib, shutil
+FICLONE = 0x40049409
+root, workspace, batch = sys.argv[1], sys.argv[2], sys.argv[3]
+files = json.loads(sys.stdin.buffer.read())
+lock = lock_store(root, False)
+incoming = os.path.join(root, "incoming", batch)
+if os.path.isdir(incoming):
+    for name in os.listdir(incoming):
+        path = os.path.join(incoming, name)
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1048576), b""):
+                hasher.update(chunk)
+        if hasher.hexdigest() != name:
+            os.remove(path)
+            continue
+        os.chmod(path, 0o444)
+        os.makedirs(os.path.join(root, name[:2]), exist_ok=True)
+        os.replace(path, os.path.join(root, name[:2], name))
+    os.rmdir(incoming)
+reflink = fcntl is not None and sys.platform.startswith("linux")
+def clone(blob, dest):
+    global reflink
+    try:
+        with open(blob, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        # 文件系统不支持时不再尝试
+        reflink = False
+        if os.path.lexists(dest):
+            os.remove(dest)
+        return False
+def executable(blob):
+    path = blob + ".x"
+    if not os.path.isfile(path):
+        tmp_path = path + ".rb-tmp-" + batch
+        shutil.copyfile(blob, tmp_path)
+        os.chmod(tmp_path, 0o555)
+        os.replace(tmp_path, path)
+    return path
+cloned = linked = copied = 0
+errors = []
+vanished = set()
+used = set()
+for rel, (digest, mode) in files.items():
+    blob = os.path.join(root, digest[:2], digest)
+    dest = os.path.join(workspace, rel)
+    if not os.path.isfile(blob):
+        vanished.add(digest)
+        continue
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        if os.path.lexists(dest):
+            os.remove(dest)
+        used.add(digest)
+        if reflink and clone(blob, dest):
+            os.chmod(dest, mode)
+            cloned += 1
+        else:
+            try:
+                if mode & 0o111:
+                    os.link(executable(blob), dest)
+                    used.add(digest + ".x")
+                else:
+                    os.link(blob, dest)
+                linked += 1
+            except OSError:
+                shutil.copyfile(blob, dest)
+                os.chmod(dest, mode)
+                copied += 1
+    except OSError as e:
+        errors.append(rel + ": " + str(e))
+os.makedirs(os.path.join(root, "usage"), exist_ok=True)
+with open(os.path.join(root, "usage", batch + ".json"), "w") as f:
+    json.dump(sorted(used), f)
+sys.stdout.write(json.dumps({
+    "cloned": cloned,
+    "linked": linked,
+    "copied": copied,
+    "errors": errors,
+    "vanished": sorted(vanished)
+}))
+'''
+
+# 垃圾回收: 合并最近使用记录, 总大小超过上限时按最近使用时间淘汰; 有任务正在生成工作目录时跳过
+REMOTE_GC_SCRIPT = REMOTE_STORE_HELPERS + '''
+root, max_bytes = sys.argv[1], int(sys.argv[2])
+lock = lock_store(root, True)
+if lock is None:
+    sys.stdout.write(json.dumps({"total": 0, "removed": 0, "freed": 0, "busy": True}))
+    sys.exit(0)
+index_path = os.path.join(root, "usage.json")
+try:
+    with open(index_path) as f:
+        last_used = json.load(f)
+except (OSError, ValueError):
+    last_used = {}
+usage_dir = os.path.join(root, "usage")
+for name in os.listdir(usage_dir) if os.path.isdir(usage_dir) else []:
+    path = os.path.join(usage_dir, name)
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path) as f:
+            for digest in json.load(f):
+                last_used[digest] = max(last_used.get(digest, 0), mtime)
+    except (OSError, ValueError):
+        pass
+    os.remove(path)
+blobs = []
+total = 0
+for prefix in os.listdir(root):
+    directory = os.path.join(root, prefix)
+    if prefix in ("incoming", "usage") or not os.path.isdir(directory):
+        continue
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        st = os.stat(path)
+        blobs.append((max(st.st_mtime, last_used.get(name, 0)), st.st_size, name, path))
+        total += st.st_size
+removed = freed = 0
+if total > max_bytes:
+    for _, size, name, path in sorted(blobs):
+        if total - freed <= max_bytes:
+            break
+        os.remove(path)
+        last_used.pop(name, None)
+        removed += 1
+        freed += size
+tmp_path = index_path + ".tmp"
+with open(tmp_path, "w") as f:
+    json.dump({name: last_used[name] for _, _, name, _ in blobs if name in last_used}, f)
+os.replace(tmp_path, index_path)
+sys.stdout.write(json.dumps({"total": total, "removed": removed, "freed": freed}))
+'''
+
+class RemoteBlobStore:
+    """远程内容寻址存储"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        root: Optional[str] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.server = server
+        self.root = root or server.config.get('blob_store_root', DEFAULT_BLOB_ROOT)
+        self.max_bytes = max_bytes or server.config.get(
+            'blob_store_max_bytes',
+            DEFAULT_BLOB_MAX_BYTES
+        )
+        self.error: Optional[str] = None
+        self.vanished: List[str] = []
+        
+    def missing(self, hashes: List[str]) -> List[str]:
+        """
+        查询服务器缺失的内容
+        
+        Args:
+            hashes: 哈希列表
+            
+        Returns:
+            List[str]: 缺失的哈希
+        """
+        stdout, stderr = self.server.execute_python_input(
+            REMOTE_MISSING_SCRIPT,
+            json.dumps(hashes).encode('utf-8'),
+            self.root
+        )
+        if not stdout.strip():
+            raise RuntimeError(f"查询远程存储失败: {stderr.strip()}")
+        return json.loads(stdout)
+        
+    def upload(
+        self,
+        entries: List[FileEntry],
+        batch_id: str,
+        channels: int = 4,
+        progress_callback: Optional[Callable[[TransferStats], None]] = None,
+        flow: Optional[BandwidthFlow] = None
+    ) -> bool:
+        """
+        上传缺失的内容到 incoming 目录, 在 materialize 时校验入库
+        
+        Args:
+            entries: 待上传文件 (每个哈希一个)
+            batch_id: 批次标识, 并发任务各自使用独立的 incoming 子目录
+            channels: 并发通道数
+            progress_callback: 进度回调
+            flow: 带宽流
+            
+        Returns:
+            bool: 是否上传成功
+        """
+        if not entries:
+            return True
+            
+        if not self.server.create_directories([f"{self.root}/incoming/{batch_id}"]):
+            self.error = "创建远程存储目录失败"
+            return False
+            
+        uploader = ParallelUploader(
+            self.server,
+            channels=channels,
+            progress_callback=progress_callback,
+            flow=flow
+        )
+        if not uploader.upload([
+            (entry.local_path, f"{self.root}/incoming/{batch_id}/{entry.hash}", entry.size)
+            for entry in entries
+        ]):
+            self.error = uploader.error
+            return False
+        return True
+        
+    def materialize(
+        self,
+        files: Dict[str, Tuple[str, int]],
+        workspace: str,
+        batch_id: str
+    ) -> bool:
+        """
+        由存储生成任务工作目录
+        
+        不支持 reflink 时工作目录中的文件与存储共享 inode (只读, 只保留执行权限),
+        打包过程不能原地修改源文件;
+        查询后已被回收的内容记录在 vanished 中, 重新上传后再次生成
+        
+        Args:
+            files: 相对路径到 (哈希, 权限) 的映射
+            workspace: 远程工作目录
+            batch_id: 上传批次标识
+            
+        Returns:
+            bool: 是否成功
+        """
+        self.vanished = []
+        stdout, stderr = self.server.execute_python_input(
+            REMOTE_MATERIALIZE_SCRIPT,
+            json.dumps(files).encode('utf-8'),
+            self.root,
+            workspace,
+            batch_id
+        )
+        if not stdout.strip():
+            self.error = f"生成工作目录失败: {stderr.strip()}"
+            return False
+            
+        result = json.loads(stdout)
+        if result['errors']:
+            self.error = f"生成工作目录失败: {result['errors'][0]}"
+            return False
+        if result['vanished']:
+            self.vanished = result['vanished']
+            self.error = f"生成工作目录失败: {len(self.vanished)} 个文件已被回收"
+            return False
+            
+        logger.debug(
+            f"生成工作目录 {workspace}: reflink {result['cloned']} 个, "
+            f"硬链接 {result['linked']} 个, 复制 {result['copied']} 个"
+        )
+        return True
+        
+    def gc(self) -> Dict[str, int]:
+        """
+        按 LRU 回收超出容量的内容
+        
+        Returns:
+            Dict[str, int]: 回收统计
+        """
+        try:
+            stdout, stderr = self.server.execute_python(
+                REMOTE_GC_SCRIPT,
+                self.root,
+                str(self.max_bytes)
+            )
+            if not stdout.strip():
+                logger.warning(f"远程存储回收失败: {stderr.strip()}")
+                return {}
+            result = json.loads(stdout)
+            if result.get('busy'):
+                logger.debug("远程存储正在使用, 跳过回收")
+            elif result['removed']:
+                logger.info(
+                    f"远程存储回收 {result['removed']} 个文件, "
+                    f"释放 {result['freed']} 字节"
+                )
+            return result
+        except Exception as e:
+            logger.warning(f"远程存储回收失败: {str(e)}")
+            return {}
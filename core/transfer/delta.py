@@ -0,0 +1,352 @@
+"""
+块级增量传输
+远程返回已有文件的块签名 (弱滚动校验 + 强哈希), 本地只发送字面数据和块引用,
+由远程根据旧文件重建新文件 (rsync 算法)
+"""
+import mmap
+import json
+import struct
+import hashlib
+import logging
+from itertools import accumulate
+from typing import Dict, List, Tuple, Optional, Iterator, BinaryIO
+from ..server import BaseServer
+from .bandwidth import BandwidthFlow, ThrottledWriter
+from .manifest import temp_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+MAX_LITERAL_SIZE = 1024 * 1024
+# 向量化计算弱校验时每段的窗口位置数
+SCAN_SEGMENT = 256 * 1024
+
+# 帧类型: 块引用 / 字面数据 / 结束
+OP_COPY = b'C'
+OP_DATA = b'D'
+OP_END = b'E'
+
+# 远程签名脚本: 输出已有文件每个完整块的 [弱校验, 强哈希]
+REMOTE_SIGNATURE_SCRIPT = '''
+import hashlib, json, os, sys
+from itertools import accumulate
+path, block_size = sys.argv[1], int(sys.argv[2])
+signatures = []
+if os.path.isfile(path):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if len(block) < block_size:
+                break
+            a = sum(block) & 0xFFFF
+            b = sum(accumulate(block)) & 0xFFFF
+            signatures.append([(b << 16) | a, hashlib.blake2b(block, digest_size=16).hexdigest()])
+    sys.stdout.write(json.dumps(signatures))
+'''
+
+# 远程重建脚本: 从 stdin 读取增量帧, 结合旧文件 (可与目标文件不同) 生成新文件并校验哈希
+REMOTE_PATCH_SCRIPT = '''
+import hashlib, os, shutil, struct, sys
+basis_path, path, tmp_path = sys.argv[1], sys.argv[2], sys.argv[3]
+block_size, expected = int(sys.argv[4]), sys.argv[5]
+stream = sys.stdin.buffer
+os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+hasher = hashlib.sha256()
+with open(basis_path, "rb") as basis, open(tmp_path, "wb") as out:
+    while True:
+        op = stream.read(1)
+        if op == b"C":
+            index, = struct.unpack(">I", stream.read(4))
+            basis.seek(index * block_size)
+            data = basis.read(block_size)
+        elif op == b"D":
+            length, = struct.unpack(">I", stream.read(4))
+            data = stream.read(length)
+        else:
+            break
+        hasher.update(data)
+        out.write(data)
+if hasher.hexdigest() != expected:
+    os.remove(tmp_path)
+    sys.stderr.write("hash mismatch")
+    sys.exit(1)
+shutil.copymode(basis_path, tmp_path)
+os.replace(tmp_path, path)
+'''
+
+def weak_checksum(block: bytes) -> int:
+    """计算块的弱校验值 (rsync 滚动校验)"""
+    a = sum(block) & 0xFFFF
+    b = sum(accumulate(block)) & 0xFFFF
+    return (b << 16) | a
+
+def strong_hash(block: bytes) -> str:
+    """计算块的强哈希"""
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+def block_signatures(path: str, block_size: int = DEFAULT_BLOCK_SIZE) -> List[Tuple[int, str]]:
+    """
+    计算本地文件的块签名
+    
+    Args:
+        path: 文件路径
+        block_size: 块大小
+        
+    Returns:
+        List[Tuple[int, str]]: 每个完整块的 (弱校验, 强哈希)
+    """
+    signatures = []
+    with open(path, 'rb') as f:
+        while len(block := f.read(block_size)) == block_size:
+            signatures.append((weak_checksum(block), strong_hash(block)))
+    return signatures
+
+def _match(
+    table: Dict[int, List[Tuple[int, str]]],
+    weak: int,
+    block: bytes
+) -> Optional[int]:
+    """弱校验命中时比较强哈希, 返回匹配的块序号"""
+    if candidates := table.get(weak):
+        digest = strong_hash(block)
+        return next((index for index, strong in candidates if strong == digest), None)
+    return None
+
+def _weak_checksums(data: bytes, start: int, count: int, block_size: int) -> 'np.ndarray':
+    """
+    向量化计算从 start 开始的 count 个窗口的弱校验值
+    
+    a = sum(x[i]), b = sum((p + L - i) * x[i]), 由两个前缀和相减得到;
+    uint64 溢出回绕不影响低 16 位
+    """
+    x = np.frombuffer(data, dtype=np.uint8, count=count + block_size - 1, offset=start).astype(np.uint64)
+    s1 = np.zeros(len(x) + 1, dtype=np.uint64)
+    s2 = np.zeros(len(x) + 1, dtype=np.uint64)
+    np.cumsum(x, out=s1[1:])
+    np.cumsum(x * np.arange(len(x), dtype=np.uint64), out=s2[1:])
+    
+    p = np.arange(count, dtype=np.uint64)
+    end = p + np.uint64(block_size)
+    a = s1[end] - s1[p]
+    b = end * a - (s2[end] - s2[p])
+    return ((b & np.uint64(0xFFFF)) << np.uint64(16)) | (a & np.uint64(0xFFFF))
+
+def _scan_vectorized(
+    data: bytes,
+    table: Dict[int, List[Tuple[int, str]]],
+    block_size: int
+) -> Iterator[Tuple[int, int]]:
+    """只在弱校验命中的位置比较强哈希, 未修改区域按块跳过, 修改区域分段向量化计算"""
+    keys = np.sort(np.fromiter(table.keys(), dtype=np.uint64, count=len(table)))
+    last = len(data) - block_size
+    pos = 0
+    while pos <= last:
+        # 未修改区域中上一块之后紧接着下一块, 先单独检查该窗口
+        weak = int(_weak_checksums(data, pos, 1, block_size)[0])
+        matched = _match(table, weak, data[pos:pos + block_size])
+        if matched is not None:
+            yield pos, matched
+            pos += block_size
+            continue
+            
+        start = pos + 1
+        count = min(SCAN_SEGMENT, last + 1 - start)
+        if count <= 0:
+            break
+        weak = _weak_checksums(data, start, count, block_size)
+        # 有序键上二分查找, 比 np.isin 的排序快
+        found = keys[np.minimum(np.searchsorted(keys, weak), len(keys) - 1)] == weak
+        pos = start
+        for offset in np.flatnonzero(found).tolist():
+            candidate = start + offset
+            # 已匹配块覆盖的位置跳过
+            if candidate < pos:
+                continue
+            matched = _match(table, int(weak[offset]), data[candidate:candidate + block_size])
+            if matched is not None:
+                yield candidate, matched
+                pos = candidate + block_size
+        pos = max(pos, start + count)
+
+def _scan_rolling(
+    data: bytes,
+    table: Dict[int, List[Tuple[int, str]]],
+    block_size: int
+) -> Iterator[Tuple[int, int]]:
+    """逐字节滚动计算弱校验 (未安装 numpy 时使用)"""
+    size = len(data)
+    pos = 0
+    window = data[0:block_size]
+    a = sum(window) & 0xFFFF
+    b = sum(accumulate(window)) & 0xFFFF
+    while pos + block_size <= size:
+        matched = _match(table, (b << 16) | a, data[pos:pos + block_size])
+        if matched is not None:
+            yield pos, matched
+            pos += block_size
+            if pos + block_size <= size:
+                window = data[pos:pos + block_size]
+                a = sum(window) & 0xFFFF
+                b = sum(accumulate(window)) & 0xFFFF
+            continue
+            
+        # 向后滚动一个字节
+        if pos + block_size < size:
+            out_byte = data[pos]
+            in_byte = data[pos + block_size]
+            a = (a - out_byte + in_byte) & 0xFFFF
+            b = (b - block_size * out_byte + a) & 0xFFFF
+        pos += 1
+
+def compute_delta(
+    data: bytes,
+    signatures: List[Tuple[int, str]],
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[Tuple[bytes, object]]:
+    """
+    根据旧文件签名计算新数据的增量
+    
+    Args:
+        data: 新文件内容 (bytes 或 mmap)
+        signatures: 旧文件块签名
+        block_size: 块大小
+        
+    Yields:
+        Tuple[bytes, object]: (OP_COPY, 块序号) 或 (OP_DATA, 字面数据)
+    """
+    table: Dict[int, List[Tuple[int, str]]] = {}
+    for index, (weak, strong) in enumerate(signatures):
+        table.setdefault(weak, []).append((index, strong))
+        
+    size = len(data)
+    literal_start = 0
+    
+    def literal(start: int, end: int) -> Iterator[Tuple[bytes, object]]:
+        for offset in range(start, end, MAX_LITERAL_SIZE):
+            yield OP_DATA, data[offset:min(offset + MAX_LITERAL_SIZE, end)]
+            
+    if table and size >= block_size:
+        scan = _scan_vectorized if np is not None else _scan_rolling
+        for pos, matched in scan(data, table, block_size):
+            yield from literal(literal_start, pos)
+            yield OP_COPY, matched
+            literal_start = pos + block_size
+            
+    yield from literal(literal_start, size)
+
+def encode_delta(ops: Iterator[Tuple[bytes, object]], stream: BinaryIO) -> int:
+    """
+    将增量写入输出流
+    
+    Returns:
+        int: 写入的字节数
+    """
+    written = 0
+    for op, value in ops:
+        if op == OP_COPY:
+            frame = OP_COPY + struct.pack('>I', value)
+            stream.write(frame)
+            written += len(frame)
+        else:
+            stream.write(OP_DATA + struct.pack('>I', len(value)))
+            stream.write(value)
+            written += 5 + len(value)
+    stream.write(OP_END)
+    return written + 1
+
+def apply_delta(basis: BinaryIO, delta: BinaryIO, out: BinaryIO, block_size: int) -> None:
+    """根据旧文件和增量流重建新文件"""
+    while True:
+        op = delta.read(1)
+        if op == OP_COPY:
+            index, = struct.unpack('>I', delta.read(4))
+            basis.seek(index * block_size)
+            out.write(basis.read(block_size))
+        elif op == OP_DATA:
+            length, = struct.unpack('>I', delta.read(4))
+            out.write(delta.read(length))
+        else:
+            break
+
+class DeltaUploader:
+    """增量上传器"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        flow: Optional[BandwidthFlow] = None
+    ):
+        self.server = server
+        self.block_size = block_size
+        self.flow = flow
+        
+    def upload(
+        self,
+        local_path: str,
+        remote_path: str,
+        expected_hash: str,
+        basis_path: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        以增量方式更新远程文件
+        
+        Args:
+            local_path: 本地文件
+            remote_path: 远程目标文件
+            expected_hash: 新文件的 sha256, 远程重建后校验
+            basis_path: 远程旧版本文件 (如上一次任务的工作目录中的同名文件), 默认为目标文件本身
+            
+        Returns:
+            Optional[int]: 实际发送的字节数, 无法增量传输时返回 None
+        """
+        basis_path = basis_path or remote_path
+        try:
+            stdout, _ = self.server.execute_python(
+                REMOTE_SIGNATURE_SCRIPT,
+                basis_path,
+                str(self.block_size)
+            )
+            if not stdout.strip():
+                return None
+            signatures = [tuple(item) for item in json.loads(stdout)]
+            if not signatures:
+                return None
+                
+            channel = self.server.open_channel(
+                self.server.python_command(
+                    REMOTE_PATCH_SCRIPT,
+                    basis_path,
+                    remote_path,
+                    temp_path(remote_path),
+                    str(self.block_size),
+                    expected_hash
+                )
+            )
+            try:
+                stdin = channel.makefile_stdin('wb')
+                with open(local_path, 'rb') as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        sent = encode_delta(
+                            compute_delta(data, signatures, self.block_size),
+                            ThrottledWriter(stdin, self.flow)
+                        )
+                stdin.close()
+                channel.shutdown_write()
+                
+                if channel.recv_exit_status() != 0:
+                    stderr = channel.makefile_stderr('rb').read().decode('utf-8', errors='replace')
+                    logger.warning(f"增量重建失败: {stderr.strip()}")
+                    return None
+                return sent
+            finally:
+                channel.close()
+                
+        except Exception as e:
+            logger.warning(f"增量上传失败: {str(e)}")
+            return None
@@ -0,0 +1,244 @@
+"""
+并行下载引擎
+一次远程调用列出输出目录 (同时计算校验哈希), 在多个 SFTP 通道上并发预读下载文件,
+写入本地时同时计算哈希, 下载完成后不再读取文件
+"""
+import os
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Dict, List, Tuple, Optional, Callable
+from ..server import BaseServer
+from .manifest import fetch_remote_manifest
+from .upload import TransferStats
+from .resume import ResumableTransfer, TransferCheckpoint
+from .verify import resolve_algorithm, new_hasher
+
+logger = logging.getLogger(__name__)
+
+class ParallelDownloader:
+    """并行下载器"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        channels: int = 4,
+        chunk_size: int = 256 * 1024,
+        progress_callback: Optional[Callable[[TransferStats], None]] = None,
+        resume_threshold: Optional[int] = None,
+        checkpoint: Optional[TransferCheckpoint] = None,
+        verify_hash: Optional[str] = 'sha256'
+    ):
+        """
+        Args:
+            server: 远程服务器
+            channels: SFTP 通道数
+            chunk_size: 读取块大小
+            progress_callback: 进度回调
+            resume_threshold: 不小于该大小的文件分块续传, None 表示不续传
+            checkpoint: 续传检查点
+            verify_hash: 校验算法 (sha256 / blake2b / xxh3), None 表示不校验
+        """
+        self.server = server
+        self.channels = max(1, channels)
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.resume_threshold = resume_threshold
+        self.checkpoint = checkpoint or TransferCheckpoint()
+        self.verify_hash = resolve_algorithm(verify_hash) if verify_hash else None
+        self.error: Optional[str] = None
+        self.stats = TransferStats()
+        self._stop = threading.Event()
+        self._expected: Dict[str, str] = {}
+        self._algorithm = 'sha256'
+        self._mismatched: List[Tuple[str, str, int]] = []
+        self._lock = threading.Lock()
+        
+    def download_tree(self, remote_root: str, local_root: str) -> bool:
+        """
+        递归下载远程目录
+        
+        Args:
+            remote_root: 远程目录
+            local_root: 本地目录
+            
+        Returns:
+            bool: 是否全部下载成功
+        """
+        # 列目录时远程顺带计算哈希, 作为下载时逐个比较的期望值
+        manifest = fetch_remote_manifest(
+            self.server,
+            remote_root,
+            with_hash=bool(self.verify_hash),
+            algorithm=self.verify_hash or 'sha256'
+        )
+        if not manifest:
+            self.error = f"远程目录为空或不存在: {remote_root}"
+            logger.error(self.error)
+            return False
+            
+        files = [
+            (
+                f"{remote_root}/{path}",
+                os.path.join(local_root, *path.split('/')),
+                entry.size
+            )
+            for path, entry in manifest.items()
+        ]
+        
+        # 预先创建本地目录, 工作线程只负责写文件
+        for directory in {os.path.dirname(local_path) for _, local_path, _ in files}:
+            os.makedirs(directory, exist_ok=True)
+            
+        if self.verify_hash:
+            self._algorithm = next(iter(manifest.values())).algorithm
+            self._expected = {
+                os.path.join(local_root, *path.split('/')): entry.hash
+                for path, entry in manifest.items()
+            }
+        if not self.download(files):
+            return False
+        if not self._mismatched:
+            return True
+            
+        # 校验失败的文件重新下载一次
+        retry, self._mismatched = self._mismatched, []
+        logger.warning(f"{len(retry)} 个文件校验失败, 重新下载")
+        stats = self.stats
+        if not self.download(retry):
+            return False
+        # 重传的字节计入总量, 文件数不变
+        stats.add(self.stats.done_bytes)
+        self.stats = stats
+        if self._mismatched:
+            self.error = f"下载校验失败: {', '.join(item[1] for item in self._mismatched[:5])}"
+            logger.error(self.error)
+            return False
+        return True
+        
+    def download(self, files: List[Tuple[str, str, int]]) -> bool:
+        """
+        并发下载文件
+        
+        Args:
+            files: (远程路径, 本地路径, 文件大小) 列表, 本地父目录需已存在
+            
+        Returns:
+            bool: 是否全部下载成功
+        """
+        if not files:
+            return True
+            
+        # 大文件优先, 避免最后只剩一个大文件占用单个通道
+        queue: Queue = Queue()
+        for item in sorted(files, key=lambda f: f[2], reverse=True):
+            queue.put(item)
+            
+        self.stats = TransferStats(len(files), sum(f[2] for f in files))
+        workers = [
+            threading.Thread(target=self._worker, args=(queue,), daemon=True)
+            for _ in range(min(self.channels, len(files)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            
+        if self.error:
+            logger.error(f"并行下载失败: {self.error}")
+            return False
+            
+        logger.info(
+            f"下载完成: {self.stats.done_files} 个文件, "
+            f"{self.stats.done_bytes} 字节, {self.stats.rate / 1024 / 1024:.2f} MB/s"
+        )
+        return True
+        
+    def _worker(self, queue: Queue) -> None:
+        """下载线程, 每个线程独占一个 SFTP 通道"""
+        try:
+            sftp = self.server.open_sftp()
+        except Exception as e:
+            self._fail(f"打开 SFTP 通道失败: {str(e)}")
+            return
+            
+        try:
+            while not self._stop.is_set():
+                try:
+                    remote_path, local_path, size = queue.get_nowait()
+                except Empty:
+                    break
+                try:
+                    # 续传重试可能已重建连接, 旧通道随之失效
+                    if sftp.get_channel().closed:
+                        sftp = self.server.open_sftp()
+                    if self.resume_threshold and size >= self.resume_threshold:
+                        # 分块续传时每个分块已按远程分块哈希校验
+                        self._get_resumable(remote_path, local_path)
+                    else:
+                        digest = self._get(sftp, remote_path, local_path, size)
+                        expected = self._expected.get(local_path)
+                        if expected is not None and digest != expected:
+                            with self._lock:
+                                self._mismatched.append((remote_path, local_path, size))
+                    self.stats.add(0, files=1)
+                except Exception as e:
+                    self._fail(f"{remote_path}: {str(e)}")
+        finally:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+                
+    def _get(self, sftp, remote_path: str, local_path: str, size: int) -> Optional[str]:
+        """
+        预读下载单个文件
+        
+        Returns:
+            Optional[str]: 写入时计算的哈希, 不校验时为 None
+        """
+        hasher = new_hasher(self._algorithm) if self._expected else None
+        with sftp.open(remote_path, 'rb') as remote_file:
+            # 一次发出所有读请求, 不等待逐块往返
+            remote_file.prefetch(size)
+            with open(local_path, 'wb') as local_file:
+                while chunk := remote_file.read(self.chunk_size):
+                    if self._stop.is_set():
+                        return None
+                    if hasher:
+                        hasher.update(chunk)
+                    local_file.write(chunk)
+                    self.stats.add(len(chunk))
+                    if self.progress_callback:
+                        self.progress_callback(self.stats)
+                        
+        self._copy_mode(sftp, remote_path, local_path)
+        return hasher.hexdigest() if hasher else None
+        
+    def _get_resumable(self, remote_path: str, local_path: str) -> None:
+        """分块续传大文件, 中断后只重传缺失的分块"""
+        def on_chunk(nbytes: int) -> None:
+            self.stats.add(nbytes)
+            if self.progress_callback:
+                self.progress_callback(self.stats)
+                
+        transfer = ResumableTransfer(
+            self.server,
+            self.checkpoint,
+            progress_callback=on_chunk
+        )
+        if not transfer.download(remote_path, local_path):
+            raise IOError(transfer.error)
+            
+    @staticmethod
+    def _copy_mode(sftp, remote_path: str, local_path: str) -> None:
+        """保留可执行权限 (onedir 产物中的可执行文件)"""
+        mode = sftp.stat(remote_path).st_mode
+        if mode is not None:
+            os.chmod(local_path, mode & 0o777)
+            
+    def _fail(self, message: str) -> None:
+        """记录首个错误并停止其他线程"""
+        if not self.error:
+            self.error = message
+        self._stop.set()
@@ -0,0 +1,187 @@
+"""
+文件哈希缓存
+以 (设备号, inode, 大小, 修改时间) 为键持久化文件哈希, 未修改的文件无需重新读取
+"""
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'),
+    '.remotebuilder',
+    'hash_cache.db'
+)
+
+class FileHashCache:
+    """持久化文件哈希缓存 (SQLite, LRU 淘汰)"""
+    
+    # 命中时最近使用时间的更新间隔(秒), 避免每次命中都写库
+    TOUCH_INTERVAL = 60.0
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 500000,
+        algorithm: str = 'sha256'
+    ):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self.algorithm = algorithm
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            
+        # 多个任务线程共享同一连接, 多进程通过 WAL 与忙等待超时并发访问
+        self.conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            check_same_thread=False
+        )
+        with self.lock:
+            if self.path != ':memory:':
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    algorithm TEXT NOT NULL,
+                    dev INTEGER NOT NULL,
+                    ino INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (algorithm, dev, ino, size, mtime_ns)
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_used ON file_hashes (last_used)"
+            )
+            self.conn.commit()
+            
+    def _key(self, st: os.stat_result) -> tuple:
+        """生成缓存键"""
+        return (self.algorithm, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        
+    def get(self, st: os.stat_result) -> Optional[str]:
+        """
+        查询缓存
+        
+        Args:
+            st: 文件的 os.stat 结果
+            
+        Returns:
+            Optional[str]: 缓存的哈希值, 未命中返回 None
+        """
+        key = self._key(st)
+        with self.lock:
+            row = self.conn.execute(
+                """
+                SELECT hash, last_used FROM file_hashes
+                WHERE algorithm = ? AND dev = ? AND ino = ? AND size = ? AND mtime_ns = ?
+                """,
+                key
+            ).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+                
+            self.hits += 1
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                self.conn.execute(
+                    """
+                    UPDATE file_hashes SET last_used = ?
+                    WHERE algorithm = ? AND dev = ? AND ino = ? AND size = ? AND mtime_ns = ?
+                    """,
+                    (now, *key)
+                )
+                self.conn.commit()
+            return row[0]
+            
+    def put(self, st: os.stat_result, digest: str) -> None:
+        """
+        写入缓存
+        
+        Args:
+            st: 文件的 os.stat 结果
+            digest: 哈希值
+        """
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO file_hashes
+                (algorithm, dev, ino, size, mtime_ns, hash, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (*self._key(st), digest, time.time())
+            )
+            self.conn.commit()
+            
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._evict()
+                
+    def hash_file(self, path: str, hash_func: Callable[[str], str]) -> str:
+        """
+        获取文件哈希, 未命中时计算并写入缓存
+        
+        Args:
+            path: 文件路径
+            hash_func: 实际计算哈希的函数
+            
+        Returns:
+            str: 哈希值
+        """
+        st = os.stat(path)
+        if digest := self.get(st):
+            return digest
+            
+        digest = hash_func(path)
+        
+        # 计算期间文件被修改时不写入缓存
+        if os.stat(path).st_mtime_ns == st.st_mtime_ns:
+            self.put(st, digest)
+        return digest
+        
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目, 调用方需持有锁"""
+        count = self.conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+            
+        self.conn.execute(
+            """
+            DELETE FROM file_hashes WHERE rowid IN (
+                SELECT rowid FROM file_hashes ORDER BY last_used LIMIT ?
+            )
+            """,
+            (excess,)
+        )
+        self.conn.commit()
+        logger.debug(f"哈希缓存淘汰 {excess} 个条目")
+        
+    def evict(self) -> None:
+        """淘汰超出容量的条目"""
+        with self.lock:
+            self._evict()
+            
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM file_hashes").fetchone()[0]
+            
+    def close(self) -> None:
+        """关闭缓存"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,201 @@
+"""
+工作目录忽略规则
+按 gitignore 语义匹配 .remotebuilderignore 与内置默认规则, 在遍历时直接剪除整个目录
+"""
+import os
+import re
+import logging
+from typing import List, Optional, Tuple, Iterator, Pattern
+
+logger = logging.getLogger(__name__)
+
+IGNORE_FILE = '.remotebuilderignore'
+
+# 内置默认规则
+DEFAULT_IGNORE_PATTERNS = [
+    '.git/',
+    '.hg/',
+    '.svn/',
+    '__pycache__/',
+    '*.py[cod]',
+    '.venv/',
+    'venv/',
+    '.tox/',
+    '.nox/',
+    '.mypy_cache/',
+    '.pytest_cache/',
+    '.ruff_cache/',
+    '*.egg-info/',
+    'node_modules/',
+    '/build/',
+    '/dist/',
+    '.DS_Store',
+    '.idea/',
+    '.vscode/'
+]
+
+def _translate(pattern: str) -> str:
+    """将 gitignore 通配符转换为正则表达式"""
+    result = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 3] == '**/':
+                result.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i + 2] == '**':
+                result.append('.*')
+                i += 2
+                continue
+            result.append('[^/]*')
+        elif c == '?':
+            result.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                result.append(re.escape(c))
+            else:
+                content = pattern[i + 1:end]
+                if content.startswith('!'):
+                    content = '^' + content[1:]
+                result.append(f'[{content}]')
+                i = end
+        elif c == '\\' and i + 1 < len(pattern):
+            i += 1
+            result.append(re.escape(pattern[i]))
+        else:
+            result.append(re.escape(c))
+        i += 1
+    return ''.join(result)
+
+def _strip_trailing_spaces(pattern: str) -> str:
+    """去除行尾未转义的空白, 反斜杠转义的空格 (如 foo\\ ) 保留"""
+    end = len(pattern)
+    while end > 0 and pattern[end - 1] in ' \t':
+        # 空白前连续的反斜杠为奇数个时该空白被转义
+        backslashes = 0
+        while end - 2 - backslashes >= 0 and pattern[end - 2 - backslashes] == '\\':
+            backslashes += 1
+        if backslashes % 2:
+            break
+        end -= 1
+    return pattern[:end]
+
+class IgnoreRule:
+    """单条忽略规则"""
+    
+    def __init__(self, pattern: str, negate: bool = False):
+        """
+        Args:
+            pattern: 不含否定前缀的规则, 其中的转义字符按字面匹配
+            negate: 是否为否定规则 (! 开头, 重新包含已忽略的路径)
+        """
+        self.source = pattern
+        self.negate = negate
+        
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        
+        # 包含 / 的规则相对于根目录匹配, 否则匹配任意层级的名称
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        prefix = '' if anchored else '(?:.*/)?'
+        self.regex: Pattern = re.compile(f'^{prefix}{_translate(pattern)}$')
+        
+    def match(self, path: str, is_dir: bool) -> bool:
+        """匹配相对路径 (使用 / 分隔)"""
+        if self.dir_only and not is_dir:
+            return False
+        return bool(self.regex.match(path))
+
+class IgnoreMatcher:
+    """忽略规则匹配器"""
+    
+    def __init__(self, patterns: Optional[List[str]] = None):
+        self.rules: List[IgnoreRule] = []
+        for pattern in patterns or []:
+            self.add(pattern)
+            
+    def add(self, pattern: str) -> None:
+        """添加规则, 忽略空行和注释; \\# 和 \\! 开头的规则按字面匹配 # 和 !"""
+        pattern = _strip_trailing_spaces(pattern.rstrip('\r\n'))
+        if not pattern or pattern.startswith('#'):
+            return
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        self.rules.append(IgnoreRule(pattern, negate))
+        
+    @classmethod
+    def for_workspace(
+        cls,
+        workspace: str,
+        extra_patterns: Optional[List[str]] = None,
+        use_defaults: bool = True
+    ) -> 'IgnoreMatcher':
+        """
+        生成工作目录的匹配器
+        
+        规则顺序: 内置默认规则 -> .remotebuilderignore -> 任务配置, 后面的规则优先
+        
+        Args:
+            workspace: 工作目录
+            extra_patterns: 任务配置中的额外规则
+            use_defaults: 是否使用内置默认规则
+            
+        Returns:
+            IgnoreMatcher: 匹配器
+        """
+        matcher = cls(DEFAULT_IGNORE_PATTERNS if use_defaults else [])
+        ignore_file = os.path.join(workspace, IGNORE_FILE)
+        if os.path.isfile(ignore_file):
+            try:
+                with open(ignore_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        matcher.add(line)
+            except Exception as e:
+                logger.warning(f"读取忽略规则失败: {str(e)}")
+        for pattern in extra_patterns or []:
+            matcher.add(pattern)
+        return matcher
+        
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        """
+        判断相对路径是否被忽略
+        
+        Args:
+            path: 相对路径 (使用 / 分隔)
+            is_dir: 是否为目录
+            
+        Returns:
+            bool: 是否忽略
+        """
+        ignored = False
+        for rule in self.rules:
+            if rule.negate == ignored and rule.match(path, is_dir):
+                ignored = not rule.negate
+        return ignored
+        
+    def walk(self, root: str) -> Iterator[Tuple[str, str]]:
+        """
+        遍历工作目录, 被忽略的目录整体剪除不再进入
+        
+        Args:
+            root: 工作目录
+            
+        Yields:
+            Tuple[str, str]: (本地路径, 相对路径)
+        """
+        for dirpath, dirnames, filenames in os.walk(root):
+            relative_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            prefix = '' if relative_dir == '.' else relative_dir + '/'
+            
+            dirnames[:] = [
+                name for name in dirnames
+                if not self.is_ignored(prefix + name, is_dir=True)
+            ]
+            for name in filenames:
+                if not self.is_ignored(prefix + name):
+                    yield os.path.join(dirpath, name), prefix + name
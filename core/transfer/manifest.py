@@ -0,0 +1,291 @@
+"""
+工作目录清单
+负责生成本地/远程文件清单并计算差异, 用于增量上传
+"""
+import os
+import json
+import stat
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable
+from ..server import BaseServer
+from .ignore import IgnoreMatcher
+from .verify import REMOTE_HASH_HELPERS
+
+logger = logging.getLogger(__name__)
+
+# 传输临时文件的标记, 不会与用户文件常见的 .part / .tmp 后缀冲突; 清单和生成工作目录时跳过
+TEMP_MARKER = '.rb-tmp-'
+
+# 远程清单脚本: 一次调用列出整个目录的 (路径, 大小, 修改时间, 哈希)
+REMOTE_MANIFEST_SCRIPT = REMOTE_HASH_HELPERS + '''
+import json, sys
+root = sys.argv[1]
+with_hash = len(sys.argv) < 3 or sys.argv[2] == "1"
+algorithm = resolve_algorithm(sys.argv[3] if len(sys.argv) > 3 else "sha256")
+entries = {}
+if os.path.isdir(root):
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if ".rb-tmp-" in name:
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+                digest = hash_path(path, algorithm) if with_hash else ""
+            except OSError:
+                continue
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            entries[rel] = [st.st_size, st.st_mtime, digest]
+sys.stdout.write(json.dumps({"algorithm": algorithm, "entries": entries}))
+'''
+
+# 远程文件属性脚本: stdin 为路径列表, 输出 {路径: [大小, 修改时间, 权限] 或 null}
+REMOTE_STAT_SCRIPT = '''
+import json, os, sys
+result = {}
+for path in json.loads(sys.stdin.buffer.read()):
+    try:
+        st = os.stat(path)
+        result[path] = [st.st_size, st.st_mtime, st.st_mode]
+    except OSError:
+        result[path] = None
+sys.stdout.write(json.dumps(result))
+'''
+
+def temp_path(path: str, tag: Optional[str] = None) -> str:
+    """
+    传输临时文件路径
+    
+    Args:
+        path: 目标文件
+        tag: 固定标记 (续传时跨重试保持不变), 为空时使用随机值, 并发写入同一文件互不冲突
+        
+    Returns:
+        str: 临时文件路径
+    """
+    return f"{path}{TEMP_MARKER}{tag or uuid.uuid4().hex}"
+
+class FileEntry:
+    """清单条目"""
+    
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        mtime: float,
+        hash: str = "",
+        local_path: Optional[str] = None,
+        algorithm: str = "sha256",
+        mode: int = 0o644
+    ):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.hash = hash
+        self.local_path = local_path
+        self.algorithm = algorithm
+        self.mode = mode
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "path": self.path,
+            "size": self.size,
+            "mtime": self.mtime,
+            "hash": self.hash
+        }
+
+def scan_workspace(
+    root: str,
+    matcher: Optional[IgnoreMatcher] = None
+) -> Dict[str, FileEntry]:
+    """
+    扫描本地工作目录
+    
+    Args:
+        root: 工作目录
+        matcher: 忽略规则, 被忽略的目录不会进入遍历
+        
+    Returns:
+        Dict[str, FileEntry]: 相对路径 (使用 / 分隔) 到条目的映射
+    """
+    matcher = matcher or IgnoreMatcher()
+    entries: Dict[str, FileEntry] = {}
+    for local_path, relative_path in matcher.walk(root):
+        try:
+            st = os.stat(local_path)
+        except OSError as e:
+            logger.warning(f"读取文件信息失败: {str(e)}")
+            continue
+        entries[relative_path] = FileEntry(
+            path=relative_path,
+            size=st.st_size,
+            mtime=st.st_mtime,
+            local_path=local_path,
+            mode=stat.S_IMODE(st.st_mode)
+        )
+    return entries
+
+def hash_manifest(
+    entries: Dict[str, FileEntry],
+    hash_func: Callable[[str], str],
+    max_workers: int = 8
+) -> None:
+    """
+    在线程池中计算清单中所有文件的哈希值
+    
+    Args:
+        entries: 本地清单
+        hash_func: 哈希函数, 参数为本地文件路径, 算法须与清单的 algorithm (默认 sha256) 一致
+        max_workers: 线程数
+    """
+    pending = [entry for entry in entries.values() if not entry.hash]
+    if not pending:
+        return
+        
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        hashes = executor.map(lambda entry: hash_func(entry.local_path), pending)
+        for entry, digest in zip(pending, hashes):
+            entry.hash = digest
+
+def tree_hash(entries: Dict[str, FileEntry]) -> str:
+    """
+    计算整个目录树的哈希 (路径与内容哈希), 清单需已计算哈希
+    
+    Args:
+        entries: 本地清单
+        
+    Returns:
+        str: 树哈希
+    """
+    hasher = hashlib.sha256()
+    for path in sorted(entries):
+        hasher.update(f"{path}\0{entries[path].hash}\n".encode('utf-8'))
+    return hasher.hexdigest()
+
+def fetch_remote_manifest(
+    server: BaseServer,
+    remote_root: str,
+    with_hash: bool = True,
+    algorithm: str = 'sha256'
+) -> Dict[str, FileEntry]:
+    """
+    获取远程目录清单 (单次远程调用)
+    
+    Args:
+        server: 远程服务器
+        remote_root: 远程目录
+        with_hash: 是否计算哈希
+        algorithm: 哈希算法, 远程不支持时回退为 sha256 (记录在条目的 algorithm 中)
+        
+    Returns:
+        Dict[str, FileEntry]: 远程清单, 获取失败时返回空清单
+    """
+    try:
+        stdout, stderr = server.execute_python(
+            REMOTE_MANIFEST_SCRIPT,
+            remote_root,
+            "1" if with_hash else "0",
+            algorithm
+        )
+        if not stdout.strip():
+            if stderr:
+                logger.warning(f"获取远程清单失败: {stderr}")
+            return {}
+            
+        result = json.loads(stdout)
+        return {
+            path: FileEntry(
+                path=path,
+                size=size,
+                mtime=mtime,
+                hash=digest,
+                algorithm=result['algorithm']
+            )
+            for path, (size, mtime, digest) in result['entries'].items()
+        }
+        
+    except Exception as e:
+        logger.warning(f"获取远程清单失败: {str(e)}")
+        return {}
+
+def fetch_remote_stats(
+    server: BaseServer,
+    paths: List[str]
+) -> Optional[Dict[str, Optional[List[float]]]]:
+    """
+    获取远程文件的属性 (单次远程调用, 代理可用时经代理的 stat 操作)
+    
+    Args:
+        server: 远程服务器
+        paths: 远程路径
+        
+    Returns:
+        Optional[Dict[str, Optional[List[float]]]]: 路径到 (大小, 修改时间, 权限) 的映射,
+            不存在的路径为 None; 远程调用失败时返回 None
+    """
+    try:
+        agent = getattr(server, 'agent', None)
+        if agent is not None and agent.alive:
+            return agent.stat(paths)
+            
+        stdout, stderr = server.execute_python_input(
+            REMOTE_STAT_SCRIPT,
+            json.dumps(paths).encode('utf-8')
+        )
+        if not stdout.strip():
+            logger.warning(f"获取远程文件属性失败: {stderr}")
+            return None
+        return json.loads(stdout)
+        
+    except Exception as e:
+        logger.warning(f"获取远程文件属性失败: {str(e)}")
+        return None
+
+def diff_manifests(
+    local: Dict[str, FileEntry],
+    remote: Dict[str, FileEntry]
+) -> List[str]:
+    """
+    比较本地与远程清单
+    
+    Args:
+        local: 本地清单
+        remote: 远程清单
+        
+    Returns:
+        List[str]: 需要上传的相对路径
+    """
+    changed = []
+    for path, entry in local.items():
+        remote_entry = remote.get(path)
+        if (
+            remote_entry is None
+            or remote_entry.size != entry.size
+            or remote_entry.hash != entry.hash
+        ):
+            changed.append(path)
+    return changed
+
+def plan_directories(paths: List[str]) -> List[str]:
+    """
+    计算创建目录树所需的最小目录集合
+    
+    只保留叶子目录, 其父目录由 mkdir -p 一并创建
+    
+    Args:
+        paths: 相对文件路径 (使用 / 分隔)
+        
+    Returns:
+        List[str]: 需要创建的相对目录
+    """
+    directories = {path.rsplit('/', 1)[0] for path in paths if '/' in path}
+    parents = set()
+    for directory in directories:
+        while '/' in directory:
+            directory = directory.rsplit('/', 1)[0]
+            parents.add(directory)
+    return sorted(directories - parents)
@@ -0,0 +1,219 @@
+"""
+校验写入通道
+文件数据经命令通道的 stdin 发送, 远程边写入边计算哈希并返回,
+上传校验不需要在传输完成后再次读取远程文件
+"""
+import json
+import struct
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional, Callable, BinaryIO, Tuple
+from ..server import BaseServer
+from .bandwidth import BandwidthFlow
+from .verify import REMOTE_HASH_HELPERS, new_hasher
+
+logger = logging.getLogger(__name__)
+
+HEADER_SIZE = struct.Struct('>I')
+
+# 分块写入使用的哈希 (与 delta.strong_hash 一致)
+CHUNK_ALGORITHM = 'chunk'
+
+# 远程接收脚本: 每帧为 4 字节头部长度 + JSON 头部 + size 字节数据
+# 头部 {"id", "path", "size", "offset", "rename", "algorithm"}: offset 为空时截断写入整个文件,
+# 否则写入已有文件的指定偏移; rename 不为空时写完后改名 (原子替换)
+# 首行输出实际使用的算法, 之后每帧输出一行 {"id", "hash"} 或 {"id", "error"}
+REMOTE_RECEIVE_SCRIPT = REMOTE_HASH_HELPERS + '''
+import json, struct, sys
+algorithm = resolve_algorithm(sys.argv[1])
+stdin = sys.stdin.buffer
+out = sys.stdout
+def read_exact(size):
+    data = b""
+    while len(data) < size:
+        chunk = stdin.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+def respond(result):
+    out.write(json.dumps(result) + "\\n")
+    out.flush()
+def skip(remaining):
+    while remaining:
+        chunk = stdin.read(min(remaining, 1048576))
+        if not chunk:
+            sys.exit(1)
+        remaining -= len(chunk)
+respond({"algorithm": algorithm})
+while True:
+    prefix = read_exact(4)
+    if prefix is None:
+        break
+    header = json.loads(read_exact(struct.unpack(">I", prefix)[0]))
+    remaining = header["size"]
+    if header.get("algorithm") == "chunk":
+        hasher = hashlib.blake2b(digest_size=16)
+    else:
+        hasher = new_hasher(algorithm)
+    try:
+        offset = header.get("offset")
+        f = open(header["path"], "wb" if offset is None else "r+b")
+    except OSError as e:
+        skip(remaining)
+        respond({"id": header["id"], "error": str(e)})
+        continue
+    with f:
+        if offset:
+            f.seek(offset)
+        while remaining:
+            chunk = stdin.read(min(remaining, 1048576))
+            if not chunk:
+                sys.exit(1)
+            hasher.update(chunk)
+            f.write(chunk)
+            remaining -= len(chunk)
+    try:
+        if header.get("rename"):
+            os.replace(header["path"], header["rename"])
+    except OSError as e:
+        respond({"id": header["id"], "error": str(e)})
+        continue
+    respond({"id": header["id"], "hash": hasher.hexdigest()})
+'''
+
+class RemoteReceiver:
+    """校验写入通道, 多个写入可同时在途, 结果按帧返回"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        algorithm: str = 'sha256',
+        flow: Optional[BandwidthFlow] = None,
+        chunk_size: int = 256 * 1024
+    ):
+        """
+        Args:
+            server: 远程服务器
+            algorithm: 整个文件写入时的哈希算法, 远程不支持时回退为 sha256
+            flow: 带宽流
+            chunk_size: 每次发送的数据量
+        """
+        self.server = server
+        self.algorithm = algorithm
+        self.flow = flow
+        self.chunk_size = chunk_size
+        self.channel = None
+        self._stdin = None
+        self._stdout = None
+        self._next_id = 1
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        
+    def open(self) -> None:
+        """打开通道并读取远程实际使用的算法"""
+        self.channel = self.server.open_channel(
+            self.server.python_command(REMOTE_RECEIVE_SCRIPT, self.algorithm)
+        )
+        self._stdin = self.channel.makefile_stdin('wb')
+        self._stdout = self.channel.makefile('rb')
+        line = self._stdout.readline()
+        if not line:
+            raise IOError("启动远程接收脚本失败")
+        self.algorithm = json.loads(line)['algorithm']
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        
+    def send(
+        self,
+        source: BinaryIO,
+        path: str,
+        size: int,
+        offset: Optional[int] = None,
+        rename: Optional[str] = None,
+        chunk: bool = False,
+        on_data: Optional[Callable[[int], None]] = None
+    ) -> Tuple[Future, str]:
+        """
+        发送一段数据, 不等待远程写入结果
+        
+        Args:
+            source: 数据来源, 从当前位置读取 size 字节
+            path: 远程文件
+            size: 字节数
+            offset: 写入偏移, None 表示截断写入整个文件
+            rename: 写完后改名为该路径
+            chunk: 使用分块哈希 (blake2b-128) 代替整个文件的算法
+            on_data: 每发送一块数据的回调
+            
+        Returns:
+            Tuple[Future, str]: (远程写入时计算的哈希, 本地发送时计算的哈希)
+        """
+        future: Future = Future()
+        with self._lock:
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+            
+        header = json.dumps({
+            'id': request_id,
+            'path': path,
+            'size': size,
+            'offset': offset,
+            'rename': rename,
+            'algorithm': CHUNK_ALGORITHM if chunk else None
+        }).encode('utf-8')
+        self._stdin.write(HEADER_SIZE.pack(len(header)) + header)
+        
+        hasher = hashlib.blake2b(digest_size=16) if chunk else new_hasher(self.algorithm)
+        remaining = size
+        while remaining:
+            data = source.read(min(self.chunk_size, remaining))
+            if not data:
+                raise IOError(f"本地文件在传输过程中变短: {path}")
+            if self.flow:
+                self.flow.consume(len(data))
+            hasher.update(data)
+            self._stdin.write(data)
+            remaining -= len(data)
+            if on_data:
+                on_data(len(data))
+        return future, hasher.hexdigest()
+        
+    def close(self) -> None:
+        """结束发送, 等待所有写入结果后关闭通道"""
+        try:
+            if self._stdin:
+                self._stdin.flush()
+                self._stdin.close()
+                self.channel.shutdown_write()
+            if self._reader:
+                self._reader.join()
+        finally:
+            if self.channel:
+                self.channel.close()
+                self.channel = None
+                
+    def _read_loop(self) -> None:
+        """读取写入结果并交给对应的请求"""
+        try:
+            for line in self._stdout:
+                result = json.loads(line)
+                with self._lock:
+                    future = self._pending.pop(result['id'], None)
+                if future is None:
+                    continue
+                if 'error' in result:
+                    future.set_exception(IOError(result['error']))
+                else:
+                    future.set_result(result['hash'])
+        except Exception as e:
+            logger.error(f"读取远程写入结果失败: {str(e)}")
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(IOError("远程接收脚本已退出"))
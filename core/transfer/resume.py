@@ -0,0 +1,380 @@
+"""
+可续传的分块传输
+大文件按固定大小分块传输并逐块校验, 已完成的分块记录在断点文件中,
+连接中断后重试只传输缺失的分块
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable
+from ..server import BaseServer
+from .delta import strong_hash
+from .bandwidth import BandwidthFlow
+from .receive import RemoteReceiver
+from .manifest import temp_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_CHECKPOINT_DIR = os.path.join(
+    os.path.expanduser('~'),
+    '.remotebuilder',
+    'checkpoints'
+)
+
+# 一次读取的分块数, 限制预读占用的内存
+READ_WINDOW = 16
+
+# 远程分块哈希脚本: 输出文件大小、权限与每个分块的哈希, 文件不存在时输出 null
+REMOTE_CHUNK_HASH_SCRIPT = '''
+import hashlib, json, os, sys
+path, chunk_size = sys.argv[1], int(sys.argv[2])
+result = None
+if os.path.isfile(path):
+    hashes = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hashes.append(hashlib.blake2b(chunk, digest_size=16).hexdigest())
+    st = os.stat(path)
+    result = {"size": st.st_size, "mode": st.st_mode, "hashes": hashes}
+sys.stdout.write(json.dumps(result))
+'''
+
+_reconnect_lock = threading.Lock()
+
+def chunk_hashes(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+    """
+    计算本地文件每个分块的哈希
+    
+    Args:
+        path: 文件路径
+        chunk_size: 分块大小
+        
+    Returns:
+        List[str]: 分块哈希
+    """
+    hashes = []
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            hashes.append(strong_hash(chunk))
+    return hashes
+
+class TransferCheckpoint:
+    """传输断点 (JSON 文件持久化)"""
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 断点文件路径, None 表示只保存在内存中
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                logger.warning(f"读取传输断点失败: {str(e)}")
+                
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取断点"""
+        with self.lock:
+            return self.state.get(key)
+            
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """更新断点并持久化"""
+        with self.lock:
+            self.state[key] = value
+            self._save()
+            
+    def discard(self, key: str) -> None:
+        """删除断点"""
+        with self.lock:
+            if self.state.pop(key, None) is not None:
+                self._save()
+                
+    def _save(self) -> None:
+        """写入断点文件, 没有未完成的传输时删除文件"""
+        if not self.path:
+            return
+        try:
+            if not self.state:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"保存传输断点失败: {str(e)}")
+
+class ResumableTransfer:
+    """可续传的分块传输"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        checkpoint: Optional[TransferCheckpoint] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_attempts: int = 5,
+        delay: float = 1.0,
+        backoff: float = 2.0,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        flow: Optional[BandwidthFlow] = None,
+        verify: bool = False
+    ):
+        """
+        Args:
+            verify: 上传时经校验写入通道发送分块, 远程写入时逐块校验
+        """
+        self.server = server
+        self.checkpoint = checkpoint or TransferCheckpoint()
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.progress_callback = progress_callback
+        self.flow = flow
+        self.verify = verify
+        self.error: Optional[str] = None
+        
+    def download(self, remote_path: str, local_path: str) -> bool:
+        """
+        续传下载文件
+        
+        Args:
+            remote_path: 远程文件
+            local_path: 本地文件
+            
+        Returns:
+            bool: 是否下载成功
+        """
+        return self._with_retries(self._download_once, remote_path, local_path)
+        
+    def upload(self, local_path: str, remote_path: str) -> bool:
+        """
+        续传上传文件, 远程父目录需已存在
+        
+        Args:
+            local_path: 本地文件
+            remote_path: 远程文件
+            
+        Returns:
+            bool: 是否上传成功
+        """
+        return self._with_retries(self._upload_once, local_path, remote_path)
+        
+    def _with_retries(self, func: Callable[[str, str], None], source: str, target: str) -> bool:
+        """失败后重连并从断点重试"""
+        current_delay = self.delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                func(source, target)
+                self.error = None
+                return True
+            except Exception as e:
+                self.error = f"{source}: {str(e)}"
+                if attempt == self.max_attempts:
+                    break
+                logger.warning(
+                    f"分块传输 {source} 失败 ({str(e)}), "
+                    f"将在 {current_delay:.1f} 秒后进行第 {attempt + 1} 次重试"
+                )
+                time.sleep(current_delay)
+                current_delay *= self.backoff
+                self._reconnect()
+                
+        logger.error(f"分块传输失败: {self.error}")
+        return False
+        
+    def _reconnect(self) -> None:
+        """传输层已断开时重新连接"""
+        with _reconnect_lock:
+            ssh = getattr(self.server, 'ssh', None)
+            transport = ssh.get_transport() if ssh else None
+            if transport is None or not transport.is_active():
+                try:
+                    self.server.connect()
+                except Exception as e:
+                    logger.warning(f"重新连接失败: {str(e)}")
+                    
+    def _remote_hashes(self, remote_path: str) -> Optional[Dict[str, Any]]:
+        """获取远程文件的分块哈希"""
+        stdout, stderr = self.server.execute_python(
+            REMOTE_CHUNK_HASH_SCRIPT,
+            remote_path,
+            str(self.chunk_size)
+        )
+        if not stdout.strip():
+            raise IOError(f"获取远程分块哈希失败: {stderr.strip()}")
+        return json.loads(stdout)
+        
+    def _ranges(self, indexes: List[int], size: int) -> List[tuple]:
+        """分块序号转换为 (偏移, 长度)"""
+        return [
+            (index * self.chunk_size, min(self.chunk_size, size - index * self.chunk_size))
+            for index in indexes
+        ]
+        
+    def _download_once(self, remote_path: str, local_path: str) -> None:
+        """下载缺失的分块, 全部完成后改名为目标文件"""
+        remote = self._remote_hashes(remote_path)
+        if remote is None:
+            raise FileNotFoundError(remote_path)
+        size, hashes = remote['size'], remote['hashes']
+        
+        key = f"download:{remote_path}:{local_path}"
+        part_path = temp_path(local_path, 'resume')
+        state = self.checkpoint.get(key)
+        # 远程文件已变化或本地临时文件丢失时从头开始
+        if not state or state['hashes'] != hashes or not os.path.isfile(part_path):
+            state = {'size': size, 'hashes': hashes, 'done': []}
+            with open(part_path, 'wb') as f:
+                f.truncate(size)
+            self.checkpoint.set(key, state)
+            
+        done = set(state['done'])
+        missing = [index for index in range(len(hashes)) if index not in done]
+        if missing:
+            logger.debug(f"续传下载 {remote_path}: 缺失 {len(missing)}/{len(hashes)} 个分块")
+            sftp = self.server.open_sftp()
+            try:
+                with sftp.open(remote_path, 'rb') as remote_file, open(part_path, 'r+b') as local_file:
+                    for start in range(0, len(missing), READ_WINDOW):
+                        window = missing[start:start + READ_WINDOW]
+                        for index, data in zip(window, remote_file.readv(self._ranges(window, size))):
+                            if strong_hash(data) != hashes[index]:
+                                raise IOError(f"分块 {index} 校验失败")
+                            if self.flow:
+                                self.flow.consume(len(data))
+                            local_file.seek(index * self.chunk_size)
+                            local_file.write(data)
+                            # 先写入数据再记录断点
+                            local_file.flush()
+                            done.add(index)
+                            state['done'] = sorted(done)
+                            self.checkpoint.set(key, state)
+                            if self.progress_callback:
+                                self.progress_callback(len(data))
+            finally:
+                sftp.close()
+                
+        os.replace(part_path, local_path)
+        # 保留可执行权限
+        os.chmod(local_path, remote['mode'] & 0o777)
+        self.checkpoint.discard(key)
+        
+    def _upload_once(self, local_path: str, remote_path: str) -> None:
+        """上传缺失的分块, 全部完成后改名为目标文件"""
+        st = os.stat(local_path)
+        key = f"upload:{local_path}:{remote_path}"
+        state = self.checkpoint.get(key)
+        # 断点中保存本地分块哈希, 源文件未修改时重试无需重新计算
+        if not state or state['size'] != st.st_size or state['mtime_ns'] != st.st_mtime_ns:
+            state = {
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'hashes': chunk_hashes(local_path, self.chunk_size),
+                'done': []
+            }
+            self.checkpoint.set(key, state)
+        size, hashes = state['size'], state['hashes']
+        
+        # 以远程临时文件的实际内容为准确定已完成的分块
+        part_path = temp_path(remote_path, 'resume')
+        remote = self._remote_hashes(part_path)
+        sftp = self.server.open_sftp()
+        try:
+            if remote and remote['size'] == size:
+                done = {
+                    index for index, digest in enumerate(remote['hashes'])
+                    if index < len(hashes) and digest == hashes[index]
+                }
+            else:
+                with sftp.open(part_path, 'wb') as remote_file:
+                    remote_file.truncate(size)
+                done = set()
+            state['done'] = sorted(done)
+            self.checkpoint.set(key, state)
+            
+            missing = [index for index in range(len(hashes)) if index not in done]
+            if missing:
+                logger.debug(f"续传上传 {local_path}: 缺失 {len(missing)}/{len(hashes)} 个分块")
+                if self.verify:
+                    self._send_verified(local_path, part_path, missing, size, hashes, done, key, state)
+                else:
+                    with open(local_path, 'rb') as local_file, sftp.open(part_path, 'r+b') as remote_file:
+                        remote_file.set_pipelined(True)
+                        for index, (offset, length) in zip(missing, self._ranges(missing, size)):
+                            local_file.seek(offset)
+                            data = local_file.read(length)
+                            if self.flow:
+                                self.flow.consume(len(data))
+                            remote_file.seek(offset)
+                            remote_file.write(data)
+                            done.add(index)
+                            state['done'] = sorted(done)
+                            self.checkpoint.set(key, state)
+                            if self.progress_callback:
+                                self.progress_callback(len(data))
+                                
+            try:
+                sftp.posix_rename(part_path, remote_path)
+            except IOError:
+                # 服务器不支持 posix-rename 扩展时先删除再改名
+                try:
+                    sftp.remove(remote_path)
+                except IOError:
+                    pass
+                sftp.rename(part_path, remote_path)
+        finally:
+            sftp.close()
+            
+        self.checkpoint.discard(key)
+        
+    def _send_verified(
+        self,
+        local_path: str,
+        part_path: str,
+        missing: List[int],
+        size: int,
+        hashes: List[str],
+        done: set,
+        key: str,
+        state: Dict[str, Any]
+    ) -> None:
+        """经校验写入通道发送分块, 远程写入时计算的分块哈希与本地一致才记入断点"""
+        receiver = RemoteReceiver(self.server, flow=self.flow)
+        receiver.open()
+        sent = []
+        try:
+            with open(local_path, 'rb') as local_file:
+                for index, (offset, length) in zip(missing, self._ranges(missing, size)):
+                    local_file.seek(offset)
+                    future, _ = receiver.send(
+                        local_file,
+                        part_path,
+                        length,
+                        offset=offset,
+                        chunk=True,
+                        on_data=self.progress_callback
+                    )
+                    sent.append((index, future))
+        finally:
+            receiver.close()
+            
+        failed = []
+        for index, future in sent:
+            if future.result() == hashes[index]:
+                done.add(index)
+            else:
+                failed.append(index)
+        state['done'] = sorted(done)
+        self.checkpoint.set(key, state)
+        if failed:
+            raise IOError(f"分块 {failed[0]} 校验失败")
\ No newline at end of file
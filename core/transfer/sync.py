@@ -0,0 +1,323 @@
+"""
+常驻工作目录同步
+监听本地工作目录变化, 在后台持续推送到固定的打包服务器,
+提交任务时上传阶段只需同步最后的少量改动
+"""
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Callable
+from ..server import BaseServer
+from .ignore import IgnoreMatcher
+from .manifest import FileEntry, scan_workspace, hash_manifest, plan_directories
+from .upload import ParallelUploader
+from .bandwidth import BandwidthFlow
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+# 删除远程文件: stdin 为相对路径列表
+REMOTE_DELETE_SCRIPT = '''
+import json, os, sys
+root = sys.argv[1]
+for rel in json.loads(sys.stdin.buffer.read()):
+    try:
+        os.remove(os.path.join(root, rel))
+    except OSError:
+        pass
+'''
+
+# 由常驻目录生成任务工作目录: stdin 为相对路径列表
+# 优先 reflink (独立副本), 不支持时硬链接 (常驻目录中的文件设为只读, 打包过程不能原地修改),
+# 再不支持时复制; 常驻目录的更新通过改名写入新文件, 不影响已生成的任务目录
+REMOTE_CLONE_SCRIPT = '''
+import json, os, shutil, stat, sys
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+FICLONE = 0x40049409
+source, target = sys.argv[1], sys.argv[2]
+files = json.loads(sys.stdin.buffer.read())
+if os.path.isdir(target):
+    shutil.rmtree(target)
+reflink = fcntl is not None and sys.platform.startswith("linux")
+def clone(src, dest):
+    global reflink
+    try:
+        with open(src, "rb") as f, open(dest, "wb") as out:
+            fcntl.ioctl(out.fileno(), FICLONE, f.fileno())
+        shutil.copymode(src, dest)
+        return True
+    except OSError:
+        # 文件系统不支持时不再尝试
+        reflink = False
+        if os.path.lexists(dest):
+            os.remove(dest)
+        return False
+cloned = linked = copied = 0
+errors = []
+for rel in files:
+    src = os.path.join(source, rel)
+    dest = os.path.join(target, rel)
+    try:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if reflink and clone(src, dest):
+            cloned += 1
+            continue
+        mode = stat.S_IMODE(os.stat(src).st_mode)
+        try:
+            if mode & 0o222:
+                os.chmod(src, mode & ~0o222)
+            os.link(src, dest)
+            linked += 1
+        except OSError:
+            shutil.copyfile(src, dest)
+            os.chmod(dest, mode | 0o200)
+            copied += 1
+    except OSError as e:
+        errors.append(rel + ": " + str(e))
+sys.stdout.write(json.dumps({"cloned": cloned, "linked": linked, "copied": copied, "errors": errors}))
+'''
+
+class _ChangeHandler(FileSystemEventHandler):
+    """文件系统事件处理器"""
+    
+    def __init__(self, sync: 'WarmWorkspace'):
+        super().__init__()
+        self.sync = sync
+        
+    def on_any_event(self, event) -> None:
+        self.sync.mark_dirty()
+
+class WarmWorkspace:
+    """常驻工作目录"""
+    
+    def __init__(
+        self,
+        name: str,
+        workspace: str,
+        server: BaseServer,
+        hash_func: Callable[[str], str],
+        matcher: Optional[IgnoreMatcher] = None,
+        channels: int = 4,
+        poll_interval: float = 5.0,
+        debounce: float = 0.5
+    ):
+        self.name = name
+        self.workspace = workspace
+        self.server = server
+        self.remote_root = f"/tmp/warm_{name}"
+        self.hash_func = hash_func
+        self.matcher = matcher or IgnoreMatcher.for_workspace(workspace)
+        self.channels = channels
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        
+        self.synced: Dict[str, FileEntry] = {}
+        self.last_sync_time: Optional[float] = None
+        self.dirty_since: Optional[float] = None
+        self.last_event_time = 0.0
+        self.sync_count = 0
+        self.error: Optional[str] = None
+        
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+        
+    @property
+    def sync_lag(self) -> float:
+        """同步延迟(秒): 最早未同步改动距今的时间"""
+        if self.dirty_since is None:
+            return 0.0
+        return time.time() - self.dirty_since
+        
+    def start(self) -> None:
+        """开始监听并在后台同步"""
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_ChangeHandler(self), self.workspace, recursive=True)
+            self._observer.start()
+        else:
+            logger.info(f"未安装 watchdog, 常驻工作目录 {self.name} 使用定时扫描")
+            
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        
+    def stop(self) -> None:
+        """停止同步"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread:
+            self._thread.join()
+            
+    def mark_dirty(self) -> None:
+        """记录本地改动"""
+        now = time.time()
+        self.last_event_time = now
+        if self.dirty_since is None:
+            self.dirty_since = now
+        self._wakeup.set()
+        
+    def _run(self) -> None:
+        """后台同步线程"""
+        self.sync()
+        while not self._stop.is_set():
+            if self._observer is None:
+                # 定时扫描: 无法得知改动时间, 以上次同步时间估算延迟
+                self._wakeup.wait(self.poll_interval)
+                self.dirty_since = self.dirty_since or self.last_sync_time
+            else:
+                self._wakeup.wait()
+                # 等待连续改动平静下来再同步
+                while time.time() - self.last_event_time < self.debounce:
+                    time.sleep(self.debounce)
+            self._wakeup.clear()
+            if not self._stop.is_set():
+                self.sync()
+                
+    def sync(self, flow: Optional[BandwidthFlow] = None) -> bool:
+        """
+        将本地改动推送到远程常驻目录
+        
+        Args:
+            flow: 带宽流 (任务触发同步时使用任务的带宽流)
+            
+        Returns:
+            bool: 是否同步成功
+        """
+        with self.lock:
+            try:
+                started = time.time()
+                local = scan_workspace(self.workspace, self.matcher)
+                
+                # 大小和修改时间未变的文件沿用上次的哈希
+                for path, entry in local.items():
+                    previous = self.synced.get(path)
+                    if previous and previous.size == entry.size and previous.mtime == entry.mtime:
+                        entry.hash = previous.hash
+                hash_manifest(local, self.hash_func)
+                
+                changed = [
+                    entry for path, entry in sorted(local.items())
+                    if path not in self.synced or self.synced[path].hash != entry.hash
+                ]
+                removed = [path for path in self.synced if path not in local]
+                
+                if changed:
+                    directories = plan_directories([entry.path for entry in changed])
+                    if not self.server.create_directories(
+                        [self.remote_root]
+                        + [f"{self.remote_root}/{directory}" for directory in directories]
+                    ):
+                        raise RuntimeError("创建远程目录失败")
+                    uploader = ParallelUploader(
+                        self.server,
+                        channels=self.channels,
+                        atomic=True,
+                        flow=flow
+                    )
+                    if not uploader.upload([
+                        (entry.local_path, f"{self.remote_root}/{entry.path}", entry.size)
+                        for entry in changed
+                    ]):
+                        raise RuntimeError(uploader.error)
+                        
+                if removed:
+                    self.server.execute_python_input(
+                        REMOTE_DELETE_SCRIPT,
+                        json.dumps(removed).encode('utf-8'),
+                        self.remote_root
+                    )
+                    
+                self.synced = local
+                self.last_sync_time = time.time()
+                self.sync_count += 1
+                self.error = None
+                # 同步期间发生的改动留待下一轮
+                if self.dirty_since is not None and self.last_event_time < started:
+                    self.dirty_since = None
+                if changed or removed:
+                    logger.debug(
+                        f"常驻工作目录 {self.name} 同步 {len(changed)} 个文件, "
+                        f"删除 {len(removed)} 个文件"
+                    )
+                return True
+                
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"同步常驻工作目录失败: {str(e)}")
+                return False
+                
+    def clone_to(
+        self,
+        remote_workspace: str,
+        manifest: Dict[str, FileEntry]
+    ) -> Optional[List[str]]:
+        """
+        由常驻目录生成任务工作目录
+        
+        只生成任务清单中的文件 (任务可以使用自己的忽略规则); 优先 reflink, 不支持时硬链接,
+        常驻目录的后续更新通过改名写入, 不会影响已生成的任务目录
+        
+        Args:
+            remote_workspace: 远程任务工作目录
+            manifest: 任务的本地清单
+            
+        Returns:
+            Optional[List[str]]: 常驻目录中没有或内容不同的文件, 需要单独上传; 失败时返回 None
+        """
+        with self.lock:
+            paths = [
+                path for path, entry in manifest.items()
+                if path in self.synced and self.synced[path].hash == entry.hash
+            ]
+            stdout, stderr = self.server.execute_python_input(
+                REMOTE_CLONE_SCRIPT,
+                json.dumps(paths).encode('utf-8'),
+                self.remote_root,
+                remote_workspace
+            )
+            if not stdout.strip():
+                self.error = stderr.strip()
+                logger.error(f"生成任务工作目录失败: {self.error}")
+                return None
+                
+            result = json.loads(stdout)
+            if result['errors']:
+                self.error = result['errors'][0]
+                logger.error(f"生成任务工作目录失败: {self.error}")
+                return None
+                
+            logger.debug(
+                f"生成任务工作目录 {remote_workspace}: reflink {result['cloned']} 个, "
+                f"硬链接 {result['linked']} 个, 复制 {result['copied']} 个"
+            )
+            cloned = set(paths)
+            return sorted(path for path in manifest if path not in cloned)
+            
+    def get_status(self) -> Dict[str, object]:
+        """获取同步状态"""
+        return {
+            'name': self.name,
+            'workspace': self.workspace,
+            'remote_root': self.remote_root,
+            'files': len(self.synced),
+            'last_sync_time': self.last_sync_time,
+            'sync_lag': self.sync_lag,
+            'sync_count': self.sync_count,
+            'watching': self._observer is not None,
+            'error': self.error
+        }
@@ -0,0 +1,301 @@
+"""
+并行上传引擎
+在同一个 SSH 传输层上打开多个 SFTP 通道, 以流水线方式并发上传文件;
+校验时改用校验写入通道, 远程边写入边计算哈希
+"""
+import time
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Dict, List, Tuple, Optional, Callable
+from ..server import BaseServer
+from .bandwidth import BandwidthFlow
+from .resume import ResumableTransfer, TransferCheckpoint
+from .receive import RemoteReceiver
+from .manifest import temp_path
+
+logger = logging.getLogger(__name__)
+
+class TransferStats:
+    """传输统计"""
+    
+    def __init__(self, total_files: int = 0, total_bytes: int = 0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+        
+    def add(self, nbytes: int, files: int = 0) -> None:
+        """累加已传输数据"""
+        with self.lock:
+            self.done_bytes += nbytes
+            self.done_files += files
+            
+    @property
+    def elapsed(self) -> float:
+        """已用时间(秒)"""
+        return max(time.time() - self.start_time, 1e-6)
+        
+    @property
+    def rate(self) -> float:
+        """平均吞吐量(字节/秒)"""
+        return self.done_bytes / self.elapsed
+
+class ParallelUploader:
+    """并行上传器"""
+    
+    def __init__(
+        self,
+        server: BaseServer,
+        channels: int = 4,
+        chunk_size: int = 256 * 1024,
+        progress_callback: Optional[Callable[[TransferStats], None]] = None,
+        atomic: bool = False,
+        flow: Optional[BandwidthFlow] = None,
+        resume_threshold: Optional[int] = None,
+        checkpoint: Optional[TransferCheckpoint] = None,
+        verify_hash: Optional[str] = None
+    ):
+        """
+        Args:
+            server: 远程服务器
+            channels: 并发通道数
+            chunk_size: 写入块大小
+            progress_callback: 进度回调
+            atomic: 先写临时文件再改名
+            flow: 带宽流
+            resume_threshold: 不小于该大小的文件分块续传, None 表示不续传
+            checkpoint: 续传检查点
+            verify_hash: 校验算法 (sha256 / blake2b / xxh3), None 表示不校验
+        """
+        self.server = server
+        self.channels = max(1, channels)
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.atomic = atomic
+        self.flow = flow
+        self.resume_threshold = resume_threshold
+        self.checkpoint = checkpoint or TransferCheckpoint()
+        self.verify_hash = verify_hash
+        self.error: Optional[str] = None
+        self.stats = TransferStats()
+        self._stop = threading.Event()
+        self._expected: Dict[str, str] = {}
+        self._mismatched: List[Tuple[str, str, int]] = []
+        self._lock = threading.Lock()
+        
+    def upload(
+        self,
+        files: List[Tuple[str, str, int]],
+        expected: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """
+        并发上传文件
+        
+        Args:
+            files: (本地路径, 远程路径, 文件大小) 列表, 远程父目录需已存在
+            expected: 远程路径到期望哈希 (清单中 verify_hash 算法的哈希) 的映射,
+                缺少时与发送时计算的哈希比较
+            
+        Returns:
+            bool: 是否全部上传成功 (校验时包括校验通过)
+        """
+        self._expected = expected or {}
+        if not self._transfer(files):
+            return False
+        if not self.verify_hash or not self._mismatched:
+            return True
+            
+        # 校验失败的文件重新上传一次
+        retry, self._mismatched = self._mismatched, []
+        logger.warning(f"{len(retry)} 个文件上传校验失败, 重新上传")
+        stats = self.stats
+        if not self._transfer(retry):
+            return False
+        # 重传的字节计入总量, 文件数不变
+        stats.add(self.stats.done_bytes)
+        self.stats = stats
+        if self._mismatched:
+            self.error = f"上传校验失败: {', '.join(item[1] for item in self._mismatched[:5])}"
+            logger.error(self.error)
+            return False
+        return True
+        
+    def _transfer(self, files: List[Tuple[str, str, int]]) -> bool:
+        """并发传输一批文件"""
+        if not files:
+            return True
+            
+        # 大文件优先, 避免最后只剩一个大文件占用单个通道
+        queue: Queue = Queue()
+        for item in sorted(files, key=lambda f: f[2], reverse=True):
+            queue.put(item)
+            
+        self.stats = TransferStats(len(files), sum(f[2] for f in files))
+        workers = [
+            threading.Thread(target=self._worker, args=(queue,), daemon=True)
+            for _ in range(min(self.channels, len(files)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            
+        if self.error:
+            logger.error(f"并行上传失败: {self.error}")
+            return False
+            
+        logger.info(
+            f"上传完成: {self.stats.done_files} 个文件, "
+            f"{self.stats.done_bytes} 字节, {self.stats.rate / 1024 / 1024:.2f} MB/s"
+        )
+        return True
+        
+    def _worker(self, queue: Queue) -> None:
+        """上传线程, 每个线程独占一个 SFTP 通道 (校验时为校验写入通道)"""
+        if self.verify_hash:
+            self._verified_worker(queue)
+            return
+            
+        try:
+            sftp = self.server.open_sftp()
+        except Exception as e:
+            self._fail(f"打开 SFTP 通道失败: {str(e)}")
+            return
+            
+        try:
+            while not self._stop.is_set():
+                try:
+                    local_path, remote_path, size = queue.get_nowait()
+                except Empty:
+                    break
+                try:
+                    # 续传重试可能已重建连接, 旧通道随之失效
+                    if sftp.get_channel().closed:
+                        sftp = self.server.open_sftp()
+                    if self.resume_threshold and size >= self.resume_threshold:
+                        self._put_resumable(local_path, remote_path)
+                    else:
+                        self._put(sftp, local_path, remote_path)
+                    self.stats.add(0, files=1)
+                except Exception as e:
+                    self._fail(f"{local_path}: {str(e)}")
+        finally:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+                
+    def _put(self, sftp, local_path: str, remote_path: str) -> None:
+        """流水线写入单个文件"""
+        # 原子模式先写临时文件再改名, 不修改已有文件的 inode (可能被硬链接引用)
+        target_path = temp_path(remote_path) if self.atomic else remote_path
+        with open(local_path, 'rb') as local_file:
+            with sftp.open(target_path, 'wb') as remote_file:
+                # 不等待每次写入的确认, 关闭时统一校验
+                remote_file.set_pipelined(True)
+                while chunk := local_file.read(self.chunk_size):
+                    if self._stop.is_set():
+                        return
+                    if self.flow:
+                        self.flow.consume(len(chunk))
+                    remote_file.write(chunk)
+                    self.stats.add(len(chunk))
+                    if self.progress_callback:
+                        self.progress_callback(self.stats)
+                        
+        if self.atomic:
+            try:
+                sftp.posix_rename(target_path, remote_path)
+            except IOError:
+                # 服务器不支持 posix-rename 扩展时先删除再改名
+                try:
+                    sftp.remove(remote_path)
+                except IOError:
+                    pass
+                sftp.rename(target_path, remote_path)
+                        
+    def _verified_worker(self, queue: Queue) -> None:
+        """经校验写入通道上传, 远程写入结果在通道关闭时统一比较"""
+        receiver = RemoteReceiver(self.server, self.verify_hash, self.flow, self.chunk_size)
+        try:
+            receiver.open()
+        except Exception as e:
+            self._fail(f"打开校验写入通道失败: {str(e)}")
+            return
+            
+        def on_data(nbytes: int) -> None:
+            self.stats.add(nbytes)
+            if self.progress_callback:
+                self.progress_callback(self.stats)
+                
+        sent = []
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = queue.get_nowait()
+                except Empty:
+                    break
+                local_path, remote_path, size = item
+                try:
+                    if self.resume_threshold and size >= self.resume_threshold:
+                        # 分块续传时逐块校验
+                        self._put_resumable(local_path, remote_path)
+                        self.stats.add(0, files=1)
+                        continue
+                    target_path = temp_path(remote_path) if self.atomic else remote_path
+                    with open(local_path, 'rb') as local_file:
+                        future, local_digest = receiver.send(
+                            local_file,
+                            target_path,
+                            size,
+                            rename=remote_path if self.atomic else None,
+                            on_data=on_data
+                        )
+                    sent.append((item, future, local_digest))
+                except Exception as e:
+                    self._fail(f"{local_path}: {str(e)}")
+        finally:
+            try:
+                receiver.close()
+            except Exception as e:
+                self._fail(f"关闭校验写入通道失败: {str(e)}")
+                
+        # 清单中的哈希与远程算法一致时与其比较, 同时发现扫描后被修改的文件
+        use_expected = receiver.algorithm == self.verify_hash
+        for item, future, local_digest in sent:
+            try:
+                remote_digest = future.result()
+            except Exception as e:
+                self._fail(f"{item[1]}: {str(e)}")
+                continue
+            expected = self._expected.get(item[1]) if use_expected else None
+            if remote_digest != (expected or local_digest):
+                with self._lock:
+                    self._mismatched.append(item)
+            self.stats.add(0, files=1)
+            
+    def _put_resumable(self, local_path: str, remote_path: str) -> None:
+        """分块续传大文件, 中断后只重传缺失的分块"""
+        def on_chunk(nbytes: int) -> None:
+            self.stats.add(nbytes)
+            if self.progress_callback:
+                self.progress_callback(self.stats)
+                
+        transfer = ResumableTransfer(
+            self.server,
+            self.checkpoint,
+            progress_callback=on_chunk,
+            flow=self.flow,
+            verify=bool(self.verify_hash)
+        )
+        if not transfer.upload(local_path, remote_path):
+            raise IOError(transfer.error)
+            
+    def _fail(self, message: str) -> None:
+        """记录首个错误并停止其他线程"""
+        if not self.error:
+            self.error = message
+        self._stop.set()
@@ -0,0 +1,215 @@
+"""
+传输完整性校验
+本地通过 mmap 在线程池中计算文件哈希, 与远程在传输过程中生成的清单比较;
+哈希只用于发现传输损坏时, 可以选用非加密的快速哈希 (xxh3, 需要 xxhash)
+"""
+import os
+import json
+import mmap
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from ..server import BaseServer
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+# 不小于该大小的文件通过 mmap 计算哈希, 避免逐块复制到 Python 对象
+MMAP_MIN_SIZE = 1024 * 1024
+
+# 每次送入哈希函数的数据量, hashlib 处理大块数据时释放 GIL, 多线程可并行
+HASH_SLICE = 64 * 1024 * 1024
+
+DEFAULT_VERIFY_WORKERS = min(8, os.cpu_count() or 1)
+
+# 远程脚本共用的哈希函数, 拼接在各远程脚本之前
+# 远程没有 xxhash 时回退为 sha256, 脚本输出实际使用的算法
+REMOTE_HASH_HELPERS = '''
+import hashlib, mmap, os
+def resolve_algorithm(name):
+    if name == "xxh3":
+        try:
+            import xxhash
+        except ImportError:
+            return "sha256"
+        return name
+    return name if name in ("sha256", "blake2b") else "sha256"
+def new_hasher(name):
+    if name == "xxh3":
+        import xxhash
+        return xxhash.xxh3_128()
+    if name == "blake2b":
+        return hashlib.blake2b()
+    return hashlib.sha256()
+def hash_path(path, name):
+    hasher = new_hasher(name)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= 1048576:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hasher.update(data)
+        else:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+'''
+
+# 批量计算远程文件哈希: stdin 为路径列表, 输出 {"algorithm": .., "hashes": {路径: 哈希}}
+REMOTE_HASH_FILES_SCRIPT = REMOTE_HASH_HELPERS + '''
+import json, sys
+from concurrent.futures import ThreadPoolExecutor
+algorithm = resolve_algorithm(sys.argv[1])
+paths = json.loads(sys.stdin.buffer.read())
+def safe_hash(path):
+    try:
+        return hash_path(path, algorithm)
+    except OSError:
+        return ""
+with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+    hashes = dict(zip(paths, executor.map(safe_hash, paths)))
+sys.stdout.write(json.dumps({"algorithm": algorithm, "hashes": hashes}))
+'''
+
+def resolve_algorithm(algorithm: Optional[str]) -> str:
+    """
+    确定本地可用的哈希算法
+    
+    Args:
+        algorithm: sha256 / blake2b / xxh3
+        
+    Returns:
+        str: 实际使用的算法, xxhash 未安装时回退为 sha256
+    """
+    if algorithm == 'xxh3' and xxhash is None:
+        logger.warning("未安装 xxhash, 使用 sha256 校验")
+        return 'sha256'
+    return algorithm if algorithm in ('sha256', 'blake2b', 'xxh3') else 'sha256'
+
+def new_hasher(algorithm: str = 'sha256'):
+    """创建哈希对象"""
+    if algorithm == 'xxh3':
+        return xxhash.xxh3_128()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b()
+    return hashlib.sha256()
+
+def hash_file(path: str, algorithm: str = 'sha256') -> str:
+    """
+    计算文件哈希, 大文件通过 mmap 读取
+    
+    Args:
+        path: 文件路径
+        algorithm: 哈希算法
+        
+    Returns:
+        str: 十六进制哈希值
+    """
+    hasher = new_hasher(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_SIZE:
+            hasher.update(f.read())
+            return hasher.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                for offset in range(0, size, HASH_SLICE):
+                    hasher.update(view[offset:offset + HASH_SLICE])
+            finally:
+                view.release()
+    return hasher.hexdigest()
+
+def hash_files(
+    paths: List[str],
+    algorithm: str = 'sha256',
+    max_workers: int = DEFAULT_VERIFY_WORKERS
+) -> Dict[str, str]:
+    """
+    在线程池中计算多个文件的哈希
+    
+    Returns:
+        Dict[str, str]: 路径到哈希的映射, 无法读取的文件哈希为空
+    """
+    def safe_hash(path: str) -> str:
+        try:
+            return hash_file(path, algorithm)
+        except OSError as e:
+            logger.warning(f"计算文件哈希失败: {str(e)}")
+            return ""
+            
+    # 大文件优先, 避免最后只剩一个大文件占用单个线程
+    def file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+            
+    ordered = sorted(paths, key=file_size, reverse=True)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return dict(zip(ordered, executor.map(safe_hash, ordered)))
+
+def verify_files(
+    expected: Dict[str, str],
+    algorithm: str = 'sha256',
+    max_workers: int = DEFAULT_VERIFY_WORKERS
+) -> List[str]:
+    """
+    校验本地文件与期望的哈希是否一致
+    
+    Args:
+        expected: 本地路径到期望哈希的映射
+        algorithm: 期望哈希使用的算法
+        max_workers: 线程数
+        
+    Returns:
+        List[str]: 不一致或无法读取的本地路径
+    """
+    actual = hash_files(list(expected), algorithm, max_workers)
+    return sorted(path for path, digest in expected.items() if actual.get(path) != digest)
+
+def fetch_remote_hashes(
+    server: BaseServer,
+    paths: List[str],
+    algorithm: str = 'sha256'
+) -> Optional[Dict[str, str]]:
+    """
+    计算远程文件哈希 (单次远程调用, 代理可用时经代理的 hash 操作)
+    
+    Args:
+        server: 远程服务器
+        paths: 远程路径
+        algorithm: 哈希算法, 远程不支持时返回 None
+        
+    Returns:
+        Optional[Dict[str, str]]: 远程路径到哈希的映射, 失败时返回 None
+    """
+    try:
+        # 代理运行时直接在代理进程内计算, 不执行脚本
+        agent = getattr(server, 'agent', None)
+        if agent is not None and agent.alive:
+            used, hashes = agent.hash_files(paths, algorithm)
+            if used != algorithm:
+                logger.warning(f"远程不支持 {algorithm} 哈希")
+                return None
+            return hashes
+            
+        stdout, stderr = server.execute_python_input(
+            REMOTE_HASH_FILES_SCRIPT,
+            json.dumps(paths).encode('utf-8'),
+            algorithm
+        )
+        if not stdout.strip():
+            logger.warning(f"计算远程文件哈希失败: {stderr}")
+            return None
+        result = json.loads(stdout)
+        if result['algorithm'] != algorithm:
+            logger.warning(f"远程不支持 {algorithm} 哈希")
+            return None
+        return result['hashes']
+        
+    except Exception as e:
+        logger.warning(f"计算远程文件哈希失败: {str(e)}")
+        return None
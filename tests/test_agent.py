@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import unittest
+from concurrent.futures import wait
+from core.server import RemoteAgent, AgentError
+
+class LocalChannel:
+    """以本地子进程模拟会话通道"""
+    
+    def __init__(self, args):
+        self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        
+    def makefile(self, mode):
+        return self.proc.stdout
+        
+    def sendall(self, data):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+        
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+        
+class LocalServer:
+    """在本地运行代理的服务器"""
+    
+    encoding = 'gbk'
+    
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def open_channel(self, command):
+        return LocalChannel(command)
+        
+class TestRemoteAgent(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.agent = RemoteAgent(LocalServer(), max_workers=4)
+        self.assertTrue(self.agent.start())
+        
+    def tearDown(self):
+        self.agent.close()
+        shutil.rmtree(self.temp_dir)
+        
+    def test_file_operations(self):
+        """测试创建目录, 哈希, 属性和清理"""
+        nested = os.path.join(self.temp_dir, 'a', 'b')
+        self.assertTrue(self.agent.create_directories([nested]))
+        path = os.path.join(nested, 'data.bin')
+        with open(path, 'wb') as f:
+            f.write(b'x' * 5000)
+            
+        algorithm, hashes = self.agent.hash_files([path, os.path.join(nested, 'missing')])
+        self.assertEqual(algorithm, 'sha256')
+        self.assertEqual(hashes[path], hashlib.sha256(b'x' * 5000).hexdigest())
+        self.assertEqual(hashes[os.path.join(nested, 'missing')], '')
+        
+        stat = self.agent.stat([path, os.path.join(nested, 'missing')])
+        self.assertEqual(stat[path][0], 5000)
+        self.assertIsNone(stat[os.path.join(nested, 'missing')])
+        
+        self.assertEqual(self.agent.cleanup([os.path.join(self.temp_dir, 'a')]), 1)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+        
+    def test_hash_algorithm(self):
+        """测试按指定算法计算哈希"""
+        path = os.path.join(self.temp_dir, 'data.bin')
+        with open(path, 'wb') as f:
+            f.write(b'data')
+            
+        algorithm, hashes = self.agent.hash_files([path], 'blake2b')
+        self.assertEqual(algorithm, 'blake2b')
+        self.assertEqual(hashes[path], hashlib.blake2b(b'data').hexdigest())
+        
+        # 不支持的算法回退为 sha256
+        algorithm, hashes = self.agent.hash_files([path], 'md5')
+        self.assertEqual(algorithm, 'sha256')
+        self.assertEqual(hashes[path], hashlib.sha256(b'data').hexdigest())
+        
+    def test_exec_uses_server_encoding(self):
+        """测试命令输出按服务器编码解码"""
+        script = "import sys; sys.stdout.buffer.write('构建完成'.encode('gbk'))"
+        stdout, _, status = self.agent.execute(f'"{sys.executable}" -c "{script}"')
+        self.assertEqual((stdout, status), ('构建完成', 0))
+        
+    def test_python_in_process(self):
+        """测试 Python 脚本在代理进程内执行"""
+        script = 'import os, sys; print(sys.stdin.read() + sys.argv[1]); print(os.getpid(), file=sys.stderr)'
+        stdout, stderr = self.agent.execute_python(script, 'b', data=b'a')
+        self.assertEqual(stdout.strip(), 'ab')
+        self.assertEqual(int(stderr), self.agent.metrics()['pid'])
+        
+        # 退出码和异常不影响代理
+        result, _ = self.agent.request('python', script='import sys; sys.exit(3)')
+        self.assertEqual(result['exit_status'], 3)
+        stdout, stderr = self.agent.execute_python('raise ValueError("bad")')
+        self.assertIn('ValueError', stderr)
+        self.assertTrue(self.agent.alive)
+        
+    def test_python_isolation(self):
+        """测试并发脚本的标准输入输出互不干扰"""
+        script = 'import sys, time; data = sys.stdin.read(); time.sleep(0.1); print(data, sys.argv[1])'
+        futures = [
+            self.agent.submit('python', str(i).encode(), script=script, argv=[str(i)])
+            for i in range(8)
+        ]
+        wait(futures)
+        for i, future in enumerate(futures):
+            result, output = future.result()
+            self.assertEqual(output[:result['stdout_size']].decode().split(), [str(i), str(i)])
+            
+    def test_multiplexed_requests(self):
+        """测试慢请求不阻塞后发出的快请求"""
+        slow = self.agent.submit('exec', command=f'"{sys.executable}" -c "import time; time.sleep(0.5)"')
+        start = time.time()
+        stdout, stderr, status = self.agent.execute('echo hello')
+        self.assertEqual((stdout.strip(), status), ('hello', 0))
+        self.assertLess(time.time() - start, 0.5)
+        self.assertFalse(slow.done())
+        wait([slow])
+        self.assertEqual(slow.result()[0]['exit_status'], 0)
+        
+    def test_metrics(self):
+        """测试运行指标"""
+        self.agent.execute('echo hello')
+        with self.assertRaises(AgentError):
+            self.agent.request('stat')
+        metrics = self.agent.metrics()
+        self.assertEqual(metrics['workers'], 4)
+        self.assertEqual(metrics['requests']['exec'], 1)
+        self.assertEqual(metrics['errors'], 1)
+        self.assertEqual(metrics['pending'], 0)
+        
+    def test_request_timeout(self):
+        """测试请求超时后代理仍可用"""
+        with self.assertRaises(AgentError):
+            self.agent.request('python', script='import time; time.sleep(1)', timeout=0.1)
+        self.assertTrue(self.agent.alive)
+        self.assertEqual(self.agent.metrics()['pending'], 0)
+        
+    def test_errors(self):
+        """测试远程错误和关闭后的请求"""
+        with self.assertRaises(AgentError):
+            self.agent.request('stat')
+        with self.assertRaises(AgentError):
+            self.agent.request('tar', path=self.temp_dir)
+        self.assertTrue(self.agent.alive)
+        
+        self.agent.close()
+        self.assertFalse(self.agent.alive)
+        with self.assertRaises(AgentError):
+            self.agent.submit('ping')
+            
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,282 @@
+import io
+import os
+import sys
+import gzip
+import shutil
+import hashlib
+import tarfile
+import tempfile
+import subprocess
+import unittest
+from core.transfer.manifest import FileEntry
+from core.transfer.archive import (
+    ArchiveUploader,
+    ArchiveDownloader,
+    choose_transfer_mode,
+    ARCHIVE_MIN_FILES,
+    ARCHIVE_MAX_AVG_SIZE,
+    REMOTE_EXTRACT_SCRIPT,
+    zstandard
+)
+
+class LocalChannel:
+    """以本地子进程模拟命令通道"""
+    
+    def __init__(self, args, env=None):
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env
+        )
+        
+    def makefile(self, mode):
+        return self.proc.stdout
+        
+    def makefile_stdin(self, mode):
+        return self.proc.stdin
+        
+    def makefile_stderr(self, mode):
+        return self.proc.stderr
+        
+    def shutdown_write(self):
+        self.proc.stdin.close()
+        
+    def recv_exit_status(self):
+        return self.proc.wait()
+        
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+        
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+    
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def open_channel(self, command):
+        return LocalChannel(command)
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(self.python_command(script, *args), capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+class NoZstdServer(LocalServer):
+    """既没有 zstandard 模块也没有 zstd 命令的服务器"""
+    
+    def python_command(self, script, *args):
+        return super().python_command('import sys; sys.modules["zstandard"] = None\n' + script, *args)
+        
+    def open_channel(self, command):
+        return LocalChannel(command, env={'PATH': ''})
+        
+class TestTransferMode(unittest.TestCase):
+    def _entries(self, count, size):
+        return [FileEntry(f'f{index}', size, 0.0) for index in range(count)]
+        
+    def test_thresholds(self):
+        """测试按文件数和平均大小选择上传方式"""
+        self.assertEqual(choose_transfer_mode([]), 'sftp')
+        self.assertEqual(choose_transfer_mode(self._entries(ARCHIVE_MIN_FILES - 1, 10)), 'sftp')
+        self.assertEqual(choose_transfer_mode(self._entries(ARCHIVE_MIN_FILES, 10)), 'archive')
+        self.assertEqual(
+            choose_transfer_mode(self._entries(ARCHIVE_MIN_FILES, ARCHIVE_MAX_AVG_SIZE)),
+            'archive'
+        )
+        self.assertEqual(
+            choose_transfer_mode(self._entries(ARCHIVE_MIN_FILES, ARCHIVE_MAX_AVG_SIZE + 1)),
+            'sftp'
+        )
+        
+    def test_explicit_mode(self):
+        """测试配置指定的上传方式优先"""
+        entries = self._entries(ARCHIVE_MIN_FILES * 2, 10)
+        self.assertEqual(choose_transfer_mode(entries, {'mode': 'sftp'}), 'sftp')
+        self.assertEqual(choose_transfer_mode(self._entries(1, 10), {'mode': 'archive'}), 'archive')
+        
+class TestArchiveUpload(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.local_dir = os.path.join(self.temp_dir, 'local')
+        self.remote_dir = os.path.join(self.temp_dir, 'remote')
+        self.files = {
+            'main.py': b'print("hello")',
+            'pkg/__init__.py': b'',
+            'pkg/sub/data.bin': os.urandom(100 * 1024)
+        }
+        self.entries = []
+        for path, content in self.files.items():
+            local_path = os.path.join(self.local_dir, *path.split('/'))
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            with open(local_path, 'wb') as f:
+                f.write(content)
+            self.entries.append(FileEntry(
+                path,
+                len(content),
+                0.0,
+                hashlib.sha256(content).hexdigest(),
+                local_path=local_path
+            ))
+        os.chmod(os.path.join(self.local_dir, 'main.py'), 0o755)
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _remote_files(self):
+        result = {}
+        for dirpath, _, names in os.walk(self.remote_dir):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    result[os.path.relpath(path, self.remote_dir).replace(os.sep, '/')] = f.read()
+        return result
+        
+    def test_upload(self):
+        """测试归档上传解包到远程目录并保留权限"""
+        for verify in (True, False):
+            shutil.rmtree(self.remote_dir, ignore_errors=True)
+            progress = []
+            uploader = ArchiveUploader(LocalServer(), progress_callback=progress.append, verify=verify)
+            self.assertTrue(uploader.upload(self.entries, self.remote_dir), uploader.error)
+            self.assertEqual(self._remote_files(), self.files)
+            self.assertEqual(os.stat(os.path.join(self.remote_dir, 'main.py')).st_mode & 0o777, 0o755)
+            self.assertEqual(progress[-1], sum(len(content) for content in self.files.values()))
+            self.assertEqual(uploader.sent_bytes, progress[-1])
+            
+    def test_upload_hash_mismatch(self):
+        """测试远程解出的内容与清单哈希不符时上传失败"""
+        self.entries[0].hash = '0' * 64
+        uploader = ArchiveUploader(LocalServer())
+        self.assertFalse(uploader.upload(self.entries, self.remote_dir))
+        self.assertIn('main.py', uploader.error)
+        
+    def _extract(self, members, verify='sha256'):
+        """向远程解包脚本发送包含指定成员的 tar 流"""
+        data = io.BytesIO()
+        with gzip.GzipFile(fileobj=data, mode='wb') as stream:
+            with tarfile.open(fileobj=stream, mode='w|') as archive:
+                for member, content in members:
+                    archive.addfile(member, io.BytesIO(content) if content is not None else None)
+        return subprocess.run(
+            [sys.executable, '-c', REMOTE_EXTRACT_SCRIPT, self.remote_dir, 'gzip', verify],
+            input=data.getvalue(),
+            capture_output=True
+        )
+        
+    def _file(self, name, content):
+        member = tarfile.TarInfo(name)
+        member.size = len(content)
+        return member, content
+        
+    def _link(self, name, target, kind=tarfile.SYMTYPE):
+        member = tarfile.TarInfo(name)
+        member.type = kind
+        member.linkname = target
+        return member, None
+        
+    def test_extract_rejects_escaping_paths(self):
+        """测试解包拒绝位于目标目录外的成员和链接"""
+        outside = os.path.join(self.temp_dir, 'outside')
+        cases = [
+            [self._file('../outside', b'x')],
+            [self._file(outside, b'x')],
+            [self._link('link', self.temp_dir), self._file('link/outside', b'x')],
+            [self._link('hard', '../outside', tarfile.LNKTYPE)]
+        ]
+        for members in cases:
+            for verify in ('sha256', ''):
+                shutil.rmtree(self.remote_dir, ignore_errors=True)
+                result = self._extract(members, verify)
+                self.assertNotEqual(result.returncode, 0, members)
+                self.assertFalse(os.path.exists(outside))
+                
+    def test_extract_allows_inner_links(self):
+        """测试目标目录内的链接正常解包"""
+        result = self._extract([
+            self._file('lib/real.so', b'library'),
+            self._link('lib/alias.so', 'real.so')
+        ])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open(os.path.join(self.remote_dir, 'lib', 'alias.so'), 'rb') as f:
+            self.assertEqual(f.read(), b'library')
+            
+class TestArchiveDownload(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.remote_dir = os.path.join(self.temp_dir, 'remote')
+        self.local_dir = os.path.join(self.temp_dir, 'local')
+        self.files = {
+            'app/app': os.urandom(200 * 1024),
+            'app/_internal/base_library.zip': b'library' * 5000,
+            'app/_internal/empty': b''
+        }
+        for path, content in self.files.items():
+            full_path = os.path.join(self.remote_dir, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+        os.chmod(os.path.join(self.remote_dir, 'app', 'app'), 0o755)
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _check_local(self):
+        for path, content in self.files.items():
+            with open(os.path.join(self.local_dir, *path.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual(os.stat(os.path.join(self.local_dir, 'app', 'app')).st_mode & 0o777, 0o755)
+        
+    def test_auto_level(self):
+        """测试自动级别: 压缩速度不低于链路带宽的最高级别"""
+        # 单线程时空闲核数固定为 1, 结果与本机负载无关
+        cases = [(0, 3), (1e6, 19), (5e6, 15), (5e7, 6), (3e8, 1), (1e10, 1)]
+        for bandwidth, level in cases:
+            shutil.rmtree(self.local_dir, ignore_errors=True)
+            downloader = ArchiveDownloader(
+                LocalServer(),
+                compression='gzip',
+                threads=1,
+                bandwidth=bandwidth,
+                verify_hash=None
+            )
+            self.assertTrue(downloader.download(self.remote_dir, self.local_dir), downloader.error)
+            self.assertEqual(downloader.used_level, level, bandwidth)
+        self._check_local()
+        
+    def test_explicit_level(self):
+        """测试指定的级别原样使用"""
+        downloader = ArchiveDownloader(LocalServer(), compression='gzip', level=9, bandwidth=1e10)
+        self.assertTrue(downloader.download(self.remote_dir, self.local_dir), downloader.error)
+        self.assertEqual(downloader.used_level, 9)
+        self._check_local()
+        
+    @unittest.skipIf(zstandard is None, "未安装 zstandard")
+    def test_zstd_stream(self):
+        """测试 zstd 流 (Z 标记) 边接收边解压并校验"""
+        progress = []
+        downloader = ArchiveDownloader(
+            LocalServer(),
+            compression='zstd',
+            level=3,
+            progress_callback=lambda received, extracted: progress.append((received, extracted))
+        )
+        self.assertTrue(downloader.download(self.remote_dir, self.local_dir), downloader.error)
+        self._check_local()
+        self.assertEqual(downloader.files, len(self.files))
+        self.assertEqual(downloader.extracted_bytes, sum(len(c) for c in self.files.values()))
+        # 压缩后传输的字节数小于原始大小 (含可压缩文件)
+        self.assertLess(downloader.received_bytes, downloader.extracted_bytes)
+        self.assertEqual(progress[-1], (downloader.received_bytes, downloader.extracted_bytes))
+        
+    @unittest.skipIf(zstandard is None, "未安装 zstandard")
+    def test_zstd_fallback(self):
+        """测试远程不支持 zstd 时回退为 gzip 流 (G 标记)"""
+        downloader = ArchiveDownloader(NoZstdServer(), compression='zstd', level=3)
+        self.assertTrue(downloader.download(self.remote_dir, self.local_dir), downloader.error)
+        self._check_local()
+        self.assertEqual(downloader.used_level, 3)
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,162 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+import unittest
+from types import SimpleNamespace
+from typing import Optional
+from core.storage.artifacts import ArtifactStore
+
+try:
+    from fastapi import FastAPI, Header
+    from fastapi.testclient import TestClient
+    from core.api.artifacts import ArtifactAPI
+except ImportError:
+    FastAPI = None
+
+class LocalBuildManager:
+    """只提供产物相关接口的构建管理器"""
+    
+    def __init__(self, store):
+        self.artifact_store = store
+        self.tasks = {}
+        
+    def fetch_artifact(self, task_id):
+        task = self.tasks.get(task_id)
+        return task.artifact_id if task else None
+        
+def create_app(artifact_api):
+    """与 core.api.app 相同的产物路由"""
+    app = FastAPI()
+    
+    @app.get("/tasks/{task_id}/artifacts")
+    def list_artifacts(task_id: str):
+        return artifact_api.list_artifacts(task_id)
+        
+    @app.get("/tasks/{task_id}/artifacts/{name:path}")
+    def download_artifact(
+        task_id: str,
+        name: str,
+        range: Optional[str] = Header(None),
+        if_none_match: Optional[str] = Header(None),
+        if_range: Optional[str] = Header(None)
+    ):
+        return artifact_api.download_artifact(task_id, name, range, if_none_match, if_range)
+        
+    return app
+    
+@unittest.skipIf(FastAPI is None, "未安装 fastapi")
+class TestArtifactAPI(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ArtifactStore(root=os.path.join(self.temp_dir, 'store'), max_age=None)
+        self.files = {
+            'app/main': os.urandom(300 * 1024),
+            'app/lib/core.so': b'library' * 1000,
+            'README': b'readme'
+        }
+        output_dir = os.path.join(self.temp_dir, 'output')
+        for path, content in self.files.items():
+            full_path = os.path.join(output_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+        artifact_id = self.store.put(output_dir, 'demo')
+        
+        manager = LocalBuildManager(self.store)
+        manager.tasks['task'] = SimpleNamespace(artifact_id=artifact_id, remote_output=None)
+        self.client = TestClient(create_app(ArtifactAPI(manager)))
+        self.etag = self.client.get('/tasks/task/artifacts/app/main').headers['etag']
+        
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+        
+    def test_full_file(self):
+        """测试完整下载单个文件"""
+        response = self.client.get('/tasks/task/artifacts/app/main')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.files['app/main'])
+        self.assertEqual(response.headers['accept-ranges'], 'bytes')
+        self.assertEqual(int(response.headers['content-length']), len(self.files['app/main']))
+        
+    def test_ranges(self):
+        """测试区间, 后缀区间和开放区间返回 206"""
+        data = self.files['app/main']
+        size = len(data)
+        cases = [
+            ('bytes=100-1123', 100, 1123),
+            ('bytes=-512', size - 512, size - 1),
+            ('bytes=300000-', 300000, size - 1),
+            ('bytes=1000-999999999', 1000, size - 1)
+        ]
+        for header, start, end in cases:
+            response = self.client.get('/tasks/task/artifacts/app/main', headers={'Range': header})
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(response.headers['content-range'], f'bytes {start}-{end}/{size}')
+            self.assertEqual(response.content, data[start:end + 1])
+            
+    def test_unsatisfiable_range(self):
+        """测试无法满足的区间返回 416"""
+        size = len(self.files['app/main'])
+        for header in (f'bytes={size}-', 'bytes=-0', 'bytes=500-100'):
+            response = self.client.get('/tasks/task/artifacts/app/main', headers={'Range': header})
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response.headers['content-range'], f'bytes */{size}')
+            
+    def test_conditional_requests(self):
+        """测试 If-None-Match 和 If-Range"""
+        response = self.client.get('/tasks/task/artifacts/app/main', headers={'If-None-Match': self.etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        
+        # ETag 一致时按区间返回
+        response = self.client.get(
+            '/tasks/task/artifacts/app/main',
+            headers={'Range': 'bytes=0-9', 'If-Range': self.etag}
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.files['app/main'][:10])
+        
+        # ETag 不一致时忽略 Range, 返回完整文件
+        response = self.client.get(
+            '/tasks/task/artifacts/app/main',
+            headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('content-range', response.headers)
+        self.assertEqual(response.content, self.files['app/main'])
+        
+    def test_zip_stream(self):
+        """测试目录和全部文件以 zip 流返回"""
+        response = self.client.get('/tasks/task/artifacts/app')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(sorted(archive.namelist()), ['lib/core.so', 'main'])
+            self.assertEqual(archive.read('main'), self.files['app/main'])
+            self.assertEqual(archive.read('lib/core.so'), self.files['app/lib/core.so'])
+            
+        response = self.client.get('/tasks/task/artifacts/*')
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(
+                {name: archive.read(name) for name in archive.namelist()},
+                self.files
+            )
+            
+        # 内容未变时 zip 的 ETag 不变
+        response = self.client.get(
+            '/tasks/task/artifacts/*',
+            headers={'If-None-Match': response.headers['etag']}
+        )
+        self.assertEqual(response.status_code, 304)
+        
+    def test_not_found(self):
+        """测试不存在的任务和文件返回 404"""
+        self.assertEqual(self.client.get('/tasks/missing/artifacts/app/main').status_code, 404)
+        self.assertEqual(self.client.get('/tasks/task/artifacts/app/missing').status_code, 404)
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
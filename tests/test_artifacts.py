@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import random
+import shutil
+import tempfile
+import zipfile
+import unittest
+from core.storage.artifacts import ArtifactStore
+from core.storage.delta import apply_delta, DELTA_FORMAT
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ArtifactStore(
+            root=os.path.join(self.temp_dir, 'store'),
+            max_count=2,
+            max_age=None
+        )
+        
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+        
+    def _output(self, name, files):
+        output_dir = os.path.join(self.temp_dir, name)
+        for path, content in files.items():
+            full_path = os.path.join(output_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+        return output_dir
+        
+    def _objects(self):
+        return sorted(
+            name for _, _, names in os.walk(self.store.chunks_dir) for name in names
+        )
+        
+    def test_put_export_and_dedup(self):
+        first = self.store.put(self._output('a', {'app/main': b'exe', 'app/lib.so': b'lib'}), 'demo')
+        second = self.store.put(self._output('b', {'app/main': b'exe2', 'app/lib.so': b'lib'}), 'demo')
+        
+        # 相同内容只保存一份
+        self.assertEqual(len(self._objects()), 3)
+        self.assertEqual(self.store.get(first)['file_count'], 2)
+        
+        export_dir = os.path.join(self.temp_dir, 'export')
+        self.assertTrue(self.store.export(second, export_dir))
+        with open(os.path.join(export_dir, 'app', 'main'), 'rb') as f:
+            self.assertEqual(f.read(), b'exe2')
+        with self.store.open_file(first, 'app/lib.so') as f:
+            self.assertEqual(f.read(), b'lib')
+            
+    def test_retention_by_count_and_size(self):
+        ids = []
+        for index in range(3):
+            ids.append(self.store.put(self._output(f'o{index}', {'main': bytes([index]) * 10}), 'demo'))
+            time.sleep(0.01)
+        self.store.wait_deletions()
+        
+        # 每个项目保留最新的 2 个, 未被引用的对象在后台删除
+        self.assertIsNone(self.store.get(ids[0]))
+        self.assertEqual(len(self._objects()), 2)
+        
+        # 超出全局容量时淘汰最久未使用的产物
+        self.store.max_bytes = 15
+        self.store.touch(ids[1])
+        self.assertEqual(self.store.apply_retention(), [ids[2]])
+        self.store.wait_deletions()
+        self.assertEqual(len(self._objects()), 1)
+        
+    def test_chunk_dedup_across_shifted_content(self):
+        rng = random.Random(0)
+        payload = bytes(rng.getrandbits(8) for _ in range(512 * 1024))
+        first = self.store.put(self._output('a', {'app': payload}), 'demo', platform='linux')
+        size_after_first = self.store.total_size()
+        
+        # 中间插入数据后, 只有插入点附近的分块需要新保存
+        changed = payload[:200000] + b'patched' + payload[200000:]
+        second = self.store.put(self._output('b', {'app': changed}), 'demo', platform='windows')
+        self.assertLess(self.store.total_size() - size_after_first, 150 * 1024)
+        self.assertEqual(self.store.logical_size(), len(payload) + len(changed))
+        
+        # 按需还原任意区间
+        with self.store.open_file(second, 'app') as f:
+            f.seek(199990)
+            self.assertEqual(f.read(27), changed[199990:200017])
+            f.seek(0)
+            self.assertEqual(f.read(), changed)
+            
+        # 删除一个产物后, 共享分块仍可读取
+        self.store.delete(first)
+        self.store.wait_deletions()
+        self.assertEqual(self.store.total_size(), sum(
+            os.path.getsize(os.path.join(dirpath, name))
+            for dirpath, _, names in os.walk(self.store.chunks_dir) for name in names
+        ))
+        export_dir = os.path.join(self.temp_dir, 'export')
+        self.assertTrue(self.store.export(second, export_dir))
+        with open(os.path.join(export_dir, 'app'), 'rb') as f:
+            self.assertEqual(f.read(), changed)
+            
+    def test_delta_between_versions(self):
+        rng = random.Random(1)
+        payload = bytes(rng.getrandbits(8) for _ in range(512 * 1024))
+        changed = payload[:300000] + b'v2' + payload[300000:]
+        base = self.store.put(self._output('v1', {
+            'app': payload,
+            'lib/a.so': b'shared library',
+            'old.txt': b'removed'
+        }), 'demo')
+        target = self.store.put(self._output('v2', {
+            'app': changed,
+            'lib/b.so': b'shared library',
+            'new.txt': b'added'
+        }), 'demo')
+        
+        path = self.store.get_delta(base, target)
+        self.assertLess(os.path.getsize(path), 150 * 1024)
+        # 同一版本对只生成一次
+        mtime = os.path.getmtime(path)
+        self.assertEqual(self.store.get_delta(base, target), path)
+        self.assertEqual(os.path.getmtime(path), mtime)
+        
+        base_dir = os.path.join(self.temp_dir, 'client_v1')
+        self.assertTrue(self.store.export(base, base_dir))
+        dest_dir = os.path.join(self.temp_dir, 'client_v2')
+        manifest = apply_delta(path, base_dir, dest_dir)
+        ops = {item['path']: item['op'] for item in manifest['files']}
+        self.assertEqual(ops, {'app': 'patch', 'lib/b.so': 'keep', 'new.txt': 'new'})
+        self.assertEqual(manifest['deleted'], ['lib/a.so', 'old.txt'])
+        with open(os.path.join(dest_dir, 'app'), 'rb') as f:
+            self.assertEqual(f.read(), changed)
+        self.assertFalse(os.path.exists(os.path.join(dest_dir, 'old.txt')))
+        
+        # 产物删除后其差异包一并删除, 之后不再生成
+        self.store.delete(base)
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.store.get_delta(base, target))
+        
+    def test_delta_rejects_unsafe_paths(self):
+        base_dir = self._output('base', {'app': b'data'})
+        for item in [
+            {'op': 'new', 'path': '../escape', 'size': 0, 'hash': '', 'mode': 0o644},
+            {'op': 'new', 'path': '/tmp/escape', 'size': 0, 'hash': '', 'mode': 0o644},
+            {'op': 'keep', 'path': 'copy', 'base_path': '../../etc/passwd', 'size': 0, 'hash': '', 'mode': 0o644}
+        ]:
+            package = os.path.join(self.temp_dir, 'evil.zip')
+            with zipfile.ZipFile(package, 'w') as archive:
+                archive.writestr('delta.json', json.dumps({'format': DELTA_FORMAT, 'files': [item], 'deleted': []}))
+            with self.assertRaises(ValueError):
+                apply_delta(package, base_dir, os.path.join(self.temp_dir, 'dest'))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'escape')))
+        
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,398 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from core.server import (
+    AsyncUnixServer,
+    SyncServerAdapter,
+    EventLoopThread,
+    ServerFactory
+)
+from core.server.adapter import AsyncSFTPClient, AsyncChannel
+from core.server.retry import async_retry
+from core.server.status_cache import StatusCache
+from core.transfer.upload import ParallelUploader
+from core.transfer.download import ParallelDownloader
+
+class LocalProcess:
+    """以本地子进程模拟 asyncssh 的远程进程"""
+    
+    def __init__(self, proc, server):
+        self.proc = proc
+        self.server = server
+        self.stdin = proc.stdin
+        self.stdout = proc.stdout
+        self.stderr = proc.stderr
+        self.running = True
+        server.active += 1
+        server.peak = max(server.peak, server.active)
+        
+    @property
+    def exit_status(self):
+        return self.proc.returncode
+        
+    async def wait_closed(self):
+        await self.proc.wait()
+        if self.running:
+            self.running = False
+            self.server.active -= 1
+            
+    def close(self):
+        if self.proc.returncode is None:
+            self.proc.kill()
+            
+class LocalSFTPFile:
+    """以本地文件模拟 asyncssh 的 SFTP 文件"""
+    
+    def __init__(self, path, mode):
+        self.file = open(path, mode)
+        
+    async def read(self, size=-1, offset=None):
+        await asyncio.sleep(0)
+        if offset is not None:
+            self.file.seek(offset)
+        return self.file.read(size)
+        
+    async def write(self, data, offset=None):
+        await asyncio.sleep(0)
+        if offset is not None:
+            self.file.seek(offset)
+        self.file.write(data)
+        
+    async def truncate(self, size=None):
+        self.file.truncate(size)
+        
+    async def stat(self):
+        return SimpleNamespace(size=os.fstat(self.file.fileno()).st_size)
+        
+    async def close(self):
+        self.file.close()
+        
+class LocalSFTP:
+    """以本地文件系统模拟 asyncssh 的 SFTP 客户端"""
+    
+    async def open(self, path, mode):
+        return LocalSFTPFile(path, mode)
+        
+    async def stat(self, path):
+        st = os.stat(path)
+        return SimpleNamespace(
+            permissions=st.st_mode,
+            size=st.st_size,
+            uid=st.st_uid,
+            gid=st.st_gid,
+            atime=st.st_atime,
+            mtime=st.st_mtime
+        )
+        
+    async def mkdir(self, path):
+        os.mkdir(path)
+        
+    async def remove(self, path):
+        os.remove(path)
+        
+    async def rename(self, old_path, new_path):
+        os.rename(old_path, new_path)
+        
+    async def posix_rename(self, old_path, new_path):
+        os.replace(old_path, new_path)
+        
+    async def put(self, local_path, remote_path):
+        shutil.copyfile(local_path, remote_path)
+        
+    async def get(self, remote_path, local_path):
+        shutil.copyfile(remote_path, local_path)
+        
+    def exit(self):
+        pass
+        
+class LocalAsyncServer(AsyncUnixServer):
+    """在本地 shell 中执行命令的异步服务器"""
+    
+    def __init__(self, config=None):
+        super().__init__({
+            'host': 'localhost',
+            'username': 'test',
+            'python': sys.executable,
+            **(config or {})
+        })
+        self.active = 0
+        self.peak = 0
+        
+    async def connect(self):
+        self.conn = object()
+        self._reset_session_state()
+        self.status.connected = True
+        return True
+        
+    async def disconnect(self):
+        self.conn = None
+        self.status.connected = False
+        
+    async def open_process(self, command):
+        self._require_connection()
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        return LocalProcess(proc, self)
+        
+    async def start_sftp(self):
+        self._require_connection()
+        return LocalSFTP()
+        
+class ProbeServer(LocalAsyncServer):
+    """记录并发探测数的异步服务器"""
+    
+    probing = 0
+    peak_probing = 0
+    threads = set()
+    
+    async def check_health(self):
+        cls = type(self)
+        cls.probing += 1
+        cls.peak_probing = max(cls.peak_probing, cls.probing)
+        cls.threads.add(threading.current_thread().name)
+        await asyncio.sleep(0.05)
+        cls.probing -= 1
+        self.status.cpu_usage = 42.0
+        return self.status
+        
+class CollectingLog:
+    """收集流式输出的日志"""
+    
+    def __init__(self):
+        self.lines = []
+        
+    def write(self, stream, line):
+        self.lines.append((stream, line))
+        
+class TestAsyncServer(unittest.TestCase):
+    """异步服务器与会话数限制"""
+    
+    def test_concurrent_commands_limited_by_sessions(self):
+        """测试同一连接上的并发命令受 max_sessions 限制"""
+        server = LocalAsyncServer({'max_sessions': 3})
+        
+        async def run():
+            await server.connect()
+            return await asyncio.gather(*[
+                server.execute_command(f"sleep 0.05; echo {i}") for i in range(9)
+            ])
+            
+        results = asyncio.run(run())
+        self.assertEqual([stdout.strip() for stdout, _ in results], [str(i) for i in range(9)])
+        self.assertGreater(server.peak, 1)
+        self.assertLessEqual(server.peak, 3)
+        
+    def test_stdin_and_directories(self):
+        """测试 stdin 输入以及与同步服务器共用的建目录命令"""
+        server = LocalAsyncServer()
+        temp_dir = tempfile.mkdtemp()
+        try:
+            async def run():
+                await server.connect()
+                output = await server.execute_python_input(
+                    "import sys; print(sys.stdin.read().upper(), sys.argv[1])", b"data", "arg"
+                )
+                created = await server.create_directories([
+                    os.path.join(temp_dir, 'a', 'b'),
+                    os.path.join(temp_dir, "it's")
+                ])
+                removed = await server.remove_directory(os.path.join(temp_dir, 'a'))
+                return output, created, removed
+                
+            (stdout, _), created, removed = asyncio.run(run())
+            self.assertEqual(stdout.strip(), "DATA arg")
+            self.assertTrue(created and removed)
+            self.assertEqual(os.listdir(temp_dir), ["it's"])
+        finally:
+            shutil.rmtree(temp_dir)
+            
+    def test_async_retry(self):
+        """测试协程重试"""
+        attempts = []
+        
+        @async_retry(max_attempts=3, delay=0.01, exceptions=(OSError,))
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OSError("connection reset")
+            return True
+            
+        self.assertTrue(asyncio.run(flaky()))
+        self.assertEqual(len(attempts), 3)
+        
+class TestSyncServerAdapter(unittest.TestCase):
+    """同步适配器: 远程代理, 命令通道和 SFTP 都在共享事件循环上运行"""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.adapters = []
+        
+    def tearDown(self):
+        for adapter in self.adapters:
+            adapter.disconnect()
+        shutil.rmtree(self.temp_dir)
+        
+    def _adapter(self, **config):
+        adapter = SyncServerAdapter(LocalAsyncServer(config))
+        self.assertTrue(adapter.connect())
+        self.adapters.append(adapter)
+        return adapter
+        
+    def _write_tree(self, root):
+        files = {
+            'main.py': b'print(1)\n',
+            'pkg/__init__.py': b'',
+            'pkg/data/blob.bin': os.urandom(600 * 1024)
+        }
+        for path, data in files.items():
+            full_path = os.path.join(root, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(data)
+        return files
+        
+    def test_agent_runs_over_async_channel(self):
+        """测试远程代理在适配器的会话通道上运行"""
+        adapter = self._adapter()
+        self.assertTrue(adapter._agent_ready())
+        self.assertIsInstance(adapter.agent.channel, AsyncChannel)
+        
+        self.assertEqual(adapter.execute_command("echo hello"), ("hello\n", ""))
+        stdout, _ = adapter.execute_python_input("import sys; print(len(sys.stdin.buffer.read()))", b"x" * 100000)
+        self.assertEqual(stdout.strip(), "100000")
+        
+        target = os.path.join(self.temp_dir, 'x', 'y')
+        self.assertTrue(adapter.create_directories([target]))
+        self.assertTrue(os.path.isdir(target))
+        self.assertTrue(adapter.remove_directory(os.path.join(self.temp_dir, 'x')))
+        self.assertFalse(os.path.exists(target))
+        
+    def test_streaming_without_agent(self):
+        """测试不启动代理时经独立通道执行和流式读取"""
+        adapter = self._adapter(agent=False)
+        self.assertIsNone(adapter.agent)
+        self.assertEqual(adapter.execute_command("echo out; echo err >&2"), ("out\n", "err\n"))
+        
+        log = CollectingLog()
+        status = adapter.execute_streaming("echo one; echo two >&2; exit 3", log)
+        self.assertEqual(status, 3)
+        self.assertEqual(sorted(log.lines), [('stderr', 'two'), ('stdout', 'one')])
+        
+        with self.assertRaises(TimeoutError):
+            adapter.execute_streaming("sleep 5", CollectingLog(), timeout=0.2)
+            
+    def test_sftp_facade(self):
+        """测试 SFTP 接口: 流水线写入, 区间读取, 属性和改名"""
+        adapter = self._adapter(agent=False)
+        sftp = adapter.open_sftp()
+        self.assertIsInstance(sftp, AsyncSFTPClient)
+        self.assertFalse(sftp.get_channel().closed)
+        
+        path = os.path.join(self.temp_dir, 'file.bin')
+        data = os.urandom(200 * 1024)
+        with sftp.open(path, 'wb') as remote_file:
+            remote_file.set_pipelined(True)
+            for offset in range(0, len(data), 1000):
+                remote_file.write(data[offset:offset + 1000])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+            
+        with sftp.open(path, 'rb') as remote_file:
+            remote_file.seek(100)
+            self.assertEqual(remote_file.read(50), data[100:150])
+            self.assertEqual(remote_file.readv([(0, 10), (5000, 20)]), [data[:10], data[5000:5020]])
+            
+        os.chmod(path, 0o755)
+        self.assertEqual(sftp.stat(path).st_mode & 0o777, 0o755)
+        sftp.posix_rename(path, path + '.moved')
+        self.assertTrue(os.path.exists(path + '.moved'))
+        with self.assertRaises(IOError):
+            sftp.stat(path)
+            
+        sftp.close()
+        self.assertTrue(sftp.get_channel().closed)
+        
+    def test_upload_and_download_tree(self):
+        """测试并行上传 (SFTP 与校验两条路径) 和目录下载经适配器完成"""
+        adapter = self._adapter()
+        local_root = os.path.join(self.temp_dir, 'local')
+        files = self._write_tree(local_root)
+        
+        for verify_hash in (None, 'sha256'):
+            remote_root = os.path.join(self.temp_dir, f'remote-{verify_hash}')
+            uploads = []
+            for path in files:
+                remote_path = os.path.join(remote_root, *path.split('/'))
+                os.makedirs(os.path.dirname(remote_path), exist_ok=True)
+                uploads.append((os.path.join(local_root, *path.split('/')), remote_path, len(files[path])))
+            uploader = ParallelUploader(adapter, channels=2, atomic=True, verify_hash=verify_hash)
+            self.assertTrue(uploader.upload(uploads), uploader.error)
+            for path, data in files.items():
+                with open(os.path.join(remote_root, *path.split('/')), 'rb') as f:
+                    self.assertEqual(f.read(), data)
+                    
+        download_root = os.path.join(self.temp_dir, 'download')
+        downloader = ParallelDownloader(adapter, channels=2)
+        self.assertTrue(downloader.download_tree(os.path.join(self.temp_dir, 'remote-None'), download_root))
+        for path, data in files.items():
+            with open(os.path.join(download_root, *path.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), data)
+                
+class TestServerWiring(unittest.TestCase):
+    """工厂和状态缓存对异步后端的支持"""
+    
+    def test_factory_selects_backend(self):
+        """测试按配置创建异步后端并识别服务器类型"""
+        config = {'host': 'localhost', 'username': 'test'}
+        server = ServerFactory.create_server('unix', {**config, 'backend': 'asyncssh'})
+        self.assertIsInstance(server, SyncServerAdapter)
+        self.assertIsInstance(server.server, AsyncUnixServer)
+        self.assertIs(server.loop, EventLoopThread.shared())
+        self.assertEqual(ServerFactory.get_server_type(server), 'unix')
+        
+        windows = ServerFactory.create_server('windows', {**config, 'backend': 'asyncssh'})
+        self.assertEqual(windows.encoding, 'gbk')
+        self.assertEqual(ServerFactory.get_server_type(windows), 'windows')
+        self.assertEqual(ServerFactory.get_server_type(ServerFactory.create_server('macos', config)), 'macos')
+        
+    def test_status_cache_gathers_async_servers(self):
+        """测试异步服务器在同一个事件循环中并发探测"""
+        loop = EventLoopThread()
+        try:
+            servers = {f"s{i}": SyncServerAdapter(ProbeServer(), loop) for i in range(6)}
+            cache = StatusCache(lambda: dict(servers), ttl=30, refresh_interval=60, max_workers=1)
+            try:
+                start = time.time()
+                snapshots = cache.refresh_many(list(servers) + ['missing'])
+                self.assertLess(time.time() - start, 0.25)
+                
+                self.assertEqual(sorted(snapshots), sorted(servers))
+                self.assertEqual(ProbeServer.peak_probing, 6)
+                self.assertEqual(ProbeServer.threads, {"server-event-loop"})
+                self.assertEqual(cache.get('s0').status.cpu_usage, 42.0)
+                
+                # 过期的异步服务器合并为一次后台探测
+                cache.snapshots.clear()
+                self.assertEqual(cache.refresh_expired(), 6)
+                deadline = time.time() + 2
+                while len(cache.snapshots) < 6 and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(len(cache.snapshots), 6)
+            finally:
+                cache.stop()
+        finally:
+            loop.stop()
+            
+if __name__ == '__main__':
+    unittest.main()
+    
\ No newline at end of file
@@ -0,0 +1,66 @@
+import threading
+import time
+import unittest
+from core.transfer import BandwidthManager
+
+CHUNK = 64 * 1024
+
+def run_threads(flow, threads, chunks, errors):
+    def worker():
+        try:
+            for _ in range(chunks):
+                flow.consume(CHUNK)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    return workers
+
+class TestBandwidthManager(unittest.TestCase):
+    def test_many_threads_on_one_flow(self):
+        manager = BandwidthManager(global_rate=64 * 1024 * 1024)
+        flow = manager.register('task', 'host')
+        errors = []
+        for worker_thread in run_threads(flow, 4, 20, errors):
+            worker_thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(flow.transferred, 4 * 20 * CHUNK)
+        self.assertEqual(manager.get_status()['task']['waiting'], 0)
+        manager.unregister(flow)
+
+    def test_small_task_not_queued_behind_large_one(self):
+        # 未设置全局上限, 仅按实测链路带宽在同一服务器的流之间公平分配
+        manager = BandwidthManager()
+        manager.set_link_rate('host', 4 * 1024 * 1024)
+        large = manager.register('large', 'host')
+        small = manager.register('small', 'host')
+        errors = []
+
+        workers = run_threads(large, 4, 40, errors)
+        time.sleep(0.05)
+        start = time.monotonic()
+        for worker_thread in run_threads(small, 2, 4, errors):
+            worker_thread.join(10)
+        small_elapsed = time.monotonic() - start
+        for worker_thread in workers:
+            worker_thread.join(20)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(small.transferred, 2 * 4 * CHUNK)
+        self.assertEqual(large.transferred, 4 * 40 * CHUNK)
+        # 小任务只需 512KB, 按份额应在大任务 (10MB) 结束前很久完成
+        self.assertLess(small_elapsed, 1.0)
+
+    def test_single_flow_not_shaped_by_link_rate(self):
+        manager = BandwidthManager()
+        manager.set_link_rate('host', 1024)
+        flow = manager.register('task', 'host')
+        start = time.monotonic()
+        flow.consume(10 * 1024 * 1024)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
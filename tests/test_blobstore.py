@@ -0,0 +1,117 @@
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import unittest
+from core.transfer.blobstore import RemoteBlobStore
+
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+    
+    config = {}
+    
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(self.python_command(script, *args), capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+    def execute_python_input(self, script, data, *args):
+        result = subprocess.run(self.python_command(script, *args), input=data, capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+class NoLinkServer(LocalServer):
+    """不支持硬链接的服务器, 生成工作目录时只能 reflink 或复制"""
+    
+    def python_command(self, script, *args):
+        prefix = 'import os\ndef link(*args):\n    raise OSError("no link")\nos.link = link\n'
+        return super().python_command(prefix + script, *args)
+        
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.temp_dir, 'blobs')
+        self.workspace = os.path.join(self.temp_dir, 'workspace')
+        self.store = RemoteBlobStore(LocalServer(), root=self.root, max_bytes=1)
+        
+    def tearDown(self):
+        for directory, _, names in os.walk(self.temp_dir):
+            for name in names:
+                os.chmod(os.path.join(directory, name), 0o644)
+        shutil.rmtree(self.temp_dir)
+        
+    def _incoming(self, batch, content):
+        digest = hashlib.sha256(content).hexdigest()
+        os.makedirs(os.path.join(self.root, 'incoming', batch), exist_ok=True)
+        with open(os.path.join(self.root, 'incoming', batch, digest), 'wb') as f:
+            f.write(content)
+        return digest
+        
+    def test_materialize_keeps_blob_intact(self):
+        """测试生成工作目录后存储中的内容只读且不被修改"""
+        digest = self._incoming('task1', b'print(1)\n')
+        self.assertTrue(self.store.materialize({'app/main.py': (digest, 0o644)}, self.workspace, 'task1'), self.store.error)
+        blob = os.path.join(self.root, digest[:2], digest)
+        dest = os.path.join(self.workspace, 'app', 'main.py')
+        with open(dest, 'rb') as f:
+            self.assertEqual(f.read(), b'print(1)\n')
+            
+        # 存储中的内容只读, 硬链接的文件不能被原地修改, 独立副本的修改不影响存储
+        self.assertFalse(os.stat(blob).st_mode & 0o222)
+        if not os.path.samefile(blob, dest):
+            with open(dest, 'wb') as f:
+                f.write(b'changed')
+        with open(blob, 'rb') as f:
+            self.assertEqual(f.read(), b'print(1)\n')
+            
+        # 再次使用不修改内容文件 (及硬链接的工作目录文件) 的时间
+        os.utime(blob, (1000, 1000))
+        self.assertTrue(self.store.materialize({'other.py': (digest, 0o644)}, self.workspace, 'task2'))
+        self.assertEqual(os.stat(blob).st_mtime, 1000)
+        
+    def test_collected_blob_reported(self):
+        """测试已被回收的内容记录在 vanished 中"""
+        digest = self._incoming('task1', b'data')
+        self.assertTrue(self.store.materialize({'a': (digest, 0o644)}, self.workspace, 'task1'))
+        self.assertEqual(self.store.gc()['removed'], 1)
+        
+        self.assertFalse(self.store.materialize({'a': (digest, 0o644), 'b': (digest, 0o644)}, self.workspace, 'task2'))
+        self.assertEqual(self.store.vanished, [digest])
+        
+    def _modes(self):
+        return {
+            name: os.stat(os.path.join(self.workspace, name)).st_mode & 0o777
+            for name in os.listdir(self.workspace)
+        }
+        
+    def test_materialize_modes(self):
+        """测试相同内容的可执行文件和普通文件各自保留执行权限"""
+        digest = self._incoming('task1', b'#!/bin/sh\necho ok\n')
+        files = {'run.sh': (digest, 0o755), 'copy.txt': (digest, 0o644)}
+        self.assertTrue(self.store.materialize(files, self.workspace, 'task1'), self.store.error)
+        blob = os.path.join(self.root, digest[:2], digest)
+        modes = self._modes()
+        for name, (_, mode) in files.items():
+            dest = os.path.join(self.workspace, name)
+            if any(os.path.exists(path) and os.path.samefile(path, dest) for path in (blob, blob + '.x')):
+                # 硬链接只读, 只保留执行权限
+                self.assertEqual(modes[name], 0o555 if mode & 0o111 else 0o444)
+            else:
+                self.assertEqual(modes[name], mode)
+        self.assertTrue(modes['run.sh'] & 0o111)
+        self.assertFalse(modes['copy.txt'] & 0o111)
+        self.assertFalse(os.stat(blob).st_mode & 0o111)
+        
+        # 不支持硬链接时 reflink 或复制的文件使用清单中的权限
+        shutil.rmtree(self.workspace)
+        store = RemoteBlobStore(NoLinkServer(), root=self.root)
+        files['private.bin'] = (digest, 0o600)
+        self.assertTrue(store.materialize(files, self.workspace, 'task2'), store.error)
+        self.assertEqual(self._modes(), {name: mode for name, (_, mode) in files.items()})
+        
+if __name__ == '__main__':
+    unittest.main()
+    
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from core.builder.cache import BuildCache, build_fingerprint
+
+class TestBuildCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = BuildCache(root=os.path.join(self.temp_dir, 'cache'), max_entries=2)
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def test_fingerprint_ignores_config_order(self):
+        toolchain = {'python': '3.11.4', 'PyInstaller': '6.3.0'}
+        a = build_fingerprint('tree', 'linux', 'main.py', 'pyinstaller', {'onefile': True, 'name': 'app'}, toolchain)
+        b = build_fingerprint('tree', 'linux', 'main.py', 'pyinstaller', {'name': 'app', 'onefile': True}, toolchain)
+        c = build_fingerprint('tree', 'linux', 'main.py', 'pyinstaller', {'name': 'app', 'onefile': False}, toolchain)
+        d = build_fingerprint('tree', 'linux', 'main.py', 'pyinstaller', {'name': 'app'}, {'python': '3.12.0', 'PyInstaller': '6.3.0'})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(a, d)
+        
+    def test_put_get_and_evict(self):
+        self.assertIsNone(self.cache.get('fp1'))
+        
+        for index in range(3):
+            self.assertTrue(self.cache.put(f'fp{index}', f'artifact{index}'))
+            time.sleep(0.01)
+            
+        # 最多保留两个条目, 最早的被淘汰
+        self.assertFalse(self.cache.contains('fp0'))
+        self.assertEqual(self.cache.get('fp2'), 'artifact2')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        
+    def test_get_drops_deleted_artifact(self):
+        self.cache.put('fp', 'artifact')
+        self.assertIsNone(self.cache.get('fp', lambda artifact_id: False))
+        self.assertFalse(self.cache.contains('fp'))
+        
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import io
+import os
+import sys
+import random
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import unittest
+from core.transfer import delta as delta_module
+from core.transfer.delta import (
+    block_signatures,
+    compute_delta,
+    encode_delta,
+    apply_delta,
+    OP_COPY,
+    REMOTE_PATCH_SCRIPT
+)
+from core.transfer.manifest import temp_path
+
+class TestDeltaTransfer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.block_size = 1024
+        rng = random.Random(42)
+        self.basis = bytes(rng.getrandbits(8) for _ in range(64 * 1024))
+        self.basis_path = os.path.join(self.temp_dir, 'basis.bin')
+        with open(self.basis_path, 'wb') as f:
+            f.write(self.basis)
+            
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _roundtrip(self, data):
+        signatures = block_signatures(self.basis_path, self.block_size)
+        ops = list(compute_delta(data, signatures, self.block_size))
+        delta = io.BytesIO()
+        encode_delta(iter(ops), delta)
+        delta.seek(0)
+        
+        out = io.BytesIO()
+        with open(self.basis_path, 'rb') as basis:
+            apply_delta(basis, delta, out, self.block_size)
+        return ops, out.getvalue()
+        
+    def test_identical_file(self):
+        """测试相同文件只发送块引用"""
+        ops, result = self._roundtrip(self.basis)
+        self.assertEqual(result, self.basis)
+        self.assertTrue(all(op == OP_COPY for op, _ in ops))
+        
+    def test_insertion(self):
+        """测试中间插入数据后仍能复用后续块"""
+        data = self.basis[:10000] + b'inserted bytes' + self.basis[10000:]
+        ops, result = self._roundtrip(data)
+        self.assertEqual(result, data)
+        
+        literal = sum(len(value) for op, value in ops if op != OP_COPY)
+        self.assertLess(literal, 2 * self.block_size)
+        
+    def test_modification_and_truncation(self):
+        """测试修改和截断"""
+        data = bytearray(self.basis[:40000])
+        data[5000:5010] = b'x' * 10
+        ops, result = self._roundtrip(bytes(data))
+        self.assertEqual(result, bytes(data))
+        
+    @unittest.skipIf(delta_module.np is None, "需要 numpy")
+    def test_vectorized_scan_matches_rolling(self):
+        """测试向量化扫描与逐字节滚动的匹配结果一致"""
+        data = bytearray(self.basis)
+        data[3000:3000] = b'inserted'
+        data[30000:30500] = os.urandom(700)
+        table = {}
+        for index, (weak, strong) in enumerate(block_signatures(self.basis_path, self.block_size)):
+            table.setdefault(weak, []).append((index, strong))
+        self.assertEqual(
+            list(delta_module._scan_vectorized(bytes(data), table, self.block_size)),
+            list(delta_module._scan_rolling(bytes(data), table, self.block_size))
+        )
+        
+    def test_patch_keeps_mode(self):
+        """测试远程重建后保留文件权限"""
+        os.chmod(self.basis_path, 0o755)
+        data = self.basis[:10000] + b'inserted bytes' + self.basis[10000:]
+        stream = io.BytesIO()
+        encode_delta(compute_delta(data, block_signatures(self.basis_path, self.block_size), self.block_size), stream)
+        expected = hashlib.sha256(data).hexdigest()
+        subprocess.run(
+            [
+                sys.executable, '-c', REMOTE_PATCH_SCRIPT,
+                self.basis_path, self.basis_path, temp_path(self.basis_path),
+                str(self.block_size), expected
+            ],
+            input=stream.getvalue(),
+            check=True
+        )
+        with open(self.basis_path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.stat(self.basis_path).st_mode & 0o777, 0o755)
+        self.assertEqual(os.listdir(self.temp_dir), ['basis.bin'])
+        
+    def test_patch_from_other_basis(self):
+        """测试以上一次工作目录中的文件为旧版本重建到新目录"""
+        data = self.basis[:20000] + b'changed' + self.basis[20000:]
+        stream = io.BytesIO()
+        encode_delta(compute_delta(data, block_signatures(self.basis_path, self.block_size), self.block_size), stream)
+        target = os.path.join(self.temp_dir, 'workspace', 'lib', 'data.bin')
+        subprocess.run(
+            [
+                sys.executable, '-c', REMOTE_PATCH_SCRIPT,
+                self.basis_path, target, temp_path(target),
+                str(self.block_size), hashlib.sha256(data).hexdigest()
+            ],
+            input=stream.getvalue(),
+            check=True
+        )
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        # 旧版本保持不变
+        with open(self.basis_path, 'rb') as f:
+            self.assertEqual(f.read(), self.basis)
+        self.assertEqual(os.listdir(os.path.dirname(target)), ['data.bin'])
+        
+    def test_patch_hash_mismatch(self):
+        """测试哈希不符时不替换目标文件且不留下临时文件"""
+        stream = io.BytesIO()
+        encode_delta(compute_delta(b'new data', [], self.block_size), stream)
+        result = subprocess.run(
+            [
+                sys.executable, '-c', REMOTE_PATCH_SCRIPT,
+                self.basis_path, self.basis_path, temp_path(self.basis_path),
+                str(self.block_size), '0' * 64
+            ],
+            input=stream.getvalue(),
+            capture_output=True
+        )
+        self.assertNotEqual(result.returncode, 0)
+        with open(self.basis_path, 'rb') as f:
+            self.assertEqual(f.read(), self.basis)
+        self.assertEqual(os.listdir(self.temp_dir), ['basis.bin'])
+
+if __name__ == '__main__':
+    unittest.main()
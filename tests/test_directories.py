@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import unittest
+from core.server import BaseServer
+from core.server.unix import UnixServer
+from core.server.windows import WindowsServer
+from core.transfer.manifest import plan_directories
+
+class TestPlanDirectories(unittest.TestCase):
+    def test_leaf_directories(self):
+        """测试只保留叶子目录"""
+        paths = [
+            'main.py',
+            'pkg/__init__.py',
+            'pkg/sub/a.py',
+            'pkg/sub/b.py',
+            'pkg/sub/deep/c.py',
+            'data/x/y/z.bin',
+            'docs/readme.md'
+        ]
+        self.assertEqual(plan_directories(paths), ['data/x/y', 'docs', 'pkg/sub/deep'])
+        self.assertEqual(plan_directories(['main.py']), [])
+        self.assertEqual(plan_directories([]), [])
+        
+    def test_covers_all_parents(self):
+        """测试逐个创建叶子目录 (含父目录) 后所有文件的父目录都存在"""
+        paths = [f'a/b{index % 7}/c{index % 3}/file{index}' for index in range(100)] + ['a/top']
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for directory in plan_directories(paths):
+                os.makedirs(os.path.join(temp_dir, directory))
+            for path in paths:
+                self.assertTrue(os.path.isdir(os.path.join(temp_dir, os.path.dirname(path))))
+        finally:
+            shutil.rmtree(temp_dir)
+            
+class TestBatchArguments(unittest.TestCase):
+    def test_batches_under_limit(self):
+        """测试分批后每批长度不超过上限且保持顺序"""
+        paths = [f'/tmp/workspace_task/dir_{index:04d}/' + 'x' * (index % 50) for index in range(1000)]
+        batches = BaseServer._batch_arguments(paths, 6000)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual([path for batch in batches for path in batch], paths)
+        for batch in batches:
+            self.assertLessEqual(sum(len(path) + 3 for path in batch), 6000)
+            
+    def test_long_argument(self):
+        """测试超过上限的单个参数单独成批"""
+        long_path = 'x' * 7000
+        self.assertEqual(
+            BaseServer._batch_arguments(['a', long_path, 'b'], 6000),
+            [['a'], [long_path], ['b']]
+        )
+        self.assertEqual(BaseServer._batch_arguments([], 6000), [])
+        
+    def test_windows_command_length(self):
+        """测试 Windows 命令不超过 cmd.exe 的长度上限"""
+        paths = [f"C:\\build\\workspace\\it's dir {index:04d}" for index in range(2000)]
+        commands = WindowsServer.mkdir_commands(paths)
+        self.assertGreater(len(commands), 1)
+        for command in commands:
+            self.assertLess(len(command), 8191)
+        self.assertIn("'C:\\build\\workspace\\it''s dir 0000'", commands[0])
+        
+    def test_unix_commands(self):
+        """测试 Unix 命令在本地 shell 中创建所有目录"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(temp_dir, f"dir {index}", "it's $HOME") for index in range(3000)]
+            commands = UnixServer.mkdir_commands(paths)
+            self.assertGreater(len(commands), 1)
+            for command in commands:
+                subprocess.run(command, shell=True, check=True)
+            for path in paths:
+                self.assertTrue(os.path.isdir(path))
+        finally:
+            shutil.rmtree(temp_dir)
+            
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+from core.transfer.download import ParallelDownloader
+
+class LocalFile:
+    """以本地文件模拟 SFTP 文件, 可按次数返回损坏的内容"""
+    
+    def __init__(self, path, mode, corrupt):
+        self.file = open(path, mode)
+        self.corrupt = corrupt
+        
+    def prefetch(self, size):
+        pass
+        
+    def read(self, size):
+        data = self.file.read(size)
+        if data and self.corrupt:
+            return bytes([data[0] ^ 0xFF]) + data[1:]
+        return data
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.file.close()
+        
+class LocalSFTP:
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        
+    def get_channel(self):
+        return self
+        
+    def open(self, path, mode):
+        with self.server.lock:
+            remaining = self.server.corrupt.get(path, 0)
+            if remaining:
+                self.server.corrupt[path] = remaining - 1
+        return LocalFile(path, mode, remaining > 0)
+        
+    def stat(self, path):
+        return os.stat(path)
+        
+    def close(self):
+        self.closed = True
+        
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = 0
+        self.corrupt = {}  # 远程路径 -> 返回损坏内容的次数
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run([sys.executable, '-c', script, *args], capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+    def open_sftp(self):
+        with self.lock:
+            self.channels += 1
+        return LocalSFTP(self)
+        
+class TestParallelDownload(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.remote_dir = os.path.join(self.temp_dir, 'remote')
+        self.local_dir = os.path.join(self.temp_dir, 'local')
+        self.files = {
+            'app/app': os.urandom(600 * 1024),
+            'app/_internal/lib/core.so': os.urandom(40 * 1024),
+            'app/_internal/lib/empty.txt': b'',
+            'app/_internal/data/a/b/c/config.json': b'{}'
+        }
+        for index in range(20):
+            self.files[f'app/_internal/modules/m{index}.pyc'] = os.urandom(index * 100)
+        for path, content in self.files.items():
+            full_path = os.path.join(self.remote_dir, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+        os.chmod(os.path.join(self.remote_dir, 'app', 'app'), 0o755)
+        self.server = LocalServer()
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _local_files(self):
+        result = {}
+        for dirpath, _, names in os.walk(self.local_dir):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    result[os.path.relpath(path, self.local_dir).replace(os.sep, '/')] = f.read()
+        return result
+        
+    def test_download_tree(self):
+        """测试并发下载嵌套目录并保留可执行权限"""
+        progress = []
+        downloader = ParallelDownloader(
+            self.server,
+            channels=4,
+            chunk_size=64 * 1024,
+            progress_callback=progress.append
+        )
+        self.assertTrue(downloader.download_tree(self.remote_dir, self.local_dir), downloader.error)
+        self.assertEqual(self._local_files(), self.files)
+        self.assertEqual(os.stat(os.path.join(self.local_dir, 'app', 'app')).st_mode & 0o777, 0o755)
+        self.assertEqual(downloader.stats.done_files, len(self.files))
+        self.assertEqual(downloader.stats.done_bytes, sum(len(c) for c in self.files.values()))
+        self.assertEqual(self.server.channels, 4)
+        self.assertTrue(progress)
+        
+    def test_mismatch_retried(self):
+        """测试校验失败的文件重新下载一次"""
+        remote_path = f"{self.remote_dir}/app/_internal/lib/core.so"
+        self.server.corrupt[remote_path] = 1
+        downloader = ParallelDownloader(self.server, channels=2)
+        self.assertTrue(downloader.download_tree(self.remote_dir, self.local_dir), downloader.error)
+        self.assertEqual(self._local_files(), self.files)
+        
+        # 重新下载后仍不一致时失败
+        shutil.rmtree(self.local_dir)
+        self.server.corrupt[remote_path] = 2
+        downloader = ParallelDownloader(self.server, channels=2)
+        self.assertFalse(downloader.download_tree(self.remote_dir, self.local_dir))
+        self.assertIn('core.so', downloader.error)
+        
+    def test_missing_root(self):
+        """测试远程目录不存在时失败"""
+        downloader = ParallelDownloader(self.server)
+        self.assertFalse(downloader.download_tree(os.path.join(self.temp_dir, 'missing'), self.local_dir))
+        self.assertIn('missing', downloader.error)
+        self.assertEqual(self.server.channels, 0)
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from core.transfer.hashcache import FileHashCache
+
+class TestFileHashCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = FileHashCache(
+            path=os.path.join(self.temp_dir, 'cache.db'),
+            max_entries=2
+        )
+        self.calls = []
+        
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+        
+    def _write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+        
+    def _hash(self, path):
+        self.calls.append(path)
+        with open(path) as f:
+            return f"hash-{f.read()}"
+            
+    def test_unchanged_file_is_not_rehashed(self):
+        """测试未修改的文件直接命中缓存"""
+        path = self._write('a.txt', 'one')
+        self.assertEqual(self.cache.hash_file(path, self._hash), 'hash-one')
+        self.assertEqual(self.cache.hash_file(path, self._hash), 'hash-one')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.hits, 1)
+        
+    def test_modified_file_is_rehashed(self):
+        """测试修改后的文件重新计算哈希"""
+        path = self._write('a.txt', 'one')
+        self.cache.hash_file(path, self._hash)
+        
+        self._write('a.txt', 'two!')
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+        self.assertEqual(self.cache.hash_file(path, self._hash), 'hash-two!')
+        self.assertEqual(len(self.calls), 2)
+        
+    def test_persists_across_instances(self):
+        """测试缓存在重新打开后仍然有效"""
+        path = self._write('a.txt', 'one')
+        self.cache.hash_file(path, self._hash)
+        self.cache.close()
+        
+        self.cache = FileHashCache(path=os.path.join(self.temp_dir, 'cache.db'))
+        self.cache.hash_file(path, self._hash)
+        self.assertEqual(len(self.calls), 1)
+        
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        paths = [self._write(f'{i}.txt', str(i)) for i in range(3)]
+        for path in paths:
+            self.cache.hash_file(path, self._hash)
+            time.sleep(0.01)
+            
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(os.stat(paths[0])))
+        self.assertIsNotNone(self.cache.get(os.stat(paths[2])))
+
+if __name__ == '__main__':
+    unittest.main()
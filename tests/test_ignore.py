@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.transfer.ignore import IgnoreMatcher
+
+class TestIgnoreMatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _touch(self, relative_path):
+        path = os.path.join(self.temp_dir, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(relative_path)
+            
+    def test_gitignore_semantics(self):
+        """测试 gitignore 匹配语义"""
+        matcher = IgnoreMatcher([
+            '*.log',
+            '!keep.log',
+            '/build/',
+            'docs/**/*.tmp',
+            'cache/'
+        ])
+        self.assertTrue(matcher.is_ignored('a/b/error.log'))
+        self.assertFalse(matcher.is_ignored('a/keep.log'))
+        self.assertTrue(matcher.is_ignored('build', is_dir=True))
+        self.assertFalse(matcher.is_ignored('src/build', is_dir=True))
+        self.assertTrue(matcher.is_ignored('docs/x/y/z.tmp'))
+        self.assertTrue(matcher.is_ignored('docs/z.tmp'))
+        self.assertTrue(matcher.is_ignored('src/cache', is_dir=True))
+        self.assertFalse(matcher.is_ignored('src/cache'))
+        
+    def test_escapes(self):
+        """测试转义的 ! 和 # 按字面匹配, 转义的行尾空格保留"""
+        matcher = IgnoreMatcher([
+            '*.log',
+            '\\!important.log',
+            '\\#notes',
+            'trailing\\ ',
+            'spaces   \n',
+            '!keep.log\r\n'
+        ])
+        # \! 开头的规则忽略名为 !important.log 的文件, 而不是重新包含 important.log
+        self.assertTrue(matcher.is_ignored('!important.log'))
+        self.assertTrue(matcher.is_ignored('important.log'))
+        self.assertFalse(matcher.is_ignored('keep.log'))
+        self.assertFalse(any(rule.negate for rule in matcher.rules[:-1]))
+        self.assertTrue(matcher.rules[-1].negate)
+        
+        self.assertTrue(matcher.is_ignored('#notes'))
+        self.assertTrue(matcher.is_ignored('trailing '))
+        self.assertFalse(matcher.is_ignored('trailing'))
+        self.assertTrue(matcher.is_ignored('spaces'))
+        self.assertFalse(matcher.is_ignored('spaces   '))
+        
+    def test_walk_prunes_directories(self):
+        """测试遍历时剪除忽略的目录"""
+        for path in [
+            'main.py',
+            'pkg/mod.py',
+            'pkg/__pycache__/mod.cpython-311.pyc',
+            '.git/HEAD',
+            'node_modules/lib/index.js',
+            'dist/app.exe',
+            'data/dist/keep.txt'
+        ]:
+            self._touch(path)
+            
+        with open(os.path.join(self.temp_dir, '.remotebuilderignore'), 'w') as f:
+            f.write('# comment\n*.txt\n')
+            
+        matcher = IgnoreMatcher.for_workspace(self.temp_dir, ['!keep.txt'])
+        files = sorted(relative for _, relative in matcher.walk(self.temp_dir))
+        self.assertEqual(files, [
+            '.remotebuilderignore',
+            'data/dist/keep.txt',
+            'main.py',
+            'pkg/mod.py'
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
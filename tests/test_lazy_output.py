@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+from core.builder import BuildManager, BuildTask, TaskStatus
+from core.builder.cache import BuildCache
+from core.storage.artifacts import ArtifactStore
+from core.transfer.hashcache import FileHashCache
+
+try:
+    from fastapi.testclient import TestClient
+    from core.api.artifacts import ArtifactAPI
+    from test_artifact_api import create_app
+except ImportError:
+    TestClient = None
+
+class LocalChannel:
+    """以本地子进程模拟命令通道"""
+    
+    def __init__(self, args):
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+    def makefile(self, mode):
+        return self.proc.stdout
+        
+    def makefile_stdin(self, mode):
+        return self.proc.stdin
+        
+    def makefile_stderr(self, mode):
+        return self.proc.stderr
+        
+    def shutdown_write(self):
+        self.proc.stdin.close()
+        
+    def recv_exit_status(self):
+        return self.proc.wait()
+        
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+        
+class LocalServer:
+    """在本地执行远程脚本的服务器, 记录回传输出的次数"""
+    
+    def __init__(self):
+        self.config = {}
+        self.downloads = 0
+        self.lock = threading.Lock()
+        
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def open_channel(self, command):
+        with self.lock:
+            self.downloads += 1
+        # 放慢下载, 让并发请求在下载期间到达
+        time.sleep(0.2)
+        return LocalChannel(command)
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(self.python_command(script, *args), capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+    def execute_python_input(self, script, data, *args):
+        result = subprocess.run(self.python_command(script, *args), input=data, capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+    def remove_directory(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+        
+class TestLazyOutput(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ArtifactStore(root=os.path.join(self.temp_dir, 'store'), max_age=None)
+        self.manager = BuildManager(
+            None,
+            hash_cache=FileHashCache(os.path.join(self.temp_dir, 'hashes.db')),
+            build_cache=BuildCache(os.path.join(self.temp_dir, 'cache')),
+            artifact_store=self.store,
+            log_dir=os.path.join(self.temp_dir, 'logs')
+        )
+        self.server = LocalServer()
+        self.files = {
+            'app/main': os.urandom(200 * 1024),
+            'app/lib/core.so': b'library' * 100
+        }
+        
+    def tearDown(self):
+        for task in self.manager.tasks.values():
+            shutil.rmtree(f"/tmp/output_{task.task_id}", ignore_errors=True)
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+        
+    def _finished_task(self, ttl=60.0):
+        """在打包服务器上留下输出并完成任务"""
+        task = BuildTask(
+            f"lazy_{uuid.uuid4().hex}",
+            'linux',
+            'main.py',
+            self.temp_dir,
+            {'transfer': {'output_compression': 'gzip', 'output_level': 1, 'remote_ttl': ttl}}
+        )
+        task.server = self.server
+        task.output_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        remote_output = f"/tmp/output_{task.task_id}"
+        for path, content in self.files.items():
+            full_path = os.path.join(remote_output, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+        self.assertTrue(self.manager._keep_remote_output(task))
+        task.status = TaskStatus.SUCCESS
+        self.manager.tasks[task.task_id] = task
+        return task
+        
+    def _stored_files(self, artifact_id):
+        result = {}
+        for entry in self.store.list_files(artifact_id):
+            with self.store.open_file(artifact_id, entry['path']) as f:
+                result[entry['path']] = f.read()
+        return result
+        
+    def test_first_fetch_downloads_once(self):
+        """测试首次请求下载输出, 之后使用本地产物"""
+        task = self._finished_task()
+        self.assertIsNone(task.output_dir)
+        self.assertEqual(self.server.downloads, 0)
+        
+        artifact_id = self.manager.fetch_artifact(task.task_id)
+        self.assertIsNotNone(artifact_id)
+        self.assertEqual(self._stored_files(artifact_id), self.files)
+        self.assertEqual(self.server.downloads, 1)
+        # 已存入产物存储, 远程副本被删除
+        self.assertIsNone(task.remote_output)
+        self.assertFalse(os.path.exists(f"/tmp/output_{task.task_id}"))
+        
+        self.assertEqual(self.manager.fetch_artifact(task.task_id), artifact_id)
+        self.assertEqual(self.server.downloads, 1)
+        
+    def test_concurrent_first_fetch(self):
+        """测试并发的首次请求只下载一次"""
+        task = self._finished_task()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.manager.fetch_artifact(task.task_id)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+            
+        self.assertEqual(self.server.downloads, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertIsNotNone(results[0])
+        
+    def test_expired_output(self):
+        """测试过期后删除远程输出, 产物不可用"""
+        task = self._finished_task(ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.manager.fetch_artifact(task.task_id))
+        self.assertIsNone(task.remote_output)
+        self.assertFalse(os.path.exists(f"/tmp/output_{task.task_id}"))
+        self.assertEqual(self.server.downloads, 0)
+        
+    def test_missing_output(self):
+        """测试远程输出已被服务器清理时产物不可用"""
+        task = self._finished_task()
+        shutil.rmtree(f"/tmp/output_{task.task_id}")
+        self.assertIsNone(self.manager.fetch_artifact(task.task_id))
+        self.assertIsNone(task.remote_output)
+        self.assertEqual(self.server.downloads, 0)
+        
+    @unittest.skipIf(TestClient is None, "未安装 fastapi")
+    def test_api(self):
+        """测试产物接口列出远程清单, 过期后返回 404"""
+        client = TestClient(create_app(ArtifactAPI(self.manager)))
+        task = self._finished_task()
+        data = client.get(f'/tasks/{task.task_id}/artifacts').json()['data']
+        self.assertTrue(data['remote'])
+        self.assertEqual(
+            {entry['name']: entry['size'] for entry in data['files']},
+            {path: len(content) for path, content in self.files.items()}
+        )
+        self.assertEqual(self.server.downloads, 0)
+        
+        response = client.get(f'/tasks/{task.task_id}/artifacts/app/main')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.files['app/main'])
+        data = client.get(f'/tasks/{task.task_id}/artifacts').json()['data']
+        self.assertFalse(data['remote'])
+        
+        expired = self._finished_task(ttl=0.05)
+        time.sleep(0.1)
+        response = client.get(f'/tasks/{expired.task_id}/artifacts/app/main')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(os.path.exists(f"/tmp/output_{expired.task_id}"))
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
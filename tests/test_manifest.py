@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import unittest
+from core.transfer.manifest import (
+    FileEntry,
+    diff_manifests,
+    fetch_remote_manifest,
+    temp_path
+)
+
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+    
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(self.python_command(script, *args), capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+class CannedServer:
+    """返回固定输出的服务器"""
+    
+    def __init__(self, stdout, stderr=''):
+        self.output = (stdout, stderr)
+        
+    def execute_python(self, script, *args):
+        return self.output
+        
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.files = {
+            'main.py': b'print("hello")',
+            'pkg/__init__.py': b'',
+            'pkg/sub/data.bin': os.urandom(4096)
+        }
+        for path, content in self.files.items():
+            full_path = os.path.join(self.temp_dir, *path.split('/'))
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+                
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def _entry(self, path, content):
+        return FileEntry(path, len(content), 0.0, hashlib.sha256(content).hexdigest())
+        
+    def test_diff_manifests(self):
+        """测试只上传新增, 大小或哈希不同的文件"""
+        local = {
+            'same': self._entry('same', b'same'),
+            'new': self._entry('new', b'new'),
+            'resized': self._entry('resized', b'longer content'),
+            'edited': self._entry('edited', b'abcd')
+        }
+        remote = {
+            'same': self._entry('same', b'same'),
+            'resized': self._entry('resized', b'short'),
+            'edited': self._entry('edited', b'abce'),
+            'deleted': self._entry('deleted', b'gone')
+        }
+        # 修改时间不同不算修改
+        remote['same'].mtime = 12345.0
+        self.assertEqual(sorted(diff_manifests(local, remote)), ['edited', 'new', 'resized'])
+        self.assertEqual(sorted(diff_manifests(local, {})), sorted(local))
+        self.assertEqual(diff_manifests({}, remote), [])
+        
+    def test_remote_manifest(self):
+        """测试远程清单列出嵌套文件并跳过传输临时文件"""
+        with open(temp_path(os.path.join(self.temp_dir, 'main.py')), 'wb') as f:
+            f.write(b'partial')
+        manifest = fetch_remote_manifest(LocalServer(), self.temp_dir)
+        self.assertEqual(set(manifest), set(self.files))
+        for path, content in self.files.items():
+            entry = manifest[path]
+            self.assertEqual(entry.path, path)
+            self.assertEqual(entry.size, len(content))
+            self.assertEqual(entry.hash, hashlib.sha256(content).hexdigest())
+            self.assertEqual(entry.algorithm, 'sha256')
+            
+        # 不计算哈希时只返回大小和修改时间
+        manifest = fetch_remote_manifest(LocalServer(), self.temp_dir, with_hash=False)
+        self.assertEqual({entry.hash for entry in manifest.values()}, {''})
+        
+        self.assertEqual(fetch_remote_manifest(LocalServer(), os.path.join(self.temp_dir, 'missing')), {})
+        
+    def test_remote_manifest_parsing(self):
+        """测试解析远程输出, 输出为空或无效时返回空清单"""
+        output = json.dumps({
+            'algorithm': 'blake2b',
+            'entries': {'a/b.txt': [3, 1700000000.5, 'abc']}
+        })
+        manifest = fetch_remote_manifest(CannedServer(output), '/remote', algorithm='blake2b')
+        entry = manifest['a/b.txt']
+        self.assertEqual((entry.size, entry.mtime, entry.hash), (3, 1700000000.5, 'abc'))
+        self.assertEqual(entry.algorithm, 'blake2b')
+        
+        self.assertEqual(fetch_remote_manifest(CannedServer('', 'Traceback'), '/remote'), {})
+        self.assertEqual(fetch_remote_manifest(CannedServer('not json'), '/remote'), {})
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import sys
+import json
+import subprocess
+import unittest
+from core.server import BaseServer, ServerStatus
+from core.server.probe import UNIX_PROBE_SCRIPT, BUILDER_DISTRIBUTIONS, apply_probe
+
+class LocalServer(BaseServer):
+    """在本地执行探测脚本的服务器"""
+
+    def __init__(self):
+        super().__init__({'agent': False})
+        self.calls = 0
+
+    def execute_python(self, script, *args):
+        self.calls += 1
+        result = subprocess.run([sys.executable, '-c', script, *args], capture_output=True, text=True)
+        return result.stdout, result.stderr
+
+    connect = disconnect = execute_command = None
+    upload_file = download_file = create_directory = remove_directory = None
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "探测脚本读取 /proc")
+class TestProbe(unittest.TestCase):
+    def test_probe_script(self):
+        result = subprocess.run(
+            [sys.executable, '-c', UNIX_PROBE_SCRIPT, *BUILDER_DISTRIBUTIONS],
+            capture_output=True,
+            text=True
+        )
+        probe = json.loads(result.stdout)
+        self.assertTrue(0 <= probe['cpu_usage'] <= 100)
+        self.assertTrue(0 < probe['memory_usage'] < 100)
+        self.assertEqual(probe['cpu_count'], __import__('os').cpu_count())
+        self.assertEqual(len(probe['load_average']), 3)
+        self.assertGreater(probe['temp_free'], 0)
+        self.assertEqual(probe['python_version'], sys.version.split()[0])
+
+        status = apply_probe(ServerStatus(), probe)
+        self.assertEqual(status.python_version, f"Python {sys.version.split()[0]}")
+        self.assertIsInstance(status.builder_versions, dict)
+
+    def test_check_health_single_call(self):
+        server = LocalServer()
+        server.status.errors.append("旧错误")
+        status = server.check_health()
+        self.assertEqual(server.calls, 1)
+        self.assertEqual(status.errors, [])
+        self.assertGreater(status.cpu_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from core.transfer.resume import ResumableTransfer, TransferCheckpoint
+
+class LocalFile:
+    """以本地文件模拟 SFTP 文件"""
+    
+    def __init__(self, path, mode, server):
+        self.file = open(path, mode)
+        self.server = server
+        
+    def readv(self, ranges):
+        for offset, length in ranges:
+            if self.server.fail_after is not None and self.server.reads >= self.server.fail_after:
+                raise IOError("connection reset")
+            self.server.reads += 1
+            self.file.seek(offset)
+            yield self.file.read(length)
+            
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.file.close()
+        
+class LocalSFTP:
+    def __init__(self, server):
+        self.server = server
+        
+    def open(self, path, mode):
+        return LocalFile(path, mode, self.server)
+        
+    def close(self):
+        pass
+        
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+    
+    def __init__(self):
+        self.reads = 0
+        self.fail_after = None
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(
+            [sys.executable, '-c', script, *args],
+            capture_output=True,
+            text=True
+        )
+        return result.stdout, result.stderr
+        
+    def open_sftp(self):
+        return LocalSFTP(self)
+        
+class TestResumableTransfer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.remote_path = os.path.join(self.temp_dir, 'remote.bin')
+        self.content = os.urandom(10 * 1024 + 123)
+        with open(self.remote_path, 'wb') as f:
+            f.write(self.content)
+            
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def test_download_resumes_from_checkpoint(self):
+        server = LocalServer()
+        checkpoint_path = os.path.join(self.temp_dir, 'checkpoint.json')
+        local_path = os.path.join(self.temp_dir, 'local.bin')
+        
+        # 第一次传输 4 个分块后中断
+        server.fail_after = 4
+        transfer = ResumableTransfer(
+            server,
+            TransferCheckpoint(checkpoint_path),
+            chunk_size=1024,
+            max_attempts=1
+        )
+        self.assertFalse(transfer.download(self.remote_path, local_path))
+        self.assertTrue(os.path.exists(checkpoint_path))
+        
+        # 重新加载断点后只传输剩余的 7 个分块
+        server.fail_after = None
+        server.reads = 0
+        transfer = ResumableTransfer(
+            server,
+            TransferCheckpoint(checkpoint_path),
+            chunk_size=1024,
+            max_attempts=1
+        )
+        self.assertTrue(transfer.download(self.remote_path, local_path))
+        self.assertEqual(server.reads, 7)
+        with open(local_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+if __name__ == '__main__':
+    unittest.main()
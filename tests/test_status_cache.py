@@ -0,0 +1,113 @@
+import time
+import unittest
+from core.server import ServerStatus, ServerManager
+from core.server.status_cache import StatusCache
+
+class FakeServer:
+    """记录探测次数的模拟服务器"""
+    
+    def __init__(self, config=None, cpu_usage=10.0):
+        self.config = config or {}
+        self.status = ServerStatus()
+        self.cpu_usage = cpu_usage
+        self.probes = 0
+        
+    def check_health(self):
+        self.probes += 1
+        self.status.cpu_usage = self.cpu_usage
+        return self.status
+        
+    def disconnect(self):
+        pass
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class TestStatusCache(unittest.TestCase):
+    def setUp(self):
+        self.servers = {}
+        self.updates = []
+        self.cache = StatusCache(
+            lambda: dict(self.servers),
+            ttl=30,
+            refresh_interval=60,
+            on_update=lambda name, status: self.updates.append(name)
+        )
+        
+    def tearDown(self):
+        self.cache.stop()
+        
+    def test_get_reads_snapshot_without_probing(self):
+        server = self.servers['a'] = FakeServer()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(server.probes, 0)
+        
+        snapshot = self.cache.get('a', refresh=True)
+        self.assertEqual(server.probes, 1)
+        self.assertEqual(snapshot.status.cpu_usage, 10.0)
+        self.assertFalse(snapshot.stale)
+        self.assertEqual(self.updates, ['a'])
+        
+        # 之后的探测不修改已有快照
+        server.cpu_usage = 90.0
+        server.check_health()
+        self.assertEqual(self.cache.get('a').status.cpu_usage, 10.0)
+        self.assertEqual(server.probes, 2)
+        
+    def test_refresh_expired_uses_per_server_ttl(self):
+        fresh = self.servers['fresh'] = FakeServer()
+        expiring = self.servers['expiring'] = FakeServer({'status_ttl': 0})
+        self.cache.refresh('fresh')
+        self.cache.refresh('expiring')
+        self.assertEqual(self.cache.get('expiring').ttl, 0)
+        
+        self.assertEqual(self.cache.refresh_expired(), 1)
+        self.assertTrue(wait_for(lambda: expiring.probes == 2))
+        self.assertEqual(fresh.probes, 1)
+        
+    def test_removed_servers_are_pruned(self):
+        self.servers['a'] = FakeServer()
+        self.cache.refresh('a')
+        del self.servers['a']
+        self.cache.refresh_expired()
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('a', refresh=True))
+        
+    def test_background_refresh(self):
+        cache = StatusCache(lambda: dict(self.servers), ttl=0, refresh_interval=0.02)
+        try:
+            server = self.servers['a'] = FakeServer()
+            self.assertTrue(wait_for(lambda: server.probes >= 2))
+            self.assertIsNotNone(cache.get('a'))
+        finally:
+            cache.stop()
+
+class TestServerManagerStats(unittest.TestCase):
+    def test_stats_read_from_cache(self):
+        manager = ServerManager()
+        try:
+            server = FakeServer()
+            manager.servers['a'] = server
+            manager.active_servers['a'] = server
+            manager.reconnect_attempts['a'] = 0
+            manager.status_cache.refresh('a')
+            
+            for _ in range(3):
+                stats = manager.get_server_stats()
+            self.assertEqual(server.probes, 1)
+            self.assertEqual(stats['servers']['a']['cpu_usage'], 10.0)
+            self.assertFalse(stats['servers']['a']['stale'])
+            self.assertEqual(manager.load_balancer.server_loads['a'], 4.0)
+            
+            manager.get_server_stats(refresh=True)
+            self.assertEqual(server.probes, 2)
+        finally:
+            manager.status_cache.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import deque
+from core.server import BaseServer, OutputLog, LineDecoder
+from core.builder import BuildTask
+
+class FakeChannel:
+    """按顺序送出 stdout/stderr 数据的模拟通道"""
+    
+    def __init__(self, events, exit_status):
+        self.events = deque(events)
+        self.exit_status = exit_status
+        self.read_fd, self.write_fd = os.pipe()
+        os.write(self.write_fd, b'x')
+        self.closed = False
+        
+    def fileno(self):
+        return self.read_fd
+        
+    def _ready(self, stream):
+        return bool(self.events) and self.events[0][0] == stream
+        
+    def recv_ready(self):
+        return self._ready('stdout')
+        
+    def recv_stderr_ready(self):
+        return self._ready('stderr')
+        
+    def recv(self, size):
+        return self.events.popleft()[1]
+        
+    def recv_stderr(self, size):
+        return self.events.popleft()[1]
+        
+    def exit_status_ready(self):
+        return not self.events
+        
+    def recv_exit_status(self):
+        return self.exit_status
+        
+    def close(self):
+        if not self.closed:
+            os.close(self.read_fd)
+            os.close(self.write_fd)
+            self.closed = True
+            
+class ChannelServer(BaseServer):
+    """open_channel 返回模拟通道的服务器"""
+    
+    encoding = 'gbk'
+    
+    def __init__(self, channel):
+        super().__init__({'agent': False})
+        self.channel = channel
+        
+    def open_channel(self, command):
+        return self.channel
+        
+    connect = disconnect = check_health = execute_command = None
+    upload_file = download_file = create_directory = remove_directory = None
+    
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def test_line_decoder_keeps_partial_characters(self):
+        """测试多字节字符跨块时不被截断"""
+        data = '构建完成\r\nline 2\npartial'.encode('gbk')
+        decoder = LineDecoder('gbk')
+        lines = []
+        for i in range(len(data)):
+            lines += decoder.feed(data[i:i + 1])
+        self.assertEqual(lines, ['构建完成', 'line 2'])
+        self.assertEqual(decoder.flush(), ['partial'])
+        
+    def test_output_log_tail_and_spool(self):
+        """测试内存中只保留末尾, 完整输出写入日志文件"""
+        path = os.path.join(self.temp_dir, 'logs', 'task.log')
+        seen = []
+        log = OutputLog(path, tail_lines=3, on_line=lambda stream, line: seen.append(stream))
+        for i in range(10):
+            log.write('stdout' if i % 2 else 'stderr', f"line {i}")
+        log.close()
+        self.assertEqual(log.tail(), 'line 7\nline 8\nline 9')
+        self.assertEqual(log.tail(1), 'line 9')
+        self.assertEqual(log.lines, 10)
+        self.assertEqual(seen.count('stderr'), 5)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines(), [f"line {i}" for i in range(10)])
+            
+    def test_streaming_reads_both_streams(self):
+        """测试同时读取 stdout 和 stderr 并逐行回调"""
+        channel = FakeChannel([
+            ('stdout', 'INFO: 开始\n'.encode('gbk')),
+            ('stderr', b'WARNING: par'),
+            ('stdout', b'tial\nno newline'),
+            ('stderr', b'tial\n')
+        ], exit_status=2)
+        server = ChannelServer(channel)
+        lines = []
+        log = OutputLog(on_line=lambda *item: lines.append(item))
+        status = server.execute_streaming('pyinstaller', log=log)
+        self.assertEqual(status, 2)
+        self.assertIn(('stdout', 'INFO: 开始'), lines)
+        self.assertIn(('stderr', 'WARNING: partial'), lines)
+        self.assertIn(('stdout', 'tial'), lines)
+        self.assertEqual(lines[-1], ('stdout', 'no newline'))
+        self.assertEqual(log.lines, 4)
+        self.assertTrue(channel.closed)
+        
+    def test_collect_output(self):
+        """测试收集完整输出和退出码"""
+        channel = FakeChannel([('stderr', b'err'), ('stdout', b'out')], exit_status=0)
+        self.assertEqual(ChannelServer(channel)._collect_output('cmd'), ('out', 'err', 0))
+        
+    def test_task_last_output(self):
+        """测试任务日志的逐行回调记录最近一行非空输出"""
+        channel = FakeChannel([
+            ('stdout', 'INFO: 分析依赖\n'.encode('gbk')),
+            ('stderr', b'INFO: Building EXE\n\n')
+        ], exit_status=0)
+        task = BuildTask('task', 'windows', 'main.py', self.temp_dir, {})
+        self.assertEqual(task.last_output, '')
+        self.assertIsNone(task.last_output_time)
+        self.assertEqual(ChannelServer(channel).execute_streaming('pyinstaller', log=task.log), 0)
+        self.assertEqual(task.last_output, 'INFO: Building EXE')
+        self.assertIsNotNone(task.last_output_time)
+        self.assertEqual(task.log.lines, 3)
+        
+if __name__ == '__main__':
+    unittest.main()
+    
\ No newline at end of file
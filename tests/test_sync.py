@@ -0,0 +1,66 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import unittest
+from core.transfer.manifest import FileEntry, temp_path
+from core.transfer.sync import WarmWorkspace
+
+class LocalServer:
+    """在本地执行远程脚本的服务器"""
+
+    config = {}
+
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+
+    def execute_python_input(self, script, data, *args):
+        result = subprocess.run(self.python_command(script, *args), input=data, capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+
+class TestWarmClone(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.warm = WarmWorkspace('test', self.temp_dir, LocalServer(), hash_func=lambda path: '')
+        self.warm.remote_root = os.path.join(self.temp_dir, 'mirror')
+        os.makedirs(os.path.join(self.warm.remote_root, 'app'))
+        for name in ['main.py', 'data.part', temp_path('main.py')]:
+            with open(os.path.join(self.warm.remote_root, 'app', name), 'w') as f:
+                f.write(name)
+        for name in ['main.py', 'data.part']:
+            self.warm.synced[f'app/{name}'] = self._entry(f'app/{name}', name)
+
+    def tearDown(self):
+        for directory, _, names in os.walk(self.temp_dir):
+            for name in names:
+                os.chmod(os.path.join(directory, name), 0o644)
+        shutil.rmtree(self.temp_dir)
+
+    def _entry(self, path, digest):
+        return FileEntry(path, 0, 0, hash=digest)
+
+    def test_clone_only_task_files(self):
+        target = os.path.join(self.temp_dir, 'task')
+        manifest = {
+            'app/main.py': self._entry('app/main.py', 'main.py'),
+            'app/data.part': self._entry('app/data.part', 'data.part'),
+            'app/new.py': self._entry('app/new.py', 'new.py')
+        }
+        # 常驻目录中没有的文件交给调用方上传, 用户的 .part 文件照常生成
+        self.assertEqual(self.warm.clone_to(target, manifest), ['app/new.py'])
+        self.assertEqual(sorted(os.listdir(os.path.join(target, 'app'))), ['data.part', 'main.py'])
+
+        # 任务目录中的修改不会写入常驻目录
+        source = os.path.join(self.warm.remote_root, 'app', 'main.py')
+        dest = os.path.join(target, 'app', 'main.py')
+        if os.path.samefile(source, dest):
+            self.assertFalse(os.stat(source).st_mode & 0o222)
+        else:
+            with open(dest, 'w') as f:
+                f.write('changed')
+        with open(source) as f:
+            self.assertEqual(f.read(), 'main.py')
+
+if __name__ == '__main__':
+    unittest.main()
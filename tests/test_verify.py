@@ -0,0 +1,225 @@
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+import unittest
+from core.transfer.verify import hash_file, verify_files, fetch_remote_hashes
+from core.transfer.manifest import fetch_remote_manifest
+from core.transfer.archive import ArchiveDownloader
+from core.transfer.upload import ParallelUploader
+
+class LocalChannel:
+    """以本地子进程模拟命令通道"""
+    
+    def __init__(self, args):
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+    def makefile(self, mode):
+        return self.proc.stdout
+        
+    def makefile_stdin(self, mode):
+        return self.proc.stdin
+        
+    def makefile_stderr(self, mode):
+        return self.proc.stderr
+        
+    def shutdown_write(self):
+        self.proc.stdin.close()
+        
+    def recv_exit_status(self):
+        return self.proc.wait()
+        
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+        
+class LocalFile:
+    """以本地文件模拟 SFTP 文件"""
+    
+    def __init__(self, path, mode):
+        self.file = open(path, mode)
+        self.pipelined = False
+        
+    def set_pipelined(self, pipelined):
+        self.pipelined = pipelined
+        
+    def write(self, data):
+        self.file.write(data)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.file.close()
+        
+class LocalSFTP:
+    """以本地文件系统模拟 SFTP 通道"""
+    
+    def __init__(self):
+        self.closed = False
+        
+    def get_channel(self):
+        return self
+        
+    def open(self, path, mode):
+        return LocalFile(path, mode)
+        
+    def posix_rename(self, source, target):
+        os.replace(source, target)
+        
+    def close(self):
+        self.closed = True
+        
+class LocalServer:
+    """在本地执行远程脚本的服务器, 记录打开的 SFTP 通道和命令通道数"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sftp_channels = 0
+        self.command_channels = 0
+        
+    def open_sftp(self):
+        with self.lock:
+            self.sftp_channels += 1
+        return LocalSFTP()
+        
+    def python_command(self, script, *args):
+        return [sys.executable, '-c', script, *args]
+        
+    def open_channel(self, command):
+        with self.lock:
+            self.command_channels += 1
+        return LocalChannel(command)
+        
+    def execute_python(self, script, *args):
+        result = subprocess.run(self.python_command(script, *args), capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+    def execute_python_input(self, script, data, *args):
+        result = subprocess.run(self.python_command(script, *args), input=data, capture_output=True)
+        return result.stdout.decode(), result.stderr.decode()
+        
+class TestVerify(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.remote_dir = os.path.join(self.temp_dir, 'remote')
+        os.makedirs(os.path.join(self.remote_dir, 'app', 'lib'))
+        self.files = {
+            'app/main': os.urandom(3 * 1024 * 1024 + 17),
+            'app/lib/small.so': b'small',
+            'app/empty': b''
+        }
+        for path, content in self.files.items():
+            with open(os.path.join(self.remote_dir, *path.split('/')), 'wb') as f:
+                f.write(content)
+        self.server = LocalServer()
+        
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        
+    def test_hash_file_and_verify(self):
+        """测试本地文件哈希与多线程校验, 修改一个字节即可发现"""
+        paths = {
+            os.path.join(self.remote_dir, *path.split('/')): hashlib.sha256(content).hexdigest()
+            for path, content in self.files.items()
+        }
+        for path, digest in paths.items():
+            self.assertEqual(hash_file(path), digest)
+        self.assertEqual(verify_files(paths, max_workers=2), [])
+        
+        # 修改一个字节即可发现
+        main = os.path.join(self.remote_dir, 'app', 'main')
+        with open(main, 'r+b') as f:
+            f.seek(2 * 1024 * 1024)
+            f.write(b'\0' if self.files['app/main'][2 * 1024 * 1024] else b'\1')
+        self.assertEqual(verify_files(paths, max_workers=2), [main])
+        
+    def test_remote_hashes_match_local(self):
+        """测试远程清单和远程哈希与本地计算的一致"""
+        manifest = fetch_remote_manifest(self.server, self.remote_dir, algorithm='blake2b')
+        self.assertEqual(set(manifest), set(self.files))
+        for path, entry in manifest.items():
+            self.assertEqual(entry.algorithm, 'blake2b')
+            self.assertEqual(entry.hash, hash_file(os.path.join(self.remote_dir, *path.split('/')), 'blake2b'))
+            
+        main = os.path.join(self.remote_dir, 'app', 'main')
+        self.assertEqual(fetch_remote_hashes(self.server, [main]), {main: hash_file(main)})
+        
+    def test_archive_download_verified(self):
+        """测试压缩下载边解包边校验"""
+        local_dir = os.path.join(self.temp_dir, 'local')
+        downloader = ArchiveDownloader(self.server, compression='gzip', level=1, verify_hash='sha256')
+        self.assertTrue(downloader.download(self.remote_dir, local_dir), downloader.error)
+        self.assertEqual(downloader.files, len(self.files))
+        for path, content in self.files.items():
+            with open(os.path.join(local_dir, *path.split('/')), 'rb') as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual(sorted(os.listdir(local_dir)), ['app'])
+        
+    def test_upload_verified_while_writing(self):
+        """测试校验写入通道边写入边校验, 与清单不一致时重传后失败"""
+        target_dir = os.path.join(self.temp_dir, 'target')
+        os.makedirs(target_dir)
+        file_list = []
+        expected = {}
+        for path, content in self.files.items():
+            remote_path = os.path.join(target_dir, os.path.basename(path))
+            file_list.append((os.path.join(self.remote_dir, *path.split('/')), remote_path, len(content)))
+            expected[remote_path] = hashlib.sha256(content).hexdigest()
+            
+        uploader = ParallelUploader(self.server, channels=2, atomic=True, verify_hash='sha256')
+        self.assertTrue(uploader.upload(file_list, expected), uploader.error)
+        for path, content in self.files.items():
+            with open(os.path.join(target_dir, os.path.basename(path)), 'rb') as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual(sorted(os.listdir(target_dir)), sorted(os.path.basename(p) for p in self.files))
+        
+        # 与传输前的清单不一致时重传一次后报告失败
+        main = os.path.join(target_dir, 'main')
+        expected[main] = '0' * 64
+        uploader = ParallelUploader(self.server, channels=2, verify_hash='sha256')
+        self.assertFalse(uploader.upload(file_list, expected))
+        self.assertIn(main, uploader.error)
+        
+    def test_upload_engines(self):
+        """测试未开启校验时走流水线 SFTP 写入, 开启时走校验写入通道, 结果一致"""
+        for verify_hash in (None, 'sha256'):
+            target_dir = os.path.join(self.temp_dir, f'target-{verify_hash}')
+            os.makedirs(target_dir)
+            file_list = []
+            expected = {}
+            for path, content in self.files.items():
+                remote_path = os.path.join(target_dir, os.path.basename(path))
+                file_list.append((os.path.join(self.remote_dir, *path.split('/')), remote_path, len(content)))
+                expected[remote_path] = hashlib.sha256(content).hexdigest()
+                
+            server = LocalServer()
+            uploader = ParallelUploader(server, channels=2, atomic=True, verify_hash=verify_hash)
+            self.assertTrue(uploader.upload(file_list, expected), uploader.error)
+            for path, content in self.files.items():
+                with open(os.path.join(target_dir, os.path.basename(path)), 'rb') as f:
+                    self.assertEqual(f.read(), content)
+            self.assertEqual(sorted(os.listdir(target_dir)), sorted(os.path.basename(p) for p in self.files))
+            self.assertEqual(uploader.stats.done_files, len(self.files))
+            self.assertEqual(uploader.stats.done_bytes, sum(len(c) for c in self.files.values()))
+            if verify_hash:
+                self.assertEqual((server.sftp_channels, server.command_channels), (0, 2))
+            else:
+                self.assertEqual((server.sftp_channels, server.command_channels), (2, 0))
+                
+        # 未开启校验时不比较清单哈希
+        expected[file_list[0][1]] = '0' * 64
+        uploader = ParallelUploader(LocalServer(), channels=2)
+        self.assertTrue(uploader.upload(file_list, expected), uploader.error)
+        
+if __name__ == '__main__':
+    unittest.main()
+    
\ No newline at end of file